@@ -0,0 +1,250 @@
+"""Fan-out analyses: one resume over many JDs, or many resumes screened against one JD."""
+from __future__ import annotations
+
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from . import metrics
+from .llm_client import LLMClientError
+from .pipeline import (
+    LLMConfig,
+    PipelineError,
+    analyze_gaps_and_mapping_async,
+    gather_or_cancel,
+    generate_custom_resume_async,
+    generate_learning_plan_async,
+    parse_resume_profile_async,
+    run_full_analysis_async,
+)
+from .schemas import FullAnalysisResult, GapAnalysisResult, JDMappingMatrix, LearningPlan, Profile
+
+# JDs analyzed at the same time within one batch request.
+BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", "4"))
+# Resumes screened at the same time within one screening request.
+SCREENING_CONCURRENCY = int(os.getenv("LLM_SCREENING_CONCURRENCY", "8"))
+
+COVERAGE_WEIGHTS = {"full": 1.0, "partial": 0.5, "none": 0.0}
+MANDATORY_WEIGHT = 2.0
+
+
+@dataclass
+class BatchOutcome:
+    index: int
+    result: Optional[FullAnalysisResult] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class ScreeningOutcome:
+    index: int
+    resume_profile: Optional[Profile] = None
+    gap_analysis: Optional[GapAnalysisResult] = None
+    jd_mapping_matrix: Optional[JDMappingMatrix] = None
+    learning_plan: Optional[LearningPlan] = None
+    custom_resume_markdown: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def score(self) -> float:
+        return coverage_score(self.jd_mapping_matrix) if self.jd_mapping_matrix else 0.0
+
+
+def mandatory_coverage(matrix: JDMappingMatrix) -> Tuple[int, int]:
+    """(fully covered, total) mandatory JD points."""
+
+    coverage = {item.jd_point_id: item.coverage for item in matrix.resume_mapping}
+    mandatory = [point for point in matrix.jd_points if point.mandatory]
+    covered = sum(1 for point in mandatory if coverage.get(point.id) == "full")
+    return covered, len(mandatory)
+
+
+def coverage_score(matrix: JDMappingMatrix) -> float:
+    """Share of JD points the resume covers, counting mandatory points double.
+
+    Points without a mapping row count as uncovered.
+    """
+
+    coverage = {item.jd_point_id: item.coverage for item in matrix.resume_mapping}
+    total = earned = 0.0
+    for point in matrix.jd_points:
+        weight = MANDATORY_WEIGHT if point.mandatory else 1.0
+        total += weight
+        earned += weight * COVERAGE_WEIGHTS[coverage.get(point.id, "none")]
+    return round(earned / total, 4) if total else 0.0
+
+
+def rank_by_coverage(results: Dict[int, FullAnalysisResult]) -> List[Tuple[int, float]]:
+    """(index, coverage) pairs, best coverage first; ties keep request order."""
+
+    scored = [
+        (index, coverage_score(result.jd_mapping_matrix)) for index, result in results.items()
+    ]
+    return sorted(scored, key=lambda item: (-item[1], item[0]))
+
+
+async def iter_batch_analysis(
+    resume_text: str,
+    jd_texts: List[str],
+    *,
+    llm_config: Optional[LLMConfig] = None,
+    concurrency: int = BATCH_CONCURRENCY,
+) -> AsyncIterator[BatchOutcome]:
+    """Yield one outcome per JD in completion order.
+
+    The resume is parsed once up front (a failure there aborts the batch);
+    each JD then runs the remaining stages with at most ``concurrency`` JDs in
+    flight. A failing JD is reported in its outcome and does not stop others.
+    """
+
+    resume_profile, _, _ = await parse_resume_profile_async(resume_text, llm_config=llm_config)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def analyze_one(index: int, jd_text: str) -> BatchOutcome:
+        async with semaphore:
+            try:
+                result = await run_full_analysis_async(
+                    resume_text, jd_text, llm_config=llm_config, resume_profile=resume_profile
+                )
+            except (LLMClientError, PipelineError) as exc:
+                metrics.incr("batch_jd_total", status="failed")
+                return BatchOutcome(index, error=str(exc))
+        metrics.incr("batch_jd_total", status="succeeded")
+        return BatchOutcome(index, result=result)
+
+    tasks = [asyncio.create_task(analyze_one(i, jd)) for i, jd in enumerate(jd_texts)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def rank_candidates(outcomes: List[ScreeningOutcome]) -> List[ScreeningOutcome]:
+    """Screened candidates, best first: coverage score, then mandatory points met."""
+
+    screened = [outcome for outcome in outcomes if outcome.jd_mapping_matrix is not None]
+    return sorted(
+        screened,
+        key=lambda outcome: (
+            -outcome.score,
+            -mandatory_coverage(outcome.jd_mapping_matrix)[0],
+            outcome.index,
+        ),
+    )
+
+
+async def iter_screening(
+    resume_texts: List[str],
+    job_profile: Profile,
+    *,
+    llm_config: Optional[LLMConfig] = None,
+    concurrency: int = SCREENING_CONCURRENCY,
+) -> AsyncIterator[ScreeningOutcome]:
+    """Yield one outcome per resume in completion order.
+
+    The caller parses the JD once; each resume only runs parse + gap/mapping,
+    which is all a ranking needs. Plans and custom resumes are left to
+    :func:`complete_candidate` for the shortlisted few.
+    """
+
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def screen_one(index: int, resume_text: str) -> ScreeningOutcome:
+        async with semaphore:
+            try:
+                resume_profile, _, _ = await parse_resume_profile_async(
+                    resume_text, llm_config=llm_config
+                )
+                gap_analysis, jd_mapping, _, _ = await analyze_gaps_and_mapping_async(
+                    resume_profile, job_profile, llm_config=llm_config
+                )
+            except (LLMClientError, PipelineError) as exc:
+                metrics.incr("screening_candidates_total", status="failed")
+                return ScreeningOutcome(index, error=str(exc))
+        metrics.incr("screening_candidates_total", status="succeeded")
+        return ScreeningOutcome(index, resume_profile, gap_analysis, jd_mapping)
+
+    tasks = [asyncio.create_task(screen_one(i, text)) for i, text in enumerate(resume_texts)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def complete_candidate(
+    outcome: ScreeningOutcome,
+    resume_text: str,
+    jd_text: str,
+    *,
+    include_learning_plan: bool,
+    include_custom_resume: bool,
+    llm_config: Optional[LLMConfig] = None,
+) -> ScreeningOutcome:
+    """Fill in the optional follow-up stages for one shortlisted candidate."""
+
+    async def plan() -> Optional[LearningPlan]:
+        if not include_learning_plan or outcome.gap_analysis is None:
+            return None
+        learning_plan, _, _ = await generate_learning_plan_async(
+            outcome.gap_analysis, llm_config=llm_config
+        )
+        return learning_plan
+
+    async def custom_resume() -> Optional[str]:
+        if not include_custom_resume:
+            return None
+        markdown, _, _ = await generate_custom_resume_async(
+            resume_text, jd_text, llm_config=llm_config
+        )
+        return markdown
+
+    try:
+        outcome.learning_plan, outcome.custom_resume_markdown = await gather_or_cancel(
+            plan(), custom_resume()
+        )
+    except (LLMClientError, PipelineError) as exc:
+        # The screening score stays valid; only the follow-up is reported as failed.
+        outcome.error = str(exc)
+    return outcome
+
+
+async def iter_shortlist(
+    shortlist: List[ScreeningOutcome],
+    resume_texts: List[str],
+    jd_text: str,
+    *,
+    include_learning_plan: bool,
+    include_custom_resume: bool,
+    llm_config: Optional[LLMConfig] = None,
+    concurrency: int = SCREENING_CONCURRENCY,
+) -> AsyncIterator[ScreeningOutcome]:
+    """Run :func:`complete_candidate` over the top-K, yielding in completion order."""
+
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def complete(outcome: ScreeningOutcome) -> ScreeningOutcome:
+        async with semaphore:
+            return await complete_candidate(
+                outcome,
+                resume_texts[outcome.index],
+                jd_text,
+                include_learning_plan=include_learning_plan,
+                include_custom_resume=include_custom_resume,
+                llm_config=llm_config,
+            )
+
+    tasks = [asyncio.create_task(complete(outcome)) for outcome in shortlist]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,154 @@
+"""Hedged LLM requests: re-send a call whose first token is slower than usual."""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from . import metrics
+from .ratelimit import RateLimiter
+
+T = TypeVar("T")
+HedgeKey = Tuple[str, str]
+
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "false").lower() in {"1", "true", "yes"}
+# Optional secondary endpoint/key for the duplicate request (same protocol as the primary).
+HEDGE_API_BASE = os.getenv("LLM_HEDGE_API_BASE") or None
+HEDGE_API_KEY = os.getenv("LLM_HEDGE_API_KEY") or None
+# The hedge fires once the first token is later than this quantile of recent TTFTs.
+HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.9"))
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))
+# Used until HEDGE_MIN_SAMPLES first-token times have been seen for a stage/model.
+HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "15"))
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+
+
+class TTFTTracker:
+    """Sliding window of time-to-first-token samples per (stage, model)."""
+
+    def __init__(self, window: int = HEDGE_WINDOW) -> None:
+        self.window = window
+        self._samples: Dict[HedgeKey, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: HedgeKey, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+        metrics.observe("llm_ttft_seconds", seconds, stage=key[0], model=key[1])
+
+    def threshold(self, key: HedgeKey) -> float:
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        index = min(int(HEDGE_QUANTILE * len(samples)), len(samples) - 1)
+        return max(samples[index], HEDGE_MIN_DELAY)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+ttft = TTFTTracker()
+
+
+async def _discard(stream: AsyncIterator[T], task: "asyncio.Future[T]") -> None:
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
+    aclose = getattr(stream, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+async def hedged_stream(
+    open_primary: Callable[[], AsyncIterator[T]],
+    open_hedge: Callable[[], AsyncIterator[T]],
+    *,
+    key: HedgeKey,
+    tracker: Optional[TTFTTracker] = None,
+    limiter: Optional[RateLimiter] = None,
+    tokens: int = 0,
+) -> AsyncIterator[T]:
+    """Stream from ``open_primary``, racing ``open_hedge`` if its first item is slow.
+
+    The duplicate request starts once the primary has produced nothing for the
+    adaptive threshold; whichever stream yields first is followed to the end
+    and the other is cancelled. If one contender fails before producing
+    anything the other keeps going; the primary's error is raised if both fail.
+
+    With a ``limiter`` the hedge needs a slot of its own, taken only if one is
+    free without queueing; otherwise the hedge is skipped and the primary awaited.
+    """
+
+    tracker = tracker or ttft
+    stage, model = key
+    hedge_slot = False
+
+    def release_hedge_slot() -> None:
+        nonlocal hedge_slot
+        if hedge_slot and limiter is not None:
+            hedge_slot = False
+            limiter.release()
+
+    started = {"primary": time.perf_counter()}
+    streams = {"primary": open_primary()}
+    # First-item futures not yet consumed; anything left here is cancelled on exit.
+    firsts = {"primary": asyncio.ensure_future(streams["primary"].__anext__())}
+    winner: Optional[str] = None
+    first_item: Optional[T] = None
+    exhausted = False
+    errors: Dict[str, BaseException] = {}
+    try:
+        delay = tracker.threshold(key)
+        metrics.set_gauge("llm_hedge_threshold_seconds", delay, stage=stage, model=model)
+        await asyncio.wait(set(firsts.values()), timeout=delay)
+        if not firsts["primary"].done():
+            if limiter is not None and not limiter.try_acquire(tokens):
+                metrics.incr("llm_hedges_skipped_total", stage=stage, model=model)
+                await asyncio.wait(set(firsts.values()))
+            else:
+                hedge_slot = limiter is not None
+        if not firsts["primary"].done():
+            metrics.incr("llm_hedges_total", stage=stage, model=model)
+            started["hedge"] = time.perf_counter()
+            streams["hedge"] = open_hedge()
+            firsts["hedge"] = asyncio.ensure_future(streams["hedge"].__anext__())
+        while firsts and winner is None:
+            done, _ = await asyncio.wait(
+                set(firsts.values()), return_when=asyncio.FIRST_COMPLETED
+            )
+            # Prefer the primary when both finished in the same tick.
+            for name in [name for name in ("primary", "hedge") if firsts.get(name) in done]:
+                task = firsts.pop(name)
+                error = task.exception()
+                if error is None or isinstance(error, StopAsyncIteration):
+                    winner, exhausted = name, error is not None
+                    first_item = None if exhausted else task.result()
+                    break
+                errors[name] = error
+    finally:
+        for name, task in firsts.items():
+            await _discard(streams[name], task)
+        if winner != "hedge":
+            release_hedge_slot()
+    if winner is None:
+        raise errors.get("primary") or errors["hedge"]
+
+    try:
+        tracker.record(key, time.perf_counter() - started[winner])
+        if "hedge" in streams:
+            metrics.incr("llm_hedge_wins_total", stage=stage, model=model, winner=winner)
+        if exhausted:
+            return
+        yield first_item  # type: ignore[misc]
+        async for item in streams[winner]:
+            yield item
+    finally:
+        release_hedge_slot()
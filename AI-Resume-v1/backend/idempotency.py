@@ -0,0 +1,55 @@
+"""Idempotency keys for analysis submissions (``client_run_id`` or the Idempotency-Key header)."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from . import metrics
+from .schemas import AnalyzeRequest
+from .storage import get_idempotency_record, put_idempotency_record
+
+# How long a key keeps pointing at its analysis.
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a different request."""
+
+
+def fingerprint(payload: AnalyzeRequest) -> str:
+    """Hash of what the analysis depends on; the API key and run labels are left out."""
+
+    material = json.dumps(
+        [payload.resume_text, payload.jd_text, payload.llm_model, payload.llm_api_base],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _expires_at() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+
+
+def begin(key: str, request_fingerprint: str) -> Optional[str]:
+    """Claim ``key`` for this request; returns the stored analysis id if it already finished.
+
+    Raises IdempotencyConflict when the key belongs to a different request.
+    """
+
+    record = get_idempotency_record(key)
+    if record is not None:
+        if record.fingerprint != request_fingerprint:
+            metrics.incr("idempotency_conflicts_total")
+            raise IdempotencyConflict(f"Idempotency key {key!r} was used for a different request")
+        if record.analysis_id:
+            metrics.incr("idempotency_replays_total")
+        return record.analysis_id
+    put_idempotency_record(key, request_fingerprint, _expires_at())
+    return None
+
+
+def complete(key: str, request_fingerprint: str, analysis_id: str) -> None:
+    put_idempotency_record(key, request_fingerprint, _expires_at(), analysis_id)
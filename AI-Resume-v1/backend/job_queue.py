@@ -0,0 +1,125 @@
+"""Pool of asyncio workers draining the SQLite job queue (AnalysisJob)."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics
+from .storage import (
+    AnalysisJob,
+    StorageError,
+    claim_job,
+    extend_job_lease,
+    fail_job,
+    finish_job,
+)
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# A leased job becomes visible to other workers again if its lease is not renewed.
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))
+# Idle workers look for work this often even without a submit notification.
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Delay before a failed attempt is retried.
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "10"))
+
+# Runs one job and returns the id of the saved analysis.
+JobHandler = Callable[[AnalysisJob], Awaitable[str]]
+
+
+class WorkerPool:
+    """``workers`` tasks that lease jobs, run them and record the outcome.
+
+    While a job runs its lease is renewed every third of the visibility
+    timeout, so only a worker that died (or a process that was killed) lets
+    the job be picked up again. Failed attempts are retried after
+    ``JOB_RETRY_DELAY`` until the job runs out of attempts.
+    """
+
+    def __init__(
+        self,
+        handler: JobHandler,
+        workers: int = JOB_WORKERS,
+        *,
+        visibility_timeout: float = JOB_VISIBILITY_TIMEOUT,
+        poll_seconds: float = JOB_POLL_SECONDS,
+    ) -> None:
+        self.handler = handler
+        self.workers = workers
+        self.visibility_timeout = visibility_timeout
+        self.poll_seconds = poll_seconds
+        self.running = 0
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the workers; jobs they were running are retried once their lease lapses."""
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was submitted."""
+
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            self._wakeup.clear()
+            job = await run_in_threadpool(claim_job, self.visibility_timeout)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run_job(job)
+
+    async def run_job(self, job: AnalysisJob) -> None:
+        """Run one leased job and record its outcome."""
+
+        metrics.observe(
+            "job_queue_wait_seconds", (datetime.utcnow() - job.created_at).total_seconds()
+        )
+        self.running += 1
+        metrics.set_gauge("jobs_running", self.running)
+        heartbeat = asyncio.create_task(self._keep_leased(job.job_id))
+        try:
+            analysis_id = await self.handler(job)
+        except Exception as exc:
+            metrics.incr("jobs_failed_total")
+            await run_in_threadpool(fail_job, job.job_id, str(exc), JOB_RETRY_DELAY)
+        else:
+            metrics.incr("jobs_succeeded_total")
+            await run_in_threadpool(finish_job, job.job_id, analysis_id)
+        finally:
+            heartbeat.cancel()
+            self.running -= 1
+            metrics.set_gauge("jobs_running", self.running)
+
+    async def _keep_leased(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            try:
+                await run_in_threadpool(extend_job_lease, job_id, self.visibility_timeout)
+            except StorageError as exc:
+                # Renewals run every third of the timeout, so one failure does not lose the lease.
+                metrics.incr("job_lease_renewal_errors_total")
+                logger.warning("Renewing the lease on job %s failed: %s", job_id, exc)
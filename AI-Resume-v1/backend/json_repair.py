@@ -0,0 +1,173 @@
+"""Tolerant repair of cosmetically damaged LLM JSON before a stage is failed."""
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, List, Tuple
+
+# Closing candidates tried when the output was cut off mid-document.
+MAX_TRUNCATION_ATTEMPTS = 8
+
+# Opening fence of the document; its closing fence is the *last* one in the text,
+# because string values (custom_resume_markdown) may carry fenced blocks of their own.
+_FENCE_RE = re.compile(r"```[a-zA-Z]*\s*(?=\{)")
+_FENCE = "```"
+_SMART_QUOTES = "“”„‟"
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONRepairError(ValueError):
+    pass
+
+
+@dataclass
+class RepairResult:
+    data: Any
+    repairs: List[str] = field(default_factory=list)
+
+
+def _extract_fenced(text: str) -> Tuple[str, bool, bool]:
+    """(document, whether it was fenced, whether its closing fence is present)."""
+
+    match = _FENCE_RE.search(text)
+    if match is None:
+        return text, False, False
+    end = text.rfind(_FENCE, match.end())
+    if end < 0:
+        return text[match.end() :], True, False
+    return text[match.end() : end], True, True
+
+
+class _Scanner:
+    """Single pass that re-emits the document with string-level damage fixed."""
+
+    def __init__(self) -> None:
+        self.out: List[str] = []
+        self.stack: List[str] = []
+        # (index into ``out`` of each comma, closers open at that point)
+        self.cuts: List[Tuple[int, List[str]]] = []
+        self.repairs: List[str] = []
+        self.in_string = False
+        self.smart_string = False
+        self.escaped = False
+
+    def note(self, repair: str) -> None:
+        if repair not in self.repairs:
+            self.repairs.append(repair)
+
+    def _drop_trailing_comma(self) -> None:
+        index = len(self.out) - 1
+        while index >= 0 and self.out[index].isspace():
+            index -= 1
+        if index >= 0 and self.out[index] == ",":
+            del self.out[index]
+            self.note("trailing_commas")
+
+    def scan(self, text: str) -> None:
+        for position, char in enumerate(text):
+            if self.in_string:
+                self._string_char(char)
+                continue
+            if char == '"':
+                self.in_string, self.smart_string = True, False
+                self.out.append(char)
+            elif char in _SMART_QUOTES:
+                self.in_string, self.smart_string = True, True
+                self.out.append('"')
+                self.note("smart_quotes")
+            elif char in _CLOSERS:
+                self.stack.append(_CLOSERS[char])
+                self.out.append(char)
+            elif char in "}]":
+                self._drop_trailing_comma()
+                if self.stack:
+                    self.out.append(self.stack.pop())
+                if not self.stack:
+                    if text[position + 1 :].strip():
+                        self.note("surrounding_prose")
+                    return
+            elif char == ",":
+                self.cuts.append((len(self.out), list(self.stack)))
+                self.out.append(char)
+            else:
+                self.out.append(char)
+
+    def _string_char(self, char: str) -> None:
+        if self.escaped:
+            self.escaped = False
+            self.out.append(char)
+        elif char == "\\":
+            self.escaped = True
+            self.out.append(char)
+        elif char == '"' and not self.smart_string:
+            self.in_string = False
+            self.out.append(char)
+        elif char in _SMART_QUOTES and self.smart_string:
+            self.in_string = False
+            self.out.append('"')
+        elif char == '"':
+            self.out.append('\\"')
+        elif char in _CONTROL_ESCAPES:
+            self.out.append(_CONTROL_ESCAPES[char])
+            self.note("control_characters")
+        else:
+            self.out.append(char)
+
+
+def _close(prefix: str, closers: List[str]) -> str:
+    prefix = prefix.rstrip()
+    if prefix.endswith(","):
+        prefix = prefix[:-1]
+    return prefix + "".join(reversed(closers))
+
+
+def repair_json(payload: str) -> RepairResult:
+    """Parse ``payload``, fixing the damage LLMs commonly introduce.
+
+    Handles fenced blocks anywhere in the text, prose around the document,
+    trailing commas, raw newlines inside strings, smart quotes used as string
+    delimiters and output truncated mid-document. ``repairs`` lists what was
+    applied; :class:`JSONRepairError` is raised when nothing yields valid JSON.
+    """
+
+    repairs: List[str] = []
+    text, fenced, closed = _extract_fenced(payload)
+    if fenced:
+        repairs.append("code_fence")
+    start = text.find("{")
+    if start < 0:
+        raise JSONRepairError("no JSON object found")
+    if text[:start].strip():
+        repairs.append("surrounding_prose")
+
+    scanner = _Scanner()
+    scanner.scan(text[start:])
+    for repair in scanner.repairs:
+        if repair not in repairs:
+            repairs.append(repair)
+    body = "".join(scanner.out)
+
+    if not scanner.stack:
+        candidates = [body]
+    elif closed:
+        # The fence was closed, so the output was not cut off: an unbalanced
+        # document here is malformed, and "repairing" it would silently drop content.
+        raise JSONRepairError("unbalanced JSON inside a closed code fence")
+    else:
+        # Cut off mid-document: close what is open, then fall back to dropping
+        # the last (possibly half-written) element at each preceding comma.
+        repairs.append("truncation")
+        head = body + ('"' if scanner.in_string and not scanner.escaped else "")
+        candidates = [_close(head, scanner.stack)]
+        for length, closers in reversed(scanner.cuts[-MAX_TRUNCATION_ATTEMPTS:]):
+            candidates.append(_close("".join(scanner.out[:length]), closers))
+
+    last_error: Exception = JSONRepairError("empty document")
+    for candidate in candidates:
+        try:
+            return RepairResult(json.loads(candidate), repairs)
+        except json.JSONDecodeError as exc:
+            last_error = exc
+    raise JSONRepairError(str(last_error)) from last_error
@@ -0,0 +1,211 @@
+"""Weighted pool of (api_base, api_key) entries so throughput scales with owned keys."""
+from __future__ import annotations
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from . import metrics
+
+# JSON list of {"provider", "base_url", "key", "weight", "rpm", "tpm"}; read from
+# LLM_KEY_POOL_FILE when that is set. DEEPSEEK_API_KEYS=k1,k2 is a shorthand for
+# equal-weight DeepSeek entries on LLM_API_BASE.
+KEY_POOL_SPEC = os.getenv("LLM_KEY_POOL", "")
+KEY_POOL_FILE = os.getenv("LLM_KEY_POOL_FILE", "")
+DEEPSEEK_KEYS = os.getenv("DEEPSEEK_API_KEYS", "")
+# How long a key that returned 429 stays out of rotation when no Retry-After is sent.
+KEY_COOLDOWN_SECONDS = float(os.getenv("LLM_KEY_COOLDOWN", "30"))
+LATENCY_ALPHA = 0.2
+WINDOW_SECONDS = 60.0
+
+
+def _mask(key: str) -> str:
+    return f"{key[:6]}...{key[-4:]}" if len(key) > 10 else key[:2] + "..."
+
+
+@dataclass
+class PoolEntry:
+    provider: str
+    api_base: str
+    api_key: str
+    weight: float = 1.0
+    rpm: Optional[int] = None
+    tpm: Optional[int] = None
+    cooldown_until: float = 0.0
+    latency: Optional[float] = None
+    in_flight: int = 0
+    requests: Deque[float] = field(default_factory=deque)
+    tokens: Deque[Tuple[float, int]] = field(default_factory=deque)
+
+    @property
+    def name(self) -> str:
+        return _mask(self.api_key)
+
+    def _trim(self, now: float) -> None:
+        while self.requests and now - self.requests[0] > WINDOW_SECONDS:
+            self.requests.popleft()
+        while self.tokens and now - self.tokens[0][0] > WINDOW_SECONDS:
+            self.tokens.popleft()
+
+    def capacity(self, now: float) -> float:
+        """Share (0..1) of this minute's request/token allowance still unused."""
+
+        self._trim(now)
+        remaining = 1.0
+        if self.rpm:
+            remaining = min(remaining, 1 - len(self.requests) / self.rpm)
+        if self.tpm:
+            remaining = min(remaining, 1 - sum(count for _, count in self.tokens) / self.tpm)
+        return max(remaining, 0.0)
+
+
+@dataclass
+class Lease:
+    """One request's use of a pool entry; report the outcome through the pool."""
+
+    entry: PoolEntry
+    started: float
+    reported: bool = False
+
+
+class KeyPool:
+    def __init__(self, entries: Optional[List[PoolEntry]] = None) -> None:
+        self.entries = entries or []
+        self._lock = threading.Lock()
+
+    def first_key(self, provider: str) -> Optional[str]:
+        return next((e.api_key for e in self.entries if e.provider == provider), None)
+
+    def candidates(self, provider: str, api_base: str, default_base: str) -> List[PoolEntry]:
+        """Entries usable for a request to ``api_base`` made without an explicit key.
+
+        Requests aimed at the provider's default base may go to any of its
+        entries; requests to another base only use entries for that base.
+        """
+
+        base = api_base.rstrip("/")
+        any_base = base == default_base.rstrip("/")
+        return [
+            entry
+            for entry in self.entries
+            if entry.provider == provider and (any_base or entry.api_base.rstrip("/") == base)
+        ]
+
+    def acquire(self, entries: List[PoolEntry], estimated_tokens: int = 0) -> Optional[Lease]:
+        """Pick an entry weighted by remaining capacity and inverse latency."""
+
+        if not entries:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            available = [entry for entry in entries if entry.cooldown_until <= now]
+            if not available:
+                # Everything is cooling down: use the key that recovers first.
+                available = [min(entries, key=lambda entry: entry.cooldown_until)]
+            known = [entry.latency for entry in available if entry.latency is not None]
+            default_latency = sum(known) / len(known) if known else 1.0
+            scores = []
+            for entry in available:
+                latency = entry.latency if entry.latency is not None else default_latency
+                # Saturated keys keep a small share so a full pool still makes progress.
+                capacity = max(entry.capacity(now), 0.01)
+                scores.append(entry.weight * capacity / max(latency, 0.05) / (1 + entry.in_flight))
+            entry = random.choices(available, weights=scores)[0]
+            entry.requests.append(now)
+            if estimated_tokens:
+                entry.tokens.append((now, estimated_tokens))
+            entry.in_flight += 1
+            metrics.set_gauge(
+                "llm_key_pool_available",
+                sum(1 for e in entries if e.cooldown_until <= now),
+                provider=entry.provider,
+            )
+        metrics.incr("llm_key_requests_total", key=entry.name)
+        return Lease(entry=entry, started=time.perf_counter())
+
+    def release(
+        self,
+        lease: Lease,
+        *,
+        ok: bool,
+        latency: Optional[float] = None,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        """Record the outcome; a 429 takes the key out of rotation for a while."""
+
+        if lease.reported:
+            return
+        lease.reported = True
+        entry = lease.entry
+        now = time.monotonic()
+        with self._lock:
+            entry.in_flight = max(entry.in_flight - 1, 0)
+            if ok and latency is not None:
+                entry.latency = (
+                    latency
+                    if entry.latency is None
+                    else (1 - LATENCY_ALPHA) * entry.latency + LATENCY_ALPHA * latency
+                )
+            if status_code == 429:
+                entry.cooldown_until = now + (retry_after or KEY_COOLDOWN_SECONDS)
+        if status_code == 429:
+            metrics.incr("llm_key_cooldowns_total", key=entry.name)
+
+    def available(self, entries: List[PoolEntry]) -> int:
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for entry in entries if entry.cooldown_until <= now)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "provider": entry.provider,
+                    "api_base": entry.api_base,
+                    "key": entry.name,
+                    "weight": entry.weight,
+                    "capacity": round(entry.capacity(now), 3),
+                    "latency_seconds": entry.latency,
+                    "in_flight": entry.in_flight,
+                    "cooldown_seconds": max(entry.cooldown_until - now, 0.0),
+                }
+                for entry in self.entries
+            ]
+
+
+def load_entries(
+    spec: str = "", *, deepseek_keys: str = "", deepseek_base: str = ""
+) -> List[PoolEntry]:
+    entries = [
+        PoolEntry(
+            provider=item.get("provider", "deepseek"),
+            api_base=item["base_url"],
+            api_key=item["key"],
+            weight=float(item.get("weight", 1.0)),
+            rpm=item.get("rpm"),
+            tpm=item.get("tpm"),
+        )
+        for item in (json.loads(spec) if spec.strip() else [])
+    ]
+    for key in deepseek_keys.split(","):
+        if key.strip():
+            entries.append(PoolEntry("deepseek", deepseek_base, key.strip()))
+    return entries
+
+
+def _load_default(deepseek_base: str) -> KeyPool:
+    spec = KEY_POOL_SPEC
+    if KEY_POOL_FILE:
+        with open(KEY_POOL_FILE, "r", encoding="utf-8") as handle:
+            spec = handle.read()
+    return KeyPool(load_entries(spec, deepseek_keys=DEEPSEEK_KEYS, deepseek_base=deepseek_base))
+
+
+pool = _load_default(os.getenv("LLM_API_BASE", "https://api.deepseek.com"))
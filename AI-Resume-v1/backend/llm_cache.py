@@ -0,0 +1,168 @@
+"""Content-addressed cache for stage LLM responses (in-memory LRU + SQLite)."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from . import metrics
+from .storage import (
+    StorageError,
+    evict_llm_cache_entries,
+    get_llm_cache_entry,
+    put_llm_cache_entry,
+)
+
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL", "86400"))
+CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+# The SQLite tier is trimmed to CACHE_MAX_ENTRIES once every this many writes.
+CACHE_EVICT_EVERY = max(int(os.getenv("LLM_CACHE_EVICT_EVERY", "100")), 1)
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    content: str
+    reasoning: Optional[str] = None
+
+
+def cache_key(
+    prompt: str,
+    *,
+    model: str,
+    api_base: str,
+    temperature: Optional[float],
+) -> str:
+    """Hash of everything that determines the provider's answer to a prompt."""
+
+    material = json.dumps(
+        [prompt, model, api_base.rstrip("/"), temperature], ensure_ascii=False
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier cache: a per-process LRU in front of the shared SQLite table.
+
+    The SQLite tier lives in the application database so every uvicorn worker
+    sees the same entries; the memory tier only saves the round trip to disk.
+    Coroutines use :meth:`aget` / :meth:`aput`, which keep the SQLite I/O off
+    the event loop.
+    """
+
+    def __init__(
+        self,
+        *,
+        memory_entries: int,
+        ttl_seconds: float,
+        max_entries: int,
+        evict_every: int = CACHE_EVICT_EVERY,
+    ) -> None:
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self._memory: "OrderedDict[str, tuple[float, CachedResponse]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _memory_get(self, key: str, now: float) -> Optional[CachedResponse]:
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                metrics.incr("llm_cache_hits_total", tier="memory")
+                return value
+            del self._memory[key]
+            return None
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        now = time.monotonic()
+        value = self._memory_get(key, now)
+        return value if value is not None else self._sqlite_get(key, now)
+
+    async def aget(self, key: str) -> Optional[CachedResponse]:
+        now = time.monotonic()
+        value = self._memory_get(key, now)
+        if value is not None:
+            return value
+        return await asyncio.to_thread(self._sqlite_get, key, now)
+
+    def _sqlite_get(self, key: str, now: float) -> Optional[CachedResponse]:
+        try:
+            entry = get_llm_cache_entry(key)
+        except StorageError:
+            entry = None
+        if entry is None:
+            metrics.incr("llm_cache_misses_total")
+            return None
+
+        value = CachedResponse(content=entry.content, reasoning=entry.reasoning)
+        remaining = (entry.expires_at - datetime.utcnow()).total_seconds()
+        self._remember(key, value, now + max(remaining, 0.0))
+        metrics.incr("llm_cache_hits_total", tier="sqlite")
+        return value
+
+    def put(self, key: str, value: CachedResponse) -> None:
+        self._remember(key, value, time.monotonic() + self.ttl_seconds)
+        self._sqlite_put(key, value)
+
+    async def aput(self, key: str, value: CachedResponse) -> None:
+        self._remember(key, value, time.monotonic() + self.ttl_seconds)
+        await asyncio.to_thread(self._sqlite_put, key, value)
+
+    def _sqlite_put(self, key: str, value: CachedResponse) -> None:
+        try:
+            put_llm_cache_entry(
+                key,
+                value.content,
+                value.reasoning,
+                datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+            )
+        except StorageError:
+            # The memory tier still serves this process; a broken DB must not fail the stage.
+            return
+        metrics.incr("llm_cache_writes_total")
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.evict_every == 0
+        if not due:
+            return
+        # Trimming scans the table, so it runs every evict_every writes rather than on each.
+        try:
+            evicted = evict_llm_cache_entries(self.max_entries)
+        except StorageError:
+            return
+        if evicted:
+            metrics.incr("llm_cache_evictions_total", evicted, tier="sqlite")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+    def _remember(self, key: str, value: CachedResponse, expires_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > max(self.memory_entries, 0):
+                self._memory.popitem(last=False)
+                metrics.incr("llm_cache_evictions_total", tier="memory")
+            metrics.set_gauge("llm_cache_memory_entries", len(self._memory))
+
+
+response_cache = ResponseCache(
+    memory_entries=CACHE_MEMORY_ENTRIES,
+    ttl_seconds=CACHE_TTL_SECONDS,
+    max_entries=CACHE_MAX_ENTRIES,
+)
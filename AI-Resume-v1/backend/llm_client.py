@@ -1,35 +1,207 @@
 """LLM client abstraction for DeepSeek/OpenAI compatible APIs."""
 from __future__ import annotations
 
+import asyncio
+import importlib.util
 import json
 import os
-from typing import Any
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Literal, Optional, TypeVar
 
 import httpx
 from dotenv import load_dotenv
 
+from . import hedging, key_pool, metrics, providers, ratelimit
+from .retry import (
+    RetryBudget,
+    acall_with_retries,
+    astream_with_retries,
+    call_with_retries,
+    is_retryable_status,
+    parse_retry_after,
+    stream_with_retries,
+)
+
 load_dotenv()
 
+T = TypeVar("T")
+
 DEFAULT_MODEL = os.getenv("LLM_MODEL", "deepseek-chat")
 API_BASE_URL = os.getenv("LLM_API_BASE", "https://api.deepseek.com")
 ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com")
 DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+ANTHROPIC_MAX_TOKENS = int(os.getenv("ANTHROPIC_MAX_TOKENS", "8192"))
+DEFAULT_TEMPERATURE = 0.2
 CHAT_COMPLETIONS_PATH = "/chat/completions"
 ANTHROPIC_MESSAGES_PATH = "/v1/messages"
 
+# Connection pool tuning for the long-lived provider clients.
+POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100"))
+POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "30"))
+POOL_MAX_CLIENTS = int(os.getenv("LLM_POOL_MAX_CLIENTS", "8"))
+HTTP2_ENABLED = os.getenv("LLM_HTTP2", "false").lower() in {"1", "true", "yes"}
+
+# Follow-up requests allowed when a streamed reply stops at its output token budget.
+MAX_CONTINUATIONS = int(os.getenv("LLM_MAX_CONTINUATIONS", "2"))
+TRUNCATED_FINISH_REASONS = {"length", "max_tokens"}
+CONTINUE_PROMPT = (
+    "Your previous reply was cut off by the output limit. Continue exactly where it "
+    "stopped, without repeating anything, restarting the JSON or adding commentary."
+)
+
+# Mid-stream Anthropic error events that are transient (same as 429/5xx).
+ANTHROPIC_RETRYABLE_ERRORS = {"overloaded_error", "api_error", "rate_limit_error"}
+
 SYSTEM_PROMPT = (
     "You are an AI career analyst that only outputs valid JSON per instructions."
 )
 
 
 class LLMClientError(RuntimeError):
-    """Raised when the LLM provider returns an error."""
+    """Raised when the LLM provider returns an error.
+
+    ``retryable`` marks transient failures (429, 5xx, network); ``retry_after``
+    carries the provider's Retry-After hint in seconds when it sent one.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        *,
+        status_code: int | None = None,
+        retry_after: float | None = None,
+        retryable: bool = False,
+    ) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+
+@dataclass
+class LLMDelta:
+    """One incremental chunk of a streamed completion.
+
+    ``finish`` deltas carry the provider's finish/stop reason; they are consumed
+    by the continuation loop and never reach stream_llm callers. ``retry``
+    deltas announce that a failed request is re-sent: ``text`` is the reason
+    (status code or ``network``), with the upcoming attempt and backoff delay.
+    ``queued`` deltas report the request's place in the outbound rate-limit
+    queue while it waits for a slot; position 0 marks the slot being granted
+    and is dropped before deltas leave stream_llm.
+    """
+
+    kind: Literal["content", "reasoning", "finish", "retry", "queued"]
+    text: str
+    attempt: int = 0
+    delay: float = 0.0
+    position: int = 0
+
+
+_clients: "OrderedDict[tuple[str, str], httpx.Client]" = OrderedDict()
+_clients_lock = threading.Lock()
+# AsyncClient connections are bound to the event loop that opened them, so the
+# async pools are tracked per loop and dropped together with it.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, OrderedDict[tuple[str, str], httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+_pending_closes: set[asyncio.Task] = set()
+
+
+def _use_http2() -> bool:
+    # httpx only speaks HTTP/2 when the optional `h2` package is installed.
+    return HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+        keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_http_client(api_base: str, provider: str = "deepseek") -> httpx.Client:
+    """Return the pooled client for (api_base, provider), creating it on first use.
+
+    Clients stay open for the lifetime of the process so TCP/TLS connections are
+    reused across stages. At most POOL_MAX_CLIENTS pools are kept; the least
+    recently used one is closed when a new base URL pushes past the limit.
+    """
+
+    key = (api_base.rstrip("/"), provider)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None:
+            _clients.move_to_end(key)
+            return client
+        client = httpx.Client(
+            base_url=api_base,
+            timeout=DEFAULT_TIMEOUT,
+            limits=_pool_limits(),
+            http2=_use_http2(),
+        )
+        _clients[key] = client
+        while len(_clients) > max(POOL_MAX_CLIENTS, 1):
+            _, evicted = _clients.popitem(last=False)
+            evicted.close()
+        return client
+
+
+def get_async_http_client(api_base: str, provider: str = "deepseek") -> httpx.AsyncClient:
+    """Async counterpart of get_http_client, pooled per running event loop."""
+
+    loop = asyncio.get_running_loop()
+    pools = _async_clients.setdefault(loop, OrderedDict())
+    key = (api_base.rstrip("/"), provider)
+    client = pools.get(key)
+    if client is not None:
+        pools.move_to_end(key)
+        return client
+    client = httpx.AsyncClient(
+        base_url=api_base,
+        timeout=DEFAULT_TIMEOUT,
+        limits=_pool_limits(),
+        http2=_use_http2(),
+    )
+    pools[key] = client
+    while len(pools) > max(POOL_MAX_CLIENTS, 1):
+        _, evicted = pools.popitem(last=False)
+        task = loop.create_task(evicted.aclose())
+        _pending_closes.add(task)
+        task.add_done_callback(_pending_closes.discard)
+    return client
+
+
+def close_http_clients() -> None:
+    """Close every pooled sync client; called on application shutdown."""
+
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+async def aclose_http_clients() -> None:
+    """Close the async clients pooled on the running event loop."""
+
+    pools = _async_clients.pop(asyncio.get_running_loop(), None) or {}
+    for client in pools.values():
+        await client.aclose()
 
 
 def resolve_default_api_key(provider: str = "deepseek") -> str | None:
     if provider == "anthropic":
-        return os.getenv("ANTHROPIC_AUTH_TOKEN")
-    return os.getenv("DEEPSEEK_API_KEY") or os.getenv("OPENAI_API_KEY")
+        key = os.getenv("ANTHROPIC_AUTH_TOKEN")
+    else:
+        key = os.getenv("DEEPSEEK_API_KEY") or os.getenv("OPENAI_API_KEY")
+    return key or key_pool.pool.first_key(provider)
 
 
 def _get_api_key(override: str | None = None, provider: str = "deepseek") -> str:
@@ -43,6 +215,958 @@ def _get_api_key(override: str | None = None, provider: str = "deepseek") -> str
     return api_key
 
 
+def _detect_provider(base_url: str, model: str) -> str:
+    lower_base = base_url.lower()
+    if "anthropic" in lower_base or "jiuwan" in lower_base or "claude" in model.lower():
+        return "anthropic"
+    return "deepseek"
+
+
+def temperature_for(model: str, api_base: str | None = None) -> float | None:
+    """Sampling temperature sent for model, or None when the request omits it."""
+
+    if _detect_provider(api_base or API_BASE_URL, model) == "anthropic":
+        return None
+    # DeepSeek reasoning模型不支持 temperature 等参数，避免发送无效字段
+    if model == "deepseek-reasoner":
+        return None
+    return DEFAULT_TEMPERATURE
+
+
+def supports_json_mode(model: str, api_base: str | None = None) -> bool:
+    """Whether the OpenAI-compatible `response_format: json_object` can be sent."""
+
+    provider = _detect_provider(api_base or API_BASE_URL, model)
+    return provider != "anthropic" and model != "deepseek-reasoner"
+
+
+def _chat_path(base_url: str) -> str:
+    if base_url.rstrip("/").endswith("chat/completions"):
+        return ""
+    return CHAT_COMPLETIONS_PATH
+
+
+def _build_chat_request(
+    prompt: str,
+    *,
+    model: str,
+    api_key: str | None,
+    stream: bool,
+    max_tokens: int | None = None,
+    json_mode: bool = False,
+    partial: str | None = None,
+) -> tuple[dict[str, str], dict[str, Any]]:
+    headers = {
+        "Authorization": f"Bearer {_get_api_key(api_key)}",
+        "Content-Type": "application/json",
+    }
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+    if partial:
+        messages += [
+            {"role": "assistant", "content": partial},
+            {"role": "user", "content": CONTINUE_PROMPT},
+        ]
+    payload: dict[str, Any] = {"model": model, "messages": messages}
+    temperature = temperature_for(model)
+    if temperature is not None:
+        payload["temperature"] = temperature
+    if max_tokens:
+        payload["max_tokens"] = max_tokens
+    # A continuation is only the tail of the document, so it cannot be a JSON object itself.
+    if json_mode and not partial and supports_json_mode(model):
+        payload["response_format"] = {"type": "json_object"}
+    if stream:
+        payload["stream"] = True
+    return headers, payload
+
+
+def _read_sse_data(line: str | bytes) -> Optional[str]:
+    """Return the payload of an SSE `data:` line, or None for other lines."""
+
+    if not line:
+        return None
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", errors="ignore")
+    if not line.startswith("data:"):
+        return None
+    return line[len("data:"):].strip()
+
+
+def _chat_stream_deltas(data_line: str, include_reasoning: bool) -> list[LLMDelta]:
+    try:
+        data = json.loads(data_line)
+    except json.JSONDecodeError:
+        return []
+    choices = data.get("choices") or []
+    if not choices:
+        return []
+    delta = choices[0].get("delta") or {}
+    deltas: list[LLMDelta] = []
+    if include_reasoning and delta.get("reasoning_content"):
+        deltas.append(LLMDelta("reasoning", delta["reasoning_content"]))
+    if delta.get("content"):
+        deltas.append(LLMDelta("content", delta["content"]))
+    if choices[0].get("finish_reason"):
+        deltas.append(LLMDelta("finish", choices[0]["finish_reason"]))
+    return deltas
+
+
+class DeltaCollector:
+    """Accumulates streamed deltas into the (content, reasoning) call_llm result."""
+
+    def __init__(self, include_reasoning: bool) -> None:
+        self.include_reasoning = include_reasoning
+        self.content_parts: list[str] = []
+        self.reasoning_parts: list[str] = []
+
+    def add(self, delta: LLMDelta) -> None:
+        if delta.kind == "content":
+            self.content_parts.append(delta.text)
+        elif delta.kind == "reasoning":
+            self.reasoning_parts.append(delta.text)
+
+    def result(self) -> str | tuple[str, str | None]:
+        content = "".join(self.content_parts).strip()
+        reasoning = "".join(self.reasoning_parts).strip() if self.reasoning_parts else None
+        return (content, reasoning) if self.include_reasoning else content
+
+
+def _parse_chat_message(
+    data: dict[str, Any], include_reasoning: bool
+) -> str | tuple[str, str | None]:
+    # DeepSeek/OpenAI compatible payloads place content under choices[].message.content
+    try:
+        message = data["choices"][0]["message"]
+        content = message["content"]
+        reasoning = message.get("reasoning_content")
+    except (KeyError, IndexError, TypeError) as exc:
+        raise LLMClientError(
+            f"Unexpected LLM response format: {json.dumps(data)[:500]}"
+        ) from exc
+    if include_reasoning:
+        return content.strip(), (reasoning.strip() if isinstance(reasoning, str) else None)
+    return content.strip()
+
+
+def _provider_error(response: httpx.Response, detail: str) -> LLMClientError:
+    return LLMClientError(
+        f"LLM provider error: {response.status_code} {detail}",
+        status_code=response.status_code,
+        retry_after=parse_retry_after(response.headers),
+        retryable=is_retryable_status(response.status_code),
+    )
+
+
+def _transport_error(exc: httpx.HTTPError) -> LLMClientError:
+    # Connect/read timeouts and dropped connections are worth another attempt.
+    return LLMClientError(
+        f"Failed to call LLM provider: {exc}",
+        retryable=isinstance(exc, httpx.TransportError),
+    )
+
+
+def _stream_error(response: httpx.Response) -> LLMClientError:
+    try:
+        detail = response.text
+    except httpx.ResponseNotRead:
+        try:
+            detail = response.read().decode("utf-8")
+        except Exception:
+            detail = "<stream response not available>"
+    return _provider_error(response, detail)
+
+
+async def _astream_error(response: httpx.Response) -> LLMClientError:
+    try:
+        detail = (await response.aread()).decode("utf-8", errors="ignore")
+    except Exception:
+        detail = "<stream response not available>"
+    return _provider_error(response, detail)
+
+
+def _status_error(exc: httpx.HTTPStatusError) -> LLMClientError:
+    detail = ""
+    try:
+        detail = exc.response.text
+    except httpx.ResponseNotRead:
+        try:
+            detail = exc.response.read().decode("utf-8")
+        except Exception:
+            detail = "<stream response not available>"
+    return _provider_error(exc.response, detail)
+
+
+def _retry_notice(attempt: int, delay: float, reason: str) -> LLMDelta:
+    return LLMDelta("retry", reason, attempt=attempt, delay=delay)
+
+
+def _queue_notice(position: int) -> LLMDelta:
+    return LLMDelta("queued", "", position=position)
+
+
+def _continued(
+    open_stream: Callable[[Optional[str]], Iterator[LLMDelta]],
+    *,
+    provider: str,
+    prefix: str = "",
+    max_continuations: int,
+) -> Iterator[LLMDelta]:
+    """Re-request with the partial output whenever a reply stops at its token budget."""
+
+    parts = [prefix] if prefix else []
+    if prefix:
+        yield LLMDelta("content", prefix)
+    for attempt in range(max_continuations + 1):
+        finish = None
+        for delta in open_stream("".join(parts) or None):
+            if delta.kind == "finish":
+                finish = delta.text
+                continue
+            if delta.kind == "content":
+                parts.append(delta.text)
+            yield delta
+        if finish not in TRUNCATED_FINISH_REASONS:
+            return
+        if attempt == max_continuations:
+            metrics.incr("llm_truncated_total", provider=provider)
+            return
+        metrics.incr("llm_continuations_total", provider=provider)
+
+
+async def _continued_async(
+    open_stream: Callable[[Optional[str]], AsyncIterator[LLMDelta]],
+    *,
+    provider: str,
+    prefix: str = "",
+    max_continuations: int,
+) -> AsyncIterator[LLMDelta]:
+    parts = [prefix] if prefix else []
+    if prefix:
+        yield LLMDelta("content", prefix)
+    for attempt in range(max_continuations + 1):
+        finish = None
+        async for delta in open_stream("".join(parts) or None):
+            if delta.kind == "finish":
+                finish = delta.text
+                continue
+            if delta.kind == "content":
+                parts.append(delta.text)
+            yield delta
+        if finish not in TRUNCATED_FINISH_REASONS:
+            return
+        if attempt == max_continuations:
+            metrics.incr("llm_truncated_total", provider=provider)
+            return
+        metrics.incr("llm_continuations_total", provider=provider)
+
+
+def _stream_chat(
+    prompt: str,
+    *,
+    model: str,
+    base_url: str,
+    api_key: str | None,
+    timeout: float,
+    include_reasoning: bool,
+    max_tokens: int | None = None,
+    json_mode: bool = False,
+    partial: str | None = None,
+) -> Iterator[LLMDelta]:
+    headers, payload = _build_chat_request(
+        prompt,
+        model=model,
+        api_key=api_key,
+        stream=True,
+        max_tokens=max_tokens,
+        json_mode=json_mode,
+        partial=partial,
+    )
+    try:
+        client = get_http_client(base_url)
+        with client.stream(
+            "POST",
+            _chat_path(base_url),
+            headers=headers,
+            json=payload,
+            timeout=timeout,
+        ) as response:
+            if response.is_error:
+                raise _stream_error(response)
+            for line in response.iter_lines():
+                data_line = _read_sse_data(line)
+                if data_line is None:
+                    continue
+                if data_line == "[DONE]":
+                    break
+                yield from _chat_stream_deltas(data_line, include_reasoning)
+    except httpx.HTTPError as exc:  # pragma: no cover - network errors
+        raise _transport_error(exc) from exc
+
+
+async def _stream_chat_async(
+    prompt: str,
+    *,
+    model: str,
+    base_url: str,
+    api_key: str | None,
+    timeout: float,
+    include_reasoning: bool,
+    max_tokens: int | None = None,
+    json_mode: bool = False,
+    partial: str | None = None,
+) -> AsyncIterator[LLMDelta]:
+    headers, payload = _build_chat_request(
+        prompt,
+        model=model,
+        api_key=api_key,
+        stream=True,
+        max_tokens=max_tokens,
+        json_mode=json_mode,
+        partial=partial,
+    )
+    try:
+        client = get_async_http_client(base_url)
+        async with client.stream(
+            "POST",
+            _chat_path(base_url),
+            headers=headers,
+            json=payload,
+            timeout=timeout,
+        ) as response:
+            if response.is_error:
+                raise await _astream_error(response)
+            async for line in response.aiter_lines():
+                data_line = _read_sse_data(line)
+                if data_line is None:
+                    continue
+                if data_line == "[DONE]":
+                    break
+                for delta in _chat_stream_deltas(data_line, include_reasoning):
+                    yield delta
+    except httpx.HTTPError as exc:  # pragma: no cover - network errors
+        raise _transport_error(exc) from exc
+
+
+def endpoint_chain(
+    model: str | None = None, api_base: str | None = None, api_key: str | None = None
+) -> list[providers.Endpoint]:
+    """The requested endpoint followed by the configured LLM_FALLBACK_CHAIN.
+
+    Fallback entries use the server's default key (or key pool) for their
+    provider and are left out when no such key is configured.
+    """
+
+    target_model = model or DEFAULT_MODEL
+    provider = _detect_provider(api_base or API_BASE_URL, target_model)
+    default_base = ANTHROPIC_BASE_URL if provider == "anthropic" else API_BASE_URL
+    chain = [providers.Endpoint(provider, api_base or default_base, target_model, api_key)]
+    for fallback_provider, fallback_model, fallback_base in providers.parse_fallback_chain(
+        providers.FALLBACK_CHAIN
+    ):
+        base = fallback_base or (
+            ANTHROPIC_BASE_URL if fallback_provider == "anthropic" else API_BASE_URL
+        )
+        endpoint = providers.Endpoint(fallback_provider, base, fallback_model)
+        if resolve_default_api_key(fallback_provider) and all(
+            endpoint.key != other.key for other in chain
+        ):
+            chain.append(endpoint)
+    return chain
+
+
+def _is_output(delta: LLMDelta) -> bool:
+    return delta.kind in ("content", "reasoning")
+
+
+def _local_wait(delta: LLMDelta) -> float | None:
+    if delta.kind == "queued":
+        return 0.0
+    if delta.kind == "retry":
+        return delta.delay
+    return None
+
+
+def _is_slot_granted(delta: LLMDelta) -> bool:
+    # Internal marker from the rate limiter; callers only see queue positions.
+    return delta.kind == "queued" and not delta.position
+
+
+def _circuit_error(exc: providers.CircuitOpenError) -> LLMClientError:
+    return LLMClientError(str(exc))
+
+
+def _pool_entries(endpoint: providers.Endpoint) -> list[key_pool.PoolEntry]:
+    # Requests that bring their own key never touch the server's key pool.
+    if endpoint.api_key is not None:
+        return []
+    default_base = ANTHROPIC_BASE_URL if endpoint.provider == "anthropic" else API_BASE_URL
+    return key_pool.pool.candidates(endpoint.provider, endpoint.api_base, default_base)
+
+
+def _estimate_tokens(prompt: str, partial: str | None, max_tokens: int | None) -> int:
+    # Rough 4-characters-per-token estimate of the prompt plus the output budget.
+    return (len(prompt) + len(partial or "")) // 4 + (max_tokens or 0)
+
+
+def _release_failed(
+    lease: key_pool.Lease, entries: list[key_pool.PoolEntry], exc: LLMClientError
+) -> None:
+    key_pool.pool.release(
+        lease, ok=False, status_code=exc.status_code, retry_after=exc.retry_after
+    )
+    # The retry goes to another key, so the rate-limited key's Retry-After need not be waited out.
+    if exc.status_code == 429 and key_pool.pool.available(entries):
+        exc.retry_after = None
+
+
+def _leased(
+    open_request: Callable[[str, str | None], Iterator[LLMDelta]],
+    entries: list[key_pool.PoolEntry],
+    estimated_tokens: int,
+    api_base: str,
+    api_key: str | None,
+) -> Iterator[LLMDelta]:
+    """Send one request through a pool entry (or the given base/key when no pool applies)."""
+
+    lease = key_pool.pool.acquire(entries, estimated_tokens)
+    if lease is None:
+        yield from open_request(api_base, api_key)
+        return
+    first_token: float | None = None
+    try:
+        for delta in open_request(lease.entry.api_base, lease.entry.api_key):
+            if first_token is None:
+                first_token = time.perf_counter() - lease.started
+            yield delta
+    except LLMClientError as exc:
+        _release_failed(lease, entries, exc)
+        raise
+    finally:
+        key_pool.pool.release(lease, ok=True, latency=first_token)
+
+
+async def _aleased(
+    open_request: Callable[[str, str | None], AsyncIterator[LLMDelta]],
+    entries: list[key_pool.PoolEntry],
+    estimated_tokens: int,
+    api_base: str,
+    api_key: str | None,
+) -> AsyncIterator[LLMDelta]:
+    lease = key_pool.pool.acquire(entries, estimated_tokens)
+    if lease is None:
+        async for delta in open_request(api_base, api_key):
+            yield delta
+        return
+    first_token: float | None = None
+    try:
+        async for delta in open_request(lease.entry.api_base, lease.entry.api_key):
+            if first_token is None:
+                first_token = time.perf_counter() - lease.started
+            yield delta
+    except LLMClientError as exc:
+        _release_failed(lease, entries, exc)
+        raise
+    finally:
+        key_pool.pool.release(lease, ok=True, latency=first_token)
+
+
+def _call_leased(
+    post: Callable[[str, str | None], T],
+    entries: list[key_pool.PoolEntry],
+    estimated_tokens: int,
+    api_base: str,
+    api_key: str | None,
+) -> T:
+    """Non-streaming counterpart of _leased."""
+
+    lease = key_pool.pool.acquire(entries, estimated_tokens)
+    if lease is None:
+        return post(api_base, api_key)
+    try:
+        result = post(lease.entry.api_base, lease.entry.api_key)
+    except LLMClientError as exc:
+        _release_failed(lease, entries, exc)
+        raise
+    finally:
+        # Whole-response time is no first-token latency, so it does not reweight the key.
+        key_pool.pool.release(lease, ok=True)
+    return result
+
+
+async def _acall_leased(
+    post: Callable[[str, str | None], Awaitable[T]],
+    entries: list[key_pool.PoolEntry],
+    estimated_tokens: int,
+    api_base: str,
+    api_key: str | None,
+) -> T:
+    lease = key_pool.pool.acquire(entries, estimated_tokens)
+    if lease is None:
+        return await post(api_base, api_key)
+    try:
+        result = await post(lease.entry.api_base, lease.entry.api_key)
+    except LLMClientError as exc:
+        _release_failed(lease, entries, exc)
+        raise
+    finally:
+        key_pool.pool.release(lease, ok=True)
+    return result
+
+
+def _stream_endpoint(
+    prompt: str,
+    endpoint: providers.Endpoint,
+    *,
+    timeout: float,
+    include_reasoning: bool,
+    max_tokens: int | None,
+    json_mode: bool,
+    max_continuations: int,
+) -> Iterator[LLMDelta]:
+    provider = endpoint.provider
+
+    if provider == "anthropic":
+        primary_key: str | None = _get_api_key(endpoint.api_key, provider="anthropic")
+
+        def open_request(
+            partial: Optional[str], base: str, key: str | None
+        ) -> Iterator[LLMDelta]:
+            return _stream_anthropic(
+                prompt,
+                model=endpoint.model,
+                api_base=base,
+                api_key=key or "",
+                timeout=timeout,
+                include_reasoning=include_reasoning,
+                max_tokens=max_tokens,
+                prefill=partial,
+            )
+
+    else:
+        primary_key = endpoint.api_key
+
+        def open_request(
+            partial: Optional[str], base: str, key: str | None
+        ) -> Iterator[LLMDelta]:
+            return _stream_chat(
+                prompt,
+                model=endpoint.model,
+                base_url=base,
+                api_key=key,
+                timeout=timeout,
+                include_reasoning=include_reasoning,
+                max_tokens=max_tokens,
+                json_mode=json_mode,
+                partial=partial,
+            )
+
+    entries = _pool_entries(endpoint)
+    limiter = ratelimit.get_limiter(provider, endpoint.model)
+
+    def open_stream(partial: Optional[str]) -> Iterator[LLMDelta]:
+        estimated_tokens = _estimate_tokens(prompt, partial, max_tokens)
+        return ratelimit.throttled_stream(
+            lambda: _leased(
+                lambda base, key: open_request(partial, base, key),
+                entries,
+                estimated_tokens,
+                endpoint.api_base,
+                primary_key,
+            ),
+            limiter,
+            estimated_tokens,
+            notice=_queue_notice,
+        )
+
+    budget = RetryBudget()
+    yield from _continued(
+        lambda partial: stream_with_retries(
+            lambda: open_stream(partial),
+            budget,
+            provider=provider,
+            notice=_retry_notice,
+            is_output=_is_output,
+        ),
+        provider=provider,
+        prefix="{" if json_mode and provider == "anthropic" else "",
+        max_continuations=max_continuations,
+    )
+
+
+async def _stream_endpoint_async(
+    prompt: str,
+    endpoint: providers.Endpoint,
+    *,
+    timeout: float,
+    include_reasoning: bool,
+    max_tokens: int | None,
+    json_mode: bool,
+    max_continuations: int,
+    stage: str,
+) -> AsyncIterator[LLMDelta]:
+    provider = endpoint.provider
+
+    if provider == "anthropic":
+        primary_key: str | None = _get_api_key(endpoint.api_key, provider="anthropic")
+
+        def open_request(
+            partial: Optional[str], base: str, key: str | None
+        ) -> AsyncIterator[LLMDelta]:
+            return _stream_anthropic_async(
+                prompt,
+                model=endpoint.model,
+                api_base=base,
+                api_key=key or "",
+                timeout=timeout,
+                include_reasoning=include_reasoning,
+                max_tokens=max_tokens,
+                prefill=partial,
+            )
+
+    else:
+        primary_key = endpoint.api_key
+
+        def open_request(
+            partial: Optional[str], base: str, key: str | None
+        ) -> AsyncIterator[LLMDelta]:
+            return _stream_chat_async(
+                prompt,
+                model=endpoint.model,
+                base_url=base,
+                api_key=key,
+                timeout=timeout,
+                include_reasoning=include_reasoning,
+                max_tokens=max_tokens,
+                json_mode=json_mode,
+                partial=partial,
+            )
+
+    prefix = "{" if json_mode and provider == "anthropic" else ""
+    entries = _pool_entries(endpoint)
+    limiter = ratelimit.get_limiter(provider, endpoint.model)
+
+    def open_pooled(partial: Optional[str]) -> AsyncIterator[LLMDelta]:
+        return _aleased(
+            lambda base, key: open_request(partial, base, key),
+            entries,
+            _estimate_tokens(prompt, partial, max_tokens),
+            endpoint.api_base,
+            primary_key,
+        )
+
+    def open_hedged(partial: Optional[str]) -> AsyncIterator[LLMDelta]:
+        # Only the first request is hedged; continuations already have output flowing.
+        if not hedging.HEDGE_ENABLED or (partial or "") != prefix:
+            return open_pooled(partial)
+        if hedging.HEDGE_API_BASE or hedging.HEDGE_API_KEY:
+
+            def open_hedge() -> AsyncIterator[LLMDelta]:
+                return open_request(
+                    partial,
+                    hedging.HEDGE_API_BASE or endpoint.api_base,
+                    hedging.HEDGE_API_KEY or primary_key,
+                )
+
+        else:
+            # Without a dedicated hedge target the duplicate takes its own pool lease.
+            def open_hedge() -> AsyncIterator[LLMDelta]:
+                return open_pooled(partial)
+
+        # The hedge is extra load: it only goes out if the limiter has a slot free right now.
+        return hedging.hedged_stream(
+            lambda: open_pooled(partial),
+            open_hedge,
+            key=(stage or "default", endpoint.model),
+            limiter=limiter,
+            tokens=_estimate_tokens(prompt, partial, max_tokens),
+        )
+
+    def open_stream(partial: Optional[str]) -> AsyncIterator[LLMDelta]:
+        # The slot is taken before hedging, so queueing time never triggers a hedge.
+        return ratelimit.athrottled_stream(
+            lambda: open_hedged(partial),
+            limiter,
+            _estimate_tokens(prompt, partial, max_tokens),
+            notice=_queue_notice,
+        )
+
+    budget = RetryBudget()
+    async for delta in _continued_async(
+        lambda partial: astream_with_retries(
+            lambda: open_stream(partial),
+            budget,
+            provider=provider,
+            notice=_retry_notice,
+            is_output=_is_output,
+        ),
+        provider=provider,
+        prefix=prefix,
+        max_continuations=max_continuations,
+    ):
+        yield delta
+
+
+def _call_chat(
+    prompt: str,
+    *,
+    model: str,
+    base_url: str,
+    api_key: str | None,
+    timeout: float,
+    include_reasoning: bool,
+    max_tokens: int | None,
+    json_mode: bool,
+) -> str | tuple[str, str | None]:
+    """One non-streaming chat-completions request."""
+
+    headers, payload = _build_chat_request(
+        prompt,
+        model=model,
+        api_key=api_key,
+        stream=False,
+        max_tokens=max_tokens,
+        json_mode=json_mode,
+    )
+    try:
+        client = get_http_client(base_url)
+        response = client.post(
+            _chat_path(base_url), headers=headers, json=payload, timeout=timeout
+        )
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:  # pragma: no cover - network errors
+        raise _status_error(exc) from exc
+    except httpx.HTTPError as exc:  # pragma: no cover - network errors
+        raise _transport_error(exc) from exc
+    return _parse_chat_message(response.json(), include_reasoning)
+
+
+async def _call_chat_async(
+    prompt: str,
+    *,
+    model: str,
+    base_url: str,
+    api_key: str | None,
+    timeout: float,
+    include_reasoning: bool,
+    max_tokens: int | None,
+    json_mode: bool,
+) -> str | tuple[str, str | None]:
+    headers, payload = _build_chat_request(
+        prompt,
+        model=model,
+        api_key=api_key,
+        stream=False,
+        max_tokens=max_tokens,
+        json_mode=json_mode,
+    )
+    try:
+        client = get_async_http_client(base_url)
+        response = await client.post(
+            _chat_path(base_url), headers=headers, json=payload, timeout=timeout
+        )
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:  # pragma: no cover - network errors
+        raise _status_error(exc) from exc
+    except httpx.HTTPError as exc:  # pragma: no cover - network errors
+        raise _transport_error(exc) from exc
+    return _parse_chat_message(response.json(), include_reasoning)
+
+
+def _call_endpoint(
+    prompt: str,
+    endpoint: providers.Endpoint,
+    *,
+    timeout: float,
+    include_reasoning: bool,
+    max_tokens: int | None,
+    json_mode: bool,
+) -> str | tuple[str, str | None]:
+    """Non-streaming counterpart of _stream_endpoint: throttled and retried."""
+
+    provider = endpoint.provider
+    prefill = "{" if json_mode and provider == "anthropic" else None
+
+    if provider == "anthropic":
+        primary_key: str | None = _get_api_key(endpoint.api_key, provider="anthropic")
+
+        def post(base: str, key: str | None) -> str | tuple[str, str | None]:
+            return _call_anthropic(
+                prompt,
+                model=endpoint.model,
+                api_base=base,
+                api_key=key or "",
+                timeout=timeout,
+                max_tokens=max_tokens,
+                prefill=prefill,
+            )
+
+    else:
+        primary_key = endpoint.api_key
+
+        def post(base: str, key: str | None) -> str | tuple[str, str | None]:
+            return _call_chat(
+                prompt,
+                model=endpoint.model,
+                base_url=base,
+                api_key=key,
+                timeout=timeout,
+                include_reasoning=include_reasoning,
+                max_tokens=max_tokens,
+                json_mode=json_mode,
+            )
+
+    entries = _pool_entries(endpoint)
+    limiter = ratelimit.get_limiter(provider, endpoint.model)
+    estimated_tokens = _estimate_tokens(prompt, prefill, max_tokens)
+
+    def throttled_post() -> str | tuple[str, str | None]:
+        with ratelimit.slot(limiter, estimated_tokens):
+            return _call_leased(
+                post, entries, estimated_tokens, endpoint.api_base, primary_key
+            )
+
+    return call_with_retries(throttled_post, RetryBudget(), provider=provider)
+
+
+async def _call_endpoint_async(
+    prompt: str,
+    endpoint: providers.Endpoint,
+    *,
+    timeout: float,
+    include_reasoning: bool,
+    max_tokens: int | None,
+    json_mode: bool,
+) -> str | tuple[str, str | None]:
+    provider = endpoint.provider
+    prefill = "{" if json_mode and provider == "anthropic" else None
+
+    if provider == "anthropic":
+        primary_key: str | None = _get_api_key(endpoint.api_key, provider="anthropic")
+
+        async def post(base: str, key: str | None) -> str | tuple[str, str | None]:
+            return await _call_anthropic_async(
+                prompt,
+                model=endpoint.model,
+                api_base=base,
+                api_key=key or "",
+                timeout=timeout,
+                max_tokens=max_tokens,
+                prefill=prefill,
+            )
+
+    else:
+        primary_key = endpoint.api_key
+
+        async def post(base: str, key: str | None) -> str | tuple[str, str | None]:
+            return await _call_chat_async(
+                prompt,
+                model=endpoint.model,
+                base_url=base,
+                api_key=key,
+                timeout=timeout,
+                include_reasoning=include_reasoning,
+                max_tokens=max_tokens,
+                json_mode=json_mode,
+            )
+
+    entries = _pool_entries(endpoint)
+    limiter = ratelimit.get_limiter(provider, endpoint.model)
+    estimated_tokens = _estimate_tokens(prompt, prefill, max_tokens)
+
+    async def throttled_post() -> str | tuple[str, str | None]:
+        async with ratelimit.aslot(limiter, estimated_tokens):
+            return await _acall_leased(
+                post, entries, estimated_tokens, endpoint.api_base, primary_key
+            )
+
+    return await acall_with_retries(throttled_post, RetryBudget(), provider=provider)
+
+
+def stream_llm(
+    prompt: str,
+    *,
+    model: str | None = None,
+    api_base: str | None = None,
+    api_key: str | None = None,
+    timeout: float | None = None,
+    include_reasoning: bool = False,
+    max_tokens: int | None = None,
+    json_mode: bool = False,
+    max_continuations: int | None = None,
+) -> Iterator[LLMDelta]:
+    """Yield content (and optionally reasoning) deltas as the provider streams them.
+
+    ``max_tokens`` caps each request's output; a reply that stops on that limit
+    is continued (up to ``max_continuations`` times) and the continuation is
+    streamed straight after the partial output. ``json_mode`` asks for a JSON
+    object (response_format, or a ``{`` prefill for Anthropic). Endpoints with
+    an open circuit breaker are skipped in favour of LLM_FALLBACK_CHAIN.
+    """
+
+    options = {
+        "timeout": timeout or DEFAULT_TIMEOUT,
+        "include_reasoning": include_reasoning,
+        "max_tokens": max_tokens,
+        "json_mode": json_mode,
+        "max_continuations": MAX_CONTINUATIONS if max_continuations is None else max_continuations,
+    }
+    try:
+        for delta in providers.failover_stream(
+            endpoint_chain(model, api_base, api_key),
+            lambda endpoint: _stream_endpoint(prompt, endpoint, **options),
+            is_output=_is_output,
+            local_wait=_local_wait,
+        ):
+            if not _is_slot_granted(delta):
+                yield delta
+    except providers.CircuitOpenError as exc:
+        raise _circuit_error(exc) from exc
+
+
+async def stream_llm_async(
+    prompt: str,
+    *,
+    model: str | None = None,
+    api_base: str | None = None,
+    api_key: str | None = None,
+    timeout: float | None = None,
+    include_reasoning: bool = False,
+    max_tokens: int | None = None,
+    json_mode: bool = False,
+    max_continuations: int | None = None,
+    stage: str = "",
+) -> AsyncIterator[LLMDelta]:
+    """Async counterpart of stream_llm.
+
+    With LLM_HEDGE enabled, a first request whose first token is slower than the
+    recent p90 for ``stage`` and the model is duplicated (to LLM_HEDGE_API_BASE
+    when set) and the slower of the two is cancelled.
+    """
+
+    options = {
+        "timeout": timeout or DEFAULT_TIMEOUT,
+        "include_reasoning": include_reasoning,
+        "max_tokens": max_tokens,
+        "json_mode": json_mode,
+        "max_continuations": MAX_CONTINUATIONS if max_continuations is None else max_continuations,
+        "stage": stage,
+    }
+    try:
+        async for delta in providers.afailover_stream(
+            endpoint_chain(model, api_base, api_key),
+            lambda endpoint: _stream_endpoint_async(prompt, endpoint, **options),
+            is_output=_is_output,
+            local_wait=_local_wait,
+        ):
+            if not _is_slot_granted(delta):
+                yield delta
+    except providers.CircuitOpenError as exc:
+        raise _circuit_error(exc) from exc
+
+
 def call_llm(
     prompt: str,
     *,
@@ -52,131 +1176,100 @@ def call_llm(
     timeout: float | None = None,
     include_reasoning: bool = False,
     stream: bool = True,
+    max_tokens: int | None = None,
+    json_mode: bool = False,
 ) -> str | tuple[str, str | None]:
     """Invoke the configured LLM provider and return the raw string response.
 
     For DeepSeek reasoning models (e.g., deepseek-reasoner) set include_reasoning=True
-    to also capture the reasoning_content from the response.
+    to also capture the reasoning_content from the response. Use stream_llm to
+    consume the deltas as they arrive instead. Replies truncated at ``max_tokens``
+    are only continued in stream mode.
     """
 
     effective_timeout = timeout or DEFAULT_TIMEOUT
     target_model = model or DEFAULT_MODEL
-    base_url = api_base or API_BASE_URL
 
-    lower_base = base_url.lower()
-    provider = (
-        "anthropic"
-        if "anthropic" in lower_base or "jiuwan" in lower_base or "claude" in target_model.lower()
-        else "deepseek"
-    )
-    if provider == "anthropic":
-        return _call_anthropic(
+    if stream:
+        collector = DeltaCollector(include_reasoning)
+        for delta in stream_llm(
             prompt,
             model=target_model,
-            api_base=api_base or ANTHROPIC_BASE_URL,
-            api_key=_get_api_key(api_key, provider="anthropic"),
+            api_base=api_base,
+            api_key=api_key,
             timeout=effective_timeout,
-            stream=stream,
-        )
+            include_reasoning=include_reasoning,
+            max_tokens=max_tokens,
+            json_mode=json_mode,
+        ):
+            collector.add(delta)
+        return collector.result()
 
-    headers = {
-        "Authorization": f"Bearer {_get_api_key(api_key)}",
-        "Content-Type": "application/json",
-    }
-    payload: dict[str, Any] = {
-        "model": target_model,
-        "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": prompt},
-        ],
-        "temperature": 0.2,
+    options = {
+        "timeout": effective_timeout,
+        "include_reasoning": include_reasoning,
+        "max_tokens": max_tokens,
+        "json_mode": json_mode,
     }
-    # DeepSeek reasoning模型不支持 temperature 等参数，避免发送无效字段
-    if target_model == "deepseek-reasoner":
-        payload.pop("temperature", None)
-    if stream:
-        payload["stream"] = True
-
     try:
-        with httpx.Client(
-            timeout=effective_timeout, base_url=api_base or API_BASE_URL
-        ) as client:
-            path = ""
-            base = api_base or API_BASE_URL
-            if not base.rstrip("/").endswith("chat/completions"):
-                path = CHAT_COMPLETIONS_PATH
-            if stream:
-                content_parts: list[str] = []
-                reasoning_parts: list[str] = []
-                with client.stream("POST", path, headers=headers, json=payload) as response:
-                    if response.is_error:
-                        try:
-                            detail = response.text
-                        except httpx.ResponseNotRead:
-                            try:
-                                detail = response.read().decode("utf-8")
-                            except Exception:
-                                detail = "<stream response not available>"
-                        raise LLMClientError(
-                            f"LLM provider error: {response.status_code} {detail}"
-                        )
-                    for line in response.iter_lines():
-                        if not line:
-                            continue
-                        if isinstance(line, bytes):
-                            line = line.decode("utf-8", errors="ignore")
-                        if line.startswith("data:"):
-                            data_line = line[len("data:"):].strip()
-                        else:
-                            continue
-                        if data_line == "[DONE]":
-                            break
-                        try:
-                            data = json.loads(data_line)
-                        except json.JSONDecodeError:
-                            continue
-                        choices = data.get("choices") or []
-                        if not choices:
-                            continue
-                        delta = choices[0].get("delta") or {}
-                        if delta.get("content"):
-                            content_parts.append(delta["content"])
-                        if include_reasoning and delta.get("reasoning_content"):
-                            reasoning_parts.append(delta["reasoning_content"])
-                content = "".join(content_parts).strip()
-                reasoning = "".join(reasoning_parts).strip() if reasoning_parts else None
-                return (content, reasoning) if include_reasoning else content
-            else:
-                response = client.post(path, headers=headers, json=payload)
-                response.raise_for_status()
-    except httpx.HTTPStatusError as exc:  # pragma: no cover - network errors
-        detail = ""
-        try:
-            detail = exc.response.text
-        except httpx.ResponseNotRead:
-            try:
-                detail = exc.response.read().decode("utf-8")
-            except Exception:
-                detail = "<stream response not available>"
-        raise LLMClientError(
-            f"LLM provider error: {exc.response.status_code} {detail}"
-        ) from exc
-    except httpx.HTTPError as exc:  # pragma: no cover - network errors
-        raise LLMClientError(f"Failed to call LLM provider: {exc}") from exc
+        return providers.failover_call(
+            endpoint_chain(target_model, api_base, api_key),
+            lambda endpoint: _call_endpoint(prompt, endpoint, **options),
+        )
+    except providers.CircuitOpenError as exc:
+        raise _circuit_error(exc) from exc
 
-    data = response.json()
-    # DeepSeek/OpenAI compatible payloads place content under choices[].message.content
+
+async def call_llm_async(
+    prompt: str,
+    *,
+    model: str | None = None,
+    api_base: str | None = None,
+    api_key: str | None = None,
+    timeout: float | None = None,
+    include_reasoning: bool = False,
+    stream: bool = True,
+    max_tokens: int | None = None,
+    json_mode: bool = False,
+    stage: str = "",
+) -> str | tuple[str, str | None]:
+    """Async counterpart of call_llm built on the pooled httpx.AsyncClient.
+
+    ``stage`` keys the first-token statistics used for hedging.
+    """
+
+    effective_timeout = timeout or DEFAULT_TIMEOUT
+    target_model = model or DEFAULT_MODEL
+
+    if stream:
+        collector = DeltaCollector(include_reasoning)
+        async for delta in stream_llm_async(
+            prompt,
+            model=target_model,
+            api_base=api_base,
+            api_key=api_key,
+            timeout=effective_timeout,
+            include_reasoning=include_reasoning,
+            max_tokens=max_tokens,
+            json_mode=json_mode,
+            stage=stage,
+        ):
+            collector.add(delta)
+        return collector.result()
+
+    options = {
+        "timeout": effective_timeout,
+        "include_reasoning": include_reasoning,
+        "max_tokens": max_tokens,
+        "json_mode": json_mode,
+    }
     try:
-        message = data["choices"][0]["message"]
-        content = message["content"]
-        reasoning = message.get("reasoning_content")
-    except (KeyError, IndexError, TypeError) as exc:
-        raise LLMClientError(
-            f"Unexpected LLM response format: {json.dumps(data)[:500]}"
-        ) from exc
-    if include_reasoning:
-        return content.strip(), (reasoning.strip() if isinstance(reasoning, str) else None)
-    return content.strip()
+        return await providers.afailover_call(
+            endpoint_chain(target_model, api_base, api_key),
+            lambda endpoint: _call_endpoint_async(prompt, endpoint, **options),
+        )
+    except providers.CircuitOpenError as exc:
+        raise _circuit_error(exc) from exc
 
 
 def mask_api_key(key: str | None) -> str | None:
@@ -187,50 +1280,34 @@ def mask_api_key(key: str | None) -> str | None:
     return f"{key[:6]}...{key[-4:]}"
 
 
-def _call_anthropic(
+def _build_anthropic_request(
     prompt: str,
     *,
     model: str,
-    api_base: str,
     api_key: str,
-    timeout: float,
     stream: bool,
-) -> str:
-    """Anthropic Messages API call (non-stream for simplicity)."""
-
+    max_tokens: int | None = None,
+    prefill: str | None = None,
+) -> tuple[dict[str, str], dict[str, Any]]:
     headers = {
         "x-api-key": api_key,
         "Content-Type": "application/json",
         "anthropic-version": "2023-06-01",
     }
+    messages: list[dict[str, Any]] = [{"role": "user", "content": prompt}]
+    if prefill:
+        # The reply continues the prefilled assistant turn (which may not end in whitespace).
+        messages.append({"role": "assistant", "content": prefill.rstrip()})
     payload: dict[str, Any] = {
         "model": model,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": 2048,
-        "stream": False,  # we aggregate sync to simplify handling
+        "messages": messages,
+        "max_tokens": max_tokens or ANTHROPIC_MAX_TOKENS,
+        "stream": stream,
     }
+    return headers, payload
 
-    try:
-        with httpx.Client(timeout=timeout, base_url=api_base) as client:
-            path = ANTHROPIC_MESSAGES_PATH if api_base.endswith("/v1") else ANTHROPIC_MESSAGES_PATH
-            response = client.post(path, headers=headers, json=payload)
-            response.raise_for_status()
-    except httpx.HTTPStatusError as exc:
-        detail = ""
-        try:
-            detail = exc.response.text
-        except httpx.ResponseNotRead:
-            try:
-                detail = exc.response.read().decode("utf-8")
-            except Exception:
-                detail = "<stream response not available>"
-        raise LLMClientError(
-            f"LLM provider error: {exc.response.status_code} {detail}"
-        ) from exc
-    except httpx.HTTPError as exc:
-        raise LLMClientError(f"Failed to call LLM provider: {exc}") from exc
 
-    data = response.json()
+def _parse_anthropic_message(data: dict[str, Any]) -> str:
     try:
         contents = data["content"]
         if not contents:
@@ -244,3 +1321,181 @@ def _call_anthropic(
         raise LLMClientError(
             f"Unexpected Anthropic response format: {json.dumps(data)[:500]}"
         ) from exc
+
+
+def _anthropic_stream_event(
+    data_line: str, include_reasoning: bool
+) -> tuple[list[LLMDelta], bool]:
+    """Translate one Messages API SSE event into deltas; the flag marks message_stop.
+
+    The stop_reason announced in message_delta is surfaced as a ``finish`` delta.
+    """
+
+    try:
+        event = json.loads(data_line)
+    except json.JSONDecodeError:
+        return [], False
+    event_type = event.get("type")
+    if event_type == "message_stop":
+        return [], True
+    if event_type == "error":
+        error = event.get("error") or {}
+        raise LLMClientError(
+            f"LLM provider error: {error.get('type', 'error')} {error.get('message', '')}".strip(),
+            retryable=error.get("type") in ANTHROPIC_RETRYABLE_ERRORS,
+        )
+    if event_type == "message_delta":
+        stop_reason = (event.get("delta") or {}).get("stop_reason")
+        return ([LLMDelta("finish", stop_reason)] if stop_reason else []), False
+    if event_type != "content_block_delta":
+        # message_start / content_block_start|stop / ping carry no text
+        return [], False
+    delta = event.get("delta") or {}
+    if delta.get("type") == "text_delta" and delta.get("text"):
+        return [LLMDelta("content", delta["text"])], False
+    if include_reasoning and delta.get("type") == "thinking_delta" and delta.get("thinking"):
+        return [LLMDelta("reasoning", delta["thinking"])], False
+    return [], False
+
+
+def _stream_anthropic(
+    prompt: str,
+    *,
+    model: str,
+    api_base: str,
+    api_key: str,
+    timeout: float,
+    include_reasoning: bool = False,
+    max_tokens: int | None = None,
+    prefill: str | None = None,
+) -> Iterator[LLMDelta]:
+    """Stream an Anthropic Messages API completion as LLMDelta chunks."""
+
+    headers, payload = _build_anthropic_request(
+        prompt,
+        model=model,
+        api_key=api_key,
+        stream=True,
+        max_tokens=max_tokens,
+        prefill=prefill,
+    )
+    try:
+        client = get_http_client(api_base, provider="anthropic")
+        with client.stream(
+            "POST", ANTHROPIC_MESSAGES_PATH, headers=headers, json=payload, timeout=timeout
+        ) as response:
+            if response.is_error:
+                raise _stream_error(response)
+            for line in response.iter_lines():
+                data_line = _read_sse_data(line)
+                if data_line is None:
+                    continue
+                deltas, finished = _anthropic_stream_event(data_line, include_reasoning)
+                yield from deltas
+                if finished:
+                    break
+    except httpx.HTTPError as exc:
+        raise _transport_error(exc) from exc
+
+
+async def _stream_anthropic_async(
+    prompt: str,
+    *,
+    model: str,
+    api_base: str,
+    api_key: str,
+    timeout: float,
+    include_reasoning: bool = False,
+    max_tokens: int | None = None,
+    prefill: str | None = None,
+) -> AsyncIterator[LLMDelta]:
+    headers, payload = _build_anthropic_request(
+        prompt,
+        model=model,
+        api_key=api_key,
+        stream=True,
+        max_tokens=max_tokens,
+        prefill=prefill,
+    )
+    try:
+        client = get_async_http_client(api_base, provider="anthropic")
+        async with client.stream(
+            "POST", ANTHROPIC_MESSAGES_PATH, headers=headers, json=payload, timeout=timeout
+        ) as response:
+            if response.is_error:
+                raise await _astream_error(response)
+            async for line in response.aiter_lines():
+                data_line = _read_sse_data(line)
+                if data_line is None:
+                    continue
+                deltas, finished = _anthropic_stream_event(data_line, include_reasoning)
+                for delta in deltas:
+                    yield delta
+                if finished:
+                    break
+    except httpx.HTTPError as exc:
+        raise _transport_error(exc) from exc
+
+
+def _call_anthropic(
+    prompt: str,
+    *,
+    model: str,
+    api_base: str,
+    api_key: str,
+    timeout: float,
+    max_tokens: int | None = None,
+    prefill: str | None = None,
+) -> str:
+    """One non-streaming Anthropic Messages API request."""
+
+    headers, payload = _build_anthropic_request(
+        prompt,
+        model=model,
+        api_key=api_key,
+        stream=False,
+        max_tokens=max_tokens,
+        prefill=prefill,
+    )
+    try:
+        client = get_http_client(api_base, provider="anthropic")
+        response = client.post(
+            ANTHROPIC_MESSAGES_PATH, headers=headers, json=payload, timeout=timeout
+        )
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:
+        raise _status_error(exc) from exc
+    except httpx.HTTPError as exc:
+        raise _transport_error(exc) from exc
+    return (prefill or "") + _parse_anthropic_message(response.json())
+
+
+async def _call_anthropic_async(
+    prompt: str,
+    *,
+    model: str,
+    api_base: str,
+    api_key: str,
+    timeout: float,
+    max_tokens: int | None = None,
+    prefill: str | None = None,
+) -> str:
+    headers, payload = _build_anthropic_request(
+        prompt,
+        model=model,
+        api_key=api_key,
+        stream=False,
+        max_tokens=max_tokens,
+        prefill=prefill,
+    )
+    try:
+        client = get_async_http_client(api_base, provider="anthropic")
+        response = await client.post(
+            ANTHROPIC_MESSAGES_PATH, headers=headers, json=payload, timeout=timeout
+        )
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:
+        raise _status_error(exc) from exc
+    except httpx.HTTPError as exc:
+        raise _transport_error(exc) from exc
+    return (prefill or "") + _parse_anthropic_message(response.json())
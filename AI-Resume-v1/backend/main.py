@@ -4,7 +4,9 @@ from __future__ import annotations
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import analyze, prompts
+from . import metrics
+from .llm_client import aclose_http_clients, close_http_clients
+from .routers import analyze, jobs, prompts, screening
 from .storage import init_db
 
 
@@ -25,10 +27,32 @@ app.add_middleware(
 )
 
 app.include_router(analyze.router)
+app.include_router(jobs.router)
 app.include_router(prompts.router)
+app.include_router(screening.router)
+
+
+@app.on_event("startup")
+async def startup() -> None:
+    """Start the workers that drain the /jobs queue."""
+    jobs.workers.start()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    """Stop the job workers and release pooled LLM provider connections."""
+    await jobs.workers.stop()
+    close_http_clients()
+    await aclose_http_clients()
 
 
 @app.get("/health")
 def health() -> dict[str, str]:
     """Simple health endpoint for smoke tests."""
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+def metrics_endpoint() -> dict[str, object]:
+    """Process-local counters such as LLM cache hits and misses."""
+    return metrics.snapshot()
@@ -0,0 +1,178 @@
+"""Micro-batching: pack small stage prompts from concurrent requests into one LLM call.
+
+Under load the provider's requests-per-minute limit binds long before tokens
+do. Compatible prompts (same stage, model, endpoint and key) that arrive within
+a short window are sent as one request asking for an array of results; each
+answer is split back out and validated, and anything that does not split or
+validate falls back to its own call.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from . import metrics
+from .json_repair import JSONRepairError, repair_json
+
+# Off by default: batching trades up to one window of latency for fewer requests.
+MICROBATCH_ENABLED = os.getenv("LLM_MICROBATCH", "false").lower() in {"1", "true", "yes"}
+MICROBATCH_WINDOW_MS = float(os.getenv("LLM_MICROBATCH_WINDOW_MS", "200"))
+MICROBATCH_MAX_SIZE = max(int(os.getenv("LLM_MICROBATCH_MAX_SIZE", "8")), 1)
+# Output budget of one batched request (per-stage budgets are summed up to this).
+MICROBATCH_MAX_TOKENS = int(os.getenv("LLM_MICROBATCH_MAX_TOKENS", "8192"))
+# Stages with small prompts and small answers; the others are not worth packing.
+MICROBATCH_STAGES = frozenset(
+    stage.strip()
+    for stage in os.getenv("LLM_MICROBATCH_STAGES", "learning_plan,parse_job").split(",")
+    if stage.strip()
+)
+
+# Sends ``prompt`` upstream as a request carrying ``size`` tasks; returns the raw answer.
+BatchCall = Callable[[str, int], Awaitable[str]]
+# Validates one task's answer, raising when it is unusable.
+Check = Callable[[str], Any]
+
+
+class BatchSplitError(Exception):
+    """A batched answer is not an array with one result per task."""
+
+
+def batches(stage: str) -> bool:
+    return MICROBATCH_ENABLED and stage in MICROBATCH_STAGES
+
+
+def batch_prompt(prompts: List[str]) -> str:
+    """One prompt asking for the answers to ``prompts`` as a ``results`` array, in order."""
+
+    count = len(prompts)
+    header = (
+        f"下面有 {count} 个相互独立的任务，每个任务都有自己的说明与输入，请分别完成，互不参考。\n"
+        f'只输出一个 JSON 对象，格式为 {{"results": [任务 1 的结果, 任务 2 的结果, ...]}}：'
+        f"results 按任务编号顺序排列、恰好 {count} 个元素，"
+        "每个元素就是单独回答该任务时应输出的完整 JSON 对象。"
+    )
+    tasks = [f"=== 任务 {index} ===\n{prompt}" for index, prompt in enumerate(prompts, 1)]
+    return "\n\n".join([header, *tasks])
+
+
+def split_results(raw: str, count: int) -> List[str]:
+    """The per-task answers (as JSON documents) of a batched reply."""
+
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        try:
+            data = repair_json(raw).data
+        except JSONRepairError as exc:
+            raise BatchSplitError(f"Batched answer is not JSON: {exc}") from exc
+    results = data.get("results") if isinstance(data, dict) else data
+    if not isinstance(results, list) or len(results) != count:
+        raise BatchSplitError(f"Batched answer does not hold {count} results")
+    if not all(isinstance(result, dict) for result in results):
+        raise BatchSplitError("Batched answer holds a result that is not an object")
+    return [json.dumps(result, ensure_ascii=False) for result in results]
+
+
+@dataclass
+class _Item:
+    prompt: str
+    call: BatchCall
+    check: Check
+    future: "asyncio.Future[str]"
+
+
+@dataclass
+class _Batch:
+    items: List[_Item] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher:
+    """Prompts waiting for their window to close, grouped by what makes them compatible."""
+
+    def __init__(
+        self, *, window: float = MICROBATCH_WINDOW_MS / 1000, max_size: int = MICROBATCH_MAX_SIZE
+    ) -> None:
+        self.window = window
+        self.max_size = max_size
+        self._pending: Dict[Tuple[int, str], _Batch] = {}
+        self._dispatching: Set[asyncio.Task] = set()
+
+    async def submit(self, key: str, prompt: str, *, call: BatchCall, check: Check) -> str:
+        """The raw answer to ``prompt``, possibly obtained together with other callers'.
+
+        Prompts share a request only when their ``key`` matches. ``call`` sends
+        a (batched or single) prompt; ``check`` decides whether a split-out
+        answer is usable or the prompt has to be sent on its own.
+        """
+
+        loop = asyncio.get_running_loop()
+        group = (id(loop), key)
+        batch = self._pending.get(group)
+        if batch is None:
+            batch = self._pending[group] = _Batch()
+            batch.timer = loop.call_later(self.window, self._flush, group)
+        future: "asyncio.Future[str]" = loop.create_future()
+        batch.items.append(_Item(prompt, call, check, future))
+        if len(batch.items) >= self.max_size:
+            self._flush(group)
+        return await future
+
+    def _flush(self, group: Tuple[int, str]) -> None:
+        batch = self._pending.pop(group, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.ensure_future(self._dispatch(batch.items))
+        self._dispatching.add(task)
+        task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, items: List[_Item]) -> None:
+        # Callers that gave up while waiting (cancelled runs) are left out.
+        items = [item for item in items if not item.future.done()]
+        if not items:
+            return
+        metrics.observe("llm_microbatch_size", len(items))
+        if len(items) == 1:
+            await self._single(items[0])
+            return
+        metrics.incr("llm_microbatch_requests_total")
+        try:
+            raw = await items[0].call(batch_prompt([item.prompt for item in items]), len(items))
+            answers: List[Optional[str]] = list(split_results(raw, len(items)))
+        except BatchSplitError:
+            metrics.incr("llm_microbatch_fallbacks_total", value=len(items), reason="split")
+            answers = [None] * len(items)
+        except Exception:  # the batched request itself failed; each prompt gets its own try
+            metrics.incr("llm_microbatch_fallbacks_total", value=len(items), reason="call")
+            answers = [None] * len(items)
+        fallbacks = []
+        for item, answer in zip(items, answers):
+            if answer is not None:
+                try:
+                    item.check(answer)
+                except Exception:
+                    metrics.incr("llm_microbatch_fallbacks_total", reason="invalid")
+                    answer = None
+            if answer is None:
+                fallbacks.append(item)
+            elif not item.future.done():
+                item.future.set_result(answer)
+        await asyncio.gather(*(self._single(item) for item in fallbacks))
+
+    async def _single(self, item: _Item) -> None:
+        try:
+            raw = await item.call(item.prompt, 1)
+        except Exception as exc:
+            if not item.future.done():
+                item.future.set_exception(exc)
+            return
+        if not item.future.done():
+            item.future.set_result(raw)
+
+
+batcher = MicroBatcher()
@@ -0,0 +1,185 @@
+"""Incremental JSON scanning so stage sub-objects can be streamed before the stage ends."""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel, ValidationError
+
+from . import metrics
+from .schemas import (
+    Education,
+    Experience,
+    Gap,
+    JDPoint,
+    LearningPhase,
+    ResumeMapping,
+    Skill,
+    normalize_coverage_value,
+)
+
+PathItem = Union[str, int]
+Path = Tuple[PathItem, ...]
+# "*" in a pattern matches any array index.
+ANY_INDEX = "*"
+
+_PROFILE_PARTIALS = [
+    (("skills", ANY_INDEX), Skill),
+    (("education", ANY_INDEX), Education),
+    (("experiences", ANY_INDEX), Experience),
+]
+
+# Sub-objects worth surfacing early for each stage, keyed by their JSON path.
+STAGE_PARTIALS: Dict[str, List[Tuple[Path, Type[BaseModel]]]] = {
+    "parse_resume": [(("resume_profile", *path), model) for path, model in _PROFILE_PARTIALS],
+    "parse_job": [(("job_profile", *path), model) for path, model in _PROFILE_PARTIALS],
+    "gap_analysis": [
+        (("gap_analysis", "gaps", ANY_INDEX), Gap),
+        (("jd_mapping_matrix", "jd_points", ANY_INDEX), JDPoint),
+        (("jd_mapping_matrix", "resume_mapping", ANY_INDEX), ResumeMapping),
+    ],
+    "learning_plan": [(("learning_plan", "phases", ANY_INDEX), LearningPhase)],
+}
+
+
+class _Frame:
+    __slots__ = ("kind", "start", "key", "index", "expect_key")
+
+    def __init__(self, kind: str, start: int) -> None:
+        self.kind = kind
+        self.start = start
+        self.key: Optional[str] = None
+        self.index = 0
+        self.expect_key = kind == "object"
+
+
+class IncrementalJSONParser:
+    """Scan a JSON document chunk by chunk and report each object as it closes.
+
+    Text before the first ``{`` (such as a Markdown code fence) and anything
+    after the root value are ignored. The scanner keeps its position, so
+    feeding a response token by token costs O(total length). Only objects
+    whose path passes ``want`` are decoded.
+    """
+
+    def __init__(self, want: Optional[Callable[[Path], bool]] = None) -> None:
+        self._want = want
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._started = False
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Tuple[Path, Dict[str, Any]]]:
+        """Append ``chunk`` and return ``(path, object)`` for every object it closed."""
+
+        self._buffer += chunk
+        closed: List[Tuple[Path, Dict[str, Any]]] = []
+        buffer = self._buffer
+        while self._pos < len(buffer) and not self.done:
+            char = buffer[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._close_string()
+            elif not self._started:
+                if char == "{":
+                    self._started = True
+                    self._stack.append(_Frame("object", self._pos))
+            elif char == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif char in "{[":
+                self._stack.append(_Frame("object" if char == "{" else "array", self._pos))
+            elif char in "}]":
+                frame = self._stack.pop()
+                if frame.kind == "object":
+                    path = self._path()
+                    if self._want is None or self._want(path):
+                        value = self._decode(frame.start, self._pos + 1)
+                        if isinstance(value, dict):
+                            closed.append((path, value))
+                if not self._stack:
+                    self.done = True
+            elif char == ":" and self._stack:
+                self._stack[-1].expect_key = False
+            elif char == "," and self._stack:
+                top = self._stack[-1]
+                if top.kind == "array":
+                    top.index += 1
+                else:
+                    top.expect_key = True
+            self._pos += 1
+        return closed
+
+    def _close_string(self) -> None:
+        top = self._stack[-1] if self._stack else None
+        if top is not None and top.kind == "object" and top.expect_key:
+            key = self._decode(self._string_start, self._pos + 1)
+            top.key = key if isinstance(key, str) else None
+
+    def _path(self) -> Path:
+        path: List[PathItem] = []
+        for frame in self._stack:
+            if frame.kind == "array":
+                path.append(frame.index)
+            elif frame.key is not None:
+                path.append(frame.key)
+        return tuple(path)
+
+    def _decode(self, start: int, end: int) -> Any:
+        try:
+            return json.loads(self._buffer[start:end])
+        except json.JSONDecodeError:
+            return None
+
+
+def _matches(pattern: Path, path: Path) -> bool:
+    return len(pattern) == len(path) and all(
+        expected == actual or (expected == ANY_INDEX and isinstance(actual, int))
+        for expected, actual in zip(pattern, path)
+    )
+
+
+@dataclass
+class PartialObject:
+    path: Path
+    type: str
+    data: Dict[str, Any]
+
+
+class PartialStageParser:
+    """Turn one stage's streamed content into schema-validated sub-objects."""
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self.patterns = STAGE_PARTIALS.get(stage, [])
+        self._parser = IncrementalJSONParser(want=lambda path: self._model_for(path) is not None)
+
+    def _model_for(self, path: Path) -> Optional[Type[BaseModel]]:
+        return next((model for pattern, model in self.patterns if _matches(pattern, path)), None)
+
+    def feed(self, chunk: str) -> List[PartialObject]:
+        if not self.patterns or self._parser.done:
+            return []
+        found: List[PartialObject] = []
+        for path, value in self._parser.feed(chunk):
+            model = self._model_for(path)
+            if model is ResumeMapping:
+                # Same coverage normalisation the full parse applies.
+                value["coverage"] = normalize_coverage_value(value.get("coverage"))
+            try:
+                item = model.model_validate(value)
+            except ValidationError:
+                metrics.incr("partial_objects_invalid_total", stage=self.stage)
+                continue
+            found.append(PartialObject(path, model.__name__, item.model_dump()))
+        return found
@@ -1,31 +1,40 @@
 """LLM-first analysis pipeline shared by demo and FastAPI."""
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
-from typing import Dict, Optional, Tuple
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
 
-from . import prompts
-from .llm_client import LLMClientError, call_llm
+from pydantic import ValidationError
+
+from . import llm_cache, metrics, microbatch, prompts, singleflight
+from .json_repair import JSONRepairError, repair_json
+from .llm_cache import CachedResponse
+from .llm_client import (
+    API_BASE_URL,
+    DEFAULT_MODEL,
+    DeltaCollector,
+    LLMClientError,
+    LLMDelta,
+    call_llm,
+    call_llm_async,
+    stream_llm_async,
+    temperature_for,
+)
 from .schemas import (
     FullAnalysisResult,
     GapAnalysisResult,
     JDMappingMatrix,
     LearningPlan,
     Profile,
+    normalize_coverage_value,
 )
 
-# Tokens used when the LLM needs stubs for single profile requests.
-_RESUME_PLACEHOLDER = """
-This resume section is intentionally blank for a job-only request.
-Return a resume_profile stub with empty arrays, title "", and years_experience 0.
-"""
-
-_JOB_PLACEHOLDER = """
-This job description is intentionally blank for a resume-only request.
-Return a job_profile stub with empty arrays, title "", and years_experience 0.
-"""
-
-
 class PipelineError(RuntimeError):
     """Raised when LLM output cannot be parsed into expected schemas."""
 
@@ -48,33 +57,19 @@ def _loads(payload: str) -> dict:
     try:
         return json.loads(clean)
     except json.JSONDecodeError as exc:
-        raise PipelineError(f"Failed to parse LLM JSON: {exc}: {payload[:500]}") from exc
-
-
-def _normalize_coverage_value(value: object) -> str:
-    if not isinstance(value, str):
-        return "none"
-    token = value.strip().lower()
-    synonyms = {
-        "strong": "full",
-        "excellent": "full",
-        "good": "partial",
-        "medium": "partial",
-        "moderate": "partial",
-        "weak": "partial",
-        "limited": "partial",
-        "minimal": "none",
-        "poor": "none",
-        "missing": "none",
-        "none": "none",
-    }
-    if token in synonyms:
-        return synonyms[token]
-    if "full" in token:
-        return "full"
-    if "partial" in token:
-        return "partial"
-    return "none"
+        # Cosmetic damage (prose, trailing commas, truncation, ...) should not cost a re-run;
+        # the repaired document still has to pass the pydantic models downstream.
+        try:
+            repaired = repair_json(payload)
+        except JSONRepairError:
+            metrics.incr("llm_json_repair_failures_total")
+            raise PipelineError(f"Failed to parse LLM JSON: {exc}: {payload[:500]}") from exc
+        if not isinstance(repaired.data, dict):
+            raise PipelineError(f"LLM JSON is not an object: {payload[:500]}") from exc
+        metrics.incr("llm_json_repaired_total")
+        for repair in repaired.repairs:
+            metrics.incr("llm_json_repairs_total", repair=repair)
+        return repaired.data
 
 
 def _normalize_resume_mappings(matrix_payload: dict) -> None:
@@ -83,10 +78,49 @@ def _normalize_resume_mappings(matrix_payload: dict) -> None:
         return
     for item in mappings:
         if isinstance(item, dict):
-            item["coverage"] = _normalize_coverage_value(item.get("coverage"))
+            item["coverage"] = normalize_coverage_value(item.get("coverage"))
+
+
+# api_key/api_base/model overrides plus flags such as bypass_cache.
+LLMConfig = Dict[str, Any]
+T = TypeVar("T")
+# Receives (stage, delta) for every streamed chunk of a stage's LLM output.
+DeltaCallback = Callable[[str, LLMDelta], None]
+
+
+@dataclass(frozen=True)
+class StageOutput:
+    """Output budget for one stage; replies cut at max_tokens are continued."""
 
+    max_tokens: int
+    json_mode: bool = True
 
-LLMConfig = Dict[str, Optional[str]]
+
+JSON_MODE_ENABLED = os.getenv("LLM_JSON_MODE", "true").lower() in {"1", "true", "yes"}
+STAGE_OUTPUT: Dict[str, StageOutput] = {
+    "parse_resume": StageOutput(max_tokens=2048),
+    "parse_job": StageOutput(max_tokens=2048),
+    "gap_analysis": StageOutput(max_tokens=4096),
+    "learning_plan": StageOutput(max_tokens=4096),
+    "custom_resume": StageOutput(max_tokens=8192),
+}
+
+
+def stage_output(stage: str) -> Optional[StageOutput]:
+    """STAGE_OUTPUT entry with LLM_MAX_TOKENS_<STAGE> / LLM_JSON_MODE applied."""
+
+    default = STAGE_OUTPUT.get(stage)
+    if default is None:
+        return None
+    max_tokens = int(os.getenv(f"LLM_MAX_TOKENS_{stage.upper()}", default.max_tokens))
+    return StageOutput(max_tokens=max_tokens, json_mode=default.json_mode and JSON_MODE_ENABLED)
+
+
+def _output_options(stage: str) -> Dict[str, Any]:
+    output = stage_output(stage)
+    if output is None:
+        return {}
+    return {"max_tokens": output.max_tokens, "json_mode": output.json_mode}
 
 
 def _call_with_config(
@@ -94,6 +128,7 @@ def _call_with_config(
     llm_config: Optional[LLMConfig],
     *,
     include_reasoning: bool = False,
+    stage: str = "",
 ) -> str | tuple[str, str | None]:
     cfg = llm_config or {}
     return call_llm(
@@ -103,64 +138,291 @@ def _call_with_config(
         api_key=cfg.get("api_key"),
         stream=True,
         include_reasoning=include_reasoning,
+        **_output_options(stage),
     )
 
 
-def parse_resume_and_job(
-    resume_text: str,
-    jd_text: str,
+async def _call_with_config_async(
+    prompt: str,
+    llm_config: Optional[LLMConfig],
     *,
-    llm_config: Optional[LLMConfig] = None,
-    return_raw: bool = False,
-) -> Tuple[Profile, Profile, Optional[str], Optional[str]]:
-    prompt = prompts.build_parse_profile_prompt(resume_text, jd_text)
-    raw_response = _call_with_config(
-        prompt, llm_config, include_reasoning=return_raw
+    include_reasoning: bool = False,
+    stage: str = "",
+    on_delta: Optional[DeltaCallback] = None,
+) -> str | tuple[str, str | None]:
+    cfg = llm_config or {}
+    if on_delta is None:
+        return await call_llm_async(
+            prompt,
+            model=cfg.get("model"),
+            api_base=cfg.get("api_base"),
+            api_key=cfg.get("api_key"),
+            stream=True,
+            include_reasoning=include_reasoning,
+            stage=stage,
+            **_output_options(stage),
+        )
+    collector = DeltaCollector(include_reasoning)
+    async for delta in stream_llm_async(
+        prompt,
+        model=cfg.get("model"),
+        api_base=cfg.get("api_base"),
+        api_key=cfg.get("api_key"),
+        include_reasoning=include_reasoning,
+        stage=stage,
+        **_output_options(stage),
+    ):
+        collector.add(delta)
+        on_delta(stage, delta)
+    return collector.result()
+
+
+async def _call_batched_async(
+    prompt: str,
+    llm_config: Optional[LLMConfig],
+    check: Callable[[str], Any],
+    *,
+    stage: str,
+    on_delta: Optional[DeltaCallback] = None,
+) -> str:
+    """A stage call through the micro-batcher.
+
+    The answer may come from a request shared with other callers, so it is not
+    streamed token by token and carries no reasoning; it is replayed whole.
+    """
+
+    cfg = llm_config or {}
+
+    def call(batch_prompt: str, size: int) -> Awaitable[str]:
+        options = _output_options(stage)
+        if "max_tokens" in options:
+            # Room for every task's answer, within the batch budget (never below one task's).
+            single = options["max_tokens"]
+            options["max_tokens"] = max(single, min(single * size, microbatch.MICROBATCH_MAX_TOKENS))
+        return call_llm_async(  # type: ignore[return-value]
+            batch_prompt,
+            model=cfg.get("model"),
+            api_base=cfg.get("api_base"),
+            api_key=cfg.get("api_key"),
+            stream=True,
+            # Batched requests get their own first-token statistics for hedging.
+            stage=stage if size == 1 else f"{stage}_batch",
+            **options,
+        )
+
+    raw = await microbatch.batcher.submit(
+        _flight_key("", llm_config, stage=stage, include_reasoning=False),
+        prompt,
+        call=call,
+        check=check,
     )
-    reasoning = None
-    raw = raw_response
+    if on_delta is not None:
+        _replay(stage, raw, None, on_delta)
+    return raw
+
+
+def _split_reasoning(
+    raw_response: str | tuple[str, str | None]
+) -> Tuple[str, Optional[str]]:
     if isinstance(raw_response, tuple):
-        raw, reasoning = raw_response
+        return raw_response
+    return raw_response, None
+
+
+def _stage_cache_key(prompt: str, llm_config: Optional[LLMConfig]) -> Optional[str]:
+    cfg = llm_config or {}
+    if not llm_cache.CACHE_ENABLED or cfg.get("bypass_cache"):
+        return None
+    model = cfg.get("model") or DEFAULT_MODEL
+    api_base = cfg.get("api_base") or API_BASE_URL
+    return llm_cache.cache_key(
+        prompt,
+        model=model,
+        api_base=api_base,
+        temperature=temperature_for(model, api_base),
+    )
+
+
+def _flight_key(
+    prompt: str, llm_config: Optional[LLMConfig], *, stage: str, include_reasoning: bool
+) -> str:
+    """Everything that makes two stage calls interchangeable while both are in flight."""
+
+    cfg = llm_config or {}
+    api_key = cfg.get("api_key")
+    material = json.dumps(
+        [
+            prompt,
+            cfg.get("model") or DEFAULT_MODEL,
+            (cfg.get("api_base") or API_BASE_URL).rstrip("/"),
+            # Callers with different keys never share a request (or its billing).
+            hashlib.sha256(api_key.encode("utf-8")).hexdigest() if api_key else None,
+            stage,
+            include_reasoning,
+            _output_options(stage),
+        ],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _replay(
+    stage: str, content: str, reasoning: Optional[str], on_delta: DeltaCallback
+) -> None:
+    # A finished answer is replayed as a single burst so streaming clients render at once.
+    if reasoning:
+        on_delta(stage, LLMDelta("reasoning", reasoning))
+    on_delta(stage, LLMDelta("content", content))
+
+
+def _run_stage(
+    prompt: str,
+    llm_config: Optional[LLMConfig],
+    parse: Callable[[str], T],
+    *,
+    include_reasoning: bool,
+    stage: str = "",
+) -> Tuple[T, str, Optional[str]]:
+    """Call the LLM (or the response cache) and parse the output.
+
+    Only responses that parse and validate are written back to the cache, so a
+    malformed answer is never replayed to the next caller. Identical calls made
+    while one is already in flight wait for it instead of calling again.
+    """
+
+    key = _stage_cache_key(prompt, llm_config)
+    cached = llm_cache.response_cache.get(key) if key else None
+    if cached is not None:
+        reasoning = cached.reasoning if include_reasoning else None
+        return parse(cached.content), cached.content, reasoning
+    raw, reasoning = _split_reasoning(
+        singleflight.stage_calls.do(
+            _flight_key(prompt, llm_config, stage=stage, include_reasoning=include_reasoning),
+            lambda: _call_with_config(
+                prompt, llm_config, include_reasoning=include_reasoning, stage=stage
+            ),
+        )
+    )
+    value = parse(raw)
+    if key:
+        llm_cache.response_cache.put(key, CachedResponse(raw, reasoning))
+    return value, raw, reasoning
+
+
+async def _run_stage_async(
+    prompt: str,
+    llm_config: Optional[LLMConfig],
+    parse: Callable[[str], T],
+    *,
+    include_reasoning: bool,
+    stage: str,
+    on_delta: Optional[DeltaCallback] = None,
+) -> Tuple[T, str, Optional[str]]:
+    key = _stage_cache_key(prompt, llm_config)
+    cached = await llm_cache.response_cache.aget(key) if key else None
+    if cached is not None:
+        reasoning = cached.reasoning if include_reasoning else None
+        if on_delta is not None:
+            _replay(stage, cached.content, reasoning, on_delta)
+        return parse(cached.content), cached.content, reasoning
+
+    def replay(response: str | tuple[str, str | None]) -> None:
+        _replay(stage, *_split_reasoning(response), on_delta)  # type: ignore[arg-type]
+
+    def call(publish: Optional[DeltaCallback]) -> Awaitable[str | tuple[str, str | None]]:
+        if microbatch.batches(stage):
+            return _call_batched_async(prompt, llm_config, parse, stage=stage, on_delta=publish)
+        return _call_with_config_async(
+            prompt,
+            llm_config,
+            include_reasoning=include_reasoning,
+            stage=stage,
+            on_delta=publish,
+        )
+
+    raw, reasoning = _split_reasoning(
+        await singleflight.stage_calls.ado(
+            _flight_key(prompt, llm_config, stage=stage, include_reasoning=include_reasoning),
+            call,
+            on_item=on_delta,
+            replay=replay,
+        )
+    )
+    value = parse(raw)
+    if key:
+        await llm_cache.response_cache.aput(key, CachedResponse(raw, reasoning))
+    return value, raw, reasoning
+
+
+def normalize_profile_text(text: str) -> str:
+    """Canonical form of a resume/JD used for the parse prompt.
+
+    Trailing spaces, runs of blank lines and CRLF endings do not change what the
+    model extracts, so folding them keeps the rendered prompt (and therefore the
+    cache key) identical when the same document is pasted twice.
+    """
+
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    folded = "\n".join(re.sub(r"[ \t\u3000]+", " ", line).strip() for line in lines)
+    return re.sub(r"\n{3,}", "\n\n", folded).strip()
+
+
+def _profile_from_raw(raw: str, key: str) -> Profile:
     data = _loads(raw)
     try:
-        resume_profile = Profile.model_validate(data["resume_profile"])
-        job_profile = Profile.model_validate(data["job_profile"])
+        return Profile.model_validate(data[key])
     except KeyError as exc:
-        raise PipelineError("Missing profile keys in LLM response") from exc
-    return (resume_profile, job_profile, raw, reasoning) if return_raw else (resume_profile, job_profile, None, None)
+        raise PipelineError(f"Missing {key} key in LLM response") from exc
+    except ValidationError as exc:
+        raise PipelineError(f"Invalid {key} in LLM response: {exc}") from exc
 
 
-def parse_resume_only(resume_text: str, *, llm_config: Optional[LLMConfig] = None) -> Profile:
-    resume_profile, _, _, _ = parse_resume_and_job(
-        resume_text, _JOB_PLACEHOLDER, llm_config=llm_config
-    )
-    return resume_profile
+def _resume_profile_from_raw(raw: str) -> Profile:
+    return _profile_from_raw(raw, "resume_profile")
 
 
-def parse_job_only(jd_text: str, *, llm_config: Optional[LLMConfig] = None) -> Profile:
-    _, job_profile, _, _ = parse_resume_and_job(
-        _RESUME_PLACEHOLDER, jd_text, llm_config=llm_config
-    )
-    return job_profile
+def _job_profile_from_raw(raw: str) -> Profile:
+    return _profile_from_raw(raw, "job_profile")
 
 
-def analyze_gaps_and_mapping(
+def _merge_profile_outputs(
     resume_profile: Profile,
     job_profile: Profile,
-    *,
-    llm_config: Optional[LLMConfig] = None,
-    return_raw: bool = False,
-) -> Tuple[GapAnalysisResult, JDMappingMatrix, Optional[str], Optional[str]]:
+    reasonings: Tuple[Optional[str], Optional[str]],
+) -> Tuple[str, Optional[str]]:
+    """Rebuild the combined parse document the single-prompt stage used to return."""
+
+    merged = json.dumps(
+        {
+            "resume_profile": resume_profile.model_dump(),
+            "job_profile": job_profile.model_dump(),
+        },
+        ensure_ascii=False,
+    )
+    reasoning = "\n\n".join(part for part in reasonings if part) or None
+    return merged, reasoning
+
+
+async def gather_or_cancel(*aws: Awaitable[Any]) -> list[Any]:
+    """asyncio.gather that cancels the remaining awaitables once one fails."""
+
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+def _gap_prompt(resume_profile: Profile, job_profile: Profile) -> str:
     resume_json = json.dumps(resume_profile.model_dump(), ensure_ascii=False)
     job_json = json.dumps(job_profile.model_dump(), ensure_ascii=False)
-    prompt = prompts.build_gap_analysis_prompt(resume_json, job_json)
-    raw_response = _call_with_config(
-        prompt, llm_config, include_reasoning=return_raw
-    )
-    reasoning = None
-    raw = raw_response
-    if isinstance(raw_response, tuple):
-        raw, reasoning = raw_response
+    return prompts.build_gap_analysis_prompt(resume_json, job_json)
+
+
+def _gaps_from_raw(raw: str) -> Tuple[GapAnalysisResult, JDMappingMatrix]:
     data = _loads(raw)
     matrix_payload = data.get("jd_mapping_matrix")
     if isinstance(matrix_payload, dict):
@@ -170,6 +432,223 @@ def analyze_gaps_and_mapping(
         jd_mapping_matrix = JDMappingMatrix.model_validate(data["jd_mapping_matrix"])
     except KeyError as exc:
         raise PipelineError("Missing gap or mapping keys in LLM response") from exc
+    except ValidationError as exc:
+        raise PipelineError(f"Invalid gap or mapping payload in LLM response: {exc}") from exc
+    return gap_analysis, jd_mapping_matrix
+
+
+def _plan_prompt(gap_analysis: GapAnalysisResult) -> str:
+    gap_json = json.dumps(gap_analysis.model_dump(), ensure_ascii=False)
+    return prompts.build_learning_plan_prompt(gap_json)
+
+
+def _plan_from_raw(raw: str) -> LearningPlan:
+    data = _loads(raw)
+    try:
+        return LearningPlan.model_validate(data["learning_plan"])
+    except KeyError as exc:
+        raise PipelineError("Missing learning_plan key in LLM response") from exc
+    except ValidationError as exc:
+        raise PipelineError(f"Invalid learning_plan in LLM response: {exc}") from exc
+
+
+def _custom_resume_from_raw(raw: str) -> str:
+    data = _loads(raw)
+    try:
+        custom_md = data["custom_resume_markdown"]
+    except KeyError as exc:
+        raise PipelineError("Missing custom_resume_markdown in LLM response") from exc
+    if not isinstance(custom_md, str):
+        raise PipelineError("custom_resume_markdown must be a string")
+    return custom_md
+
+
+def parse_resume_profile(
+    resume_text: str,
+    *,
+    llm_config: Optional[LLMConfig] = None,
+    return_raw: bool = False,
+) -> Tuple[Profile, Optional[str], Optional[str]]:
+    prompt = prompts.build_parse_resume_prompt(normalize_profile_text(resume_text))
+    profile, raw, reasoning = _run_stage(
+        prompt,
+        llm_config,
+        _resume_profile_from_raw,
+        include_reasoning=return_raw,
+        stage="parse_resume",
+    )
+    return profile, raw if return_raw else None, reasoning if return_raw else None
+
+
+async def parse_resume_profile_async(
+    resume_text: str,
+    *,
+    llm_config: Optional[LLMConfig] = None,
+    return_raw: bool = False,
+    on_delta: Optional[DeltaCallback] = None,
+) -> Tuple[Profile, Optional[str], Optional[str]]:
+    prompt = prompts.build_parse_resume_prompt(normalize_profile_text(resume_text))
+    profile, raw, reasoning = await _run_stage_async(
+        prompt,
+        llm_config,
+        _resume_profile_from_raw,
+        include_reasoning=return_raw,
+        stage="parse_resume",
+        on_delta=on_delta,
+    )
+    return profile, raw if return_raw else None, reasoning if return_raw else None
+
+
+def parse_job_profile(
+    jd_text: str,
+    *,
+    llm_config: Optional[LLMConfig] = None,
+    return_raw: bool = False,
+) -> Tuple[Profile, Optional[str], Optional[str]]:
+    prompt = prompts.build_parse_job_prompt(normalize_profile_text(jd_text))
+    profile, raw, reasoning = _run_stage(
+        prompt,
+        llm_config,
+        _job_profile_from_raw,
+        include_reasoning=return_raw,
+        stage="parse_job",
+    )
+    return profile, raw if return_raw else None, reasoning if return_raw else None
+
+
+async def parse_job_profile_async(
+    jd_text: str,
+    *,
+    llm_config: Optional[LLMConfig] = None,
+    return_raw: bool = False,
+    on_delta: Optional[DeltaCallback] = None,
+) -> Tuple[Profile, Optional[str], Optional[str]]:
+    prompt = prompts.build_parse_job_prompt(normalize_profile_text(jd_text))
+    profile, raw, reasoning = await _run_stage_async(
+        prompt,
+        llm_config,
+        _job_profile_from_raw,
+        include_reasoning=return_raw,
+        stage="parse_job",
+        on_delta=on_delta,
+    )
+    return profile, raw if return_raw else None, reasoning if return_raw else None
+
+
+def parse_resume_and_job(
+    resume_text: str,
+    jd_text: str,
+    *,
+    llm_config: Optional[LLMConfig] = None,
+    return_raw: bool = False,
+) -> Tuple[Profile, Profile, Optional[str], Optional[str]]:
+    """Parse both documents concurrently; each side is cached independently."""
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        resume_future = executor.submit(
+            parse_resume_profile, resume_text, llm_config=llm_config, return_raw=return_raw
+        )
+        job_future = executor.submit(
+            parse_job_profile, jd_text, llm_config=llm_config, return_raw=return_raw
+        )
+        resume_profile, _, resume_reasoning = resume_future.result()
+        job_profile, _, job_reasoning = job_future.result()
+    if not return_raw:
+        return resume_profile, job_profile, None, None
+    raw, reasoning = _merge_profile_outputs(
+        resume_profile, job_profile, (resume_reasoning, job_reasoning)
+    )
+    return resume_profile, job_profile, raw, reasoning
+
+
+async def parse_resume_and_job_async(
+    resume_text: str,
+    jd_text: str,
+    *,
+    llm_config: Optional[LLMConfig] = None,
+    return_raw: bool = False,
+    on_delta: Optional[DeltaCallback] = None,
+) -> Tuple[Profile, Profile, Optional[str], Optional[str]]:
+    (resume_profile, _, resume_reasoning), (job_profile, _, job_reasoning) = await gather_or_cancel(
+        parse_resume_profile_async(
+            resume_text, llm_config=llm_config, return_raw=return_raw, on_delta=on_delta
+        ),
+        parse_job_profile_async(
+            jd_text, llm_config=llm_config, return_raw=return_raw, on_delta=on_delta
+        ),
+    )
+    if not return_raw:
+        return resume_profile, job_profile, None, None
+    raw, reasoning = _merge_profile_outputs(
+        resume_profile, job_profile, (resume_reasoning, job_reasoning)
+    )
+    return resume_profile, job_profile, raw, reasoning
+
+
+def parse_resume_only(resume_text: str, *, llm_config: Optional[LLMConfig] = None) -> Profile:
+    profile, _, _ = parse_resume_profile(resume_text, llm_config=llm_config)
+    return profile
+
+
+async def parse_resume_only_async(
+    resume_text: str, *, llm_config: Optional[LLMConfig] = None
+) -> Profile:
+    profile, _, _ = await parse_resume_profile_async(resume_text, llm_config=llm_config)
+    return profile
+
+
+def parse_job_only(jd_text: str, *, llm_config: Optional[LLMConfig] = None) -> Profile:
+    profile, _, _ = parse_job_profile(jd_text, llm_config=llm_config)
+    return profile
+
+
+async def parse_job_only_async(
+    jd_text: str, *, llm_config: Optional[LLMConfig] = None
+) -> Profile:
+    profile, _, _ = await parse_job_profile_async(jd_text, llm_config=llm_config)
+    return profile
+
+
+def analyze_gaps_and_mapping(
+    resume_profile: Profile,
+    job_profile: Profile,
+    *,
+    llm_config: Optional[LLMConfig] = None,
+    return_raw: bool = False,
+) -> Tuple[GapAnalysisResult, JDMappingMatrix, Optional[str], Optional[str]]:
+    prompt = _gap_prompt(resume_profile, job_profile)
+    (gap_analysis, jd_mapping_matrix), raw, reasoning = _run_stage(
+        prompt,
+        llm_config,
+        _gaps_from_raw,
+        include_reasoning=return_raw,
+        stage="gap_analysis",
+    )
+    return (
+        gap_analysis,
+        jd_mapping_matrix,
+        raw if return_raw else None,
+        reasoning if return_raw else None,
+    )
+
+
+async def analyze_gaps_and_mapping_async(
+    resume_profile: Profile,
+    job_profile: Profile,
+    *,
+    llm_config: Optional[LLMConfig] = None,
+    return_raw: bool = False,
+    on_delta: Optional[DeltaCallback] = None,
+) -> Tuple[GapAnalysisResult, JDMappingMatrix, Optional[str], Optional[str]]:
+    prompt = _gap_prompt(resume_profile, job_profile)
+    (gap_analysis, jd_mapping_matrix), raw, reasoning = await _run_stage_async(
+        prompt,
+        llm_config,
+        _gaps_from_raw,
+        include_reasoning=return_raw,
+        stage="gap_analysis",
+        on_delta=on_delta,
+    )
     return (
         gap_analysis,
         jd_mapping_matrix,
@@ -184,20 +663,33 @@ def generate_learning_plan(
     llm_config: Optional[LLMConfig] = None,
     return_raw: bool = False,
 ) -> Tuple[LearningPlan, Optional[str], Optional[str]]:
-    gap_json = json.dumps(gap_analysis.model_dump(), ensure_ascii=False)
-    prompt = prompts.build_learning_plan_prompt(gap_json)
-    raw_response = _call_with_config(
-        prompt, llm_config, include_reasoning=return_raw
+    prompt = _plan_prompt(gap_analysis)
+    plan, raw, reasoning = _run_stage(
+        prompt,
+        llm_config,
+        _plan_from_raw,
+        include_reasoning=return_raw,
+        stage="learning_plan",
+    )
+    return plan, raw if return_raw else None, reasoning if return_raw else None
+
+
+async def generate_learning_plan_async(
+    gap_analysis: GapAnalysisResult,
+    *,
+    llm_config: Optional[LLMConfig] = None,
+    return_raw: bool = False,
+    on_delta: Optional[DeltaCallback] = None,
+) -> Tuple[LearningPlan, Optional[str], Optional[str]]:
+    prompt = _plan_prompt(gap_analysis)
+    plan, raw, reasoning = await _run_stage_async(
+        prompt,
+        llm_config,
+        _plan_from_raw,
+        include_reasoning=return_raw,
+        stage="learning_plan",
+        on_delta=on_delta,
     )
-    reasoning = None
-    raw = raw_response
-    if isinstance(raw_response, tuple):
-        raw, reasoning = raw_response
-    data = _loads(raw)
-    try:
-        plan = LearningPlan.model_validate(data["learning_plan"])
-    except KeyError as exc:
-        raise PipelineError("Missing learning_plan key in LLM response") from exc
     return plan, raw if return_raw else None, reasoning if return_raw else None
 
 
@@ -209,41 +701,306 @@ def generate_custom_resume(
     return_raw: bool = False,
 ) -> Tuple[str, Optional[str], Optional[str]]:
     prompt = prompts.build_custom_resume_prompt(resume_text, jd_text)
-    raw_response = _call_with_config(
-        prompt, llm_config, include_reasoning=return_raw
+    custom_md, raw, reasoning = _run_stage(
+        prompt,
+        llm_config,
+        _custom_resume_from_raw,
+        include_reasoning=return_raw,
+        stage="custom_resume",
+    )
+    return custom_md, raw if return_raw else None, reasoning if return_raw else None
+
+
+async def generate_custom_resume_async(
+    resume_text: str,
+    jd_text: str,
+    *,
+    llm_config: Optional[LLMConfig] = None,
+    return_raw: bool = False,
+    on_delta: Optional[DeltaCallback] = None,
+) -> Tuple[str, Optional[str], Optional[str]]:
+    prompt = prompts.build_custom_resume_prompt(resume_text, jd_text)
+    custom_md, raw, reasoning = await _run_stage_async(
+        prompt,
+        llm_config,
+        _custom_resume_from_raw,
+        include_reasoning=return_raw,
+        stage="custom_resume",
+        on_delta=on_delta,
     )
-    reasoning = None
-    raw = raw_response
-    if isinstance(raw_response, tuple):
-        raw, reasoning = raw_response
-    data = _loads(raw)
-    try:
-        custom_md = data["custom_resume_markdown"]
-    except KeyError as exc:
-        raise PipelineError("Missing custom_resume_markdown in LLM response") from exc
-    if not isinstance(custom_md, str):
-        raise PipelineError("custom_resume_markdown must be a string")
     return custom_md, raw if return_raw else None, reasoning if return_raw else None
 
 
+# Seconds each stage may run before it is abandoned; 0 disables the limit.
+# LLM_STAGE_TIMEOUT_<STAGE> (e.g. LLM_STAGE_TIMEOUT_CUSTOM_RESUME) overrides one stage.
+STAGE_TIMEOUT_SECONDS = float(os.getenv("LLM_STAGE_TIMEOUT", "0"))
+
+
+def stage_timeout(stage: str) -> Optional[float]:
+    value = float(os.getenv(f"LLM_STAGE_TIMEOUT_{stage.upper()}", STAGE_TIMEOUT_SECONDS))
+    return value if value > 0 else None
+
+
+class StageTimeoutError(PipelineError):
+    pass
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One node of the analysis graph; ``run`` receives its inputs' values by name."""
+
+    name: str
+    run: Callable[..., Awaitable[Any]]
+    inputs: Tuple[str, ...] = ()
+    timeout: Optional[float] = None
+
+
+@dataclass
+class StageOutcome:
+    name: str
+    value: Any = None
+    error: Optional[Exception] = None
+    elapsed: float = 0.0
+    skipped: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def timed_out(self) -> bool:
+        return isinstance(self.error, StageTimeoutError)
+
+
+# Called once per stage, in completion order, with its outcome.
+StageCallback = Callable[[StageOutcome], None]
+
+
+async def _execute_stage(stage: Stage, kwargs: Dict[str, Any]) -> StageOutcome:
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        value = await asyncio.wait_for(stage.run(**kwargs), stage.timeout)
+    except asyncio.TimeoutError:
+        metrics.incr("pipeline_stage_timeouts_total", stage=stage.name)
+        error = StageTimeoutError(f"Stage '{stage.name}' timed out after {stage.timeout:g}s")
+        return StageOutcome(stage.name, error=error, elapsed=loop.time() - started)
+    except (LLMClientError, PipelineError, ValidationError) as exc:
+        # A stage that validates its own output may still raise pydantic errors.
+        return StageOutcome(stage.name, error=exc, elapsed=loop.time() - started)
+    return StageOutcome(stage.name, value=value, elapsed=loop.time() - started)
+
+
+async def run_stage_graph(
+    stages: Iterable[Stage],
+    *,
+    on_complete: Optional[StageCallback] = None,
+    fail_fast: bool = False,
+) -> Dict[str, StageOutcome]:
+    """Run every stage as soon as all of its inputs are available.
+
+    A failed or timed-out stage marks everything downstream as skipped while
+    independent branches keep running, so callers get partial results. With
+    ``fail_fast`` the first failure cancels the remaining stages and is raised.
+    """
+
+    pending: List[Stage] = list(stages)
+    names = {stage.name for stage in pending}
+    for stage in pending:
+        unknown = [name for name in stage.inputs if name not in names]
+        if unknown:
+            raise PipelineError(f"Stage '{stage.name}' depends on unknown stage '{unknown[0]}'")
+
+    outcomes: Dict[str, StageOutcome] = {}
+    running: Dict[asyncio.Task, Stage] = {}
+
+    def record(outcome: StageOutcome) -> None:
+        outcomes[outcome.name] = outcome
+        if not outcome.skipped:
+            metrics.observe("pipeline_stage_seconds", outcome.elapsed, stage=outcome.name)
+        if on_complete is not None:
+            on_complete(outcome)
+
+    try:
+        while pending or running:
+            progressed = True
+            while progressed:
+                progressed = False
+                for stage in list(pending):
+                    failed = [n for n in stage.inputs if n in outcomes and not outcomes[n].ok]
+                    if failed:
+                        pending.remove(stage)
+                        error = PipelineError(
+                            f"Stage '{stage.name}' skipped because '{failed[0]}' failed"
+                        )
+                        record(StageOutcome(stage.name, error=error, skipped=True))
+                        progressed = True
+                    elif all(name in outcomes for name in stage.inputs):
+                        pending.remove(stage)
+                        kwargs = {name: outcomes[name].value for name in stage.inputs}
+                        running[asyncio.create_task(_execute_stage(stage, kwargs))] = stage
+            if not running:
+                if pending:
+                    raise PipelineError(
+                        "Stage graph has a cycle: " + ", ".join(stage.name for stage in pending)
+                    )
+                break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                del running[task]
+                outcome = task.result()
+                record(outcome)
+                if fail_fast and outcome.error is not None:
+                    raise outcome.error
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    return outcomes
+
+
+def stage_checkpoint(value: Any) -> Tuple[str, Optional[str], Optional[str]]:
+    """(validated objects as JSON, raw output, reasoning) of a stage value tuple."""
+
+    *objects, raw, reasoning = value
+    dumped = [item.model_dump() if hasattr(item, "model_dump") else item for item in objects]
+    return json.dumps(dumped, ensure_ascii=False), raw, reasoning
+
+
+# Types of the validated objects that lead each stage's value tuple.
+STAGE_VALUE_TYPES: Dict[str, Tuple[Any, ...]] = {
+    "parse_resume": (Profile,),
+    "parse_job": (Profile,),
+    "gap_analysis": (GapAnalysisResult, JDMappingMatrix),
+    "learning_plan": (LearningPlan,),
+    "custom_resume": (str,),
+}
+
+
+def restore_stage_value(
+    stage: str, value_json: str, raw: Optional[str], reasoning: Optional[str]
+) -> Tuple[Any, ...]:
+    """Inverse of :func:`stage_checkpoint`: the stage value tuple, objects re-validated."""
+
+    items = json.loads(value_json)
+    types = STAGE_VALUE_TYPES[stage]
+    if len(items) != len(types):
+        raise PipelineError(f"Checkpoint of stage '{stage}' does not match its value")
+    try:
+        objects = [
+            item if kind is str else kind.model_validate(item) for kind, item in zip(types, items)
+        ]
+    except ValidationError as exc:
+        raise PipelineError(f"Checkpoint of stage '{stage}' no longer validates: {exc}") from exc
+    return (*objects, raw, reasoning)
+
+
+def analysis_stages(
+    resume_text: str,
+    jd_text: str,
+    *,
+    llm_config: Optional[LLMConfig] = None,
+    return_raw: bool = False,
+    on_delta: Optional[DeltaCallback] = None,
+    resume_profile: Optional[Profile] = None,
+    completed: Optional[Dict[str, Any]] = None,
+) -> List[Stage]:
+    """The full analysis as a graph: custom_resume runs beside parse → gap → plan.
+
+    Every stage value is the tuple returned by its stage function, so the raw
+    output and reasoning are always the last two items. A ``resume_profile``
+    parsed earlier (e.g. once per batch) short-circuits the parse_resume stage,
+    and so does every stage with a value in ``completed`` (restored checkpoints).
+    """
+
+    options: Dict[str, Any] = {
+        "llm_config": llm_config,
+        "return_raw": return_raw,
+        "on_delta": on_delta,
+    }
+
+    async def parse_resume() -> Any:
+        if resume_profile is not None:
+            return resume_profile, None, None
+        return await parse_resume_profile_async(resume_text, **options)
+
+    async def parse_job() -> Any:
+        return await parse_job_profile_async(jd_text, **options)
+
+    async def gap_analysis(parse_resume: Any, parse_job: Any) -> Any:
+        return await analyze_gaps_and_mapping_async(parse_resume[0], parse_job[0], **options)
+
+    async def learning_plan(gap_analysis: Any) -> Any:
+        return await generate_learning_plan_async(gap_analysis[0], **options)
+
+    async def custom_resume() -> Any:
+        return await generate_custom_resume_async(resume_text, jd_text, **options)
+
+    def restored(value: Any) -> Callable[..., Awaitable[Any]]:
+        async def _run(**_: Any) -> Any:
+            return value
+
+        return _run
+
+    graph = [
+        (parse_resume, ()),
+        (parse_job, ()),
+        (gap_analysis, ("parse_resume", "parse_job")),
+        (learning_plan, ("gap_analysis",)),
+        (custom_resume, ()),
+    ]
+    completed = completed or {}
+    return [
+        Stage(run.__name__, restored(completed[run.__name__]), inputs)
+        if run.__name__ in completed
+        else Stage(run.__name__, run, inputs, stage_timeout(run.__name__))
+        for run, inputs in graph
+    ]
+
+
+def partial_analysis(outcomes: Dict[str, StageOutcome]) -> Dict[str, Any]:
+    """FullAnalysisResult fields whose stages completed, keyed like the model."""
+
+    def value(stage: str) -> Any:
+        outcome = outcomes.get(stage)
+        return outcome.value if outcome is not None and outcome.ok else None
+
+    fields: Dict[str, Any] = {}
+    if value("parse_resume"):
+        fields["resume_profile"] = value("parse_resume")[0]
+    if value("parse_job"):
+        fields["job_profile"] = value("parse_job")[0]
+    if value("gap_analysis"):
+        fields["gap_analysis"], fields["jd_mapping_matrix"] = value("gap_analysis")[:2]
+    if value("learning_plan"):
+        fields["learning_plan"] = value("learning_plan")[0]
+    if value("custom_resume"):
+        fields["custom_resume_markdown"] = value("custom_resume")[0]
+    return fields
+
+
 def run_full_analysis(
     resume_text: str,
     jd_text: str,
     *,
     llm_config: Optional[LLMConfig] = None,
 ) -> FullAnalysisResult:
-    resume_profile, job_profile, _, _ = parse_resume_and_job(
-        resume_text, jd_text, llm_config=llm_config
-    )
-    gap_analysis, jd_mapping, _, _ = analyze_gaps_and_mapping(
-        resume_profile, job_profile, llm_config=llm_config
-    )
-    learning_plan, _, _ = generate_learning_plan(
-        gap_analysis, llm_config=llm_config
-    )
-    custom_resume_markdown, _, _ = generate_custom_resume(
-        resume_text, jd_text, llm_config=llm_config
-    )
+    # custom_resume only needs the raw texts, so it runs beside the parse → gap → plan chain.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        custom_future = executor.submit(
+            generate_custom_resume, resume_text, jd_text, llm_config=llm_config
+        )
+        resume_profile, job_profile, _, _ = parse_resume_and_job(
+            resume_text, jd_text, llm_config=llm_config
+        )
+        gap_analysis, jd_mapping, _, _ = analyze_gaps_and_mapping(
+            resume_profile, job_profile, llm_config=llm_config
+        )
+        learning_plan, _, _ = generate_learning_plan(
+            gap_analysis, llm_config=llm_config
+        )
+        custom_resume_markdown, _, _ = custom_future.result()
     return FullAnalysisResult(
         resume_profile=resume_profile,
         job_profile=job_profile,
@@ -252,3 +1009,19 @@ def run_full_analysis(
         learning_plan=learning_plan,
         custom_resume_markdown=custom_resume_markdown,
     )
+
+
+async def run_full_analysis_async(
+    resume_text: str,
+    jd_text: str,
+    *,
+    llm_config: Optional[LLMConfig] = None,
+    resume_profile: Optional[Profile] = None,
+) -> FullAnalysisResult:
+    outcomes = await run_stage_graph(
+        analysis_stages(
+            resume_text, jd_text, llm_config=llm_config, resume_profile=resume_profile
+        ),
+        fail_fast=True,
+    )
+    return FullAnalysisResult(**partial_analysis(outcomes))
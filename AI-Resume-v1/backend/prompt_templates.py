@@ -3,49 +3,56 @@ from __future__ import annotations
 
 import json
 
-PARSE_EXAMPLE = json.dumps(
-    {
-        "resume_profile": {
-            "profile_type": "resume",
-            "title": "全栈工程师",
-            "years_experience": 4.5,
-            "skills": [{"name": "Python", "level": "高级", "evidence": "负责后台接口"}],
-            "education": [
-                {
-                    "degree": "本科",
-                    "major": "计算机科学",
-                    "school": "某大学",
-                    "start": "2015",
-                    "end": "2019",
-                }
-            ],
-            "experiences": [
-                {
-                    "id": "exp1",
-                    "company": "StartupX",
-                    "title": "后端工程师",
-                    "start": "2020-01",
-                    "end": "2022-12",
-                    "description": "负责设计与实现 FastAPI 服务",
-                }
-            ],
-            "requirements": None,
-        },
-        "job_profile": {
-            "profile_type": "job",
-            "title": "资深后端工程师",
-            "years_experience": 5,
-            "skills": [
-                {"name": "FastAPI", "level": "专家", "evidence": "JD 关键要求"}
-            ],
-            "education": [],
-            "experiences": [],
-            "requirements": {
-                "must_have": ["FastAPI", "PostgreSQL"],
-                "nice_to_have": ["LLM 编排"]
-            },
-        },
+_RESUME_PROFILE_EXAMPLE = {
+    "profile_type": "resume",
+    "title": "全栈工程师",
+    "years_experience": 4.5,
+    "skills": [{"name": "Python", "level": "高级", "evidence": "负责后台接口"}],
+    "education": [
+        {
+            "degree": "本科",
+            "major": "计算机科学",
+            "school": "某大学",
+            "start": "2015",
+            "end": "2019",
+        }
+    ],
+    "experiences": [
+        {
+            "id": "exp1",
+            "company": "StartupX",
+            "title": "后端工程师",
+            "start": "2020-01",
+            "end": "2022-12",
+            "description": "负责设计与实现 FastAPI 服务",
+        }
+    ],
+    "requirements": None,
+}
+
+_JOB_PROFILE_EXAMPLE = {
+    "profile_type": "job",
+    "title": "资深后端工程师",
+    "years_experience": 5,
+    "skills": [
+        {"name": "FastAPI", "level": "专家", "evidence": "JD 关键要求"}
+    ],
+    "education": [],
+    "experiences": [],
+    "requirements": {
+        "must_have": ["FastAPI", "PostgreSQL"],
+        "nice_to_have": ["LLM 编排"]
     },
+}
+
+PARSE_RESUME_EXAMPLE = json.dumps(
+    {"resume_profile": _RESUME_PROFILE_EXAMPLE},
+    indent=2,
+    ensure_ascii=False,
+)
+
+PARSE_JOB_EXAMPLE = json.dumps(
+    {"job_profile": _JOB_PROFILE_EXAMPLE},
     indent=2,
     ensure_ascii=False,
 )
@@ -115,22 +122,35 @@ PLAN_EXAMPLE = json.dumps(
 )
 
 PROMPT_METADATA = {
-    "parse_profile": {
-        "description": "解析简历与 JD，生成结构化画像",
-        "placeholders": ["resume_text", "jd_text", "example"],
+    "parse_resume": {
+        "description": "解析简历，生成候选人结构化画像",
+        "placeholders": ["resume_text", "example"],
         "template": """
-你是一名资深招聘分析师。请阅读“简历文本”和“职位描述”，输出严格符合下列 JSON 结构的数据。只能返回 JSON，禁止出现额外说明。
+你是一名资深招聘分析师。请阅读“简历文本”，输出严格符合下列 JSON 结构的候选人画像。只能返回 JSON，禁止出现额外说明。
 JSON 结构示例：
 {example}
 
 请遵循规则：
-1. `resume_profile` 与 `job_profile` 都必须返回，即使文本为空也要填默认值（空数组、0）。
-2. `profile_type` 取值为 "resume" 或 "job"；`requirements.must_have`、`nice_to_have` 不能为空时请使用空数组。
+1. 只返回 `resume_profile`，即使文本为空也要填默认值（空数组、0）。
+2. `profile_type` 固定为 "resume"；`requirements` 返回 null。
 
 简历文本：
 ```
 {resume_text}
 ```
+""".strip(),
+    },
+    "parse_job": {
+        "description": "解析 JD，生成职位结构化画像",
+        "placeholders": ["jd_text", "example"],
+        "template": """
+你是一名资深招聘分析师。请阅读“职位描述”，输出严格符合下列 JSON 结构的职位画像。只能返回 JSON，禁止出现额外说明。
+JSON 结构示例：
+{example}
+
+请遵循规则：
+1. 只返回 `job_profile`，即使文本为空也要填默认值（空数组、0）。
+2. `profile_type` 固定为 "job"；`requirements.must_have`、`nice_to_have` 无内容时使用空数组。
 
 职位描述：
 ```
@@ -191,9 +211,17 @@ JSON 结构示例：
     },
 }
 
+# 旧版合并解析模板 parse_profile 已拆为 parse_resume / parse_job；用户改过的旧模板在 init_db 时复制到两者。
+# 未改动的旧默认模板按其 SHA-256 识别，不覆盖新的默认模板。
+LEGACY_PROMPTS = {"parse_profile": ("parse_resume", "parse_job")}
+LEGACY_DEFAULT_SHA256 = {
+    "parse_profile": "bbb4e53c0e183833024fea8aebf68d5a05727b02ab60fcc389c2a7144d50c3b6",
+}
+
 # 为方便模板渲染，提供示例映射
 PROMPT_EXAMPLES = {
-    "parse_profile": PARSE_EXAMPLE,
+    "parse_resume": PARSE_RESUME_EXAMPLE,
+    "parse_job": PARSE_JOB_EXAMPLE,
     "gap_analysis": GAP_EXAMPLE,
     "learning_plan": PLAN_EXAMPLE,
     "custom_resume": "",
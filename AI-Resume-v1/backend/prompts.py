@@ -7,17 +7,31 @@ from .prompt_templates import PROMPT_METADATA, PROMPT_EXAMPLES
 from .storage import get_prompt_template
 
 
+class _TemplateValues(dict):
+    # A template migrated from the combined parse_profile prompt still names both
+    # texts; placeholders this prompt does not fill render empty instead of failing.
+    def __missing__(self, key: str) -> str:
+        return ""
+
+
 def _render_template(name: str, **kwargs: Any) -> str:
     template = (get_prompt_template(name) or PROMPT_METADATA[name]["template"]).strip()
-    return template.format(**kwargs)
+    return template.format_map(_TemplateValues(kwargs))
 
 
-def build_parse_profile_prompt(resume_text: str, jd_text: str) -> str:
+def build_parse_resume_prompt(resume_text: str) -> str:
     return _render_template(
-        "parse_profile",
+        "parse_resume",
         resume_text=resume_text,
+        example=PROMPT_EXAMPLES["parse_resume"],
+    )
+
+
+def build_parse_job_prompt(jd_text: str) -> str:
+    return _render_template(
+        "parse_job",
         jd_text=jd_text,
-        example=PROMPT_EXAMPLES["parse_profile"],
+        example=PROMPT_EXAMPLES["parse_job"],
     )
 
 
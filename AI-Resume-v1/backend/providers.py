@@ -0,0 +1,336 @@
+"""Provider endpoints with per-endpoint circuit breakers and a fallback chain."""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from . import metrics
+
+T = TypeVar("T")
+
+# Breaker opens when, over the last BREAKER_WINDOW calls (at least
+# BREAKER_MIN_CALLS), the share of failed or slow calls reaches BREAKER_ERROR_RATE.
+BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+# A call whose first token takes longer than this counts against the endpoint.
+BREAKER_SLOW_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "30"))
+# How long an open breaker rejects calls before letting one probe through.
+BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+# Comma-separated "provider:model[@api_base]" entries tried after the requested endpoint.
+FALLBACK_CHAIN = os.getenv("LLM_FALLBACK_CHAIN", "")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """One place a completion can be sent; ``provider`` selects the wire protocol."""
+
+    provider: str
+    api_base: str
+    model: str
+    api_key: Optional[str] = None
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.provider, self.api_base.rstrip("/")
+
+    @property
+    def name(self) -> str:
+        return f"{self.provider}@{self.api_base.rstrip('/')}"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when every endpoint in the chain is rejecting calls."""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker driven by error and slow-call rate."""
+
+    def __init__(self, name: str, clock: Callable[[], float] = time.monotonic) -> None:
+        self.name = name
+        self.clock = clock
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.outcomes: Deque[bool] = deque(maxlen=BREAKER_WINDOW)
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        if state == OPEN:
+            self.opened_at = self.clock()
+        if state != HALF_OPEN:
+            self.probe_in_flight = False
+        metrics.set_gauge("llm_breaker_state", _STATE_GAUGE[state], endpoint=self.name)
+        metrics.incr("llm_breaker_transitions_total", endpoint=self.name, state=state)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in half-open state only one probe at a time."""
+
+        with self._lock:
+            if self.state == OPEN and self.clock() - self.opened_at >= BREAKER_OPEN_SECONDS:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def record(self, ok: bool, latency: Optional[float] = None, error: Optional[str] = None) -> None:
+        healthy = ok and (latency is None or latency <= BREAKER_SLOW_SECONDS)
+        with self._lock:
+            if not ok:
+                self.last_error = error
+            if self.state == HALF_OPEN:
+                self.outcomes.clear()
+                self._transition(CLOSED if healthy else OPEN)
+                if healthy:
+                    self.outcomes.append(True)
+                return
+            self.outcomes.append(healthy)
+            failures = self.outcomes.count(False)
+            if (
+                self.state == CLOSED
+                and len(self.outcomes) >= BREAKER_MIN_CALLS
+                and failures / len(self.outcomes) >= BREAKER_ERROR_RATE
+            ):
+                self._transition(OPEN)
+
+    def release(self) -> None:
+        """Give back a half-open probe slot when the call ended without a verdict."""
+
+        with self._lock:
+            self.probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            failures = self.outcomes.count(False)
+            retry_in = (
+                max(BREAKER_OPEN_SECONDS - (self.clock() - self.opened_at), 0.0)
+                if self.state == OPEN
+                else None
+            )
+            return {
+                "endpoint": self.name,
+                "state": self.state,
+                "recent_calls": len(self.outcomes),
+                "recent_failures": failures,
+                "retry_in_seconds": retry_in,
+                "last_error": self.last_error,
+            }
+
+
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(endpoint: Endpoint) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint.key)
+        if breaker is None:
+            breaker = _breakers[endpoint.key] = CircuitBreaker(endpoint.name)
+        return breaker
+
+
+def breaker_status() -> List[Dict[str, Any]]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return [breaker.snapshot() for breaker in breakers]
+
+
+def reset_breakers() -> None:
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def parse_fallback_chain(spec: str) -> List[Tuple[str, str, Optional[str]]]:
+    """Parse ``provider:model[@api_base]`` entries into (provider, model, api_base)."""
+
+    entries: List[Tuple[str, str, Optional[str]]] = []
+    for raw in spec.split(","):
+        raw = raw.strip()
+        if not raw:
+            continue
+        target, _, api_base = raw.partition("@")
+        provider, _, model = target.partition(":")
+        if not provider or not model:
+            raise ValueError(f"Invalid LLM_FALLBACK_CHAIN entry: {raw!r}")
+        entries.append((provider.strip(), model.strip(), api_base.strip() or None))
+    return entries
+
+
+def _provider_fault(exc: BaseException) -> bool:
+    # Transient provider-side failures (429 / 5xx / network) count against the
+    # endpoint and trigger failover; bad requests or keys are the caller's problem.
+    return bool(getattr(exc, "retryable", False))
+
+
+# Seconds of local waiting an item announces (from now on), or None for any other item.
+LocalWait = Callable[[T], Optional[float]]
+
+
+def _timed(
+    item: T,
+    started: float,
+    is_output: Callable[[T], bool],
+    local_wait: Optional[LocalWait[T]],
+) -> Tuple[float, Optional[float]]:
+    """(clock start, first-output latency once ``item`` is output) for failover timing."""
+
+    now = time.perf_counter()
+    wait = local_wait(item) if local_wait is not None else None
+    if wait is not None:
+        # Waiting in our own queue or backoff says nothing about the provider's health.
+        return now + wait, None
+    if is_output(item):
+        return started, max(now - started, 0.0)
+    return started, None
+
+
+def _candidates(chain: List[Endpoint]) -> Iterator[Tuple[Endpoint, CircuitBreaker]]:
+    rejected: List[str] = []
+    for endpoint in chain:
+        breaker = get_breaker(endpoint)
+        if breaker.allow():
+            yield endpoint, breaker
+        else:
+            rejected.append(endpoint.name)
+            metrics.incr("llm_breaker_rejections_total", endpoint=endpoint.name)
+    if rejected:
+        raise CircuitOpenError(f"LLM provider circuit open: {', '.join(rejected)}")
+
+
+def failover_stream(
+    chain: List[Endpoint],
+    open_stream: Callable[[Endpoint], Iterator[T]],
+    *,
+    is_output: Callable[[T], bool],
+    local_wait: Optional[LocalWait[T]] = None,
+) -> Iterator[T]:
+    """Stream from the first healthy endpoint, moving down the chain on provider faults.
+
+    Endpoints whose breaker is open are skipped without a request. Once an
+    output item has been yielded the endpoint is committed and errors propagate.
+    Time announced by ``local_wait`` items (rate-limit queueing, retry backoff)
+    is not counted towards the endpoint's first-output latency.
+    """
+
+    last_error: Optional[BaseException] = None
+    candidates = _candidates(chain)
+    while True:
+        try:
+            endpoint, breaker = next(candidates)
+        except StopIteration:
+            break
+        except CircuitOpenError:
+            if last_error is not None:
+                raise last_error
+            raise
+        if last_error is not None:
+            metrics.incr("llm_failovers_total", endpoint=endpoint.name)
+        started = time.perf_counter()
+        first_output: Optional[float] = None
+        try:
+            for item in open_stream(endpoint):
+                if first_output is None:
+                    started, first_output = _timed(item, started, is_output, local_wait)
+                yield item
+        except Exception as exc:
+            fault = _provider_fault(exc)
+            breaker.record(not fault, first_output, error=str(exc)[:200])
+            if not fault or first_output is not None:
+                raise
+            last_error = exc
+            continue
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record(True, first_output)
+        return
+    if last_error is not None:
+        raise last_error
+
+
+async def afailover_stream(
+    chain: List[Endpoint],
+    open_stream: Callable[[Endpoint], AsyncIterator[T]],
+    *,
+    is_output: Callable[[T], bool],
+    local_wait: Optional[LocalWait[T]] = None,
+) -> AsyncIterator[T]:
+    last_error: Optional[BaseException] = None
+    candidates = _candidates(chain)
+    while True:
+        try:
+            endpoint, breaker = next(candidates)
+        except StopIteration:
+            break
+        except CircuitOpenError:
+            if last_error is not None:
+                raise last_error
+            raise
+        if last_error is not None:
+            metrics.incr("llm_failovers_total", endpoint=endpoint.name)
+        started = time.perf_counter()
+        first_output: Optional[float] = None
+        try:
+            async for item in open_stream(endpoint):
+                if first_output is None:
+                    started, first_output = _timed(item, started, is_output, local_wait)
+                yield item
+        except Exception as exc:
+            fault = _provider_fault(exc)
+            breaker.record(not fault, first_output, error=str(exc)[:200])
+            if not fault or first_output is not None:
+                raise
+            last_error = exc
+            continue
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record(True, first_output)
+        return
+    if last_error is not None:
+        raise last_error
+
+
+def failover_call(chain: List[Endpoint], call: Callable[[Endpoint], T]) -> T:
+    """Non-streaming counterpart of failover_stream: one result per endpoint tried."""
+
+    def single(endpoint: Endpoint) -> Iterator[T]:
+        yield call(endpoint)
+
+    # Whole-response latency is not a first-token time, so it is not held against the endpoint.
+    results = list(failover_stream(chain, single, is_output=lambda _: False))
+    return results[0]
+
+
+async def afailover_call(
+    chain: List[Endpoint], call: Callable[[Endpoint], Awaitable[T]]
+) -> T:
+    async def single(endpoint: Endpoint) -> AsyncIterator[T]:
+        yield await call(endpoint)
+
+    results = [item async for item in afailover_stream(chain, single, is_output=lambda _: False)]
+    return results[0]
@@ -0,0 +1,410 @@
+"""Process-wide throttle for outbound LLM requests, per provider and model."""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from . import metrics
+
+T = TypeVar("T")
+
+# Defaults for every provider/model; 0 disables that limit.
+DEFAULT_RPM = int(os.getenv("LLM_RPM", "0"))
+DEFAULT_TPM = int(os.getenv("LLM_TPM", "0"))
+DEFAULT_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "0"))
+# JSON object of {"provider" | "provider:model": {"rpm", "tpm", "max_in_flight"}};
+# a model entry overrides its provider's entry, which overrides the defaults.
+RATE_LIMITS_SPEC = os.getenv("LLM_RATE_LIMITS", "")
+
+# Builds the item a throttled stream yields while waiting, from the queue position.
+QueueNotice = Callable[[int], T]
+
+
+@dataclass(frozen=True)
+class Limits:
+    rpm: int = 0
+    tpm: int = 0
+    max_in_flight: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rpm or self.tpm or self.max_in_flight)
+
+
+class TokenBucket:
+    """``capacity`` tokens that refill evenly over a minute."""
+
+    def __init__(self, per_minute: int, clock: Callable[[], float]) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 when they are now)."""
+
+        self._refill()
+        # A single request larger than the whole bucket waits for a full bucket.
+        missing = min(amount, self.capacity) - self.tokens
+        return max(missing / self.rate, 0.0)
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class _Waiter:
+    def __init__(self, tokens: int, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        self.tokens = tokens
+        self.granted = False
+        self.enqueued = time.perf_counter()
+        self.loop = loop
+        self.event = threading.Event()
+        self.future: Optional["asyncio.Future[None]"] = None
+
+    def wake(self) -> None:
+        # Called with the limiter lock held; the event doubles as a "woken while
+        # not waiting" flag for asyncio waiters.
+        self.event.set()
+        if self.loop is not None and self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimiter:
+    """Request and token buckets plus an in-flight cap, served in FIFO order.
+
+    Waiters queue in arrival order and the head is admitted as soon as every
+    limit allows it, so a large request cannot be starved by small ones.
+    Thread and asyncio callers share the same queue.
+    """
+
+    def __init__(
+        self, name: str, limits: Limits, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.name = name
+        self.limits = limits
+        self.requests = TokenBucket(limits.rpm, clock) if limits.rpm else None
+        self.token_bucket = TokenBucket(limits.tpm, clock) if limits.tpm else None
+        self.in_flight = 0
+        self.queue: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    def _wait_time(self, tokens: int) -> float:
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.wait_time(1))
+        if self.token_bucket is not None and tokens:
+            delay = max(delay, self.token_bucket.wait_time(tokens))
+        return delay
+
+    def _grant(self, tokens: int) -> None:
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.token_bucket is not None and tokens:
+            self.token_bucket.take(tokens)
+        self.in_flight += 1
+
+    def _dispatch(self, caller: Optional[_Waiter] = None, moved: bool = False) -> Optional[float]:
+        """Admit queued waiters in order; return the head's wait when it is rate-limited.
+
+        Must be called with the lock held. A head blocked on a bucket is woken
+        so it can sleep for exactly that long; one blocked on the in-flight cap
+        is woken by the next release. When the queue moved up, the remaining
+        waiters are woken to report their new position.
+        """
+
+        delay: Optional[float] = None
+        while self.queue:
+            head = self.queue[0]
+            if self.limits.max_in_flight and self.in_flight >= self.limits.max_in_flight:
+                break
+            wait = self._wait_time(head.tokens)
+            if wait > 0:
+                delay = wait
+                if head is not caller:
+                    head.wake()
+                break
+            self._grant(head.tokens)
+            head.granted = True
+            self.queue.popleft()
+            moved = True
+            metrics.observe(
+                "llm_queue_wait_seconds", time.perf_counter() - head.enqueued, limiter=self.name
+            )
+            if head is not caller:
+                head.wake()
+        if moved:
+            for waiter in self.queue:
+                if waiter is not caller:
+                    waiter.wake()
+        self._report()
+        return delay
+
+    def _report(self) -> None:
+        metrics.set_gauge("llm_queue_depth", len(self.queue), limiter=self.name)
+        metrics.set_gauge("llm_in_flight", self.in_flight, limiter=self.name)
+
+    def _enqueue(
+        self, tokens: int, loop: Optional[asyncio.AbstractEventLoop]
+    ) -> Tuple[_Waiter, Optional[float]]:
+        waiter = _Waiter(tokens, loop)
+        with self._lock:
+            self.queue.append(waiter)
+            delay = self._dispatch(waiter)
+        return waiter, delay
+
+    def _position(self, waiter: _Waiter) -> int:
+        with self._lock:
+            try:
+                return self.queue.index(waiter) + 1
+            except ValueError:
+                return 0
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter.granted:
+                self.in_flight = max(self.in_flight - 1, 0)
+            else:
+                self.queue.remove(waiter)
+            self._dispatch(moved=True)
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """Take a slot only if one is free right now and nobody is waiting for it.
+
+        For optional requests (hedges) that must never queue ahead of, or
+        alongside, real work; a successful call is paired with :meth:`release`.
+        """
+
+        with self._lock:
+            if self.queue:
+                return False
+            if self.limits.max_in_flight and self.in_flight >= self.limits.max_in_flight:
+                return False
+            if self._wait_time(tokens) > 0:
+                return False
+            self._grant(tokens)
+            self._report()
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+            self._dispatch()
+
+    def wait(self, tokens: int = 0) -> Iterator[int]:
+        """Block until admitted, yielding the 1-based queue position whenever it changes."""
+
+        waiter, delay = self._enqueue(tokens, None)
+        position = 0
+        try:
+            while not waiter.granted:
+                current = self._position(waiter)
+                if current and current != position:
+                    position = current
+                    yield position
+                waiter.event.wait(delay)
+                with self._lock:
+                    waiter.event.clear()
+                    delay = None if waiter.granted else self._dispatch(waiter)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    async def await_turn(self, tokens: int = 0) -> AsyncIterator[int]:
+        """Async counterpart of wait."""
+
+        loop = asyncio.get_running_loop()
+        waiter, delay = self._enqueue(tokens, loop)
+        position = 0
+        try:
+            while not waiter.granted:
+                current = self._position(waiter)
+                if current and current != position:
+                    position = current
+                    yield position
+                with self._lock:
+                    if waiter.granted:
+                        break
+                    if waiter.event.is_set():
+                        waiter.event.clear()
+                        future = None
+                    else:
+                        future = waiter.future = loop.create_future()
+                if future is not None:
+                    try:
+                        await asyncio.wait_for(future, delay)
+                    except asyncio.TimeoutError:
+                        pass
+                with self._lock:
+                    waiter.future = None
+                    delay = None if waiter.granted else self._dispatch(waiter)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limiter": self.name,
+                "rpm": self.limits.rpm or None,
+                "tpm": self.limits.tpm or None,
+                "max_in_flight": self.limits.max_in_flight or None,
+                "in_flight": self.in_flight,
+                "queued": len(self.queue),
+            }
+
+
+def parse_limits(spec: str) -> Dict[str, Limits]:
+    return {
+        name: Limits(
+            rpm=int(values.get("rpm") or 0),
+            tpm=int(values.get("tpm") or 0),
+            max_in_flight=int(values.get("max_in_flight") or 0),
+        )
+        for name, values in (json.loads(spec) if spec.strip() else {}).items()
+    }
+
+
+_configured = parse_limits(RATE_LIMITS_SPEC)
+_limiters: Dict[Tuple[str, str], Optional[RateLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+
+def limits_for(provider: str, model: str) -> Limits:
+    return (
+        _configured.get(f"{provider}:{model}")
+        or _configured.get(provider)
+        or Limits(DEFAULT_RPM, DEFAULT_TPM, DEFAULT_MAX_IN_FLIGHT)
+    )
+
+
+def get_limiter(provider: str, model: str) -> Optional[RateLimiter]:
+    """The shared limiter for ``provider``/``model``, or None when it is unlimited."""
+
+    key = (provider, model)
+    with _limiters_lock:
+        if key not in _limiters:
+            limits = limits_for(provider, model)
+            _limiters[key] = RateLimiter(f"{provider}:{model}", limits) if limits.enabled else None
+        return _limiters[key]
+
+
+def limiter_status() -> List[Dict[str, Any]]:
+    with _limiters_lock:
+        limiters = [limiter for limiter in _limiters.values() if limiter is not None]
+    return [limiter.snapshot() for limiter in limiters]
+
+
+def reset_limiters() -> None:
+    with _limiters_lock:
+        _limiters.clear()
+
+
+def throttled_stream(
+    open_stream: Callable[[], Iterator[T]],
+    limiter: Optional[RateLimiter],
+    tokens: int,
+    *,
+    notice: Optional[QueueNotice[T]] = None,
+) -> Iterator[T]:
+    """Wait for a slot, then iterate ``open_stream()`` while holding it.
+
+    A caller that was told its queue position gets ``notice(0)`` once the slot
+    is granted, so the time spent queueing can be told apart from the request.
+    """
+
+    if limiter is None:
+        yield from open_stream()
+        return
+    queued = False
+    for position in limiter.wait(tokens):
+        if notice is not None:
+            queued = True
+            yield notice(position)
+    if queued and notice is not None:
+        yield notice(0)
+    try:
+        yield from open_stream()
+    finally:
+        limiter.release()
+
+
+async def athrottled_stream(
+    open_stream: Callable[[], AsyncIterator[T]],
+    limiter: Optional[RateLimiter],
+    tokens: int,
+    *,
+    notice: Optional[QueueNotice[T]] = None,
+) -> AsyncIterator[T]:
+    if limiter is None:
+        async for item in open_stream():
+            yield item
+        return
+    queued = False
+    async for position in limiter.await_turn(tokens):
+        if notice is not None:
+            queued = True
+            yield notice(position)
+    if queued and notice is not None:
+        yield notice(0)
+    try:
+        async for item in open_stream():
+            yield item
+    finally:
+        limiter.release()
+
+
+@contextmanager
+def slot(limiter: Optional[RateLimiter], tokens: int = 0) -> Iterator[None]:
+    """Hold a limiter slot around a non-streaming request."""
+
+    if limiter is None:
+        yield
+        return
+    for _ in limiter.wait(tokens):
+        pass
+    try:
+        yield
+    finally:
+        limiter.release()
+
+
+@asynccontextmanager
+async def aslot(limiter: Optional[RateLimiter], tokens: int = 0) -> AsyncIterator[None]:
+    if limiter is None:
+        yield
+        return
+    async for _ in limiter.await_turn(tokens):
+        pass
+    try:
+        yield
+    finally:
+        limiter.release()
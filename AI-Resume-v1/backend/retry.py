@@ -0,0 +1,219 @@
+"""Retry policy for transient LLM provider failures (429 / 5xx / network)."""
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Mapping, Optional, TypeVar
+
+from . import metrics
+
+T = TypeVar("T")
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+# Retries allowed across every request (continuations included) of one LLM call.
+RETRY_BUDGET = int(os.getenv("LLM_RETRY_BUDGET", "4"))
+# A Retry-After longer than this is not waited out; the error is raised instead.
+RETRY_MAX_AFTER = float(os.getenv("LLM_RETRY_MAX_AFTER", "30"))
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+# Patched in tests so backoff does not actually wait.
+sleep: Callable[[float], None] = time.sleep
+asleep: Callable[[float], Awaitable[None]] = asyncio.sleep
+
+
+def is_retryable_status(status: Optional[int]) -> bool:
+    return status is not None and (status in RETRYABLE_STATUS or status >= 500)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds to wait according to ``retry-after-ms`` / ``retry-after`` headers."""
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(float(value) / 1000, 0.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+@dataclass
+class RetryBudget:
+    """Per-call retry state: attempts made and retries still allowed."""
+
+    max_attempts: int = field(default_factory=lambda: RETRY_MAX_ATTEMPTS)
+    retries_left: int = field(default_factory=lambda: RETRY_BUDGET)
+    base_delay: float = field(default_factory=lambda: RETRY_BASE_DELAY)
+    max_delay: float = field(default_factory=lambda: RETRY_MAX_DELAY)
+    max_retry_after: float = field(default_factory=lambda: RETRY_MAX_AFTER)
+    attempts: int = 0
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Capped exponential backoff with full jitter, never shorter than Retry-After."""
+
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling)
+        return max(delay, retry_after or 0.0)
+
+    def next_delay(self, exc: BaseException, attempt: int) -> Optional[float]:
+        """Delay before retrying after ``exc`` on ``attempt``, or None to give up."""
+
+        if not getattr(exc, "retryable", False):
+            return None
+        if attempt >= self.max_attempts or self.retries_left <= 0:
+            return None
+        retry_after = getattr(exc, "retry_after", None)
+        if retry_after is not None and retry_after > self.max_retry_after:
+            return None
+        self.retries_left -= 1
+        return self.backoff(attempt, retry_after)
+
+
+def retry_reason(exc: BaseException) -> str:
+    status = getattr(exc, "status_code", None)
+    return str(status) if status is not None else "network"
+
+
+RetryNotice = Callable[[int, float, str], T]
+
+
+def _record(provider: str, exc: Optional[BaseException], attempt: int) -> None:
+    metrics.observe("llm_request_attempts", attempt, provider=provider)
+    if exc is not None and attempt > 1:
+        metrics.incr("llm_retries_exhausted_total", provider=provider)
+
+
+def call_with_retries(fn: Callable[[], T], budget: RetryBudget, *, provider: str) -> T:
+    """Run ``fn`` until it succeeds, fails permanently or the budget runs out."""
+
+    attempt = 0
+    while True:
+        attempt += 1
+        budget.attempts += 1
+        try:
+            result = fn()
+        except Exception as exc:
+            delay = budget.next_delay(exc, attempt)
+            if delay is None:
+                _record(provider, exc, attempt)
+                raise
+            metrics.incr("llm_retries_total", provider=provider, reason=retry_reason(exc))
+            sleep(delay)
+            continue
+        _record(provider, None, attempt)
+        return result
+
+
+async def acall_with_retries(
+    fn: Callable[[], Awaitable[T]], budget: RetryBudget, *, provider: str
+) -> T:
+    attempt = 0
+    while True:
+        attempt += 1
+        budget.attempts += 1
+        try:
+            result = await fn()
+        except Exception as exc:
+            delay = budget.next_delay(exc, attempt)
+            if delay is None:
+                _record(provider, exc, attempt)
+                raise
+            metrics.incr("llm_retries_total", provider=provider, reason=retry_reason(exc))
+            await asleep(delay)
+            continue
+        _record(provider, None, attempt)
+        return result
+
+
+def stream_with_retries(
+    open_stream: Callable[[], Iterator[T]],
+    budget: RetryBudget,
+    *,
+    provider: str,
+    notice: Optional[RetryNotice[T]] = None,
+    is_output: Optional[Callable[[T], bool]] = None,
+) -> Iterator[T]:
+    """Iterate ``open_stream()``, re-opening it on failures before its first item.
+
+    Once an item has been yielded the caller owns partial output, so later
+    errors propagate. ``notice(attempt, delay, reason)`` builds an item that is
+    yielded before each retry so callers can surface it. With ``is_output``,
+    only items it accepts count as output (status notices do not).
+    """
+
+    attempt = 0
+    while True:
+        attempt += 1
+        budget.attempts += 1
+        started = False
+        try:
+            for item in open_stream():
+                started = started or is_output is None or is_output(item)
+                yield item
+        except Exception as exc:
+            delay = None if started else budget.next_delay(exc, attempt)
+            if delay is None:
+                _record(provider, exc, attempt)
+                raise
+            reason = retry_reason(exc)
+            metrics.incr("llm_retries_total", provider=provider, reason=reason)
+            if notice is not None:
+                yield notice(attempt + 1, delay, reason)
+            sleep(delay)
+            continue
+        _record(provider, None, attempt)
+        return
+
+
+async def astream_with_retries(
+    open_stream: Callable[[], AsyncIterator[T]],
+    budget: RetryBudget,
+    *,
+    provider: str,
+    notice: Optional[RetryNotice[T]] = None,
+    is_output: Optional[Callable[[T], bool]] = None,
+) -> AsyncIterator[T]:
+    attempt = 0
+    while True:
+        attempt += 1
+        budget.attempts += 1
+        started = False
+        try:
+            async for item in open_stream():
+                started = started or is_output is None or is_output(item)
+                yield item
+        except Exception as exc:
+            delay = None if started else budget.next_delay(exc, attempt)
+            if delay is None:
+                _record(provider, exc, attempt)
+                raise
+            reason = retry_reason(exc)
+            metrics.incr("llm_retries_total", provider=provider, reason=reason)
+            if notice is not None:
+                yield notice(attempt + 1, delay, reason)
+            await asleep(delay)
+            continue
+        _record(provider, None, attempt)
+        return
+
@@ -1,80 +1,225 @@
 """Analyze router exposing the main LLM-driven pipeline."""
 from __future__ import annotations
 
-import json
-from typing import Optional
+import asyncio
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
 from uuid import uuid4
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 
+from .. import admission, idempotency, key_pool, metrics, providers, ratelimit, runs
+from ..batch import BatchOutcome, iter_batch_analysis, rank_by_coverage
+from ..idempotency import IdempotencyConflict
 from ..llm_client import (
     LLMClientError,
+    LLMDelta,
     DEFAULT_MODEL,
     API_BASE_URL,
+    endpoint_chain,
     resolve_default_api_key,
     mask_api_key,
 )
+from ..partial_json import PartialStageParser
 from ..pipeline import (
     PipelineError,
-    analyze_gaps_and_mapping,
-    generate_custom_resume,
-    generate_learning_plan,
-    parse_job_only,
-    parse_resume_and_job,
-    parse_resume_only,
-    run_full_analysis,
+    StageOutcome,
+    analysis_stages,
+    generate_custom_resume_async,
+    parse_job_only_async,
+    parse_resume_only_async,
+    partial_analysis,
+    restore_stage_value,
+    run_full_analysis_async,
+    run_stage_graph,
+    stage_checkpoint,
 )
 from ..schemas import (
     AnalyzeRequest,
     AnalyzeResponse,
+    BatchAnalysisItem,
+    BatchAnalyzeRequest,
+    BatchAnalyzeResponse,
     CustomResumeRequest,
     CustomResumeResponse,
     FullAnalysisResult,
     JobOnlyRequest,
+    JDRanking,
     DraftUpdateRequest,
     ProfileResponse,
     ResumeOnlyRequest,
+    RunResumeRequest,
 )
 from ..storage import (
     StorageError,
+    delete_stage_checkpoints,
     get_analysis,
     get_draft_result,
+    get_idempotency_record,
+    get_run_input,
+    get_stage_checkpoints,
     save_analysis,
     save_draft_result,
+    save_run_input,
+    save_stage_checkpoint,
 )
+from ..runs import Run
+from .common import admit, admitted, format_sse, holding, llm_config_from_payload
 
 router = APIRouter(tags=["analyze"])
 
+# How often /analyze/stream checks whether the client is still connected.
+DISCONNECT_POLL_SECONDS = float(os.getenv("ANALYZE_DISCONNECT_POLL_SECONDS", "1"))
+# Save each stage as it finishes (StageCheckpoint), so a failed or abandoned run
+# can be resumed with POST /analyze/resume/{run_id} without paying for it again.
+CHECKPOINT_STAGES = (
+    os.getenv("ANALYZE_CHECKPOINT_STAGES", "true").lower() in {"1", "true", "yes"}
+)
 
-def _llm_config_from_payload(payload: AnalyzeRequest) -> dict[str, Optional[str]]:
-    return {
-        "api_key": getattr(payload, "llm_api_key", None),
-        "api_base": getattr(payload, "llm_api_base", None),
-        "model": getattr(payload, "llm_model", None),
-    }
 
+def _idempotency_key(request: Request, payload: AnalyzeRequest) -> Optional[str]:
+    return request.headers.get("idempotency-key") or payload.client_run_id
 
-def _format_sse(event: str, data: dict) -> str:
-    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
+async def _begin_idempotent(key: str, payload: AnalyzeRequest) -> Optional[str]:
+    """The analysis id stored under ``key`` if it already finished; 409 if the key is reused."""
 
-@router.post("/analyze", response_model=AnalyzeResponse)
-def analyze_endpoint(payload: AnalyzeRequest) -> AnalyzeResponse:
-    """Run the full analysis pipeline over the provided resume/JD text."""
+    try:
+        return await run_in_threadpool(idempotency.begin, key, idempotency.fingerprint(payload))
+    except IdempotencyConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    except StorageError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
+async def _load_analysis(analysis_id: str) -> AnalyzeResponse:
+    try:
+        result = await run_in_threadpool(get_analysis, analysis_id)
+    except StorageError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    if result is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return AnalyzeResponse(analysis_id=analysis_id, result=result)
+
+
+def _live_run(run_id: str) -> Optional[Run]:
+    """A run to attach to: one in progress or one that succeeded, but not a failed one."""
+
+    run = runs.registry.get(run_id)
+    return None if run is None or run.failed else run
 
-    llm_config = _llm_config_from_payload(payload)
 
+async def _start_admitted(
+    run_id: str, work: Callable[[Run], Awaitable[Any]], *, detachable: bool = True
+) -> Run:
+    """Start ``work`` under ``run_id`` once admitted, holding the slot until the run ends.
+
+    Another request under the same key may have started the run while this one
+    waited for a slot; it is then attached to instead and the slot handed back.
+    """
+
+    ticket = await admit(admission.INTERACTIVE)
+    run = _live_run(run_id)
+    if run is not None:
+        admission.controller.release(ticket)
+        return run
+    run = runs.registry.start(run_id, work, detachable=detachable)
+    run.task.add_done_callback(lambda _task: admission.controller.release(ticket))  # type: ignore[union-attr]
+    return run
+
+
+def _publish(run: Run, event: str, data: dict) -> None:
+    run.publish(lambda seq: format_sse(event, {"run_id": run.run_id, **data}, event_id=seq))
+
+
+def _publish_result(run: Run, response: AnalyzeResponse) -> None:
+    _publish(
+        run, "result", {"analysis_id": response.analysis_id, "result": response.result.model_dump()}
+    )
+    _publish(run, "complete", {"analysis_id": response.analysis_id})
+
+
+async def _analyze_and_save(run: Run, payload: AnalyzeRequest, key: str) -> str:
+    # Frames too, so an /analyze/stream under the same key can follow this run.
+    _publish(run, "run", {"status": "started"})
     try:
-        result = run_full_analysis(
-            payload.resume_text, payload.jd_text, llm_config=llm_config
+        result = await run_full_analysis_async(
+            payload.resume_text, payload.jd_text, llm_config=llm_config_from_payload(payload)
+        )
+        analysis_id = await run_in_threadpool(
+            save_analysis, payload.resume_text, payload.jd_text, result
         )
+        await run_in_threadpool(
+            idempotency.complete, key, idempotency.fingerprint(payload), analysis_id
+        )
+    except (LLMClientError, PipelineError, StorageError) as exc:
+        run.error = str(exc)
+        _publish(run, "error", {"message": run.error})
+        raise
+    _publish_result(run, AnalyzeResponse(analysis_id=analysis_id, result=result))
+    return analysis_id
+
+
+async def _analyze_idempotent(key: str, payload: AnalyzeRequest) -> AnalyzeResponse:
+    """/analyze under an idempotency key: reuse the stored result or the run in progress."""
+
+    stored_id = await _begin_idempotent(key, payload)
+    if stored_id is not None:
+        return await _load_analysis(stored_id)
+    run = _live_run(key)
+    if run is None:
+        # Not tied to this connection: a client that retries after a blip picks up the same run.
+        run = await _start_admitted(
+            key, lambda started: _analyze_and_save(started, payload, key), detachable=False
+        )
+    try:
+        analysis_id = await asyncio.shield(run.task)  # type: ignore[arg-type]
+    except asyncio.CancelledError:
+        if not run.task.cancelled():  # type: ignore[union-attr]
+            raise
+        # The stream run this request attached to was abandoned by its client.
+        raise HTTPException(status_code=409, detail="Analysis was cancelled; retry") from None
+    except (LLMClientError, PipelineError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except StorageError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    if analysis_id is None:
+        # Attached to an /analyze/stream run that ended with an error event.
+        raise HTTPException(status_code=400, detail=run.error or "Analysis failed")
+    return await _load_analysis(analysis_id)
+
+
+@router.post("/analyze", response_model=AnalyzeResponse)
+async def analyze_endpoint(request: Request, payload: AnalyzeRequest) -> AnalyzeResponse:
+    """Run the full analysis pipeline over the provided resume/JD text.
+
+    With an Idempotency-Key header (or ``client_run_id``) a repeated submission
+    returns the stored analysis, or waits for the run already in progress,
+    instead of calling the LLM again.
+    """
+
+    key = _idempotency_key(request, payload)
+    if key is not None:
+        return await _analyze_idempotent(key, payload)
+
+    llm_config = llm_config_from_payload(payload)
+
+    try:
+        async with admitted(admission.INTERACTIVE):
+            result = await run_full_analysis_async(
+                payload.resume_text, payload.jd_text, llm_config=llm_config
+            )
     except (LLMClientError, PipelineError) as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
     analysis_id = None
     try:
-        analysis_id = save_analysis(payload.resume_text, payload.jd_text, result)
+        analysis_id = await run_in_threadpool(
+            save_analysis, payload.resume_text, payload.jd_text, result
+        )
     except StorageError as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
@@ -82,9 +227,9 @@ def analyze_endpoint(payload: AnalyzeRequest) -> AnalyzeResponse:
 
 
 @router.post("/resume/only", response_model=ProfileResponse)
-def resume_only_endpoint(payload: ResumeOnlyRequest) -> ProfileResponse:
+async def resume_only_endpoint(payload: ResumeOnlyRequest) -> ProfileResponse:
     try:
-        profile = parse_resume_only(
+        profile = await parse_resume_only_async(
             payload.resume_text,
             llm_config={
                 "api_key": payload.llm_api_key,
@@ -98,9 +243,9 @@ def resume_only_endpoint(payload: ResumeOnlyRequest) -> ProfileResponse:
 
 
 @router.post("/job/only", response_model=ProfileResponse)
-def job_only_endpoint(payload: JobOnlyRequest) -> ProfileResponse:
+async def job_only_endpoint(payload: JobOnlyRequest) -> ProfileResponse:
     try:
-        profile = parse_job_only(
+        profile = await parse_job_only_async(
             payload.jd_text,
             llm_config={
                 "api_key": payload.llm_api_key,
@@ -114,9 +259,9 @@ def job_only_endpoint(payload: JobOnlyRequest) -> ProfileResponse:
 
 
 @router.post("/resume/customize", response_model=CustomResumeResponse)
-def customize_resume_endpoint(payload: CustomResumeRequest) -> CustomResumeResponse:
+async def customize_resume_endpoint(payload: CustomResumeRequest) -> CustomResumeResponse:
     try:
-        markdown, _ = generate_custom_resume(
+        markdown, _, _ = await generate_custom_resume_async(
             payload.resume_text,
             payload.jd_text,
             llm_config={
@@ -180,121 +325,399 @@ def update_draft_endpoint(analysis_id: str, payload: DraftUpdateRequest) -> Anal
     return AnalyzeResponse(analysis_id=analysis_id, result=base, draft_result=payload.result)
 
 
-@router.post("/analyze/stream")
-def analyze_stream_endpoint(payload: AnalyzeRequest) -> StreamingResponse:
-    llm_config = _llm_config_from_payload(payload)
-    run_id = payload.client_run_id or str(uuid4())
-    reasoning_mode = (llm_config.get("model") or DEFAULT_MODEL) == "deepseek-reasoner"
+async def _wait_for_disconnect(request: Request) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+async def follow_frames(request: Request, run: Run, after: int) -> AsyncIterator[str]:
+    """The frames of ``run`` after seq ``after`` until it ends or the client leaves."""
+
+    frames = run.follow(after)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(request))
+    next_frame: Optional[asyncio.Future] = None
+    try:
+        while True:
+            next_frame = asyncio.ensure_future(frames.__anext__())
+            await asyncio.wait({next_frame, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_frame.done():
+                metrics.incr("analysis_stream_disconnects_total")
+                return
+            try:
+                frame = next_frame.result()
+            except StopAsyncIteration:
+                return
+            yield frame
+    finally:
+        # Also reached when the server drops the response because the client left.
+        # Detaching starts the run's grace period rather than cancelling it outright.
+        disconnected.cancel()
+        if next_frame is not None and not next_frame.done():
+            next_frame.cancel()
+        else:
+            await frames.aclose()
+
+
+def _follow_run(request: Request, run: Run, after: int) -> StreamingResponse:
+    return StreamingResponse(follow_frames(request, run, after), media_type="text/event-stream")
+
 
-    def event_iterator():
-        yield _format_sse(
-            "run",
-            {"run_id": run_id, "status": "started"},
+def restore_checkpoints(run_id: str) -> dict[str, Any]:
+    """Stage values checkpointed by an earlier attempt at ``run_id``."""
+
+    return {
+        checkpoint.stage: restore_stage_value(
+            checkpoint.stage, checkpoint.value_json, checkpoint.raw, checkpoint.reasoning
         )
-        try:
-            resume_profile, job_profile, raw_parse, reasoning_parse = parse_resume_and_job(
-                payload.resume_text,
-                payload.jd_text,
-                llm_config=llm_config,
-                return_raw=True,
+        for checkpoint in get_stage_checkpoints(run_id)
+    }
+
+
+async def run_analysis(
+    run: Run,
+    payload: AnalyzeRequest,
+    *,
+    idempotency_key: Optional[str] = None,
+    completed: Optional[dict[str, Any]] = None,
+) -> Optional[str]:
+    """Run the staged analysis of ``payload``, publishing its SSE frames into ``run``.
+
+    Returns the saved analysis id, or None when the run ended with an error
+    event (whose message is kept on ``run.error``). The id is also recorded
+    under ``idempotency_key`` when one is given. Stages in ``completed``
+    (restored checkpoints) are not run again.
+    """
+
+    llm_config = llm_config_from_payload(payload)
+    run_id = run.run_id
+    reasoning_mode = (llm_config.get("model") or DEFAULT_MODEL) == "deepseek-reasoner"
+
+    def emit(event: str, data: dict) -> None:
+        if event == "error":
+            run.error = data.get("message")
+        _publish(run, event, data)
+
+    partial_parsers: dict[str, PartialStageParser] = {}
+    completed = completed or {}
+    # Checkpoint writes still in flight; awaited before the run ends either way.
+    checkpoint_writes: List[asyncio.Future] = []
+
+    def on_delta(stage: str, delta: LLMDelta) -> None:
+        if delta.kind == "retry":
+            emit(
+                "llm_retry",
+                {
+                    "stage": stage,
+                    "attempt": delta.attempt,
+                    "delay": round(delta.delay, 3),
+                    "reason": delta.text,
+                },
             )
-            if raw_parse:
-                yield _format_sse(
-                    "llm_output",
-                    {"run_id": run_id, "stage": "parse_profile", "content": raw_parse},
-                )
-            if reasoning_mode and reasoning_parse:
-                yield _format_sse(
-                    "reasoning_output",
-                    {"run_id": run_id, "stage": "parse_profile", "content": reasoning_parse},
-                )
-            gap_analysis, jd_mapping, raw_gap, reasoning_gap = analyze_gaps_and_mapping(
-                resume_profile,
-                job_profile,
-                llm_config=llm_config,
-                return_raw=True,
+            return
+        if delta.kind == "queued":
+            emit("llm_queued", {"stage": stage, "position": delta.position})
+            return
+        if delta.kind == "reasoning" and not reasoning_mode:
+            return
+        emit("llm_delta", {"stage": stage, "kind": delta.kind, "content": delta.text})
+        if delta.kind != "content":
+            return
+        # Completed sub-objects (each Gap, LearningPhase, ...) go out before the stage ends.
+        parser = partial_parsers.setdefault(stage, PartialStageParser(stage))
+        for item in parser.feed(delta.text):
+            emit(
+                "partial",
+                {"stage": stage, "path": list(item.path), "type": item.type, "data": item.data},
             )
-            if raw_gap:
-                yield _format_sse(
-                    "llm_output",
-                    {"run_id": run_id, "stage": "gap_analysis", "content": raw_gap},
-                )
-            if reasoning_mode and reasoning_gap:
-                yield _format_sse(
-                    "reasoning_output",
-                    {"run_id": run_id, "stage": "gap_analysis", "content": reasoning_gap},
+
+    def emit_stage_output(stage: str, raw: Optional[str], reasoning: Optional[str]) -> None:
+        if raw:
+            emit("llm_output", {"stage": stage, "content": raw})
+        if reasoning_mode and reasoning:
+            emit("reasoning_output", {"stage": stage, "content": reasoning})
+
+    def on_stage_complete(outcome: StageOutcome) -> None:
+        if outcome.ok:
+            if CHECKPOINT_STAGES and outcome.name not in completed:
+                checkpoint_writes.append(
+                    asyncio.ensure_future(
+                        run_in_threadpool(
+                            save_stage_checkpoint,
+                            run_id,
+                            outcome.name,
+                            *stage_checkpoint(outcome.value),
+                        )
+                    )
                 )
-            learning_plan, raw_plan, reasoning_plan = generate_learning_plan(
-                gap_analysis,
-                llm_config=llm_config,
-                return_raw=True,
+            *_, raw, reasoning = outcome.value
+            emit_stage_output(outcome.name, raw, reasoning)
+            return
+        emit(
+            "stage_error",
+            {
+                "stage": outcome.name,
+                "message": str(outcome.error),
+                "timed_out": outcome.timed_out,
+                "skipped": outcome.skipped,
+            },
+        )
+
+    if completed:
+        emit("run", {"status": "resumed", "restored_stages": sorted(completed)})
+    else:
+        emit("run", {"status": "started"})
+    try:
+        if CHECKPOINT_STAGES:
+            # The key is stored masked: enough for a resume to know it must be sent again.
+            stored_input = payload.model_copy(
+                update={"llm_api_key": mask_api_key(payload.llm_api_key)}
             )
-            if raw_plan:
-                yield _format_sse(
-                    "llm_output",
-                    {"run_id": run_id, "stage": "learning_plan", "content": raw_plan},
-                )
-            if reasoning_mode and reasoning_plan:
-                yield _format_sse(
-                    "reasoning_output",
-                    {"run_id": run_id, "stage": "learning_plan", "content": reasoning_plan},
-                )
-            custom_resume_markdown, raw_resume, reasoning_resume = generate_custom_resume(
+            await run_in_threadpool(save_run_input, run_id, stored_input.model_dump_json())
+        # Independent stages run concurrently and report in completion order.
+        outcomes = await run_stage_graph(
+            analysis_stages(
                 payload.resume_text,
                 payload.jd_text,
                 llm_config=llm_config,
                 return_raw=True,
+                on_delta=on_delta,
+                completed=completed,
+            ),
+            on_complete=on_stage_complete,
+        )
+        await asyncio.gather(*checkpoint_writes)
+        fields = partial_analysis(outcomes)
+        failed = [o for o in outcomes.values() if not o.ok and not o.skipped]
+        if failed:
+            emit(
+                "partial_result",
+                {
+                    "result": {
+                        key: value.model_dump() if hasattr(value, "model_dump") else value
+                        for key, value in fields.items()
+                    },
+                    "failed_stages": [o.name for o in outcomes.values() if not o.ok],
+                },
             )
-            if raw_resume:
-                yield _format_sse(
-                    "llm_output",
-                    {"run_id": run_id, "stage": "custom_resume", "content": raw_resume},
-                )
-            if reasoning_mode and reasoning_resume:
-                yield _format_sse(
-                    "reasoning_output",
-                    {"run_id": run_id, "stage": "custom_resume", "content": reasoning_resume},
-                )
+            emit("error", {"message": str(failed[0].error), "resumable": CHECKPOINT_STAGES})
+            return None
 
-            result = FullAnalysisResult(
-                resume_profile=resume_profile,
-                job_profile=job_profile,
-                gap_analysis=gap_analysis,
-                jd_mapping_matrix=jd_mapping,
-                learning_plan=learning_plan,
-                custom_resume_markdown=custom_resume_markdown,
+        result = FullAnalysisResult(**fields)
+        try:
+            analysis_id = await run_in_threadpool(
+                save_analysis, payload.resume_text, payload.jd_text, result
             )
-            analysis_id = None
-            try:
-                analysis_id = save_analysis(
-                    payload.resume_text, payload.jd_text, result
-                )
-            except StorageError as exc:  # pragma: no cover
-                yield _format_sse(
-                    "error",
-                    {"run_id": run_id, "message": str(exc)},
+            if idempotency_key is not None:
+                await run_in_threadpool(
+                    idempotency.complete,
+                    idempotency_key,
+                    idempotency.fingerprint(payload),
+                    analysis_id,
                 )
-                return
+            await run_in_threadpool(delete_stage_checkpoints, run_id)
+        except StorageError as exc:  # pragma: no cover
+            emit("error", {"message": str(exc)})
+            return None
 
-            yield _format_sse(
-                "result",
-                {
-                    "run_id": run_id,
-                    "analysis_id": analysis_id,
-                    "result": result.model_dump(),
-                },
-            )
-            yield _format_sse(
-                "complete",
-                {"run_id": run_id, "analysis_id": analysis_id},
-            )
-        except (LLMClientError, PipelineError) as exc:
-            yield _format_sse(
-                "error",
-                {"run_id": run_id, "message": str(exc)},
-            )
+        emit("result", {"analysis_id": analysis_id, "result": result.model_dump()})
+        emit("complete", {"analysis_id": analysis_id})
+        return analysis_id
+    except (LLMClientError, PipelineError, StorageError) as exc:
+        emit("error", {"message": str(exc)})
+        return None
+    except asyncio.CancelledError:
+        metrics.incr("analysis_stream_cancelled_total")
+        # Let the stages that finished before the run was abandoned reach StageCheckpoint.
+        await asyncio.gather(*checkpoint_writes, return_exceptions=True)
+        raise
 
-    return StreamingResponse(event_iterator(), media_type="text/event-stream")
+
+async def _replay_stored(run: Run, stored: AnalyzeResponse) -> Optional[str]:
+    """Publish an analysis saved by an earlier run under the same key as a finished run."""
+
+    _publish(run, "run", {"status": "stored"})
+    _publish_result(run, stored)
+    return stored.analysis_id
+
+
+@router.post("/analyze/stream")
+async def analyze_stream_endpoint(request: Request, payload: AnalyzeRequest) -> StreamingResponse:
+    """Stream the staged analysis as SSE.
+
+    Frames carry an ``id:`` and the run is keyed by ``client_run_id``: posting
+    the same run again (with ``Last-Event-ID`` after a dropped connection)
+    replays what was missed and attaches to the live run instead of restarting
+    it. A run nobody follows for ``RUN_DETACH_GRACE_SECONDS`` is cancelled, its
+    in-flight LLM requests aborted and finished stages checkpointed.
+
+    The same key (``Idempotency-Key`` header or ``client_run_id``) that already
+    produced an analysis replays the stored result without calling the LLM.
+    """
+
+    key = _idempotency_key(request, payload)
+    run_id = key or str(uuid4())
+    last_event_id = request.headers.get("last-event-id")
+    # The fingerprint is checked first: a key reused for a different request gets a
+    # 409 rather than being attached to the run the key started.
+    stored_id = await _begin_idempotent(key, payload) if key is not None else None
+    # A reconnect replays the run it was following even if that run failed; a fresh
+    # submission under the key of a failed run starts over.
+    run = runs.registry.get(run_id) if last_event_id else _live_run(run_id)
+    if run is None and stored_id is not None:
+        stored = await _load_analysis(stored_id)
+        run = runs.registry.start(run_id, lambda started: _replay_stored(started, stored))
+        return _follow_run(request, run, 0)
+    if run is None:
+        # Only new runs need a slot; reconnects attach to work that was already admitted.
+        run = await _start_admitted(
+            run_id, lambda started: run_analysis(started, payload, idempotency_key=key)
+        )
+        return _follow_run(request, run, 0)
+    metrics.incr("analysis_stream_resumed_total")
+    return _follow_run(request, run, runs.parse_last_event_id(last_event_id))
+
+
+@router.get("/analyze/stream/{run_id}")
+async def analyze_stream_resume_endpoint(
+    request: Request, run_id: str, last_event_id: Optional[str] = None
+) -> StreamingResponse:
+    """Replay a run's frames after ``Last-Event-ID`` (header or query), then follow it live."""
+
+    run = runs.registry.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found or expired")
+    metrics.incr("analysis_stream_resumed_total")
+    after = request.headers.get("last-event-id") or last_event_id
+    return _follow_run(request, run, runs.parse_last_event_id(after))
+
+
+@router.post("/analyze/resume/{run_id}")
+async def analyze_resume_run_endpoint(
+    request: Request, run_id: str, payload: Optional[RunResumeRequest] = None
+) -> StreamingResponse:
+    """Re-run only the stages a failed or abandoned run is missing, streamed like /analyze/stream.
+
+    The stored request and stage checkpoints of ``run_id`` are reused and the
+    saved analysis is assembled from them. The LLM API key is only stored
+    masked: a run submitted with one is resumed only when it is sent again in
+    the body (422 otherwise).
+    """
+
+    run = runs.registry.get(run_id)
+    if run is not None and not run.finished:
+        raise HTTPException(status_code=409, detail="Run is still in progress")
+    try:
+        stored = await run_in_threadpool(get_run_input, run_id)
+        if stored is None:
+            raise HTTPException(status_code=404, detail="No checkpoints for this run")
+        completed = await run_in_threadpool(restore_checkpoints, run_id)
+        # Runs keyed by an idempotency key use it as their run id.
+        keyed = await run_in_threadpool(get_idempotency_record, run_id) is not None
+    except (ValueError, PipelineError, StorageError) as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    try:
+        analysis = AnalyzeRequest.model_validate_json(stored.request_json)
+    except ValidationError as exc:
+        raise HTTPException(
+            status_code=409, detail=f"Stored request of this run is unreadable: {exc}"
+        ) from exc
+    api_key = payload.llm_api_key if payload is not None else None
+    if analysis.llm_api_key and not api_key:
+        # Falling back to the server key would bill a run the caller paid for to the server.
+        raise HTTPException(
+            status_code=422, detail="This run was submitted with llm_api_key; send it again"
+        )
+    analysis = analysis.model_copy(update={"llm_api_key": api_key})
+    metrics.incr("analysis_runs_resumed_total")
+    run = await _start_admitted(
+        run_id,
+        lambda started: run_analysis(
+            started, analysis, idempotency_key=run_id if keyed else None, completed=completed
+        ),
+    )
+    return _follow_run(request, run, 0)
+
+
+async def _save_batch_item(
+    payload: BatchAnalyzeRequest, outcome: BatchOutcome
+) -> BatchAnalysisItem:
+    analysis_id = None
+    if outcome.result is not None:
+        analysis_id = await run_in_threadpool(
+            save_analysis, payload.resume_text, payload.jd_texts[outcome.index], outcome.result
+        )
+    return BatchAnalysisItem(
+        index=outcome.index, analysis_id=analysis_id, result=outcome.result, error=outcome.error
+    )
+
+
+def _jd_ranking(items: List[BatchAnalysisItem]) -> List[JDRanking]:
+    by_index = {item.index: item for item in items if item.result is not None}
+    return [
+        JDRanking(
+            index=index,
+            analysis_id=by_index[index].analysis_id,
+            title=by_index[index].result.job_profile.title,
+            coverage=coverage,
+        )
+        for index, coverage in rank_by_coverage(
+            {index: item.result for index, item in by_index.items()}
+        )
+    ]
+
+
+@router.post("/analyze/batch", response_model=BatchAnalyzeResponse)
+async def analyze_batch_endpoint(payload: BatchAnalyzeRequest) -> BatchAnalyzeResponse:
+    """Analyze one resume against several JDs, parsing the resume only once."""
+
+    items: List[BatchAnalysisItem] = []
+    try:
+        async with admitted(admission.BULK):
+            async for outcome in iter_batch_analysis(
+                payload.resume_text, payload.jd_texts, llm_config=llm_config_from_payload(payload)
+            ):
+                items.append(await _save_batch_item(payload, outcome))
+    except (LLMClientError, PipelineError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except StorageError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+    items.sort(key=lambda item: item.index)
+    return BatchAnalyzeResponse(items=items, ranking=_jd_ranking(items))
+
+
+@router.post("/analyze/batch/stream")
+async def analyze_batch_stream_endpoint(payload: BatchAnalyzeRequest) -> StreamingResponse:
+    llm_config = llm_config_from_payload(payload)
+    run_id = payload.client_run_id or str(uuid4())
+
+    async def event_iterator():
+        def frame(event: str, data: dict) -> str:
+            return format_sse(event, {"run_id": run_id, **data})
+
+        yield frame("run", {"status": "started", "total": len(payload.jd_texts)})
+        items: List[BatchAnalysisItem] = []
+        try:
+            # Each JD is reported as soon as its own stages finish.
+            async for outcome in iter_batch_analysis(
+                payload.resume_text, payload.jd_texts, llm_config=llm_config
+            ):
+                item = await _save_batch_item(payload, outcome)
+                items.append(item)
+                if item.error is not None:
+                    yield frame("jd_error", {"index": item.index, "message": item.error})
+                else:
+                    yield frame("jd_result", item.model_dump())
+        except (LLMClientError, PipelineError, StorageError) as exc:
+            yield frame("error", {"message": str(exc)})
+            return
+
+        ranking = [entry.model_dump() for entry in _jd_ranking(items)]
+        yield frame("ranking", {"ranking": ranking})
+        yield frame("complete", {"analysis_ids": [e["analysis_id"] for e in ranking]})
+
+    ticket = await admit(admission.BULK)
+    return StreamingResponse(holding(ticket, event_iterator()), media_type="text/event-stream")
 
 
 @router.get("/llm/config")
@@ -307,3 +730,16 @@ def llm_config_endpoint() -> dict[str, object]:
         "has_default_key": bool(key),
         "masked_key": masked,
     }
+
+
+@router.get("/llm/status")
+def llm_status_endpoint() -> dict[str, object]:
+    """Circuit breaker state per endpoint, the default failover order, key pool, limiter and admission load."""
+
+    return {
+        "fallback_chain": [endpoint.name for endpoint in endpoint_chain()],
+        "endpoints": providers.breaker_status(),
+        "key_pool": key_pool.pool.snapshot(),
+        "rate_limits": ratelimit.limiter_status(),
+        "admission": admission.controller.snapshot(),
+    }
@@ -0,0 +1,68 @@
+"""Helpers shared by the analyze, screening and job routers."""
+from __future__ import annotations
+
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException
+
+from .. import admission
+from ..admission import AdmissionRejected, Ticket
+from ..schemas import AnalyzeRequest, BatchAnalyzeRequest, ScreeningRequest
+
+
+def llm_config_from_payload(
+    payload: AnalyzeRequest | BatchAnalyzeRequest | ScreeningRequest,
+) -> dict[str, object]:
+    return {
+        "api_key": getattr(payload, "llm_api_key", None),
+        "api_base": getattr(payload, "llm_api_base", None),
+        "model": getattr(payload, "llm_model", None),
+        "bypass_cache": getattr(payload, "bypass_cache", False),
+    }
+
+
+def format_sse(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    frame = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return frame if event_id is None else f"id: {event_id}\n{frame}"
+
+
+def _saturated(exc: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429, detail=str(exc), headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+async def admit(lane: str) -> Ticket:
+    """A pipeline slot in ``lane``, or 429 with Retry-After while the server is saturated."""
+
+    try:
+        return await admission.controller.acquire(lane)
+    except AdmissionRejected as exc:
+        raise _saturated(exc) from exc
+
+
+@asynccontextmanager
+async def admitted(lane: str) -> AsyncIterator[Ticket]:
+    """``admission.admitted`` for a request handler: a rejection becomes the 429 from ``admit``."""
+
+    entered = False
+    try:
+        async with admission.admitted(lane) as ticket:
+            entered = True
+            yield ticket
+    except AdmissionRejected as exc:
+        if entered:
+            raise
+        raise _saturated(exc) from exc
+
+
+async def holding(ticket: Ticket, frames: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Stream ``frames`` and give the admission slot back when the stream ends or is dropped."""
+
+    try:
+        async for frame in frames:
+            yield frame
+    finally:
+        admission.controller.release(ticket)
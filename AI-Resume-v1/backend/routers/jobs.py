@@ -0,0 +1,134 @@
+"""Job router: submit an analysis, then poll or subscribe to it instead of holding the request open."""
+from __future__ import annotations
+
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from .. import admission, runs
+from ..job_queue import JOB_MAX_ATTEMPTS, JOB_POLL_SECONDS, WorkerPool
+from ..pipeline import PipelineError
+from ..schemas import AnalyzeRequest, JobRequest, JobResponse
+from ..storage import AnalysisJob, StorageError, enqueue_job, get_analysis, get_job
+from .analyze import follow_frames, restore_checkpoints, run_analysis
+from .common import format_sse
+
+router = APIRouter(tags=["jobs"])
+
+
+async def _process_job(job: AnalysisJob) -> str:
+    payload = AnalyzeRequest.model_validate_json(job.request_json)
+    # A retried job picks up the stages its earlier attempts checkpointed.
+    completed = await run_in_threadpool(restore_checkpoints, job.job_id)
+    # Already queued here, so the job waits for a bulk slot rather than being rejected.
+    async with admission.admitted(admission.BULK, bounded=False):
+        # The job's run is keyed by its id, so /jobs/{id}/events can replay and follow it;
+        # it keeps going when subscribers leave.
+        run = runs.registry.start(
+            job.job_id,
+            lambda started: run_analysis(started, payload, completed=completed),
+            detachable=False,
+        )
+        analysis_id = await run.task  # type: ignore[misc]
+    if analysis_id is None:
+        raise PipelineError(run.error or "Analysis failed")
+    return analysis_id
+
+
+workers = WorkerPool(_process_job)
+
+
+def _job_response(job: AnalysisJob) -> JobResponse:
+    result = get_analysis(job.analysis_id) if job.analysis_id else None
+    return JobResponse(
+        job_id=job.job_id,
+        status=job.status,  # type: ignore[arg-type]
+        priority=job.priority,
+        attempts=job.attempts,
+        analysis_id=job.analysis_id,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        result=result,
+    )
+
+
+async def _load_job(job_id: str) -> AnalysisJob:
+    try:
+        job = await run_in_threadpool(get_job, job_id)
+    except StorageError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job_endpoint(payload: JobRequest) -> JobResponse:
+    """Queue an analysis and return its job id without waiting for the LLM."""
+
+    if payload.llm_api_key:
+        # Any process sharing the database may run the job, and the key must not be
+        # written there, so queued jobs always use the server's key.
+        raise HTTPException(
+            status_code=422,
+            detail="llm_api_key is not accepted for /jobs; use /analyze or /analyze/stream",
+        )
+    request_json = AnalyzeRequest(**payload.model_dump(exclude={"priority"})).model_dump_json()
+    try:
+        job_id = await run_in_threadpool(
+            enqueue_job, request_json, payload.priority, JOB_MAX_ATTEMPTS
+        )
+    except StorageError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    workers.notify()
+    return await run_in_threadpool(_job_response, await _load_job(job_id))
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job_endpoint(job_id: str) -> JobResponse:
+    """Status of a job, with the analysis once it succeeded."""
+
+    job = await _load_job(job_id)
+    return await run_in_threadpool(_job_response, job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events_endpoint(
+    request: Request, job_id: str, last_event_id: Optional[str] = None
+) -> StreamingResponse:
+    """SSE for a job: ``job`` status frames while it waits, then the run's own frames.
+
+    Once a worker picks the job up this is the same stream as /analyze/stream,
+    including ``Last-Event-ID`` replay.
+    """
+
+    job = await _load_job(job_id)
+    after = runs.parse_last_event_id(request.headers.get("last-event-id") or last_event_id)
+
+    async def event_iterator():
+        current: Optional[AnalysisJob] = job
+        reported = None
+        while (run := runs.registry.get(job_id)) is None:
+            if current is None:
+                return
+            if current.status in {"succeeded", "failed"}:
+                # Finished before this process ran it, or its run has expired.
+                response = await run_in_threadpool(_job_response, current)
+                yield format_sse("job", response.model_dump(mode="json"))
+                return
+            if current.status != reported:
+                reported = current.status
+                yield format_sse("job", {"job_id": job_id, "status": current.status})
+            else:
+                # Keeps proxies with idle timeouts from closing the stream while the job waits.
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(JOB_POLL_SECONDS)
+            current = await run_in_threadpool(get_job, job_id)
+        async for frame in follow_frames(request, run, after):
+            yield frame
+
+    return StreamingResponse(event_iterator(), media_type="text/event-stream")
@@ -0,0 +1,141 @@
+"""Recruiter screening: many resumes ranked against one job description."""
+from __future__ import annotations
+
+from typing import List
+from uuid import uuid4
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from .. import admission
+from ..batch import (
+    ScreeningOutcome,
+    iter_screening,
+    iter_shortlist,
+    mandatory_coverage,
+    rank_candidates,
+)
+from ..llm_client import LLMClientError
+from ..pipeline import PipelineError, parse_job_profile_async
+from ..schemas import ScreeningCandidate, ScreeningRequest, ScreeningResponse
+from .common import admit, admitted, format_sse, holding, llm_config_from_payload
+
+router = APIRouter(prefix="/screening", tags=["screening"])
+
+
+def _candidate(outcome: ScreeningOutcome) -> ScreeningCandidate:
+    if outcome.jd_mapping_matrix is None:
+        return ScreeningCandidate(index=outcome.index, error=outcome.error)
+    covered, total = mandatory_coverage(outcome.jd_mapping_matrix)
+    return ScreeningCandidate(
+        index=outcome.index,
+        score=outcome.score,
+        mandatory_covered=covered,
+        mandatory_total=total,
+        resume_profile=outcome.resume_profile,
+        gap_analysis=outcome.gap_analysis,
+        jd_mapping_matrix=outcome.jd_mapping_matrix,
+        learning_plan=outcome.learning_plan,
+        custom_resume_markdown=outcome.custom_resume_markdown,
+        error=outcome.error,
+    )
+
+
+def _wants_follow_up(payload: ScreeningRequest) -> bool:
+    return payload.top_k > 0 and (payload.include_learning_plan or payload.include_custom_resume)
+
+
+@router.post("", response_model=ScreeningResponse)
+async def screening_endpoint(payload: ScreeningRequest) -> ScreeningResponse:
+    """Rank every resume by JD coverage; optionally complete the top K."""
+
+    llm_config = llm_config_from_payload(payload)
+    try:
+        async with admitted(admission.BULK):
+            job_profile, _, _ = await parse_job_profile_async(
+                payload.jd_text, llm_config=llm_config
+            )
+            outcomes: List[ScreeningOutcome] = [
+                outcome
+                async for outcome in iter_screening(
+                    payload.resume_texts, job_profile, llm_config=llm_config
+                )
+            ]
+            ranked = rank_candidates(outcomes)
+            if _wants_follow_up(payload):
+                async for _ in iter_shortlist(
+                    ranked[: payload.top_k],
+                    payload.resume_texts,
+                    payload.jd_text,
+                    include_learning_plan=payload.include_learning_plan,
+                    include_custom_resume=payload.include_custom_resume,
+                    llm_config=llm_config,
+                ):
+                    pass
+    except (LLMClientError, PipelineError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    failed = sorted((o for o in outcomes if o.jd_mapping_matrix is None), key=lambda o: o.index)
+    return ScreeningResponse(
+        job_profile=job_profile,
+        candidates=[_candidate(outcome) for outcome in ranked + failed],
+    )
+
+
+@router.post("/stream")
+async def screening_stream_endpoint(payload: ScreeningRequest) -> StreamingResponse:
+    llm_config = llm_config_from_payload(payload)
+    run_id = payload.client_run_id or str(uuid4())
+
+    async def event_iterator():
+        def frame(event: str, data: dict) -> str:
+            return format_sse(event, {"run_id": run_id, **data})
+
+        yield frame("run", {"status": "started", "total": len(payload.resume_texts)})
+        try:
+            job_profile, _, _ = await parse_job_profile_async(
+                payload.jd_text, llm_config=llm_config
+            )
+            yield frame("job_profile", {"job_profile": job_profile.model_dump()})
+
+            # Scores stream per candidate as soon as its gap/mapping stage finishes.
+            outcomes: List[ScreeningOutcome] = []
+            async for outcome in iter_screening(
+                payload.resume_texts, job_profile, llm_config=llm_config
+            ):
+                outcomes.append(outcome)
+                candidate = _candidate(outcome)
+                if outcome.jd_mapping_matrix is None:
+                    yield frame("candidate_error", {"index": outcome.index, "message": outcome.error})
+                else:
+                    yield frame("candidate", candidate.model_dump(exclude_none=True))
+
+            ranked = rank_candidates(outcomes)
+            yield frame(
+                "ranking",
+                {"ranking": [{"index": o.index, "score": o.score} for o in ranked]},
+            )
+
+            if _wants_follow_up(payload):
+                async for outcome in iter_shortlist(
+                    ranked[: payload.top_k],
+                    payload.resume_texts,
+                    payload.jd_text,
+                    include_learning_plan=payload.include_learning_plan,
+                    include_custom_resume=payload.include_custom_resume,
+                    llm_config=llm_config,
+                ):
+                    yield frame(
+                        "candidate_detail",
+                        _candidate(outcome).model_dump(
+                            include={"index", "learning_plan", "custom_resume_markdown", "error"}
+                        ),
+                    )
+        except (LLMClientError, PipelineError) as exc:
+            yield frame("error", {"message": str(exc)})
+            return
+
+        yield frame("complete", {"screened": len(ranked)})
+
+    ticket = await admit(admission.BULK)
+    return StreamingResponse(holding(ticket, event_iterator()), media_type="text/event-stream")
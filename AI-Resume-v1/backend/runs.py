@@ -0,0 +1,249 @@
+"""Replayable streamed runs: numbered SSE frames that reconnecting clients can resume from."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics
+from .storage import StorageError, append_run_events, delete_run_events, get_run_events
+
+logger = logging.getLogger(__name__)
+
+# Frames kept in memory per run; older ones spill to SQLite (RunEvent) in batches.
+RUN_LOG_MEMORY_EVENTS = max(int(os.getenv("RUN_LOG_MEMORY_EVENTS", "2000")), 2)
+# How long a finished run stays available for replay.
+RUN_RETENTION_SECONDS = float(os.getenv("RUN_RETENTION_SECONDS", "600"))
+# How long a run keeps going with nobody attached before it is cancelled.
+RUN_DETACH_GRACE_SECONDS = float(os.getenv("RUN_DETACH_GRACE_SECONDS", "30"))
+
+
+async def _store(operation: str, write: Callable[..., None], *args: Any) -> bool:
+    """Run a RunEvent write in a worker thread; storage failures are logged, not raised."""
+
+    try:
+        await run_in_threadpool(write, *args)
+    except StorageError as exc:
+        metrics.incr("run_event_storage_errors_total", op=operation)
+        logger.warning("Run event %s failed: %s", operation, exc)
+        return False
+    return True
+
+
+def _in_background(
+    operation: str, write: Callable[..., None], *args: Any
+) -> "asyncio.Future[bool]":
+    return asyncio.ensure_future(_store(operation, write, *args))
+
+
+class Run:
+    """One pipeline run and the log of the frames it has emitted.
+
+    Frames are numbered from 1 so the number can be sent as the SSE ``id:``
+    and echoed back by the client as ``Last-Event-ID``. The newest frames are
+    kept in memory and older ones are spilled to SQLite, so a client that
+    reconnects after a long gap still gets everything it missed. Spills are
+    written from a worker thread and frames leave memory only once stored; if
+    storage fails the run keeps its whole log in memory instead.
+    """
+
+    def __init__(
+        self,
+        run_id: str,
+        detachable: bool = True,
+        cleared: "Optional[asyncio.Future[bool]]" = None,
+    ) -> None:
+        self.run_id = run_id
+        # Whether the run is cancelled once nobody follows it (background jobs are not).
+        self.detachable = detachable
+        self.log: Deque[Tuple[int, str]] = deque()
+        self.last_seq = 0
+        # Highest seq that lives only in SQLite.
+        self.spilled_through = 0
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        # Message of the run's error event, if it failed.
+        self.error: Optional[str] = None
+        self.followers = 0
+        self._changed = asyncio.Event()
+        self._grace: Optional[asyncio.TimerHandle] = None
+        # Deletion of a previous run's spilled frames that must land before our first spill.
+        self._cleared = cleared
+        self._spill: "Optional[asyncio.Future[None]]" = None
+        self._spill_failed = False
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def failed(self) -> bool:
+        """Finished with an error event, an exception or a cancellation."""
+
+        if not self.finished or self.task is None:
+            return False
+        return bool(self.error) or self.task.cancelled() or self.task.exception() is not None
+
+    def publish(self, render: Callable[[int], str]) -> int:
+        """Append the frame ``render(seq)`` and wake the followers."""
+
+        self.last_seq += 1
+        self.log.append((self.last_seq, render(self.last_seq)))
+        if len(self.log) > RUN_LOG_MEMORY_EVENTS and self._spill is None and not self._spill_failed:
+            batch = [self.log[index] for index in range(RUN_LOG_MEMORY_EVENTS // 2)]
+            self._spill = asyncio.ensure_future(self._write_spill(batch))
+        self._wake()
+        return self.last_seq
+
+    async def _write_spill(self, batch: list) -> None:
+        try:
+            if self._cleared is not None:
+                await self._cleared
+                self._cleared = None
+            if not await _store("spill", append_run_events, self.run_id, batch):
+                # Degrade to the in-memory log for the rest of this run.
+                self._spill_failed = True
+                return
+            # Frames leave memory only now, so followers never see a gap.
+            for _ in batch:
+                self.log.popleft()
+            self.spilled_through = batch[-1][0]
+            metrics.incr("run_events_spilled_total", len(batch))
+        finally:
+            self._spill = None
+
+    def finish(self) -> None:
+        if self.finished_at is None:
+            self.finished_at = time.monotonic()
+            self._cancel_grace()
+            self._wake()
+
+    def _wake(self) -> None:
+        # Followers wait on the event they saw; a fresh one is armed for the next change.
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self, after: int = 0) -> AsyncIterator[str]:
+        """Frames with seq > ``after``, then live ones until the run finishes."""
+
+        self._attach()
+        cursor = after
+        try:
+            while True:
+                if cursor < self.spilled_through:
+                    # More frames may spill while this read runs; they are picked up next pass.
+                    through = self.spilled_through
+                    spilled = await run_in_threadpool(
+                        get_run_events, self.run_id, cursor, through + 1
+                    )
+                    for seq, frame in spilled:
+                        yield frame
+                        cursor = seq
+                    # Frames the client had already seen may be gone; skip past the gap.
+                    cursor = max(cursor, through)
+                    continue
+                for seq, frame in list(self.log):
+                    if seq > cursor:
+                        yield frame
+                        cursor = seq
+                if cursor < self.last_seq:
+                    continue
+                if self.finished:
+                    return
+                await self._changed.wait()
+        finally:
+            self._detach()
+
+    def _attach(self) -> None:
+        self.followers += 1
+        self._cancel_grace()
+
+    def _detach(self) -> None:
+        self.followers -= 1
+        if self.followers or self.finished or self.task is None or not self.detachable:
+            return
+        if RUN_DETACH_GRACE_SECONDS <= 0:
+            self._abandon()
+        else:
+            self._grace = asyncio.get_running_loop().call_later(
+                RUN_DETACH_GRACE_SECONDS, self._abandon
+            )
+
+    def _cancel_grace(self) -> None:
+        if self._grace is not None:
+            self._grace.cancel()
+            self._grace = None
+
+    def _abandon(self) -> None:
+        self._grace = None
+        if self.task is not None and not self.task.done():
+            metrics.incr("run_abandoned_total")
+            self.task.cancel()
+
+
+class RunRegistry:
+    """Live and recently finished runs by ``run_id``."""
+
+    def __init__(self) -> None:
+        self.runs: Dict[str, Run] = {}
+        # Pending deletions of spilled frames, by run id.
+        self._clearing: Dict[str, "asyncio.Future[bool]"] = {}
+
+    def get(self, run_id: str) -> Optional[Run]:
+        self._purge()
+        return self.runs.get(run_id)
+
+    def start(
+        self, run_id: str, work: Callable[[Run], Awaitable[Any]], *, detachable: bool = True
+    ) -> Run:
+        """Register ``run_id`` and run ``work(run)`` in the background."""
+
+        self._purge()
+        previous = self.runs.get(run_id)
+        if previous is not None and previous.spilled_through:
+            # A failed run being retried under the same id starts its seqs over.
+            self._clear(run_id)
+        run = self.runs[run_id] = Run(run_id, detachable, self._clearing.get(run_id))
+        run.task = asyncio.create_task(work(run))
+        run.task.add_done_callback(lambda _task: run.finish())
+        metrics.set_gauge("runs_active", sum(not r.finished for r in self.runs.values()))
+        return run
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        expired = [
+            run
+            for run in self.runs.values()
+            if run.finished and now - run.finished_at >= RUN_RETENTION_SECONDS  # type: ignore[operator]
+        ]
+        for run in expired:
+            del self.runs[run.run_id]
+            if run.spilled_through:
+                self._clear(run.run_id)
+        metrics.set_gauge("runs_active", sum(not r.finished for r in self.runs.values()))
+
+    def _clear(self, run_id: str) -> None:
+        future = self._clearing[run_id] = _in_background("delete", delete_run_events, run_id)
+
+        def forget(done: "asyncio.Future[bool]") -> None:
+            if self._clearing.get(run_id) is done:
+                del self._clearing[run_id]
+
+        future.add_done_callback(forget)
+
+
+registry = RunRegistry()
+
+
+def parse_last_event_id(value: Optional[str]) -> int:
+    """The seq a reconnecting client last saw; anything unparsable replays from the start."""
+
+    try:
+        return max(int(value or 0), 0)
+    except ValueError:
+        return 0
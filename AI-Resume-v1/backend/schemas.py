@@ -1,6 +1,7 @@
 """Pydantic schema definitions for the AI career assistant."""
 from __future__ import annotations
 
+from datetime import datetime
 from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
@@ -70,6 +71,34 @@ class ResumeMatchExperience(BaseModel):
     evidence: str
 
 
+def normalize_coverage_value(value: object) -> str:
+    """Map the coverage labels models tend to produce onto ``ResumeMapping.coverage``."""
+
+    if not isinstance(value, str):
+        return "none"
+    token = value.strip().lower()
+    synonyms = {
+        "strong": "full",
+        "excellent": "full",
+        "good": "partial",
+        "medium": "partial",
+        "moderate": "partial",
+        "weak": "partial",
+        "limited": "partial",
+        "minimal": "none",
+        "poor": "none",
+        "missing": "none",
+        "none": "none",
+    }
+    if token in synonyms:
+        return synonyms[token]
+    if "full" in token:
+        return "full"
+    if "partial" in token:
+        return "partial"
+    return "none"
+
+
 class ResumeMapping(BaseModel):
     jd_point_id: str
     coverage: Literal["full", "partial", "none"]
@@ -119,6 +148,7 @@ class AnalyzeRequest(BaseModel):
     llm_api_base: Optional[str] = None
     llm_model: Optional[str] = None
     client_run_id: Optional[str] = None
+    bypass_cache: bool = False
 
 
 class AnalyzeResponse(BaseModel):
@@ -127,6 +157,88 @@ class AnalyzeResponse(BaseModel):
     draft_result: Optional[FullAnalysisResult] = None
 
 
+class RunResumeRequest(BaseModel):
+    # The stored request of a checkpointed run only holds the API key masked.
+    llm_api_key: Optional[str] = None
+
+
+class JobRequest(AnalyzeRequest):
+    # Higher runs first; equal priorities run in submission order.
+    priority: int = 0
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    priority: int
+    attempts: int
+    analysis_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    result: Optional[FullAnalysisResult] = None
+
+
+class BatchAnalyzeRequest(BaseModel):
+    resume_text: str
+    jd_texts: List[str] = Field(min_length=1, max_length=20)
+    llm_api_key: Optional[str] = None
+    llm_api_base: Optional[str] = None
+    llm_model: Optional[str] = None
+    client_run_id: Optional[str] = None
+    bypass_cache: bool = False
+
+
+class BatchAnalysisItem(BaseModel):
+    index: int
+    analysis_id: Optional[str] = None
+    result: Optional[FullAnalysisResult] = None
+    error: Optional[str] = None
+
+
+class JDRanking(BaseModel):
+    index: int
+    analysis_id: Optional[str] = None
+    title: str
+    coverage: float
+
+
+class BatchAnalyzeResponse(BaseModel):
+    items: List[BatchAnalysisItem]
+    ranking: List[JDRanking]
+
+
+class ScreeningRequest(BaseModel):
+    jd_text: str
+    resume_texts: List[str] = Field(min_length=1, max_length=500)
+    top_k: int = Field(default=0, ge=0)
+    include_learning_plan: bool = False
+    include_custom_resume: bool = False
+    llm_api_key: Optional[str] = None
+    llm_api_base: Optional[str] = None
+    llm_model: Optional[str] = None
+    client_run_id: Optional[str] = None
+    bypass_cache: bool = False
+
+
+class ScreeningCandidate(BaseModel):
+    index: int
+    score: float = 0.0
+    mandatory_covered: int = 0
+    mandatory_total: int = 0
+    resume_profile: Optional[Profile] = None
+    gap_analysis: Optional[GapAnalysisResult] = None
+    jd_mapping_matrix: Optional[JDMappingMatrix] = None
+    learning_plan: Optional[LearningPlan] = None
+    custom_resume_markdown: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ScreeningResponse(BaseModel):
+    job_profile: Profile
+    candidates: List[ScreeningCandidate]
+
+
 class ResumeOnlyRequest(BaseModel):
     resume_text: str
     llm_api_key: Optional[str] = None
@@ -0,0 +1,183 @@
+"""Coalesce identical in-flight LLM calls so duplicates share one upstream request."""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from . import metrics
+
+T = TypeVar("T")
+# Receives the positional arguments of every item the leader publishes.
+Subscriber = Callable[..., None]
+
+SINGLEFLIGHT_ENABLED = os.getenv("LLM_SINGLEFLIGHT", "true").lower() in {"1", "true", "yes"}
+
+
+class FlightAbandoned(Exception):
+    """The leading caller was cancelled before its call finished."""
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class Flight:
+    """One upstream call in progress: its eventual result and the items streamed so far.
+
+    Callers may live on different threads or event loops, so the result is a
+    concurrent future and items are handed to each subscriber on its own loop.
+    """
+
+    def __init__(self, streaming: bool) -> None:
+        self.streaming = streaming
+        self.future: "concurrent.futures.Future[Any]" = concurrent.futures.Future()
+        self.items: List[Tuple[Any, ...]] = []
+        self.subscribers: List[Tuple[Optional[asyncio.AbstractEventLoop], Subscriber]] = []
+        self._lock = threading.Lock()
+
+    def publish(self, *item: Any) -> None:
+        with self._lock:
+            self.items.append(item)
+            subscribers = list(self.subscribers)
+        current = _running_loop()
+        for loop, callback in subscribers:
+            if loop is None or loop is current:
+                callback(*item)
+            else:
+                loop.call_soon_threadsafe(callback, *item)
+
+    def subscribe(self, callback: Subscriber) -> None:
+        """Replay what has been published so far, then receive live items."""
+
+        with self._lock:
+            replay = list(self.items)
+            entry = (_running_loop(), callback)
+            self.subscribers.append(entry)
+        for item in replay:
+            callback(*item)
+
+    def unsubscribe(self, callback: Subscriber) -> None:
+        with self._lock:
+            self.subscribers = [entry for entry in self.subscribers if entry[1] is not callback]
+
+
+class FlightGroup:
+    """In-flight calls by key; the first caller leads and later identical callers follow."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._flights: Dict[str, Flight] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: str, streaming: bool) -> Tuple[Flight, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                metrics.incr("llm_coalesced_total", group=self.name)
+                return flight, False
+            flight = self._flights[key] = Flight(streaming)
+            return flight, True
+
+    def _land(self, key: str, flight: Flight) -> None:
+        # Later callers start a new flight (or hit the response cache) from here on.
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def do(self, key: Optional[str], fn: Callable[[], T]) -> T:
+        """Run ``fn`` once for all concurrent callers with the same ``key``."""
+
+        if key is None or not SINGLEFLIGHT_ENABLED:
+            return fn()
+        while True:
+            flight, leader = self._join(key, streaming=False)
+            if leader:
+                return self._lead(key, flight, fn)
+            try:
+                return flight.future.result()
+            except FlightAbandoned:
+                continue
+
+    def _lead(self, key: str, flight: Flight, fn: Callable[[], T]) -> T:
+        try:
+            result = fn()
+        except Exception as exc:
+            self._land(key, flight)
+            flight.future.set_exception(exc)
+            raise
+        except BaseException:
+            self._land(key, flight)
+            flight.future.set_exception(FlightAbandoned())
+            raise
+        self._land(key, flight)
+        flight.future.set_result(result)
+        return result
+
+    async def ado(
+        self,
+        key: Optional[str],
+        fn: Callable[[Optional[Subscriber]], Awaitable[T]],
+        *,
+        on_item: Optional[Subscriber] = None,
+        replay: Optional[Callable[[T], None]] = None,
+    ) -> T:
+        """Async counterpart of do for calls that may stream items.
+
+        ``fn(publish)`` makes the call, passing each streamed item to ``publish``
+        (which is None when the leader has no ``on_item`` of its own). Followers
+        with ``on_item`` get the items seen so far and then live ones; if the
+        leader is not streaming they get ``replay(result)`` instead. A follower
+        whose leader is cancelled retries and may become the leader itself.
+        """
+
+        if key is None or not SINGLEFLIGHT_ENABLED:
+            return await fn(on_item)
+        while True:
+            flight, leader = self._join(key, streaming=on_item is not None)
+            if leader:
+                if on_item is not None:
+                    flight.subscribe(on_item)
+                return await self._alead(key, flight, fn)
+            live = on_item is not None and flight.streaming
+            if live:
+                flight.subscribe(on_item)  # type: ignore[arg-type]
+            try:
+                result = await asyncio.shield(asyncio.wrap_future(flight.future))
+            except FlightAbandoned:
+                continue
+            finally:
+                if live:
+                    flight.unsubscribe(on_item)  # type: ignore[arg-type]
+            if on_item is not None and not live and replay is not None:
+                replay(result)
+            return result
+
+    async def _alead(
+        self, key: str, flight: Flight, fn: Callable[[Optional[Subscriber]], Awaitable[T]]
+    ) -> T:
+        try:
+            result = await fn(flight.publish if flight.streaming else None)
+        except Exception as exc:
+            self._land(key, flight)
+            flight.future.set_exception(exc)
+            raise
+        except BaseException:
+            self._land(key, flight)
+            flight.future.set_exception(FlightAbandoned())
+            raise
+        self._land(key, flight)
+        flight.future.set_result(result)
+        return result
+
+
+stage_calls = FlightGroup("stage")
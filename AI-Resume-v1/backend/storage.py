@@ -2,18 +2,20 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
 import os
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
+from sqlalchemy import delete, update
 from sqlalchemy.exc import SQLAlchemyError
 from sqlmodel import Field, Session, SQLModel, create_engine, select
 
 from .schemas import FullAnalysisResult
-from .prompt_templates import PROMPT_METADATA
+from .prompt_templates import LEGACY_DEFAULT_SHA256, LEGACY_PROMPTS, PROMPT_METADATA
 
 
 class StorageError(RuntimeError):
@@ -49,6 +51,75 @@ class AnalysisDraft(SQLModel, table=True):
     history_json: Optional[str] = None
 
 
+class LLMCacheEntry(SQLModel, table=True):
+    cache_key: str = Field(primary_key=True)
+    content: str
+    reasoning: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    expires_at: datetime = Field(index=True)
+
+
+class StageCheckpoint(SQLModel, table=True):
+    """A finished stage of an analysis run, kept so the work is not paid for twice."""
+
+    run_id: str = Field(primary_key=True)
+    stage: str = Field(primary_key=True)
+    value_json: str
+    raw: Optional[str] = None
+    reasoning: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class RunInput(SQLModel, table=True):
+    """The request behind a checkpointed run, so its missing stages can be re-run.
+
+    Stored without the LLM API key.
+    """
+
+    run_id: str = Field(primary_key=True)
+    request_json: str
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class AnalysisJob(SQLModel, table=True):
+    """A queued /jobs analysis request.
+
+    A worker leases a job by pushing ``visible_at`` forward; if the worker
+    dies the lease lapses and another worker picks the job up again.
+    """
+
+    job_id: str = Field(primary_key=True)
+    status: str = Field(default="queued", index=True)
+    priority: int = Field(default=0, index=True)
+    request_json: str
+    attempts: int = 0
+    max_attempts: int = 3
+    visible_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    analysis_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class IdempotencyRecord(SQLModel, table=True):
+    """An analysis submitted under an idempotency key, and what it produced."""
+
+    key: str = Field(primary_key=True)
+    # Hash of the request, so a key reused for a different request is caught.
+    fingerprint: str
+    analysis_id: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
+
+
+class RunEvent(SQLModel, table=True):
+    """An SSE frame of a streamed run that no longer fits in the in-memory replay log."""
+
+    run_id: str = Field(primary_key=True)
+    seq: int = Field(primary_key=True)
+    frame: str
+
+
 def init_db() -> None:
     """Create tables if they do not exist."""
 
@@ -146,9 +217,377 @@ def clear_draft(analysis_id: str) -> None:
         raise StorageError(f"Failed to clear draft: {exc}") from exc
 
 
+def get_llm_cache_entry(cache_key: str) -> Optional[LLMCacheEntry]:
+    """Return the unexpired cached LLM response for cache_key, if any."""
+
+    try:
+        with _session() as session:
+            entry = session.get(LLMCacheEntry, cache_key)
+            if entry is None or entry.expires_at <= datetime.utcnow():
+                return None
+            return entry
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to read LLM cache: {exc}") from exc
+
+
+def put_llm_cache_entry(
+    cache_key: str,
+    content: str,
+    reasoning: Optional[str],
+    expires_at: datetime,
+) -> None:
+    """Upsert a cached response (trimming is left to :func:`evict_llm_cache_entries`)."""
+
+    try:
+        with _session() as session:
+            entry = session.get(LLMCacheEntry, cache_key)
+            if entry:
+                entry.content = content
+                entry.reasoning = reasoning
+                entry.created_at = datetime.utcnow()
+                entry.expires_at = expires_at
+            else:
+                session.add(
+                    LLMCacheEntry(
+                        cache_key=cache_key,
+                        content=content,
+                        reasoning=reasoning,
+                        expires_at=expires_at,
+                    )
+                )
+            session.commit()
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to write LLM cache: {exc}") from exc
+
+
+def evict_llm_cache_entries(max_entries: int) -> int:
+    """Drop expired entries and all but the newest ``max_entries``; returns rows removed."""
+
+    try:
+        with _session() as session:
+            expired = session.execute(
+                delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= datetime.utcnow())
+            )
+            overflow_keys = (
+                select(LLMCacheEntry.cache_key)
+                .order_by(LLMCacheEntry.created_at.desc())
+                .offset(max_entries)
+            )
+            overflow = session.execute(
+                delete(LLMCacheEntry).where(LLMCacheEntry.cache_key.in_(overflow_keys))
+            )
+            session.commit()
+            return (expired.rowcount or 0) + (overflow.rowcount or 0)
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to trim LLM cache: {exc}") from exc
+
+
+def save_stage_checkpoint(
+    run_id: str,
+    stage: str,
+    value_json: str,
+    raw: Optional[str] = None,
+    reasoning: Optional[str] = None,
+) -> None:
+    """Upsert the checkpoint of one finished stage of ``run_id``."""
+
+    try:
+        with _session() as session:
+            checkpoint = session.get(StageCheckpoint, (run_id, stage))
+            if checkpoint:
+                checkpoint.value_json = value_json
+                checkpoint.raw = raw
+                checkpoint.reasoning = reasoning
+                checkpoint.created_at = datetime.utcnow()
+            else:
+                session.add(
+                    StageCheckpoint(
+                        run_id=run_id,
+                        stage=stage,
+                        value_json=value_json,
+                        raw=raw,
+                        reasoning=reasoning,
+                    )
+                )
+            session.commit()
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to save stage checkpoint: {exc}") from exc
+
+
+def get_stage_checkpoints(run_id: str) -> list[StageCheckpoint]:
+    try:
+        with _session() as session:
+            statement = select(StageCheckpoint).where(StageCheckpoint.run_id == run_id)
+            return list(session.exec(statement).all())
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to fetch stage checkpoints: {exc}") from exc
+
+
+def delete_stage_checkpoints(run_id: str) -> None:
+    """Drop the checkpoints and stored input of ``run_id`` once its analysis is saved."""
+
+    try:
+        with _session() as session:
+            session.execute(delete(StageCheckpoint).where(StageCheckpoint.run_id == run_id))
+            session.execute(delete(RunInput).where(RunInput.run_id == run_id))
+            session.commit()
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to delete stage checkpoints: {exc}") from exc
+
+
+def save_run_input(run_id: str, request_json: str) -> None:
+    try:
+        with _session() as session:
+            session.merge(RunInput(run_id=run_id, request_json=request_json))
+            session.commit()
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to save run input: {exc}") from exc
+
+
+def get_run_input(run_id: str) -> Optional[RunInput]:
+    try:
+        with _session() as session:
+            return session.get(RunInput, run_id)
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to fetch run input: {exc}") from exc
+
+
+def enqueue_job(request_json: str, priority: int = 0, max_attempts: int = 3) -> str:
+    """Persist a job request and return its identifier."""
+
+    job_id = str(uuid.uuid4())
+    try:
+        with _session() as session:
+            session.add(
+                AnalysisJob(
+                    job_id=job_id,
+                    priority=priority,
+                    request_json=request_json,
+                    max_attempts=max_attempts,
+                )
+            )
+            session.commit()
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to enqueue job: {exc}") from exc
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[AnalysisJob]:
+    try:
+        with _session() as session:
+            return session.get(AnalysisJob, job_id)
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to fetch job: {exc}") from exc
+
+
+def claim_job(visibility_timeout: float) -> Optional[AnalysisJob]:
+    """Lease the most urgent visible job for ``visibility_timeout`` seconds.
+
+    Queued jobs and running jobs whose lease lapsed are both eligible, highest
+    priority first and then oldest first. The lease is taken with a conditional
+    update, so two workers never run the same attempt.
+    """
+
+    try:
+        with _session() as session:
+            now = datetime.utcnow()
+            # Jobs whose last lease lapsed with no attempts left are given up on.
+            session.execute(
+                update(AnalysisJob)
+                .where(
+                    AnalysisJob.status == "running",
+                    AnalysisJob.visible_at <= now,
+                    AnalysisJob.attempts >= AnalysisJob.max_attempts,
+                )
+                .values(status="failed", error="Worker lease expired", updated_at=now)
+            )
+            session.commit()
+            while True:
+                statement = (
+                    select(AnalysisJob)
+                    .where(
+                        AnalysisJob.status.in_(("queued", "running")),
+                        AnalysisJob.visible_at <= now,
+                        AnalysisJob.attempts < AnalysisJob.max_attempts,
+                    )
+                    .order_by(AnalysisJob.priority.desc(), AnalysisJob.created_at)
+                    .limit(1)
+                )
+                job = session.exec(statement).first()
+                if job is None:
+                    return None
+                leased = session.execute(
+                    update(AnalysisJob)
+                    .where(
+                        AnalysisJob.job_id == job.job_id,
+                        AnalysisJob.attempts == job.attempts,
+                        AnalysisJob.visible_at == job.visible_at,
+                    )
+                    .values(
+                        status="running",
+                        attempts=job.attempts + 1,
+                        visible_at=now + timedelta(seconds=visibility_timeout),
+                        updated_at=now,
+                    )
+                )
+                session.commit()
+                if leased.rowcount:
+                    session.refresh(job)
+                    return job
+                # Another worker took it first; look for the next one.
+                session.expire_all()
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to claim job: {exc}") from exc
+
+
+def extend_job_lease(job_id: str, visibility_timeout: float) -> None:
+    try:
+        with _session() as session:
+            now = datetime.utcnow()
+            session.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.job_id == job_id, AnalysisJob.status == "running")
+                .values(visible_at=now + timedelta(seconds=visibility_timeout), updated_at=now)
+            )
+            session.commit()
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to extend job lease: {exc}") from exc
+
+
+def finish_job(job_id: str, analysis_id: str) -> None:
+    _update_job(job_id, status="succeeded", analysis_id=analysis_id, error=None)
+
+
+def fail_job(job_id: str, error: str, retry_delay: float = 0) -> None:
+    """Record a failed attempt; the job is queued again while attempts remain."""
+
+    try:
+        with _session() as session:
+            job = session.get(AnalysisJob, job_id)
+            if job is None:
+                return
+            now = datetime.utcnow()
+            job.error = error
+            job.updated_at = now
+            if job.attempts < job.max_attempts:
+                job.status = "queued"
+                job.visible_at = now + timedelta(seconds=retry_delay)
+            else:
+                job.status = "failed"
+            session.add(job)
+            session.commit()
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to record job failure: {exc}") from exc
+
+
+def _update_job(job_id: str, **values: object) -> None:
+    try:
+        with _session() as session:
+            session.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.job_id == job_id)
+                .values(updated_at=datetime.utcnow(), **values)
+            )
+            session.commit()
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to update job: {exc}") from exc
+
+
+def get_idempotency_record(key: str) -> Optional[IdempotencyRecord]:
+    """The unexpired record for ``key``, if any."""
+
+    try:
+        with _session() as session:
+            record = session.get(IdempotencyRecord, key)
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to fetch idempotency record: {exc}") from exc
+    if record is None or record.expires_at <= datetime.utcnow():
+        return None
+    return record
+
+
+def put_idempotency_record(
+    key: str, fingerprint: str, expires_at: datetime, analysis_id: Optional[str] = None
+) -> None:
+    """Upsert the record for ``key`` and drop expired ones."""
+
+    try:
+        with _session() as session:
+            session.execute(
+                delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= datetime.utcnow())
+            )
+            record = session.get(IdempotencyRecord, key)
+            if record is None:
+                record = IdempotencyRecord(key=key, fingerprint=fingerprint, expires_at=expires_at)
+            record.fingerprint = fingerprint
+            record.analysis_id = analysis_id
+            record.expires_at = expires_at
+            session.add(record)
+            session.commit()
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to save idempotency record: {exc}") from exc
+
+
+def append_run_events(run_id: str, events: list[tuple[int, str]]) -> None:
+    """Store ``(seq, frame)`` pairs evicted from the in-memory log of ``run_id``."""
+
+    try:
+        with _session() as session:
+            for seq, frame in events:
+                session.merge(RunEvent(run_id=run_id, seq=seq, frame=frame))
+            session.commit()
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to spill run events: {exc}") from exc
+
+
+def get_run_events(run_id: str, after: int, before: int) -> list[tuple[int, str]]:
+    """Spilled frames of ``run_id`` with ``after < seq < before``, in order."""
+
+    try:
+        with _session() as session:
+            statement = (
+                select(RunEvent)
+                .where(RunEvent.run_id == run_id, RunEvent.seq > after, RunEvent.seq < before)
+                .order_by(RunEvent.seq)
+            )
+            return [(event.seq, event.frame) for event in session.exec(statement).all()]
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to fetch run events: {exc}") from exc
+
+
+def delete_run_events(run_id: str) -> None:
+    try:
+        with _session() as session:
+            session.execute(delete(RunEvent).where(RunEvent.run_id == run_id))
+            session.commit()
+    except SQLAlchemyError as exc:  # pragma: no cover
+        raise StorageError(f"Failed to delete run events: {exc}") from exc
+
+
+def _migrate_legacy_prompts(session: Session) -> None:
+    """Carry user edits of renamed prompts over to the prompts that replaced them."""
+
+    for legacy_name, replacements in LEGACY_PROMPTS.items():
+        legacy = session.get(PromptTemplate, legacy_name)
+        if legacy is None:
+            continue
+        digest = hashlib.sha256(legacy.content.strip().encode("utf-8")).hexdigest()
+        if digest != LEGACY_DEFAULT_SHA256.get(legacy_name):
+            for name in replacements:
+                current = session.get(PromptTemplate, name)
+                # Never overwrite a replacement prompt the user has already edited.
+                if current is None:
+                    session.add(PromptTemplate(name=name, content=legacy.content))
+                elif current.content == PROMPT_METADATA[name]["template"]:
+                    current.content = legacy.content
+        session.delete(legacy)
+    session.flush()
+
+
 def seed_prompt_defaults() -> None:
     try:
         with _session() as session:
+            _migrate_legacy_prompts(session)
             for name, metadata in PROMPT_METADATA.items():
                 existing = session.get(PromptTemplate, name)
                 if not existing:
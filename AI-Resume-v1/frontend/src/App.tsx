@@ -269,6 +269,7 @@ function App() {
               updateAnalysisContext(result, id);
               setActiveTab("gaps");
             }}
+            onPartialResult={(result) => setAnalysisResult(result)}
           />
         );
     }
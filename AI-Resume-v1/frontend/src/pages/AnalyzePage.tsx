@@ -2,7 +2,7 @@ import { FormEvent, useEffect, useMemo, useRef, useState } from "react";
 import { API_BASE } from "../config";
 import { usePersistentState } from "../hooks/usePersistentState";
 import type { Copy } from "../i18n";
-import type { FullAnalysisResult, Gap, RunRecord } from "../types";
+import type { FullAnalysisResult, Gap, Profile, RunRecord } from "../types";
 
 const stripCodeFence = (text: string) =>
   text.replace(/```json/gi, "").replace(/```/g, "").trim();
@@ -16,12 +16,42 @@ const tryParseJSON = (text: string) => {
   }
 };
 
+const emptyProfile = (profileType: Profile["profile_type"]): Profile => ({
+  profile_type: profileType,
+  title: "",
+  years_experience: 0,
+  skills: [],
+  education: [],
+  experiences: [],
+});
+
+const emptyAnalysisResult = (): FullAnalysisResult => ({
+  resume_profile: emptyProfile("resume"),
+  job_profile: emptyProfile("job"),
+  gap_analysis: { gaps: [] },
+  jd_mapping_matrix: { jd_points: [], resume_mapping: [] },
+  learning_plan: { phases: [] },
+  custom_resume_markdown: "",
+});
+
+// partial 事件的 path 形如 ["gap_analysis", "gaps", 0]，将子对象写入对应列表位置
+const applyPartial = (
+  base: FullAnalysisResult,
+  path: Array<string | number>,
+  data: unknown
+): FullAnalysisResult => {
+  const [section, field, index] = path as [keyof FullAnalysisResult, string, number];
+  const container = base[section] as unknown as Record<string, unknown>;
+  const items = [...((container[field] as unknown[]) ?? [])];
+  items[index] = data;
+  return { ...base, [section]: { ...container, [field]: items } };
+};
+
 const formatStageSummary = (stage: string, raw: string): string => {
   const parsed = tryParseJSON(raw);
   switch (stage) {
-    case "parse_profile": {
+    case "parse_resume": {
       const resume = parsed?.resume_profile ?? {};
-      const job = parsed?.job_profile ?? {};
       const skills = (resume.skills ?? [])
         .slice(0, 3)
         .map((item: any) => item.name)
@@ -29,9 +59,11 @@ const formatStageSummary = (stage: string, raw: string): string => {
         .join("、");
       return `解析候选人「${resume.title || "未知职位"}」，约 ${
         resume.years_experience ?? 0
-      } 年经验，核心技能：${skills || "未提供"}。目标岗位：「${
-        job.title || "未知岗位"
-      }」，期望经验 ${job.years_experience ?? 0} 年。`;
+      } 年经验，核心技能：${skills || "未提供"}。`;
+    }
+    case "parse_job": {
+      const job = parsed?.job_profile ?? {};
+      return `目标岗位：「${job.title || "未知岗位"}」，期望经验 ${job.years_experience ?? 0} 年。`;
     }
     case "gap_analysis": {
       const gaps = parsed?.gap_analysis?.gaps ?? [];
@@ -71,6 +103,8 @@ const DEFAULT_MODEL_SETTINGS = {
   llm_model: "deepseek-chat",
 };
 const DEFAULT_REASONING_MODEL = "deepseek-reasoner";
+// 连接中断后按 Last-Event-ID 续接同一次分析的最大重连次数
+const MAX_STREAM_RECONNECTS = 3;
 
 type ModelSettings = typeof DEFAULT_MODEL_SETTINGS;
 
@@ -95,6 +129,7 @@ type Props = {
   onResolveRunningRuns: () => void;
   copy: Copy;
   onAnalysisResult: (result: FullAnalysisResult, analysisId?: string | null) => void;
+  onPartialResult?: (result: FullAnalysisResult) => void;
 };
 
 function AnalyzePage({
@@ -111,6 +146,7 @@ function AnalyzePage({
   onResolveRunningRuns,
   copy,
   onAnalysisResult,
+  onPartialResult,
 }: Props) {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -128,6 +164,7 @@ function AnalyzePage({
   const [typingQueue, setTypingQueue] = useState<Array<{ runId: string; text: string }>>([]);
   const typingRef = useRef(false);
   const [logRunId, setLogRunId] = useState<string | null>(null);
+  const partialResultRef = useRef<FullAnalysisResult | null>(null);
 
   const hasRunning = runs.some((r) => r.status === "running");
 
@@ -248,6 +285,7 @@ function AnalyzePage({
   };
 
   const streamAnalysis = async (runId: string) => {
+    partialResultRef.current = null;
     const body: Record<string, unknown> = {
       resume_text: resumeText,
       jd_text: jdText,
@@ -273,38 +311,69 @@ function AnalyzePage({
     }
 
     enqueueLog(runId, "流式连接已建立，等待模型响应...");
-    const reader = response.body.getReader();
-    const decoder = new TextDecoder("utf-8");
-    let buffer = "";
-
-    while (true) {
-      const { value, done } = await reader.read();
-      if (done) break;
-      buffer += decoder.decode(value, { stream: true });
-
-      let boundary = buffer.indexOf("\n\n");
-      while (boundary !== -1) {
-        const chunk = buffer.slice(0, boundary);
-        buffer = buffer.slice(boundary + 2);
-        processSseChunk(runId, chunk.trim());
-        boundary = buffer.indexOf("\n\n");
+    let lastEventId = 0;
+    let finished = false;
+    const readStream = async (stream: ReadableStream<Uint8Array>) => {
+      const reader = stream.getReader();
+      const decoder = new TextDecoder("utf-8");
+      let buffer = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary = buffer.indexOf("\n\n");
+        while (boundary !== -1) {
+          const chunk = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          const { eventName, eventId } = processSseChunk(runId, chunk.trim());
+          if (eventId) lastEventId = eventId;
+          if (eventName === "complete" || eventName === "error") finished = true;
+          boundary = buffer.indexOf("\n\n");
+        }
+      }
+    };
+
+    let stream = response.body;
+    for (let attempt = 1; ; attempt += 1) {
+      try {
+        await readStream(stream);
+      } catch (err) {
+        if (attempt > MAX_STREAM_RECONNECTS) throw err;
+      }
+      if (finished) return;
+      if (attempt > MAX_STREAM_RECONNECTS) throw new Error("流式连接中断");
+      // 服务端保留了这次运行：补发漏掉的事件后继续接收，而不是重新跑一遍流水线
+      enqueueLog(runId, `连接中断，正在第 ${attempt} 次重连...`);
+      await new Promise((resolve) => setTimeout(resolve, 1000 * attempt));
+      const resumed = await fetch(`${API_BASE}/analyze/stream/${encodeURIComponent(runId)}`, {
+        headers: { "Last-Event-ID": String(lastEventId) },
+      });
+      if (!resumed.ok || !resumed.body) {
+        const message = await resumed.text();
+        throw new Error(message || "Streaming request failed");
       }
+      stream = resumed.body;
     }
   };
 
-  const processSseChunk = (runId: string, chunk: string) => {
-    if (!chunk) return;
-    const lines = chunk.split("\n");
+  const processSseChunk = (runId: string, chunk: string): { eventName: string; eventId: number } => {
     let eventName = "message";
+    let eventId = 0;
+    if (!chunk) return { eventName, eventId };
+    const lines = chunk.split("\n");
     let dataPayload = "";
     lines.forEach((line) => {
-      if (line.startsWith("event:")) {
+      if (line.startsWith("id:")) {
+        eventId = Number(line.replace("id:", "").trim()) || 0;
+      } else if (line.startsWith("event:")) {
         eventName = line.replace("event:", "").trim();
       } else if (line.startsWith("data:")) {
         dataPayload += line.replace("data:", "").trim();
       }
     });
-    if (!dataPayload) return;
+    if (!dataPayload) return { eventName, eventId };
     const data = JSON.parse(dataPayload);
 
     switch (eventName) {
@@ -314,6 +383,34 @@ function AnalyzePage({
       case "reasoning_output":
         enqueueLog(runId, formatReasoning(data.stage, data.content));
         break;
+      case "partial":
+        partialResultRef.current = applyPartial(
+          partialResultRef.current ?? emptyAnalysisResult(),
+          data.path,
+          data.data
+        );
+        onPartialResult?.(partialResultRef.current);
+        break;
+      case "stage_error":
+        enqueueLog(
+          runId,
+          data.skipped
+            ? `阶段 ${data.stage} 已跳过（上游未完成）`
+            : `阶段 ${data.stage} ${data.timed_out ? "超时" : "失败"}：${data.message}`
+        );
+        break;
+      case "llm_retry":
+        enqueueLog(
+          runId,
+          `阶段 ${data.stage} 调用失败（${data.reason}），${Number(data.delay).toFixed(1)}s 后第 ${data.attempt} 次尝试`
+        );
+        break;
+      case "llm_queued":
+        enqueueLog(runId, `阶段 ${data.stage} 正在排队等待 LLM 配额，当前第 ${data.position} 位`);
+        break;
+      case "partial_result":
+        enqueueLog(runId, `部分结果已返回，未完成阶段：${(data.failed_stages ?? []).join("、")}`);
+        break;
       case "result": {
         const resultData = data as { analysis_id?: string | null; result: FullAnalysisResult };
         enqueueLog(runId, "分析完成，正在保存结果...");
@@ -337,6 +434,7 @@ function AnalyzePage({
       default:
         break;
     }
+    return { eventName, eventId };
   };
 
   return (
@@ -11,6 +11,16 @@ from fastapi.testclient import TestClient
 from sqlmodel import SQLModel
 
 
+@pytest.fixture(autouse=True)
+def _disable_llm_cache(monkeypatch):
+    """默认关闭 LLM 响应缓存，避免用例之间通过缓存互相影响。"""
+
+    import backend.llm_cache as llm_cache
+
+    monkeypatch.setattr(llm_cache, "CACHE_ENABLED", False)
+    llm_cache.response_cache.clear()
+
+
 @pytest.fixture()
 def temp_app(tmp_path, monkeypatch) -> tuple[object, TestClient]:
     """重载存储模块以指向临时 SQLite，返回 (analyze_module, client)。"""
@@ -23,7 +33,11 @@ def temp_app(tmp_path, monkeypatch) -> tuple[object, TestClient]:
     for mod in [
         "backend.storage",
         "backend.prompt_templates",
+        "backend.runs",
+        "backend.idempotency",
+        "backend.job_queue",
         "backend.routers.analyze",
+        "backend.routers.jobs",
         "backend.main",
         "backend.prompts",
     ]:
@@ -31,7 +45,12 @@ def temp_app(tmp_path, monkeypatch) -> tuple[object, TestClient]:
 
     import backend.storage as storage
     import backend.prompt_templates as prompt_templates
+    # 中文注释：`from .. import runs` 会先取包属性，需先重新导入依赖存储的模块
+    import backend.runs
+    import backend.idempotency
     import backend.routers.analyze as analyze
+    # 中文注释：先于 main 导入，避免 main 通过包属性拿到上一个用例的旧模块
+    import backend.routers.jobs as jobs
     import backend.main as main
 
     client = TestClient(main.app)
@@ -0,0 +1,82 @@
+"""准入控制测试：并发上限、交互优先的分道排队、有界队列与 429/Retry-After。"""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from backend import admission, metrics
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    metrics.reset()
+
+
+def test_interactive_waiters_go_before_bulk():
+    controller = admission.AdmissionController(2, bulk_share=0.5, queue_size=4, max_wait=5)
+
+    async def _run():
+        order = []
+        bulk = await controller.acquire(admission.BULK)
+        interactive = await controller.acquire(admission.INTERACTIVE)
+
+        async def _wait(lane):
+            ticket = await controller.acquire(lane)
+            order.append(lane)
+            return ticket
+
+        # 中文注释：批量道只能占一半槽位；先排队的批量请求也要让位给后来的交互请求
+        queued_bulk = asyncio.create_task(_wait(admission.BULK))
+        await asyncio.sleep(0)
+        queued_interactive = asyncio.create_task(_wait(admission.INTERACTIVE))
+        await asyncio.sleep(0)
+        assert controller.snapshot()["lanes"]["bulk"]["queued"] == 1
+        controller.release(interactive)
+        await asyncio.sleep(0)
+        controller.release(bulk)
+        await asyncio.gather(queued_bulk, queued_interactive)
+        return order
+
+    assert asyncio.run(_run()) == ["interactive", "bulk"]
+    assert controller.active == {"interactive": 1, "bulk": 1}
+    counters = metrics.snapshot()["counters"]
+    assert counters['admission_admitted_total{lane="bulk"}'] == 2
+
+
+def test_excess_requests_are_rejected_with_retry_after():
+    controller = admission.AdmissionController(
+        1, queue_size=1, max_wait=0.01, expected_seconds=30
+    )
+
+    async def _run():
+        held = await controller.acquire(admission.INTERACTIVE)
+        waiter = asyncio.create_task(controller.acquire(admission.INTERACTIVE))
+        await asyncio.sleep(0)
+        # 中文注释：队列已满时立即拒绝，Retry-After 按平均耗时与排队人数估算
+        with pytest.raises(admission.AdmissionRejected) as full:
+            await controller.acquire(admission.INTERACTIVE)
+        with pytest.raises(admission.AdmissionRejected) as timed_out:
+            await waiter
+        controller.release(held)
+        return full.value, timed_out.value
+
+    full, timed_out = asyncio.run(_run())
+    assert (full.reason, full.retry_after) == ("queue_full", 60)
+    assert timed_out.reason == "timeout"
+    assert controller.snapshot()["lanes"]["interactive"]["queued"] == 0
+    assert metrics.snapshot()["counters"][
+        'admission_rejected_total{lane="interactive",reason="queue_full"}'
+    ] == 1
+
+
+def test_analyze_returns_429_when_saturated(monkeypatch, temp_app):
+    _analyze, client = temp_app
+    controller = admission.AdmissionController(1, queue_size=0, expected_seconds=12)
+    monkeypatch.setattr(admission, "controller", controller)
+    controller.active[admission.INTERACTIVE] = 1
+
+    resp = client.post("/analyze", json={"resume_text": "r", "jd_text": "j"})
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "12"
+    assert client.get("/llm/status").json()["admission"]["lanes"]["interactive"]["active"] == 1
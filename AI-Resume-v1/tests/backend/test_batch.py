@@ -0,0 +1,99 @@
+"""多 JD 批量分析测试：覆盖率评分、排序与扇出并发上限。"""
+from __future__ import annotations
+
+import asyncio
+
+import backend.batch as batch
+from backend.schemas import JDMappingMatrix
+
+
+def _matrix(points, coverage):
+    return JDMappingMatrix.model_validate(
+        {
+            "jd_points": [
+                {"id": pid, "text": pid, "category": "skill", "required_level": "mid", "mandatory": mandatory}
+                for pid, mandatory in points
+            ],
+            "resume_mapping": [
+                {"jd_point_id": pid, "coverage": value} for pid, value in coverage.items()
+            ],
+        }
+    )
+
+
+def test_coverage_score_weights_mandatory_points():
+    # 中文注释：必选项权重翻倍，缺失映射视为未覆盖
+    matrix = _matrix([("a", True), ("b", False), ("c", False)], {"a": "full", "b": "partial"})
+    assert batch.coverage_score(matrix) == round((2 + 0.5) / 4, 4)
+    assert batch.coverage_score(JDMappingMatrix()) == 0.0
+
+
+def test_rank_by_coverage_orders_best_first(fake_result_factory):
+    low, high = fake_result_factory(), fake_result_factory()
+    low.jd_mapping_matrix = _matrix([("a", True)], {"a": "none"})
+    high.jd_mapping_matrix = _matrix([("a", True)], {"a": "full"})
+    assert batch.rank_by_coverage({0: low, 1: high}) == [(1, 1.0), (0, 0.0)]
+
+
+def test_iter_batch_analysis_parses_resume_once(monkeypatch, fake_result_factory):
+    # 中文注释：简历只解析一次，JD 扇出受并发上限约束，失败的 JD 不影响其他 JD
+    fake = fake_result_factory()
+    parse_calls = []
+    in_flight = {"now": 0, "max": 0}
+
+    async def _parse_resume(resume_text, **_):
+        parse_calls.append(resume_text)
+        return fake.resume_profile, None, None
+
+    async def _analyze(resume_text, jd_text, *, resume_profile=None, **_):
+        assert resume_profile is fake.resume_profile
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        if jd_text == "bad":
+            raise batch.PipelineError("bad jd")
+        return fake
+
+    monkeypatch.setattr(batch, "parse_resume_profile_async", _parse_resume)
+    monkeypatch.setattr(batch, "run_full_analysis_async", _analyze)
+
+    async def _collect():
+        return [
+            outcome
+            async for outcome in batch.iter_batch_analysis("r", ["j1", "bad", "j3", "j4"], concurrency=2)
+        ]
+
+    outcomes = asyncio.run(_collect())
+    assert parse_calls == ["r"]
+    assert in_flight["max"] == 2
+    assert sorted(o.index for o in outcomes) == [0, 1, 2, 3]
+    assert [o.error for o in outcomes if o.index == 1] == ["bad jd"]
+
+
+def test_rank_candidates_breaks_ties_on_mandatory_points():
+    # 中文注释：得分相同时，满足更多必选项的候选人排前，解析失败的不参与排序
+    a = batch.ScreeningOutcome(0, jd_mapping_matrix=_matrix([("m", True), ("n", True)], {"m": "partial", "n": "partial"}))
+    b = batch.ScreeningOutcome(1, jd_mapping_matrix=_matrix([("m", True), ("n", True)], {"m": "full"}))
+    failed = batch.ScreeningOutcome(2, error="boom")
+    assert a.score == b.score
+    assert batch.mandatory_coverage(b.jd_mapping_matrix) == (1, 2)
+    assert [o.index for o in batch.rank_candidates([a, b, failed])] == [1, 0]
+
+
+def test_complete_candidate_keeps_score_on_follow_up_failure(monkeypatch):
+    # 中文注释：Top-K 补充阶段失败只记录错误，不影响已有筛选结果
+    async def _fail(*_, **__):
+        raise batch.PipelineError("plan failed")
+
+    monkeypatch.setattr(batch, "generate_learning_plan_async", _fail)
+    outcome = batch.ScreeningOutcome(
+        0, gap_analysis=batch.GapAnalysisResult(), jd_mapping_matrix=_matrix([("a", True)], {"a": "full"})
+    )
+    done = asyncio.run(
+        batch.complete_candidate(
+            outcome, "r", "j", include_learning_plan=True, include_custom_resume=False
+        )
+    )
+    assert done.error == "plan failed"
+    assert done.score == 1.0
@@ -0,0 +1,116 @@
+"""对冲请求测试：首 token 超过阈值时发出副本请求，先出结果者胜出。"""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from backend import hedging, metrics
+
+
+def _stream(items, *, delay=0.0, closed=None, error=None):
+    # 中文注释：首个元素前等待 delay，被取消或关闭时记录到 closed
+    async def _gen():
+        try:
+            await asyncio.sleep(delay)
+            if error is not None:
+                raise error
+            for item in items:
+                yield item
+        finally:
+            if closed is not None:
+                closed.append(items)
+
+    return _gen
+
+
+@pytest.fixture(autouse=True)
+def _short_threshold(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_DEFAULT_DELAY", 0.02)
+    metrics.reset()
+
+
+def _collect(primary, hedge, tracker):
+    async def _run():
+        return [item async for item in hedging.hedged_stream(primary, hedge, key=("gap", "m"), tracker=tracker)]
+
+    return asyncio.run(_run())
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    # 中文注释：主请求迟迟无首 token，副本先返回则采用副本并取消主请求
+    closed = []
+    tracker = hedging.TTFTTracker()
+    out = _collect(_stream(["p"], delay=1, closed=closed), _stream(["h1", "h2"]), tracker)
+    assert out == ["h1", "h2"]
+    assert ["p"] in closed
+    counters = metrics.snapshot()["counters"]
+    assert counters['llm_hedges_total{model="m",stage="gap"}'] == 1
+    assert counters['llm_hedge_wins_total{model="m",stage="gap",winner="hedge"}'] == 1
+
+
+def test_fast_primary_is_not_hedged():
+    hedge_opened = []
+
+    def _hedge():
+        hedge_opened.append(True)
+        return _stream(["h"])()
+
+    tracker = hedging.TTFTTracker()
+    assert _collect(_stream(["a", "b"]), _hedge, tracker) == ["a", "b"]
+    assert hedge_opened == []
+    assert "llm_hedges_total" not in str(metrics.snapshot()["counters"])
+
+
+def test_primary_failure_falls_back_to_hedge():
+    # 中文注释：一方在首 token 前失败时等待另一方；双方都失败才抛出
+    tracker = hedging.TTFTTracker()
+    slow_fail = _stream([], delay=0.05, error=RuntimeError("boom"))
+    assert _collect(slow_fail, _stream(["h"], delay=0.1), tracker) == ["h"]
+    with pytest.raises(RuntimeError, match="boom"):
+        _collect(slow_fail, _stream([], error=ValueError("x")), tracker)
+
+
+def test_hedge_needs_a_free_rate_limit_slot():
+    # 中文注释：限流器没有空闲槽位时跳过对冲；有槽位时对冲占用一个并在结束后归还
+    from backend import ratelimit
+
+    limiter = ratelimit.RateLimiter("m", ratelimit.Limits(max_in_flight=1))
+    hedge_opened = []
+
+    def _hedge():
+        hedge_opened.append(True)
+        return _stream(["h"])()
+
+    async def _run():
+        return [
+            item
+            async for item in hedging.hedged_stream(
+                _stream(["p"], delay=0.05), _hedge, key=("gap", "m"),
+                tracker=hedging.TTFTTracker(), limiter=limiter,
+            )
+        ]
+
+    # 中文注释：主请求已占满唯一槽位
+    assert limiter.try_acquire()
+    assert asyncio.run(_run()) == ["p"]
+    assert hedge_opened == []
+    counters = metrics.snapshot()["counters"]
+    assert counters['llm_hedges_skipped_total{model="m",stage="gap"}'] == 1
+    limiter.release()
+
+    assert asyncio.run(_run()) == ["h"]
+    assert hedge_opened == [True]
+    assert limiter.in_flight == 0
+
+
+def test_threshold_uses_quantile_after_min_samples(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_MIN_SAMPLES", 10)
+    monkeypatch.setattr(hedging, "HEDGE_MIN_DELAY", 0.5)
+    tracker = hedging.TTFTTracker()
+    for seconds in range(1, 10):
+        tracker.record(("s", "m"), float(seconds))
+    assert tracker.threshold(("s", "m")) == 0.02
+    tracker.record(("s", "m"), 10.0)
+    assert tracker.threshold(("s", "m")) == 10.0
+    assert tracker.threshold(("other", "m")) == 0.02
@@ -0,0 +1,124 @@
+"""后台任务队列测试：优先级与可见性超时、失败重试，以及 /jobs 提交、执行与查询。"""
+from __future__ import annotations
+
+import asyncio
+import time
+
+from backend import pipeline
+
+
+def _async_return(value):
+    async def _inner(*_, **__):
+        return value
+
+    return _inner
+
+
+def test_claim_order_and_visibility_timeout(temp_app):
+    import backend.storage as storage
+
+    low = storage.enqueue_job("{}", priority=0)
+    high = storage.enqueue_job("{}", priority=5)
+    # 中文注释：高优先级先出队；已租出的任务在租约到期前对其他 worker 不可见
+    assert storage.claim_job(60).job_id == high
+    assert storage.claim_job(60).job_id == low
+    assert storage.claim_job(60) is None
+
+    lapsed = storage.enqueue_job("{}", max_attempts=2)
+    assert storage.claim_job(0).attempts == 1
+    time.sleep(0.01)
+    # 中文注释：租约过期（worker 挂掉）后任务重新可领取，尝试次数递增
+    again = storage.claim_job(0)
+    assert (again.job_id, again.attempts) == (lapsed, 2)
+    time.sleep(0.01)
+    assert storage.claim_job(0) is None
+    assert storage.get_job(lapsed).status == "failed"
+
+
+def test_failed_attempts_are_retried_until_exhausted(temp_app):
+    import backend.storage as storage
+
+    job_id = storage.enqueue_job("{}", max_attempts=2)
+    storage.fail_job(storage.claim_job(60).job_id, "boom")
+    assert storage.get_job(job_id).status == "queued"
+    storage.fail_job(storage.claim_job(60).job_id, "boom again")
+    job = storage.get_job(job_id)
+    assert (job.status, job.attempts, job.error) == ("failed", 2, "boom again")
+
+
+def test_submitted_job_runs_and_lands_in_history(monkeypatch, temp_app, fake_result_factory):
+    import backend.routers.jobs as jobs
+    import backend.storage as storage
+
+    _analyze, client = temp_app
+    fake_result = fake_result_factory()
+    monkeypatch.setattr(
+        pipeline, "parse_resume_profile_async", _async_return((fake_result.resume_profile, "{}", None))
+    )
+    monkeypatch.setattr(
+        pipeline, "parse_job_profile_async", _async_return((fake_result.job_profile, "{}", None))
+    )
+    monkeypatch.setattr(
+        pipeline,
+        "analyze_gaps_and_mapping_async",
+        _async_return((fake_result.gap_analysis, fake_result.jd_mapping_matrix, "{}", None)),
+    )
+    monkeypatch.setattr(
+        pipeline, "generate_learning_plan_async", _async_return((fake_result.learning_plan, "{}", None))
+    )
+    monkeypatch.setattr(
+        pipeline,
+        "generate_custom_resume_async",
+        _async_return((fake_result.custom_resume_markdown, "{}", None)),
+    )
+
+    resp = client.post("/jobs", json={"resume_text": "r", "jd_text": "j", "priority": 1})
+    assert resp.status_code == 202
+    job_id = resp.json()["job_id"]
+    assert resp.json()["status"] == "queued"
+
+    # 中文注释：直接驱动一个 worker 处理任务，结果经 save_analysis 落库
+    asyncio.run(jobs.workers.run_job(storage.claim_job(60)))
+
+    body = client.get(f"/jobs/{job_id}").json()
+    assert body["status"] == "succeeded"
+    assert body["result"]["custom_resume_markdown"] == "md"
+    assert storage.get_analysis(body["analysis_id"]) is not None
+    assert client.get("/jobs/missing").status_code == 404
+
+
+def test_job_rejects_caller_api_key(temp_app):
+    import backend.storage as storage
+
+    _analyze, client = temp_app
+    resp = client.post(
+        "/jobs", json={"resume_text": "r", "jd_text": "j", "llm_api_key": "sk-user-secret-1234567890"}
+    )
+    # 中文注释：任务可能被共享数据库的任一进程领取，不能携带调用方的 Key
+    assert resp.status_code == 422
+    assert storage.claim_job(60) is None
+
+
+def test_lease_renewal_survives_storage_errors(monkeypatch, temp_app):
+    import backend.job_queue as job_queue
+    import backend.storage as storage
+
+    renewals = []
+
+    def _extend(job_id, _timeout):
+        renewals.append(job_id)
+        if len(renewals) == 1:
+            raise storage.StorageError("database is locked")
+
+    monkeypatch.setattr(job_queue, "extend_job_lease", _extend)
+
+    async def _handler(_job):
+        await asyncio.sleep(0.05)
+        return "analysis"
+
+    pool = job_queue.WorkerPool(_handler, visibility_timeout=0.03)
+    job_id = storage.enqueue_job("{}")
+    asyncio.run(pool.run_job(storage.claim_job(60)))
+    # 中文注释：一次续租失败只记录日志，心跳继续续租，任务照常完成
+    assert len(renewals) >= 2
+    assert storage.get_job(job_id).status == "succeeded"
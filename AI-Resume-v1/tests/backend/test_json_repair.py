@@ -0,0 +1,45 @@
+"""JSON 修复测试：覆盖常见的 LLM 输出损坏形式。"""
+from __future__ import annotations
+
+import pytest
+
+from backend.json_repair import JSONRepairError, repair_json
+
+
+@pytest.mark.parametrize(
+    "payload, expected, repair",
+    [
+        ('说明如下：\n```json\n{"a": [1, 2,],}\n```\n以上', {"a": [1, 2]}, "trailing_commas"),
+        ('好的 {"a": 1} 希望有帮助', {"a": 1}, "surrounding_prose"),
+        ('{"md": "# 标题\n- 条目"}', {"md": "# 标题\n- 条目"}, "control_characters"),
+        ('{“title”: “后端”, "q": "他说“你好”"}', {"title": "后端", "q": "他说“你好”"}, "smart_quotes"),
+        ('{"a": {"b": [1, 2, 3', {"a": {"b": [1, 2, 3]}}, "truncation"),
+        ('{"a": 1, "b":', {"a": 1}, "truncation"),
+    ],
+)
+def test_repair_json_cases(payload, expected, repair):
+    # 中文注释：修复结果应与预期一致，并记录对应的修复类型
+    result = repair_json(payload)
+    assert result.data == expected
+    assert repair in result.repairs
+
+
+def test_repair_json_gives_up_on_garbage():
+    with pytest.raises(JSONRepairError):
+        repair_json("没有任何 JSON")
+
+
+def test_repair_json_keeps_nested_code_fences():
+    # 中文注释：字符串里的代码块不应被当作外层围栏的结束，也不应触发截断修复
+    markdown = "# 简历\n```python\nprint(1)\n```\n结尾"
+    payload = '```json\n{"custom_resume_markdown": "' + markdown + '",}\n```'
+    result = repair_json(payload)
+    assert result.data == {"custom_resume_markdown": markdown}
+    assert "truncation" not in result.repairs
+    assert "code_fence" in result.repairs
+
+
+def test_repair_json_rejects_unbalanced_closed_fence():
+    # 中文注释：围栏已闭合说明输出并未截断，结构不完整时应失败而不是截断修复
+    with pytest.raises(JSONRepairError):
+        repair_json('```json\n{"a": {"b": 1}\n```')
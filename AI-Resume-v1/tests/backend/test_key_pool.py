@@ -0,0 +1,111 @@
+"""API Key 池测试：按剩余容量与延迟分配，429 的 Key 暂时移出轮换。"""
+from __future__ import annotations
+
+import json
+import time
+
+import httpx
+import pytest
+
+import backend.llm_client as llm
+from backend import key_pool, providers, retry
+
+
+@pytest.fixture(autouse=True)
+def _isolate(monkeypatch):
+    providers.reset_breakers()
+    llm._clients.clear()
+    delays = []
+    monkeypatch.setattr(retry, "sleep", delays.append)
+    # 中文注释：加权随机改为取第一个候选，保证用例可复现
+    monkeypatch.setattr(key_pool.random, "choices", lambda population, weights: [population[0]])
+    yield delays
+    providers.reset_breakers()
+    llm._clients.clear()
+
+
+def test_load_entries_from_json_and_shorthand():
+    spec = json.dumps([{"base_url": "https://a.example", "key": "ka", "weight": 2, "rpm": 60}])
+    entries = key_pool.load_entries(spec, deepseek_keys="k1, k2", deepseek_base="https://d.example")
+    assert [(e.api_base, e.api_key, e.weight, e.rpm) for e in entries] == [
+        ("https://a.example", "ka", 2.0, 60),
+        ("https://d.example", "k1", 1.0, None),
+        ("https://d.example", "k2", 1.0, None),
+    ]
+
+
+def test_acquire_skips_cooling_and_tracks_capacity():
+    entries = [
+        key_pool.PoolEntry("deepseek", "https://a", "key-a", rpm=2),
+        key_pool.PoolEntry("deepseek", "https://b", "key-b"),
+    ]
+    pool = key_pool.KeyPool(entries)
+    lease = pool.acquire(entries)
+    assert lease.entry is entries[0]
+    assert entries[0].capacity(time.monotonic()) == 0.5
+    pool.release(lease, ok=False, status_code=429, retry_after=60)
+    assert pool.available(entries) == 1
+    assert pool.acquire(entries).entry is entries[1]
+    # 中文注释：只请求非默认地址时，仅使用该地址下的 Key
+    assert pool.candidates("deepseek", "https://b", "https://default") == [entries[1]]
+    assert pool.candidates("deepseek", "https://default", "https://default") == entries
+
+
+def test_stream_llm_rotates_key_after_429(monkeypatch, _isolate):
+    # 中文注释：第一个 Key 返回 429 后立即换 Key 重试，无需等满 Retry-After
+    entries = [
+        key_pool.PoolEntry("deepseek", llm.API_BASE_URL, "key-one-123456"),
+        key_pool.PoolEntry("deepseek", llm.API_BASE_URL, "key-two-123456"),
+    ]
+    monkeypatch.setattr(key_pool, "pool", key_pool.KeyPool(entries))
+    seen = []
+
+    def _handler(request):
+        key = request.headers["Authorization"].split()[-1]
+        seen.append(key)
+        if key == "key-one-123456":
+            return httpx.Response(429, headers={"retry-after": "20"}, text="limited")
+        chunk = {"choices": [{"delta": {"content": "ok"}, "finish_reason": "stop"}]}
+        return httpx.Response(200, text=f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n")
+
+    monkeypatch.setattr(
+        llm,
+        "get_http_client",
+        lambda base, provider="deepseek": httpx.Client(
+            base_url=base, transport=httpx.MockTransport(_handler)
+        ),
+    )
+    assert llm.call_llm("p") == "ok"
+    assert seen == ["key-one-123456", "key-two-123456"]
+    assert _isolate[0] < 20
+    snapshot = {item["key"]: item for item in key_pool.pool.snapshot()}
+    assert snapshot["key-on...3456"]["cooldown_seconds"] > 0
+    assert snapshot["key-tw...3456"]["latency_seconds"] is not None
+
+
+def test_non_stream_call_leases_from_pool(monkeypatch, _isolate):
+    # 中文注释：非流式调用同样从 Key 池租用 Key，429 后换 Key 并释放租约
+    entries = [
+        key_pool.PoolEntry("deepseek", llm.API_BASE_URL, "key-one-123456"),
+        key_pool.PoolEntry("deepseek", llm.API_BASE_URL, "key-two-123456"),
+    ]
+    monkeypatch.setattr(key_pool, "pool", key_pool.KeyPool(entries))
+    seen = []
+
+    def _handler(request):
+        key = request.headers["Authorization"].split()[-1]
+        seen.append(key)
+        if key == "key-one-123456":
+            return httpx.Response(429, headers={"retry-after": "20"}, text="limited")
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    monkeypatch.setattr(
+        llm,
+        "get_http_client",
+        lambda base, provider="deepseek": httpx.Client(
+            base_url=base, transport=httpx.MockTransport(_handler)
+        ),
+    )
+    assert llm.call_llm("p", stream=False) == "ok"
+    assert seen == ["key-one-123456", "key-two-123456"]
+    assert all(entry.in_flight == 0 for entry in entries)
@@ -0,0 +1,149 @@
+"""LLM 响应缓存测试，覆盖内存/SQLite 两级命中、TTL 与绕过开关。"""
+from __future__ import annotations
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import backend.llm_cache as llm_cache
+import backend.metrics as metrics
+import backend.pipeline as pipeline
+
+
+@pytest.fixture()
+def cache(monkeypatch):
+    # 中文注释：SQLite 层替换为字典，验证两级逻辑而不依赖真实数据库
+    rows: dict[str, object] = {}
+
+    class _Row:
+        def __init__(self, content, reasoning, expires_at):
+            self.content = content
+            self.reasoning = reasoning
+            self.expires_at = expires_at
+
+    def _get(key):
+        row = rows.get(key)
+        if row is None or row.expires_at <= datetime.utcnow():
+            return None
+        return row
+
+    def _put(key, content, reasoning, expires_at):
+        rows[key] = _Row(content, reasoning, expires_at)
+
+    def _evict(max_entries):
+        evictions.append(max_entries)
+        return 0
+
+    evictions: list[int] = []
+
+    monkeypatch.setattr(llm_cache, "get_llm_cache_entry", _get)
+    monkeypatch.setattr(llm_cache, "put_llm_cache_entry", _put)
+    monkeypatch.setattr(llm_cache, "evict_llm_cache_entries", _evict)
+    metrics.reset()
+    instance = llm_cache.ResponseCache(
+        memory_entries=2, ttl_seconds=60, max_entries=10, evict_every=3
+    )
+    instance.rows = rows
+    instance.evictions = evictions
+    return instance
+
+
+def test_cache_key_depends_on_model_and_temperature():
+    base = dict(model="deepseek-chat", api_base="https://api.deepseek.com", temperature=0.2)
+    key = llm_cache.cache_key("p", **base)
+    assert key == llm_cache.cache_key("p", **{**base, "api_base": "https://api.deepseek.com/"})
+    assert key != llm_cache.cache_key("p", **{**base, "model": "deepseek-reasoner"})
+    assert key != llm_cache.cache_key("p", **{**base, "temperature": None})
+
+
+def test_memory_then_sqlite_tier(cache):
+    assert cache.get("k") is None
+    cache.put("k", llm_cache.CachedResponse("v"))
+    assert cache.get("k").content == "v"
+    # 中文注释：内存层淘汰后从 SQLite 层回填
+    cache.put("a", llm_cache.CachedResponse("1"))
+    cache.put("b", llm_cache.CachedResponse("2"))
+    assert cache.get("k").content == "v"
+    counters = metrics.snapshot()["counters"]
+    assert counters['llm_cache_hits_total{tier="memory"}'] == 1
+    assert counters['llm_cache_hits_total{tier="sqlite"}'] == 1
+    assert counters["llm_cache_misses_total"] == 1
+
+
+def test_async_tier_and_periodic_eviction(cache):
+    async def _run():
+        await cache.aput("k", llm_cache.CachedResponse("v"))
+        cache.clear()
+        # 中文注释：协程路径的 SQLite 读写放到线程中执行；每 3 次写入才裁剪一次表
+        hit = await cache.aget("k")
+        await cache.aput("a", llm_cache.CachedResponse("1"))
+        return hit
+
+    assert asyncio.run(_run()).content == "v"
+    assert cache.evictions == []
+    cache.put("b", llm_cache.CachedResponse("2"))
+    assert cache.evictions == [10]
+
+
+def test_expired_entries_miss(cache):
+    cache.put("k", llm_cache.CachedResponse("v"))
+    cache.clear()
+    cache.rows["k"].expires_at = datetime.utcnow() - timedelta(seconds=1)
+    assert cache.get("k") is None
+
+
+def test_stage_uses_cache_and_bypass(monkeypatch, cache):
+    monkeypatch.setattr(llm_cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(llm_cache, "response_cache", cache)
+    monkeypatch.setattr(pipeline.prompts, "_render_template", lambda name, **_: name)
+    calls = []
+
+    def _fake_call(*_, **__):
+        calls.append(1)
+        return json.dumps({"learning_plan": {"phases": []}})
+
+    monkeypatch.setattr(pipeline, "_call_with_config", _fake_call)
+    gaps = pipeline.GapAnalysisResult(gaps=[])
+    pipeline.generate_learning_plan(gaps)
+    pipeline.generate_learning_plan(gaps)
+    assert len(calls) == 1
+    pipeline.generate_learning_plan(gaps, llm_config={"bypass_cache": True})
+    assert len(calls) == 2
+
+
+def test_invalid_output_is_not_cached(monkeypatch, cache):
+    monkeypatch.setattr(llm_cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(llm_cache, "response_cache", cache)
+    monkeypatch.setattr(pipeline.prompts, "_render_template", lambda name, **_: name)
+    monkeypatch.setattr(pipeline, "_call_with_config", lambda *_, **__: "{}")
+    with pytest.raises(pipeline.PipelineError):
+        pipeline.generate_learning_plan(pipeline.GapAnalysisResult(gaps=[]))
+    assert cache.rows == {}
+
+
+def test_cached_stage_replays_as_single_delta(monkeypatch, cache):
+    monkeypatch.setattr(llm_cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(llm_cache, "response_cache", cache)
+    monkeypatch.setattr(pipeline.prompts, "_render_template", lambda name, **_: name)
+    payload = json.dumps({"custom_resume_markdown": "md"})
+
+    async def _fake_call(*_, **__):
+        return payload
+
+    monkeypatch.setattr(pipeline, "_call_with_config_async", _fake_call)
+    asyncio.run(pipeline.generate_custom_resume_async("r", "j"))
+
+    async def _must_not_call(*_, **__):
+        raise AssertionError("cache hit expected")
+
+    monkeypatch.setattr(pipeline, "_call_with_config_async", _must_not_call)
+    seen = []
+    markdown, raw, _ = asyncio.run(
+        pipeline.generate_custom_resume_async(
+            "r", "j", return_raw=True, on_delta=lambda stage, d: seen.append((stage, d.text))
+        )
+    )
+    assert markdown == "md"
+    assert seen == [("custom_resume", payload)]
@@ -1,11 +1,37 @@
 """LLM 客户端测试，覆盖 DeepSeek 流式与 Anthropic 分支。"""
 from __future__ import annotations
 
+import asyncio
 import json
 
+import httpx
 import pytest
 
 import backend.llm_client as llm
+from backend import metrics, providers, retry
+
+
+@pytest.fixture(autouse=True)
+def _reset_client_pool():
+    # 中文注释：连接池为进程级缓存，每个用例前后清空，避免假客户端串用
+    llm._clients.clear()
+    providers.reset_breakers()
+    yield
+    llm._clients.clear()
+    providers.reset_breakers()
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff_sleep(monkeypatch):
+    # 中文注释：重试退避不真正等待，记录每次等待时长供断言
+    delays = []
+
+    async def _asleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(retry, "sleep", delays.append)
+    monkeypatch.setattr(retry, "asleep", _asleep)
+    return delays
 
 
 class _FakeStreamResponse:
@@ -15,6 +41,7 @@ class _FakeStreamResponse:
         self._lines = lines
         self.is_error = is_error
         self.status_code = status
+        self.headers = {}
         self._text = text or ""
 
     def __enter__(self):
@@ -89,6 +116,7 @@ def test_call_llm_stream_success(monkeypatch):
         (),
         {
             "Client": lambda *_, **__: fake_client,
+            "Limits": lambda **kw: kw,
             "HTTPStatusError": _HTTPStatusError,
             "HTTPError": _HTTPError,
             "ResponseNotRead": _ResponseNotRead,
@@ -120,6 +148,7 @@ def test_call_llm_stream_provider_error(monkeypatch):
         (),
         {
             "Client": lambda *_, **__: fake_client,
+            "Limits": lambda **kw: kw,
             "HTTPStatusError": _HTTPStatusError,
             "HTTPError": _HTTPError,
             "ResponseNotRead": _ResponseNotRead,
@@ -160,12 +189,255 @@ def test_call_llm_anthropic(monkeypatch):
 
             return _Resp()
 
-    monkeypatch.setattr(llm, "httpx", type("X", (), {"Client": lambda *_, **__: _AnthropicClient()}))
+    monkeypatch.setattr(
+        llm,
+        "httpx",
+        type("X", (), {"Client": lambda *_, **__: _AnthropicClient(), "Limits": lambda **kw: kw}),
+    )
     out = llm.call_llm("p", model="claude-3", api_base="https://api.anthropic.com", stream=False)
     assert out == "reply"
 
 
+def test_call_llm_async_stream_success(monkeypatch):
+    # 中文注释：异步路径使用 httpx.MockTransport 返回 SSE 流
+    data1 = {"choices": [{"delta": {"content": "hello ", "reasoning_content": "why "}}]}
+    data2 = {"choices": [{"delta": {"content": "world"}}]}
+    body = "\n".join(
+        [f"data: {json.dumps(data1)}", "", f"data: {json.dumps(data2)}", "", "data: [DONE]", ""]
+    )
+
+    def _handler(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, text=body)
+
+    monkeypatch.setattr(
+        llm,
+        "get_async_http_client",
+        lambda base, provider="deepseek": httpx.AsyncClient(
+            base_url=base, transport=httpx.MockTransport(_handler)
+        ),
+    )
+    content, reasoning = asyncio.run(
+        llm.call_llm_async("p", api_key="k", include_reasoning=True)
+    )
+    assert content == "hello world"
+    assert reasoning == "why"
+
+
+_ANTHROPIC_EVENTS = [
+    {"type": "message_start", "message": {"id": "m1", "content": []}},
+    {"type": "content_block_start", "index": 0, "content_block": {"type": "thinking", "thinking": ""}},
+    {"type": "content_block_delta", "index": 0, "delta": {"type": "thinking_delta", "thinking": "plan"}},
+    {"type": "content_block_start", "index": 1, "content_block": {"type": "text", "text": ""}},
+    {"type": "ping"},
+    {"type": "content_block_delta", "index": 1, "delta": {"type": "text_delta", "text": "{\"a\""}},
+    {"type": "content_block_delta", "index": 1, "delta": {"type": "text_delta", "text": ": 1}"}},
+    {"type": "message_delta", "delta": {"stop_reason": "end_turn"}},
+    {"type": "message_stop"},
+]
+
+
+def _anthropic_sse_body(events):
+    return "".join(f"event: {e['type']}\ndata: {json.dumps(e)}\n\n" for e in events)
+
+
+def test_stream_llm_anthropic_deltas(monkeypatch):
+    # 中文注释：Anthropic SSE 逐事件解析，text/thinking 增量与 DeepSeek 接口一致
+    captured = {}
+
+    def _handler(request):
+        captured["payload"] = json.loads(request.content)
+        return httpx.Response(200, text=_anthropic_sse_body(_ANTHROPIC_EVENTS))
+
+    monkeypatch.setattr(
+        llm,
+        "get_http_client",
+        lambda base, provider="deepseek": httpx.Client(
+            base_url=base, transport=httpx.MockTransport(_handler)
+        ),
+    )
+    deltas = list(
+        llm.stream_llm("p", model="claude-3", api_base="https://api.anthropic.com", include_reasoning=True)
+    )
+    assert [(d.kind, d.text) for d in deltas] == [
+        ("reasoning", "plan"),
+        ("content", '{"a"'),
+        ("content", ": 1}"),
+    ]
+    assert captured["payload"]["stream"] is True
+    assert captured["payload"]["max_tokens"] == llm.ANTHROPIC_MAX_TOKENS
+
+
+def test_call_llm_async_anthropic_stream_error_event(monkeypatch):
+    # 中文注释：流中 error 事件应转为 LLMClientError
+    events = [
+        {"type": "message_start", "message": {"id": "m1"}},
+        {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}},
+    ]
+    monkeypatch.setattr(
+        llm,
+        "get_async_http_client",
+        lambda base, provider="deepseek": httpx.AsyncClient(
+            base_url=base,
+            transport=httpx.MockTransport(lambda _req: httpx.Response(200, text=_anthropic_sse_body(events))),
+        ),
+    )
+    with pytest.raises(llm.LLMClientError, match="Overloaded"):
+        asyncio.run(llm.call_llm_async("p", model="claude-3", api_base="https://api.anthropic.com"))
+
+
+def _chat_sse_body(text, finish_reason):
+    chunks = [
+        {"choices": [{"delta": {"content": text}, "finish_reason": None}]},
+        {"choices": [{"delta": {}, "finish_reason": finish_reason}]},
+    ]
+    return "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+
+
+def test_stream_llm_continues_truncated_reply(monkeypatch):
+    # 中文注释：finish_reason 为 length 时自动续写，并与已输出内容拼接
+    requests = []
+    replies = iter([_chat_sse_body('{"a": "hel', "length"), _chat_sse_body('lo"}', "stop")])
+
+    def _handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, text=next(replies))
+
+    monkeypatch.setattr(
+        llm,
+        "get_http_client",
+        lambda base, provider="deepseek": httpx.Client(
+            base_url=base, transport=httpx.MockTransport(_handler)
+        ),
+    )
+    content = llm.call_llm("p", api_key="k", max_tokens=16, json_mode=True)
+    assert content == '{"a": "hello"}'
+    assert requests[0]["max_tokens"] == 16
+    assert requests[0]["response_format"] == {"type": "json_object"}
+    # 续写请求携带已生成的部分输出，且不再要求 JSON 对象格式
+    assert requests[1]["messages"][2] == {"role": "assistant", "content": '{"a": "hel'}
+    assert "response_format" not in requests[1]
+
+
+def test_stream_llm_anthropic_json_prefill(monkeypatch):
+    # 中文注释：Anthropic 无 response_format，JSON 模式通过预填 "{" 实现
+    captured = {}
+    events = [
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "\"a\": 1}"}},
+        {"type": "message_delta", "delta": {"stop_reason": "end_turn"}},
+        {"type": "message_stop"},
+    ]
+
+    def _handler(request):
+        captured["payload"] = json.loads(request.content)
+        return httpx.Response(200, text=_anthropic_sse_body(events))
+
+    monkeypatch.setattr(
+        llm,
+        "get_http_client",
+        lambda base, provider="deepseek": httpx.Client(
+            base_url=base, transport=httpx.MockTransport(_handler)
+        ),
+    )
+    out = llm.call_llm(
+        "p", model="claude-3", api_base="https://api.anthropic.com", json_mode=True, max_tokens=512
+    )
+    assert out == '{"a": 1}'
+    assert captured["payload"]["messages"][-1] == {"role": "assistant", "content": "{"}
+    assert captured["payload"]["max_tokens"] == 512
+
+
+def test_http_client_pool_reuse_and_eviction(monkeypatch):
+    # 中文注释：同一 (api_base, provider) 复用客户端，超过上限时关闭最久未用的池
+    class _PooledClient:
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+            self.closed = False
+
+        def close(self):
+            self.closed = True
+
+    monkeypatch.setattr(
+        llm, "httpx", type("X", (), {"Client": _PooledClient, "Limits": lambda **kw: kw})
+    )
+    monkeypatch.setattr(llm, "POOL_MAX_CLIENTS", 2)
+    first = llm.get_http_client("https://a.example/")
+    assert llm.get_http_client("https://a.example") is first
+    assert llm.get_http_client("https://a.example", provider="anthropic") is not first
+    assert first.kwargs["limits"]["max_connections"] == llm.POOL_MAX_CONNECTIONS
+    llm.get_http_client("https://b.example")
+    assert first.closed is True
+    assert len(llm._clients) == 2
+    llm.close_http_clients()
+    assert llm._clients == {}
+
+
 def test_mask_api_key():
     # 中文注释：key 过短时仍应返回掩码
     assert llm.mask_api_key("abcd") == "ab...cd"
     assert llm.mask_api_key("a" * 12).startswith("aaaaaa")
+
+
+def test_stream_llm_retries_429_with_retry_after(monkeypatch, _no_backoff_sleep):
+    # 中文注释：429 在首个增量之前重试，等待时间不短于 Retry-After，重试以 retry 增量告知
+    replies = iter(
+        [
+            httpx.Response(429, headers={"retry-after": "2"}, text="slow down"),
+            httpx.Response(200, text=_chat_sse_body("ok", "stop")),
+        ]
+    )
+    monkeypatch.setattr(
+        llm,
+        "get_http_client",
+        lambda base, provider="deepseek": httpx.Client(
+            base_url=base, transport=httpx.MockTransport(lambda _req: next(replies))
+        ),
+    )
+    metrics.reset()
+    deltas = list(llm.stream_llm("p", api_key="k"))
+    assert [d.kind for d in deltas] == ["retry", "content"]
+    assert deltas[0].text == "429" and deltas[0].attempt == 2
+    assert _no_backoff_sleep == [deltas[0].delay] and deltas[0].delay >= 2
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]['llm_retries_total{provider="deepseek",reason="429"}'] == 1
+    assert snapshot["summaries"]['llm_request_attempts{provider="deepseek"}']["max"] == 2
+
+
+def test_call_llm_does_not_retry_client_errors(monkeypatch, _no_backoff_sleep):
+    # 中文注释：400 等不可重试错误立即抛出；5xx 用尽单次调用的尝试次数后抛出
+    calls = []
+
+    def _handler(status):
+        def _inner(_req):
+            calls.append(status)
+            return httpx.Response(status, text="bad")
+
+        return _inner
+
+    for status in (400, 503):
+        monkeypatch.setattr(
+            llm,
+            "get_http_client",
+            lambda base, provider="deepseek", status=status: httpx.Client(
+                base_url=base, transport=httpx.MockTransport(_handler(status))
+            ),
+        )
+        with pytest.raises(llm.LLMClientError) as excinfo:
+            llm.call_llm("p", api_key="k", stream=False)
+        assert excinfo.value.status_code == status
+    assert calls.count(400) == 1
+    assert calls.count(503) == retry.RETRY_MAX_ATTEMPTS
+    assert len(_no_backoff_sleep) == retry.RETRY_MAX_ATTEMPTS - 1
+
+
+def test_retry_budget_backoff_and_retry_after():
+    # 中文注释：退避上限封顶，预算用尽或 Retry-After 过长时放弃重试
+    budget = retry.RetryBudget(max_attempts=10, retries_left=1, base_delay=1, max_delay=4)
+    assert all(0 <= budget.backoff(attempt) <= 4 for attempt in range(1, 8))
+    error = llm.LLMClientError("x", status_code=503, retryable=True)
+    assert budget.next_delay(error, 1) is not None
+    assert budget.next_delay(error, 2) is None
+    late = llm.LLMClientError("x", status_code=429, retry_after=120, retryable=True)
+    assert retry.RetryBudget().next_delay(late, 1) is None
+    assert retry.parse_retry_after({"retry-after-ms": "1500"}) == 1.5
+    assert retry.parse_retry_after({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0.0
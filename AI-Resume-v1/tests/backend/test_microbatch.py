@@ -0,0 +1,121 @@
+"""微批测试：窗口内的兼容小提示合并为一次请求，按任务拆分校验，失败时回退为单独调用。"""
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+import backend.pipeline as pipeline
+from backend import metrics, microbatch
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    metrics.reset()
+
+
+def _check(raw):
+    if "answer" not in json.loads(raw):
+        raise ValueError("bad answer")
+
+
+def test_window_packs_prompts_into_one_request():
+    batcher = microbatch.MicroBatcher(window=0.01, max_size=8)
+    requests = []
+
+    async def _call(prompt, size):
+        requests.append((prompt, size))
+        if size == 1:
+            return json.dumps({"answer": 0})
+        return json.dumps({"results": [{"answer": i} for i in range(size)]})
+
+    async def _run():
+        return await asyncio.gather(
+            batcher.submit("k", "prompt-a", call=_call, check=_check),
+            batcher.submit("k", "prompt-b", call=_call, check=_check),
+            # 中文注释：配置不同（键不同）的提示不会与其他用户的合并
+            batcher.submit("other", "prompt-c", call=_call, check=_check),
+        )
+
+    results = asyncio.run(_run())
+    assert [json.loads(r)["answer"] for r in results] == [0, 1, 0]
+    assert sorted(size for _, size in requests) == [1, 2]
+    batched = next(prompt for prompt, size in requests if size == 2)
+    assert batched.index("prompt-a") < batched.index("prompt-b")
+    assert '"results"' in batched
+
+
+def test_unsplittable_or_invalid_answers_fall_back_to_single_calls():
+    batcher = microbatch.MicroBatcher(window=0.01, max_size=2)
+    replies = iter(
+        [
+            # 中文注释：第一批结果数量不对，全部回退；第二批只有一个结果不合格，只回退它
+            json.dumps({"results": [{"answer": 1}]}),
+            json.dumps({"results": [{"answer": 1}, {"wrong": 2}]}),
+        ]
+    )
+    singles = []
+
+    async def _call(prompt, size):
+        if size == 1:
+            singles.append(prompt)
+            return json.dumps({"answer": prompt})
+        return next(replies)
+
+    async def _run():
+        first = await asyncio.gather(
+            batcher.submit("k", "a", call=_call, check=_check),
+            batcher.submit("k", "b", call=_call, check=_check),
+        )
+        second = await asyncio.gather(
+            batcher.submit("k", "c", call=_call, check=_check),
+            batcher.submit("k", "d", call=_call, check=_check),
+        )
+        return first + second
+
+    results = asyncio.run(_run())
+    assert [json.loads(r)["answer"] for r in results] == ["a", "b", 1, "d"]
+    assert singles == ["a", "b", "d"]
+    counters = metrics.snapshot()["counters"]
+    assert counters['llm_microbatch_fallbacks_total{reason="split"}'] == 2
+    assert counters['llm_microbatch_fallbacks_total{reason="invalid"}'] == 1
+
+
+def test_job_parse_stages_share_a_request(monkeypatch, fake_result_factory):
+    profile = fake_result_factory().job_profile.model_dump()
+    requests = []
+
+    async def _fake_llm(prompt, **kwargs):
+        requests.append((prompt, kwargs))
+        count = prompt.count("=== 任务 ")
+        return json.dumps({"results": [{"job_profile": profile}] * count}, ensure_ascii=False)
+
+    monkeypatch.setattr(microbatch, "MICROBATCH_ENABLED", True)
+    monkeypatch.setattr(microbatch, "batcher", microbatch.MicroBatcher(window=0.01))
+    monkeypatch.setattr(pipeline, "call_llm_async", _fake_llm)
+    config = {"bypass_cache": True}
+    deltas = []
+
+    async def _run():
+        return await asyncio.gather(
+            pipeline.parse_job_profile_async("JD one", llm_config=config),
+            pipeline.parse_job_profile_async(
+                "JD two",
+                llm_config=config,
+                return_raw=True,
+                on_delta=lambda stage, delta: deltas.append((stage, delta.kind)),
+            ),
+        )
+
+    (first, _, _), (second, raw, reasoning) = asyncio.run(_run())
+    assert first.title == second.title == profile["title"]
+    assert len(requests) == 1
+    prompt, kwargs = requests[0]
+    assert "JD one" in prompt and "JD two" in prompt
+    # 中文注释：批量请求的输出预算按任务数放大，结果整体回放给流式调用方
+    assert kwargs["max_tokens"] == 4096
+    assert kwargs["stage"] == "parse_job_batch"
+    assert json.loads(raw)["job_profile"]["title"] == profile["title"]
+    assert reasoning is None
+    assert deltas == [("parse_job", "content")]
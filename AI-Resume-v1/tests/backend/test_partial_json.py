@@ -0,0 +1,47 @@
+"""增量 JSON 解析测试：子对象闭合即输出，并按 schema 校验。"""
+from __future__ import annotations
+
+import json
+
+from backend.partial_json import IncrementalJSONParser, PartialStageParser
+
+
+def _feed_in_chunks(parser, text, size=3):
+    found = []
+    for start in range(0, len(text), size):
+        found.extend(parser.feed(text[start : start + size]))
+    return found
+
+
+def test_incremental_parser_reports_paths_and_ignores_fences():
+    # 中文注释：代码块围栏与字符串内的括号不应影响解析
+    text = '```json\n{"a": {"b": [{"x": "}{"}, {"y": 2}]}, "c": 1}\n```'
+    closed = _feed_in_chunks(IncrementalJSONParser(), text)
+    assert closed[0] == (("a", "b", 0), {"x": "}{"})
+    assert closed[1] == (("a", "b", 1), {"y": 2})
+    assert closed[-1][0] == ()
+
+
+def test_partial_stage_parser_emits_validated_items_before_end():
+    payload = {
+        "learning_plan": {
+            "phases": [
+                {"name": "基础", "duration_weeks": 2, "goals": [], "tasks": []},
+                {"name": "缺字段"},
+            ]
+        }
+    }
+    text = json.dumps(payload, ensure_ascii=False)
+    parser = PartialStageParser("learning_plan")
+    # 中文注释：第一个阶段闭合后、整个文档结束前就应输出
+    cut = text.index("}", text.index("基础")) + 1
+    first = parser.feed(text[:cut])
+    assert [(item.path, item.type) for item in first] == [(("learning_plan", "phases", 0), "LearningPhase")]
+    # 中文注释：不符合 schema 的子对象被丢弃
+    assert parser.feed(text[cut:]) == []
+
+
+def test_partial_stage_parser_normalizes_coverage():
+    text = '{"jd_mapping_matrix": {"resume_mapping": [{"jd_point_id": "p", "coverage": "strong"}]}}'
+    items = PartialStageParser("gap_analysis").feed(text)
+    assert items[0].data["coverage"] == "full"
@@ -22,11 +22,22 @@ def test_loads_invalid_json():
         pipeline._loads("```json {bad```")
 
 
+def test_loads_repairs_and_counts(monkeypatch):
+    # 中文注释：可修复的 JSON 不再导致阶段失败，修复类型计入指标
+    from backend import metrics
+
+    metrics.reset()
+    assert pipeline._loads('结果：{"a": [1,],}') == {"a": [1]}
+    counters = metrics.snapshot()["counters"]
+    assert counters['llm_json_repairs_total{repair="trailing_commas"}'] == 1
+    assert counters["llm_json_repaired_total"] == 1
+
+
 def test_normalize_coverage_value():
-    assert pipeline._normalize_coverage_value("Strong") == "full"
-    assert pipeline._normalize_coverage_value("weak") == "partial"
-    assert pipeline._normalize_coverage_value("missing") == "none"
-    assert pipeline._normalize_coverage_value(None) == "none"
+    assert pipeline.normalize_coverage_value("Strong") == "full"
+    assert pipeline.normalize_coverage_value("weak") == "partial"
+    assert pipeline.normalize_coverage_value("missing") == "none"
+    assert pipeline.normalize_coverage_value(None) == "none"
 
 
 def test_parse_resume_and_job_success(monkeypatch):
@@ -76,6 +87,74 @@ def test_generate_custom_resume_type_error(monkeypatch):
         pipeline.generate_custom_resume("r", "j")
 
 
+def test_run_full_analysis_async_composes(monkeypatch):
+    # 中文注释：异步流水线与同步版本共享解析逻辑，mock 异步调用层即可
+    import asyncio
+
+    # 中文注释：_render_template 被替换为返回模板名，按模板名返回对应阶段输出
+    responses = {
+        "parse_resume": {"resume_profile": {"profile_type": "resume", "title": "r", "years_experience": 1}},
+        "parse_job": {"job_profile": {"profile_type": "job", "title": "j", "years_experience": 2}},
+        "gap_analysis": {"gap_analysis": {"gaps": []}, "jd_mapping_matrix": {"jd_points": [], "resume_mapping": []}},
+        "learning_plan": {"learning_plan": {"phases": []}},
+        "custom_resume": {"custom_resume_markdown": "md"},
+    }
+
+    async def _fake_call(prompt, *_, **__):
+        return json.dumps(responses[prompt])
+
+    monkeypatch.setattr(pipeline, "_call_with_config_async", _fake_call)
+    monkeypatch.setattr(pipeline.prompts, "_render_template", lambda name, **_: name)
+    result = asyncio.run(pipeline.run_full_analysis_async("r", "j"))
+    assert result.job_profile.title == "j"
+    assert result.custom_resume_markdown == "md"
+
+
+def test_normalize_profile_text_folds_whitespace():
+    text = "  张三  后端\r\n\r\n\r\n\n 技能：\tPython  "
+    assert pipeline.normalize_profile_text(text) == "张三 后端\n\n技能： Python"
+
+
+def test_parse_resume_profile_prompt_is_normalized(monkeypatch):
+    # 中文注释：仅空白不同的简历渲染出相同提示词，从而共享缓存键
+    prompts_seen = []
+
+    def _fake_call(prompt, *_, **__):
+        prompts_seen.append(prompt)
+        return json.dumps({"resume_profile": {"profile_type": "resume", "title": "r", "years_experience": 1}})
+
+    monkeypatch.setattr(pipeline, "_call_with_config", _fake_call)
+    monkeypatch.setattr(pipeline.prompts, "_render_template", lambda name, **kw: f"{name}:{kw['resume_text']}")
+    pipeline.parse_resume_profile("a  b\n\n\n c")
+    pipeline.parse_resume_profile("a b\r\n\r\nc  ")
+    assert prompts_seen[0] == prompts_seen[1] == "parse_resume:a b\n\nc"
+
+
+def test_call_with_config_async_forwards_deltas(monkeypatch):
+    # 中文注释：提供 on_delta 时逐块回调，同时仍返回拼接后的完整输出
+    import asyncio
+
+    from backend.llm_client import LLMDelta
+
+    async def _fake_stream(*_, **__):
+        for delta in (LLMDelta("reasoning", "think"), LLMDelta("content", "{}")):
+            yield delta
+
+    monkeypatch.setattr(pipeline, "stream_llm_async", _fake_stream)
+    seen = []
+    raw = asyncio.run(
+        pipeline._call_with_config_async(
+            "p",
+            None,
+            include_reasoning=True,
+            stage="learning_plan",
+            on_delta=lambda stage, delta: seen.append((stage, delta.kind)),
+        )
+    )
+    assert raw == ("{}", "think")
+    assert seen == [("learning_plan", "reasoning"), ("learning_plan", "content")]
+
+
 def test_run_full_analysis_composes(monkeypatch):
     # 中文注释：组合路径中各子函数已被 mock，验证返回结构
     profile = Profile(
@@ -92,3 +171,82 @@ def test_run_full_analysis_composes(monkeypatch):
     monkeypatch.setattr(pipeline, "generate_custom_resume", lambda *_, **__: ("md", None, None))
     result = pipeline.run_full_analysis("r", "j")
     assert result.custom_resume_markdown == "md"
+
+
+def test_run_stage_graph_runs_independent_stages_concurrently():
+    # 中文注释：无依赖阶段并发执行，完成回调按完成顺序触发
+    import asyncio
+
+    order = []
+
+    async def _slow():
+        await asyncio.sleep(0.05)
+        return "slow"
+
+    async def _fast():
+        return "fast"
+
+    async def _after(slow):
+        return slow + "+after"
+
+    stages = [
+        pipeline.Stage("slow", _slow),
+        pipeline.Stage("fast", _fast),
+        pipeline.Stage("after", _after, inputs=("slow",)),
+    ]
+    outcomes = asyncio.run(
+        pipeline.run_stage_graph(stages, on_complete=lambda o: order.append(o.name))
+    )
+    assert order == ["fast", "slow", "after"]
+    assert outcomes["after"].value == "slow+after"
+
+
+def test_run_stage_graph_timeout_returns_partial_results():
+    # 中文注释：超时阶段的下游被跳过，独立分支仍返回结果
+    import asyncio
+
+    async def _hang():
+        await asyncio.sleep(1)
+
+    async def _ok():
+        return "md"
+
+    async def _downstream(hang):
+        return hang
+
+    stages = [
+        pipeline.Stage("hang", _hang, timeout=0.01),
+        pipeline.Stage("downstream", _downstream, inputs=("hang",)),
+        pipeline.Stage("ok", _ok),
+    ]
+    outcomes = asyncio.run(pipeline.run_stage_graph(stages))
+    assert outcomes["hang"].timed_out
+    assert outcomes["downstream"].skipped
+    assert outcomes["ok"].value == "md"
+
+    with pytest.raises(pipeline.StageTimeoutError):
+        asyncio.run(pipeline.run_stage_graph(stages, fail_fast=True))
+
+
+def test_run_stage_graph_schema_invalid_stage_fails_alone(monkeypatch):
+    # 中文注释：阶段输出不符合 schema 时只让该阶段失败，不从 run_stage_graph 抛出
+    import asyncio
+    import json
+
+    async def _fake_llm(prompt, **kwargs):
+        return json.dumps({"learning_plan": {"phases": "not-a-list"}})
+
+    monkeypatch.setattr(pipeline, "call_llm_async", _fake_llm)
+
+    async def _plan():
+        return await pipeline.generate_learning_plan_async(
+            pipeline.GapAnalysisResult.model_validate({}), llm_config={"bypass_cache": True}
+        )
+
+    async def _ok():
+        return "md"
+
+    stages = [pipeline.Stage("learning_plan", _plan), pipeline.Stage("ok", _ok)]
+    outcomes = asyncio.run(pipeline.run_stage_graph(stages))
+    assert isinstance(outcomes["learning_plan"].error, pipeline.PipelineError)
+    assert outcomes["ok"].value == "md"
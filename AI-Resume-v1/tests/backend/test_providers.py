@@ -0,0 +1,139 @@
+"""熔断器与故障转移测试。"""
+from __future__ import annotations
+
+import json
+
+import httpx
+import pytest
+
+import backend.llm_client as llm
+from backend import providers, retry
+
+
+@pytest.fixture(autouse=True)
+def _isolate(monkeypatch):
+    # 中文注释：熔断器为进程级状态，每个用例前后清空；重试不真正等待
+    providers.reset_breakers()
+    llm._clients.clear()
+    monkeypatch.setattr(retry, "sleep", lambda _delay: None)
+    yield
+    providers.reset_breakers()
+    llm._clients.clear()
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_half_opens_and_closes(monkeypatch):
+    # 中文注释：错误率达到阈值后打开；冷却后仅放行一个探测请求，成功则关闭
+    monkeypatch.setattr(providers, "BREAKER_MIN_CALLS", 4)
+    clock = _Clock()
+    breaker = providers.CircuitBreaker("ep", clock=clock)
+    for ok in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(ok)
+    assert breaker.state == providers.OPEN
+    assert not breaker.allow()
+
+    clock.now += providers.BREAKER_OPEN_SECONDS
+    assert breaker.allow()
+    assert breaker.state == providers.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record(False)
+    assert breaker.state == providers.OPEN
+
+    clock.now += providers.BREAKER_OPEN_SECONDS
+    assert breaker.allow()
+    breaker.record(True, latency=0.5)
+    assert breaker.state == providers.CLOSED
+
+
+def test_slow_first_token_counts_as_failure(monkeypatch):
+    monkeypatch.setattr(providers, "BREAKER_MIN_CALLS", 2)
+    breaker = providers.CircuitBreaker("ep")
+    breaker.record(True, latency=providers.BREAKER_SLOW_SECONDS + 1)
+    breaker.record(True, latency=providers.BREAKER_SLOW_SECONDS + 1)
+    assert breaker.state == providers.OPEN
+
+
+def test_parse_fallback_chain():
+    assert providers.parse_fallback_chain(
+        "anthropic:claude-3@https://a.example, deepseek:deepseek-chat"
+    ) == [("anthropic", "claude-3", "https://a.example"), ("deepseek", "deepseek-chat", None)]
+    with pytest.raises(ValueError):
+        providers.parse_fallback_chain("deepseek")
+
+
+def _chat_ok(text):
+    chunk = {"choices": [{"delta": {"content": text}, "finish_reason": "stop"}]}
+    return f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n"
+
+
+def test_stream_llm_fails_over_and_skips_open_breaker(monkeypatch):
+    # 中文注释：主端点 503 时转到备用端点；主端点熔断后不再发请求，直接走备用
+    monkeypatch.setattr(providers, "FALLBACK_CHAIN", "deepseek:backup-model@https://backup.example")
+    monkeypatch.setattr(providers, "BREAKER_MIN_CALLS", 1)
+    hits = []
+
+    def _handler(request):
+        hits.append(request.url.host)
+        if request.url.host == "primary.example":
+            return httpx.Response(503, text="down")
+        return httpx.Response(200, text=_chat_ok("ok"))
+
+    monkeypatch.setattr(
+        llm,
+        "get_http_client",
+        lambda base, provider="deepseek": httpx.Client(
+            base_url=base, transport=httpx.MockTransport(_handler)
+        ),
+    )
+    out = llm.call_llm("p", api_key="k", api_base="https://primary.example")
+    assert out == "ok"
+    assert hits.count("primary.example") == retry.RETRY_MAX_ATTEMPTS
+    assert hits[-1] == "backup.example"
+
+    hits.clear()
+    assert llm.call_llm("p", api_key="k", api_base="https://primary.example") == "ok"
+    assert hits == ["backup.example"]
+    states = {item["endpoint"]: item["state"] for item in providers.breaker_status()}
+    assert states["deepseek@https://primary.example"] == providers.OPEN
+
+
+def test_non_stream_call_fails_over_through_breakers(monkeypatch):
+    # 中文注释：非流式调用同样按端点链转移，并计入主端点的熔断器
+    monkeypatch.setattr(providers, "FALLBACK_CHAIN", "deepseek:backup-model@https://backup.example")
+    monkeypatch.setattr(providers, "BREAKER_MIN_CALLS", 1)
+    hits = []
+
+    def _handler(request):
+        hits.append(request.url.host)
+        if request.url.host == "primary.example":
+            return httpx.Response(503, text="down")
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    monkeypatch.setattr(
+        llm,
+        "get_http_client",
+        lambda base, provider="deepseek": httpx.Client(
+            base_url=base, transport=httpx.MockTransport(_handler)
+        ),
+    )
+    assert llm.call_llm("p", api_key="k", api_base="https://primary.example", stream=False) == "ok"
+    assert hits[-1] == "backup.example"
+    states = {item["endpoint"]: item["state"] for item in providers.breaker_status()}
+    assert states["deepseek@https://primary.example"] == providers.OPEN
+
+
+def test_all_breakers_open_fails_fast(monkeypatch):
+    monkeypatch.setattr(providers, "FALLBACK_CHAIN", "")
+    endpoint = llm.endpoint_chain(api_base="https://primary.example")[0]
+    breaker = providers.get_breaker(endpoint)
+    breaker._transition(providers.OPEN)
+    with pytest.raises(llm.LLMClientError, match="circuit open"):
+        llm.call_llm("p", api_key="k", api_base="https://primary.example")
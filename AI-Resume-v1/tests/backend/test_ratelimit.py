@@ -0,0 +1,180 @@
+"""出站限流测试：RPM/TPM 令牌桶与并发上限，排队按先来后到放行。"""
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import backend.llm_client as llm
+from backend import metrics, providers, ratelimit
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def _isolate():
+    providers.reset_breakers()
+    ratelimit.reset_limiters()
+    metrics.reset()
+    yield
+    providers.reset_breakers()
+    ratelimit.reset_limiters()
+
+
+def test_token_bucket_refills_over_a_minute():
+    clock = _Clock()
+    bucket = ratelimit.TokenBucket(600, clock)
+    assert bucket.wait_time(600) == 0
+    bucket.take(600)
+    # 中文注释：每秒回补 10 个，缺 300 个需等 30 秒；超过桶容量的请求按整桶计算
+    assert bucket.wait_time(300) == pytest.approx(30)
+    clock.now = 30
+    assert bucket.wait_time(300) == 0
+    assert bucket.wait_time(10_000) == pytest.approx(30)
+
+
+def test_limits_prefer_model_entry_over_provider(monkeypatch):
+    monkeypatch.setattr(
+        ratelimit,
+        "_configured",
+        ratelimit.parse_limits(
+            json.dumps({"deepseek": {"rpm": 60}, "deepseek:deepseek-reasoner": {"max_in_flight": 2}})
+        ),
+    )
+    assert ratelimit.limits_for("deepseek", "deepseek-chat") == ratelimit.Limits(rpm=60)
+    assert ratelimit.limits_for("deepseek", "deepseek-reasoner") == ratelimit.Limits(max_in_flight=2)
+    # 中文注释：未配置任何限制时不创建限流器
+    assert ratelimit.get_limiter("anthropic", "claude") is None
+
+
+def test_waiters_are_admitted_in_order_with_positions():
+    limiter = ratelimit.RateLimiter("deepseek:m", ratelimit.Limits(max_in_flight=1))
+
+    async def _run():
+        order = []
+        positions = {}
+
+        async def _worker(name):
+            async for position in limiter.await_turn():
+                positions.setdefault(name, []).append(position)
+            order.append(name)
+
+        async for _ in limiter.await_turn():
+            pass
+        workers = [asyncio.create_task(_worker(name)) for name in ("a", "b")]
+        await asyncio.sleep(0.01)
+        assert limiter.snapshot()["queued"] == 2
+        for _ in range(3):
+            limiter.release()
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*workers)
+        return order, positions
+
+    order, positions = asyncio.run(_run())
+    assert order == ["a", "b"]
+    # 中文注释：b 先排第 2 位，a 放行后前移到第 1 位
+    assert positions == {"a": [1], "b": [2, 1]}
+    snapshot = metrics.snapshot()
+    assert snapshot["gauges"]['llm_queue_depth{limiter="deepseek:m"}'] == 0
+    assert snapshot["summaries"]['llm_queue_wait_seconds{limiter="deepseek:m"}']["count"] == 3
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    limiter = ratelimit.RateLimiter("deepseek:m", ratelimit.Limits(max_in_flight=1))
+
+    async def _run():
+        async for _ in limiter.await_turn():
+            pass
+
+        async def _wait():
+            async for _ in limiter.await_turn():
+                pass
+
+        task = asyncio.create_task(_wait())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        limiter.release()
+
+    asyncio.run(_run())
+    assert limiter.snapshot() == {
+        "limiter": "deepseek:m",
+        "rpm": None,
+        "tpm": None,
+        "max_in_flight": 1,
+        "in_flight": 0,
+        "queued": 0,
+    }
+
+
+def test_stream_reports_queue_position_until_slot_frees(monkeypatch):
+    # 中文注释：并发已满时流式调用先产出 queued 增量，槽位释放后才发出请求
+    monkeypatch.setattr(
+        ratelimit, "_configured", {"deepseek": ratelimit.Limits(max_in_flight=1)}
+    )
+    chunk = {"choices": [{"delta": {"content": "ok"}, "finish_reason": "stop"}]}
+    monkeypatch.setattr(
+        llm,
+        "get_async_http_client",
+        lambda base, provider="deepseek": httpx.AsyncClient(
+            base_url=base,
+            transport=httpx.MockTransport(
+                lambda _req: httpx.Response(200, text=f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n")
+            ),
+        ),
+    )
+    limiter = ratelimit.get_limiter("deepseek", llm.DEFAULT_MODEL)
+
+    async def _run():
+        async for _ in limiter.await_turn():
+            pass
+        deltas = []
+        async for delta in llm.stream_llm_async("p", api_key="k"):
+            deltas.append(delta)
+            if delta.kind == "queued":
+                limiter.release()
+        return deltas
+
+    deltas = asyncio.run(_run())
+    assert [(d.kind, d.position, d.text) for d in deltas] == [("queued", 1, ""), ("content", 0, "ok")]
+    assert limiter.snapshot()["in_flight"] == 0
+
+
+def test_queue_wait_does_not_count_as_slow_provider(monkeypatch):
+    # 中文注释：排队时间超过慢调用阈值，但端点本身响应很快，熔断器不应记为慢调用
+    monkeypatch.setattr(providers, "BREAKER_SLOW_SECONDS", 0.05)
+    monkeypatch.setattr(providers, "BREAKER_MIN_CALLS", 1)
+    monkeypatch.setattr(
+        ratelimit, "_configured", {"deepseek": ratelimit.Limits(max_in_flight=1)}
+    )
+    chunk = {"choices": [{"delta": {"content": "ok"}, "finish_reason": "stop"}]}
+    monkeypatch.setattr(
+        llm,
+        "get_async_http_client",
+        lambda base, provider="deepseek": httpx.AsyncClient(
+            base_url=base,
+            transport=httpx.MockTransport(
+                lambda _req: httpx.Response(200, text=f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n")
+            ),
+        ),
+    )
+    limiter = ratelimit.get_limiter("deepseek", llm.DEFAULT_MODEL)
+
+    async def _run():
+        async for _ in limiter.await_turn():
+            pass
+        asyncio.get_running_loop().call_later(0.2, limiter.release)
+        return [delta.kind async for delta in llm.stream_llm_async("p", api_key="k")]
+
+    assert asyncio.run(_run()) == ["queued", "content"]
+    (status,) = providers.breaker_status()
+    assert status["state"] == providers.CLOSED
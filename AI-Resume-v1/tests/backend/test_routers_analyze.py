@@ -6,6 +6,17 @@ import json
 import pytest
 from fastapi import HTTPException
 
+from backend import pipeline
+from backend.batch import BatchOutcome
+
+
+def _async_return(value):
+    # 中文注释：路由已改为 await 异步流水线，mock 需返回协程
+    async def _inner(*_, **__):
+        return value
+
+    return _inner
+
 
 def test_health_ok(temp_app):
     # 中文注释：健康检查应返回 200 与固定 payload
@@ -15,11 +26,18 @@ def test_health_ok(temp_app):
     assert resp.json() == {"status": "ok"}
 
 
+def test_metrics_snapshot(temp_app):
+    _analyze, client = temp_app
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert set(resp.json()) == {"counters", "gauges", "summaries"}
+
+
 def test_analyze_success(monkeypatch, temp_app, fake_result_factory):
     analyze, client = temp_app
 
     # 中文注释：mock 全量分析与存储成功路径
-    monkeypatch.setattr(analyze, "run_full_analysis", lambda *_, **__: fake_result_factory())
+    monkeypatch.setattr(analyze, "run_full_analysis_async", _async_return(fake_result_factory()))
     monkeypatch.setattr(analyze, "save_analysis", lambda *_, **__: "aid-123")
 
     resp = client.post("/analyze", json={"resume_text": "r", "jd_text": "j"})
@@ -33,19 +51,57 @@ def test_analyze_pipeline_error(monkeypatch, temp_app):
     analyze, client = temp_app
 
     # 中文注释：当流水线抛异常时应返回 400
-    def _boom(*_, **__):
+    async def _boom(*_, **__):
         raise analyze.PipelineError("bad parse")
 
-    monkeypatch.setattr(analyze, "run_full_analysis", _boom)
+    monkeypatch.setattr(analyze, "run_full_analysis_async", _boom)
 
     resp = client.post("/analyze", json={"resume_text": "r", "jd_text": "j"})
     assert resp.status_code == 400
     assert "bad parse" in resp.json()["detail"]
 
 
+def test_analyze_idempotency_key_reuses_result(monkeypatch, temp_app, fake_result_factory):
+    analyze, client = temp_app
+    calls = []
+
+    async def _analysis(*_, **__):
+        calls.append(True)
+        return fake_result_factory()
+
+    monkeypatch.setattr(analyze, "run_full_analysis_async", _analysis)
+    payload = {"resume_text": "r", "jd_text": "j"}
+
+    first = client.post("/analyze", json=payload, headers={"Idempotency-Key": "k-1"})
+    # 中文注释：同一个键重复提交直接返回已保存的分析，不再调用 LLM
+    again = client.post("/analyze", json=payload, headers={"Idempotency-Key": "k-1"})
+    assert first.status_code == again.status_code == 200
+    assert again.json()["analysis_id"] == first.json()["analysis_id"]
+    assert calls == [True]
+
+    # 中文注释：流式接口用同一个键（client_run_id）先接上保留中的运行；运行过期后回放已保存的结果
+    for expected in ("started", "stored"):
+        with client.stream(
+            "POST", "/analyze/stream", json={**payload, "client_run_id": "k-1"}
+        ) as resp:
+            body = "".join(resp.iter_text())
+        assert f'"status": "{expected}"' in body
+        assert first.json()["analysis_id"] in body.split("event: complete")[1]
+        analyze.runs.registry.runs.clear()
+    assert calls == [True]
+
+    # 中文注释：键被用于不同内容的请求时返回 409
+    conflict = client.post(
+        "/analyze", json={**payload, "jd_text": "other"}, headers={"Idempotency-Key": "k-1"}
+    )
+    assert conflict.status_code == 409
+
+
 def test_resume_only_success(monkeypatch, temp_app, fake_result_factory):
     analyze, client = temp_app
-    monkeypatch.setattr(analyze, "parse_resume_only", lambda *_, **__: fake_result_factory().resume_profile)
+    monkeypatch.setattr(
+        analyze, "parse_resume_only_async", _async_return(fake_result_factory().resume_profile)
+    )
     resp = client.post("/resume/only", json={"resume_text": "r"})
     assert resp.status_code == 200
     assert resp.json()["profile"]["title"] == "后端工程师"
@@ -53,13 +109,22 @@ def test_resume_only_success(monkeypatch, temp_app, fake_result_factory):
 
 def test_resume_only_pipeline_error(monkeypatch, temp_app):
     analyze, client = temp_app
-    monkeypatch.setattr(
-        analyze, "parse_resume_only", lambda *_, **__: (_ for _ in ()).throw(analyze.PipelineError("oops"))
-    )
+    async def _oops(*_, **__):
+        raise analyze.PipelineError("oops")
+
+    monkeypatch.setattr(analyze, "parse_resume_only_async", _oops)
     resp = client.post("/resume/only", json={"resume_text": "r"})
     assert resp.status_code == 400
 
 
+def test_customize_resume_success(monkeypatch, temp_app):
+    analyze, client = temp_app
+    monkeypatch.setattr(analyze, "generate_custom_resume_async", _async_return(("# md", "{}", None)))
+    resp = client.post("/resume/customize", json={"resume_text": "r", "jd_text": "j"})
+    assert resp.status_code == 200
+    assert resp.json()["custom_resume_markdown"] == "# md"
+
+
 def test_history_not_found(monkeypatch, temp_app):
     analyze, client = temp_app
     monkeypatch.setattr(analyze, "get_analysis", lambda *_: None)
@@ -129,28 +194,25 @@ def test_analyze_stream_success(monkeypatch, temp_app, fake_result_factory):
 
     # 中文注释：mock 流水线各阶段返回值，确保 SSE 顺序包含 result/complete
     monkeypatch.setattr(
-        analyze,
-        "parse_resume_and_job",
-        lambda *_,
-        **__: (fake_result.resume_profile, fake_result.job_profile, "{}", None),
+        pipeline, "parse_resume_profile_async", _async_return((fake_result.resume_profile, "{}", None))
     )
     monkeypatch.setattr(
-        analyze,
-        "analyze_gaps_and_mapping",
-        lambda *_,
-        **__: (fake_result.gap_analysis, fake_result.jd_mapping_matrix, "{}", None),
+        pipeline, "parse_job_profile_async", _async_return((fake_result.job_profile, "{}", None))
     )
     monkeypatch.setattr(
-        analyze,
-        "generate_learning_plan",
-        lambda *_,
-        **__: (fake_result.learning_plan, "{}", None),
+        pipeline,
+        "analyze_gaps_and_mapping_async",
+        _async_return((fake_result.gap_analysis, fake_result.jd_mapping_matrix, "{}", None)),
     )
     monkeypatch.setattr(
-        analyze,
-        "generate_custom_resume",
-        lambda *_,
-        **__: (fake_result.custom_resume_markdown, "{}", None),
+        pipeline,
+        "generate_learning_plan_async",
+        _async_return((fake_result.learning_plan, "{}", None)),
+    )
+    monkeypatch.setattr(
+        pipeline,
+        "generate_custom_resume_async",
+        _async_return((fake_result.custom_resume_markdown, "{}", None)),
     )
     monkeypatch.setattr(analyze, "save_analysis", lambda *_, **__: "run-1")
 
@@ -162,14 +224,500 @@ def test_analyze_stream_success(monkeypatch, temp_app, fake_result_factory):
     assert "analysis_id" in body
 
 
+def test_analyze_stream_forwards_deltas(monkeypatch, temp_app, fake_result_factory):
+    analyze, client = temp_app
+    fake_result = fake_result_factory()
+
+    # 中文注释：阶段内回调的增量应立即以 llm_delta 事件推送，且早于 result
+    async def _parse(*_, on_delta=None, **__):
+        on_delta("parse_resume", analyze.LLMDelta("retry", "429", attempt=2, delay=0.5))
+        on_delta("parse_resume", analyze.LLMDelta("content", "{\"resume"))
+        on_delta("parse_resume", analyze.LLMDelta("reasoning", "hidden"))
+        return fake_result.resume_profile, "{}", None
+
+    monkeypatch.setattr(pipeline, "parse_resume_profile_async", _parse)
+    monkeypatch.setattr(
+        pipeline, "parse_job_profile_async", _async_return((fake_result.job_profile, "{}", None))
+    )
+    monkeypatch.setattr(
+        pipeline,
+        "analyze_gaps_and_mapping_async",
+        _async_return((fake_result.gap_analysis, fake_result.jd_mapping_matrix, "{}", None)),
+    )
+    monkeypatch.setattr(
+        pipeline, "generate_learning_plan_async", _async_return((fake_result.learning_plan, "{}", None))
+    )
+    monkeypatch.setattr(
+        pipeline,
+        "generate_custom_resume_async",
+        _async_return((fake_result.custom_resume_markdown, "{}", None)),
+    )
+    monkeypatch.setattr(analyze, "save_analysis", lambda *_, **__: "run-1")
+
+    resp = client.post("/analyze/stream", json={"resume_text": "r", "jd_text": "j"})
+    body = "".join(resp.iter_text())
+    assert "event: llm_delta" in body
+    assert '"stage": "parse_resume"' in body
+    # 非推理模型不转发 reasoning 增量
+    assert "hidden" not in body
+    assert body.index("event: llm_delta") < body.index("event: result")
+    # 重试以 llm_retry 事件告知前端，而非作为文本增量
+    assert "event: llm_retry" in body
+    assert '"attempt": 2' in body and '"reason": "429"' in body
+
+
+def test_analyze_stream_cancels_and_checkpoints_on_disconnect(monkeypatch, temp_app, fake_result_factory):
+    import asyncio
+
+    from backend import storage
+    from backend.schemas import AnalyzeRequest
+
+    analyze, _client = temp_app
+    fake_result = fake_result_factory()
+    cancelled = []
+
+    async def _hang(*_, **__):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    # 中文注释：解析阶段立即完成，其余阶段挂起；客户端断开后应取消在途调用并保存已完成阶段
+    monkeypatch.setattr(
+        pipeline, "parse_resume_profile_async", _async_return((fake_result.resume_profile, "{}", None))
+    )
+    monkeypatch.setattr(
+        pipeline, "parse_job_profile_async", _async_return((fake_result.job_profile, "{}", None))
+    )
+    monkeypatch.setattr(pipeline, "analyze_gaps_and_mapping_async", _hang)
+    monkeypatch.setattr(pipeline, "generate_custom_resume_async", _hang)
+    monkeypatch.setattr(analyze, "DISCONNECT_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(analyze.runs, "RUN_DETACH_GRACE_SECONDS", 0)
+
+    class _Request:
+        def __init__(self):
+            self.gone = False
+            self.headers = {}
+
+        async def is_disconnected(self):
+            return self.gone
+
+    async def _run():
+        request = _Request()
+        payload = AnalyzeRequest(resume_text="r", jd_text="j", client_run_id="run-x")
+        response = await analyze.analyze_stream_endpoint(request, payload)
+        frames = []
+        async for frame in response.body_iterator:
+            frames.append(frame)
+            if "parse_job" in frame:
+                request.gone = True
+        # 中文注释：等待被取消的运行保存完检查点
+        run = analyze.runs.registry.get("run-x")
+        await asyncio.gather(run.task, return_exceptions=True)
+        return frames
+
+    frames = asyncio.run(_run())
+    assert not any("event: result" in frame for frame in frames)
+    assert cancelled == [True, True]
+    checkpoints = {c.stage: c for c in storage.get_stage_checkpoints("run-x")}
+    assert set(checkpoints) == {"parse_resume", "parse_job"}
+    assert json.loads(checkpoints["parse_job"].value_json)[0]["title"] == "JD"
+
+
+class _FakeRequest:
+    def __init__(self, headers=None):
+        self.gone = False
+        self.headers = headers or {}
+
+    async def is_disconnected(self):
+        return self.gone
+
+
+def _frame_id(frame):
+    return int(frame.split("\n", 1)[0].removeprefix("id: "))
+
+
+def test_analyze_stream_reconnect_replays_and_attaches(monkeypatch, temp_app, fake_result_factory):
+    import asyncio
+
+    from backend.schemas import AnalyzeRequest
+
+    analyze, _client = temp_app
+    fake_result = fake_result_factory()
+    gate_calls = []
+    gates = []
+
+    async def _gated_gaps(*_, **__):
+        gate_calls.append(True)
+        await gates[0].wait()
+        return fake_result.gap_analysis, fake_result.jd_mapping_matrix, "{}", None
+
+    monkeypatch.setattr(
+        pipeline, "parse_resume_profile_async", _async_return((fake_result.resume_profile, "{}", None))
+    )
+    monkeypatch.setattr(
+        pipeline, "parse_job_profile_async", _async_return((fake_result.job_profile, "{}", None))
+    )
+    monkeypatch.setattr(pipeline, "analyze_gaps_and_mapping_async", _gated_gaps)
+    monkeypatch.setattr(
+        pipeline, "generate_learning_plan_async", _async_return((fake_result.learning_plan, "{}", None))
+    )
+    monkeypatch.setattr(
+        pipeline,
+        "generate_custom_resume_async",
+        _async_return((fake_result.custom_resume_markdown, "{}", None)),
+    )
+    monkeypatch.setattr(analyze, "save_analysis", lambda *_, **__: "a-1")
+    monkeypatch.setattr(analyze, "DISCONNECT_POLL_SECONDS", 0.01)
+    # 中文注释：内存日志只保留 2 帧，更早的帧溢写到 SQLite 后仍应能回放
+    monkeypatch.setattr(analyze.runs, "RUN_LOG_MEMORY_EVENTS", 2)
+
+    async def _run():
+        gates.append(asyncio.Event())
+        payload = AnalyzeRequest(resume_text="r", jd_text="j", client_run_id="run-r")
+        first = _FakeRequest()
+        seen = []
+        response = await analyze.analyze_stream_endpoint(first, payload)
+        async for frame in response.body_iterator:
+            seen.append(frame)
+            if "parse_job" in frame:
+                first.gone = True
+        await asyncio.sleep(0.05)
+        # 中文注释：断线后用 Last-Event-ID 重新 POST，只补发漏掉的帧并接上仍在运行的流水线
+        second = _FakeRequest({"last-event-id": str(_frame_id(seen[0]))})
+        resumed = []
+        response = await analyze.analyze_stream_endpoint(second, payload)
+        async for frame in response.body_iterator:
+            resumed.append(frame)
+            if len(resumed) == 1:
+                gates[0].set()
+        replay = await analyze.analyze_stream_resume_endpoint(_FakeRequest(), "run-r", "0")
+        everything = [frame async for frame in replay.body_iterator]
+        return seen, resumed, everything
+
+    seen, resumed, everything = asyncio.run(_run())
+    assert gate_calls == [True]
+    assert [_frame_id(f) for f in resumed] == list(range(2, len(resumed) + 2))
+    assert resumed[:len(seen) - 1] == seen[1:]
+    assert "event: complete" in resumed[-1]
+    assert everything == seen[:1] + resumed
+
+
+def test_run_log_stays_in_memory_when_spill_fails(monkeypatch, temp_app):
+    # 中文注释：溢写 SQLite 失败时不影响运行，日志退化为全部保留在内存
+    import asyncio
+
+    from backend.storage import StorageError
+
+    analyze, _client = temp_app
+    monkeypatch.setattr(analyze.runs, "RUN_LOG_MEMORY_EVENTS", 2)
+
+    def _broken(*_args):
+        raise StorageError("disk full")
+
+    monkeypatch.setattr(analyze.runs, "append_run_events", _broken)
+
+    async def _work(run):
+        for index in range(6):
+            run.publish(lambda seq, index=index: f"frame-{index}")
+            await asyncio.sleep(0)
+
+    async def _run():
+        run = analyze.runs.registry.start("spill-broken", _work)
+        await run.task
+        return run, [frame async for frame in run.follow(0)]
+
+    run, frames = asyncio.run(_run())
+    assert not run.failed
+    assert run.spilled_through == 0
+    assert frames == [f"frame-{index}" for index in range(6)]
+
+
+def test_analyze_stream_key_conflict_while_run_is_live(monkeypatch, temp_app):
+    # 中文注释：运行仍在进行时，同一键换了请求内容应返回 409，而不是接到原运行上
+    import asyncio
+
+    from backend.schemas import AnalyzeRequest
+
+    analyze, _client = temp_app
+    gate = []
+    started = []
+
+    async def _gated(run, payload, **_):
+        started.append(payload.jd_text)
+        await gate[0].wait()
+
+    monkeypatch.setattr(analyze, "run_analysis", _gated)
+
+    async def _run():
+        gate.append(asyncio.Event())
+        payload = AnalyzeRequest(resume_text="r", jd_text="j", client_run_id="k-live")
+        await analyze.analyze_stream_endpoint(_FakeRequest(), payload)
+        try:
+            with pytest.raises(HTTPException) as excinfo:
+                await analyze.analyze_stream_endpoint(
+                    _FakeRequest(), payload.model_copy(update={"jd_text": "other"})
+                )
+            # 中文注释：内容相同的重复提交仍接上同一运行
+            same = await analyze.analyze_stream_endpoint(_FakeRequest(), payload)
+            return excinfo.value.status_code, same
+        finally:
+            gate[0].set()
+
+    status, same = asyncio.run(_run())
+    assert status == 409
+    assert same.status_code == 200
+    assert started == ["j"]
+
+
+def test_analyze_stream_same_key_queued_twice_starts_one_run(monkeypatch, temp_app):
+    # 中文注释：同一键的两次提交都在准入队列中等待时，放行后只启动一次流水线，第二次接上同一运行
+    import asyncio
+
+    from backend import admission
+    from backend.schemas import AnalyzeRequest
+
+    analyze, _client = temp_app
+    started = []
+
+    async def _run_analysis(run, payload, **_):
+        started.append(payload.jd_text)
+
+    monkeypatch.setattr(analyze, "run_analysis", _run_analysis)
+    controller = admission.AdmissionController(2, queue_size=4)
+    monkeypatch.setattr(admission, "controller", controller)
+
+    async def _run():
+        held = [await controller.acquire(admission.INTERACTIVE) for _ in range(2)]
+        payload = AnalyzeRequest(resume_text="r", jd_text="j", client_run_id="k-queued")
+        submissions = [
+            asyncio.ensure_future(analyze.analyze_stream_endpoint(_FakeRequest(), payload))
+            for _ in range(2)
+        ]
+        while controller.snapshot()["lanes"]["interactive"]["queued"] < 2:
+            await asyncio.sleep(0.01)
+        for ticket in held:
+            controller.release(ticket)
+        responses = await asyncio.gather(*submissions)
+        await analyze.runs.registry.get("k-queued").task
+        return responses
+
+    responses = asyncio.run(_run())
+    assert [resp.status_code for resp in responses] == [200, 200]
+    assert started == ["j"]
+    assert controller.snapshot()["lanes"]["interactive"]["active"] == 0
+
+
+def test_analyze_stream_resume_unknown_run(temp_app):
+    _analyze, client = temp_app
+    resp = client.get("/analyze/stream/missing", headers={"Last-Event-ID": "3"})
+    assert resp.status_code == 404
+
+
+def test_analyze_stream_emits_partial_objects(monkeypatch, temp_app, fake_result_factory):
+    analyze, client = temp_app
+    fake_result = fake_result_factory()
+    gap = {"id": "g1", "name": "K8s", "importance": 0.5, "attainability": 0.5, "priority": 0.5, "reason": "r"}
+
+    # 中文注释：gap 子对象在阶段结束前闭合，应以 partial 事件推送
+    async def _gaps(*_, on_delta=None, **__):
+        on_delta("gap_analysis", analyze.LLMDelta("content", '{"gap_analysis": {"gaps": ['))
+        on_delta("gap_analysis", analyze.LLMDelta("content", json.dumps(gap) + ", {"))
+        return fake_result.gap_analysis, fake_result.jd_mapping_matrix, "{}", None
+
+    monkeypatch.setattr(
+        pipeline, "parse_resume_profile_async", _async_return((fake_result.resume_profile, "{}", None))
+    )
+    monkeypatch.setattr(
+        pipeline, "parse_job_profile_async", _async_return((fake_result.job_profile, "{}", None))
+    )
+    monkeypatch.setattr(pipeline, "analyze_gaps_and_mapping_async", _gaps)
+    monkeypatch.setattr(
+        pipeline, "generate_learning_plan_async", _async_return((fake_result.learning_plan, "{}", None))
+    )
+    monkeypatch.setattr(
+        pipeline,
+        "generate_custom_resume_async",
+        _async_return((fake_result.custom_resume_markdown, "{}", None)),
+    )
+    monkeypatch.setattr(analyze, "save_analysis", lambda *_, **__: "run-1")
+
+    resp = client.post("/analyze/stream", json={"resume_text": "r", "jd_text": "j"})
+    body = "".join(resp.iter_text())
+    assert "event: partial" in body
+    assert '"path": ["gap_analysis", "gaps", 0]' in body
+    assert '"type": "Gap"' in body
+
+
 def test_analyze_stream_llm_error(monkeypatch, temp_app):
     analyze, client = temp_app
 
-    def _fail(*_, **__):
+    async def _fail(*_, **__):
         raise analyze.LLMClientError("llm down")
 
-    monkeypatch.setattr(analyze, "parse_resume_and_job", _fail)
+    monkeypatch.setattr(pipeline, "parse_resume_profile_async", _fail)
+    monkeypatch.setattr(pipeline, "parse_job_profile_async", _fail)
     resp = client.post("/analyze/stream", json={"resume_text": "r", "jd_text": "j"})
     body = "".join(resp.iter_text())
     assert "event: error" in body
     assert "llm down" in body
+
+
+def test_analyze_stream_partial_result_on_stage_failure(monkeypatch, temp_app, fake_result_factory):
+    analyze, client = temp_app
+    fake_result = fake_result_factory()
+
+    async def _fail(*_, **__):
+        raise analyze.PipelineError("bad gap json")
+
+    # 中文注释：差距分析失败时，学习计划被跳过，但已完成阶段以 partial_result 返回
+    monkeypatch.setattr(
+        pipeline, "parse_resume_profile_async", _async_return((fake_result.resume_profile, "{}", None))
+    )
+    monkeypatch.setattr(
+        pipeline, "parse_job_profile_async", _async_return((fake_result.job_profile, "{}", None))
+    )
+    monkeypatch.setattr(pipeline, "analyze_gaps_and_mapping_async", _fail)
+    monkeypatch.setattr(
+        pipeline,
+        "generate_custom_resume_async",
+        _async_return((fake_result.custom_resume_markdown, "{}", None)),
+    )
+
+    resp = client.post("/analyze/stream", json={"resume_text": "r", "jd_text": "j"})
+    body = "".join(resp.iter_text())
+    assert "event: stage_error" in body
+    assert "event: partial_result" in body
+    assert '"failed_stages": ["gap_analysis", "learning_plan"]' in body
+    assert "custom_resume_markdown" in body
+    assert "event: complete" not in body
+
+
+def test_analyze_resume_reruns_only_missing_stages(monkeypatch, temp_app, fake_result_factory):
+    from backend import storage
+
+    analyze, client = temp_app
+    fake_result = fake_result_factory()
+    calls = []
+
+    def _counted(stage, value):
+        async def _inner(*_, **__):
+            calls.append(stage)
+            return value
+
+        return _inner
+
+    async def _fail(*_, **__):
+        calls.append("custom_resume")
+        raise analyze.PipelineError("custom resume timed out")
+
+    gaps = (fake_result.gap_analysis, fake_result.jd_mapping_matrix, "{}", None)
+    for name, stage, value in [
+        ("parse_resume_profile_async", "parse_resume", (fake_result.resume_profile, "{}", None)),
+        ("parse_job_profile_async", "parse_job", (fake_result.job_profile, "{}", None)),
+        ("analyze_gaps_and_mapping_async", "gap_analysis", gaps),
+        ("generate_learning_plan_async", "learning_plan", (fake_result.learning_plan, "{}", None)),
+    ]:
+        monkeypatch.setattr(pipeline, name, _counted(stage, value))
+    monkeypatch.setattr(pipeline, "generate_custom_resume_async", _fail)
+
+    payload = {"resume_text": "r", "jd_text": "j", "client_run_id": "run-c", "llm_api_key": "sk-1"}
+    body = "".join(client.post("/analyze/stream", json=payload).iter_text())
+    assert '"resumable": true' in body
+    # 中文注释：已完成阶段逐个存入检查点，运行输入只保存掩码后的 API key
+    assert {c.stage for c in storage.get_stage_checkpoints("run-c")} == {
+        "parse_resume", "parse_job", "gap_analysis", "learning_plan"
+    }
+    assert "sk-1" not in storage.get_run_input("run-c").request_json
+
+    # 中文注释：续跑只重新调用失败的阶段，最终结果由检查点拼装并保存
+    calls.clear()
+    monkeypatch.setattr(
+        pipeline, "generate_custom_resume_async", _counted("custom_resume", ("md", "{}", None))
+    )
+    # 中文注释：原运行用了调用方的 Key，续跑未重新提供时拒绝，而不是改用服务端 Key
+    assert client.post("/analyze/resume/run-c").status_code == 422
+    assert calls == []
+    resumed = client.post("/analyze/resume/run-c", json={"llm_api_key": "sk-1"})
+    body = "".join(resumed.iter_text())
+    assert calls == ["custom_resume"]
+    assert '"restored_stages": ["gap_analysis", "learning_plan", "parse_job", "parse_resume"]' in body
+    analysis_id = json.loads(body.split("event: complete\ndata: ")[1])["analysis_id"]
+    assert storage.get_analysis(analysis_id).learning_plan == fake_result.learning_plan
+    assert storage.get_stage_checkpoints("run-c") == []
+    assert client.post("/analyze/resume/run-c").status_code == 404
+
+    # 中文注释：保存的运行输入无法解析时返回 409，而不是 500
+    storage.save_run_input("run-bad", "{}")
+    assert client.post("/analyze/resume/run-bad").status_code == 409
+
+
+def _fake_batch(fake_result_factory):
+    async def _iter(resume_text, jd_texts, **_):
+        # 中文注释：按完成顺序产出，第二个 JD 失败
+        for index in reversed(range(len(jd_texts))):
+            if index == 1:
+                yield BatchOutcome(index, error="bad jd")
+            else:
+                yield BatchOutcome(index, result=fake_result_factory())
+
+    return _iter
+
+
+def test_analyze_batch_ranks_and_saves(monkeypatch, temp_app, fake_result_factory):
+    analyze, client = temp_app
+    saved = []
+    monkeypatch.setattr(analyze, "iter_batch_analysis", _fake_batch(fake_result_factory))
+    monkeypatch.setattr(
+        analyze, "save_analysis", lambda resume, jd, result: saved.append(jd) or f"id-{jd}"
+    )
+
+    resp = client.post("/analyze/batch", json={"resume_text": "r", "jd_texts": ["a", "b", "c"]})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert [item["index"] for item in data["items"]] == [0, 1, 2]
+    assert data["items"][1]["error"] == "bad jd"
+    assert sorted(saved) == ["a", "c"]
+    assert [entry["analysis_id"] for entry in data["ranking"]] == ["id-a", "id-c"]
+
+
+def test_analyze_batch_stream_events(monkeypatch, temp_app, fake_result_factory):
+    analyze, client = temp_app
+    monkeypatch.setattr(analyze, "iter_batch_analysis", _fake_batch(fake_result_factory))
+    monkeypatch.setattr(analyze, "save_analysis", lambda *_, **__: "saved")
+
+    resp = client.post("/analyze/batch/stream", json={"resume_text": "r", "jd_texts": ["a", "b"]})
+    body = "".join(resp.iter_text())
+    assert body.count("event: jd_result") == 1
+    assert "event: jd_error" in body
+    assert body.index("event: jd_result") < body.index("event: ranking") < body.index("event: complete")
+
+
+def test_analyze_batch_requires_jds(temp_app):
+    _analyze, client = temp_app
+    resp = client.post("/analyze/batch", json={"resume_text": "r", "jd_texts": []})
+    assert resp.status_code == 422
+
+
+def test_llm_status_reports_breakers(monkeypatch, temp_app):
+    # 中文注释：/llm/status 返回故障转移顺序与各端点熔断状态
+    from backend import providers
+
+    _, client = temp_app
+    providers.reset_breakers()
+    endpoint = providers.Endpoint("deepseek", "https://x.example", "m")
+    providers.get_breaker(endpoint).record(False, error="503")
+    data = client.get("/llm/status").json()
+    assert data["fallback_chain"][0].startswith("deepseek@")
+    assert data["endpoints"] == [
+        {
+            "endpoint": "deepseek@https://x.example",
+            "state": "closed",
+            "recent_calls": 1,
+            "recent_failures": 1,
+            "retry_in_seconds": None,
+            "last_error": "503",
+        }
+    ]
+    providers.reset_breakers()
@@ -0,0 +1,70 @@
+"""招聘筛选路由测试：JD 只解析一次，按覆盖率排序并只为 Top-K 补充阶段。"""
+from __future__ import annotations
+
+import backend.routers.screening as screening
+from backend.batch import ScreeningOutcome
+from backend.schemas import JDMappingMatrix
+
+
+def _matrix(coverage: str) -> JDMappingMatrix:
+    return JDMappingMatrix.model_validate(
+        {
+            "jd_points": [{"id": "p", "text": "p", "category": "skill", "required_level": "mid", "mandatory": True}],
+            "resume_mapping": [{"jd_point_id": "p", "coverage": coverage}],
+        }
+    )
+
+
+def _patch_screening(monkeypatch, fake_result_factory, shortlisted):
+    fake = fake_result_factory()
+
+    async def _parse_job(*_, **__):
+        return fake.job_profile, None, None
+
+    async def _screen(resume_texts, job_profile, **_):
+        yield ScreeningOutcome(0, fake.resume_profile, fake.gap_analysis, _matrix("partial"))
+        yield ScreeningOutcome(1, error="bad resume")
+        yield ScreeningOutcome(2, fake.resume_profile, fake.gap_analysis, _matrix("full"))
+
+    async def _shortlist(shortlist, *_, **__):
+        for outcome in shortlist:
+            shortlisted.append(outcome.index)
+            outcome.custom_resume_markdown = f"md-{outcome.index}"
+            yield outcome
+
+    monkeypatch.setattr(screening, "parse_job_profile_async", _parse_job)
+    monkeypatch.setattr(screening, "iter_screening", _screen)
+    monkeypatch.setattr(screening, "iter_shortlist", _shortlist)
+
+
+def test_screening_ranks_and_completes_top_k(monkeypatch, temp_app, fake_result_factory):
+    _analyze, client = temp_app
+    shortlisted = []
+    _patch_screening(monkeypatch, fake_result_factory, shortlisted)
+
+    resp = client.post(
+        "/screening",
+        json={"jd_text": "j", "resume_texts": ["a", "b", "c"], "top_k": 1, "include_custom_resume": True},
+    )
+    assert resp.status_code == 200
+    candidates = resp.json()["candidates"]
+    assert [c["index"] for c in candidates] == [2, 0, 1]
+    assert shortlisted == [2]
+    assert candidates[0]["custom_resume_markdown"] == "md-2"
+    assert candidates[1]["custom_resume_markdown"] is None
+    assert candidates[2]["error"] == "bad resume"
+
+
+def test_screening_stream_events(monkeypatch, temp_app, fake_result_factory):
+    _analyze, client = temp_app
+    shortlisted = []
+    _patch_screening(monkeypatch, fake_result_factory, shortlisted)
+
+    resp = client.post("/screening/stream", json={"jd_text": "j", "resume_texts": ["a", "b", "c"]})
+    body = "".join(resp.iter_text())
+    assert body.count("event: candidate\n") == 2
+    assert "event: candidate_error" in body
+    assert body.index("event: ranking") < body.index("event: complete")
+    # 中文注释：未请求 Top-K 时不触发补充阶段
+    assert shortlisted == []
+    assert "event: candidate_detail" not in body
@@ -0,0 +1,137 @@
+"""单飞合并测试：相同的在途 LLM 调用只请求一次，结果与增量流共享给后到者。"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import backend.pipeline as pipeline
+from backend import metrics, singleflight
+from backend.llm_client import LLMDelta
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    metrics.reset()
+
+
+def test_sync_callers_share_one_call():
+    group = singleflight.FlightGroup("t")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def _fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(group.do("k", _fn)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(group.do("k", _fn)))
+    follower.start()
+    # 中文注释：等跟随者挂上在途调用后再放行领头者
+    for _ in range(5000):
+        if metrics.snapshot()["counters"].get('llm_coalesced_total{group="t"}') == 1:
+            break
+        time.sleep(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert results == ["answer", "answer"]
+    assert calls == [1]
+    assert group.in_flight() == 0
+
+
+def test_streaming_follower_gets_replay_then_live_items():
+    group = singleflight.FlightGroup("t")
+
+    async def _run():
+        gate = asyncio.Event()
+        calls = []
+
+        async def _fn(publish):
+            calls.append(1)
+            publish("s", "a")
+            await gate.wait()
+            publish("s", "b")
+            return "ab"
+
+        leader_seen, follower_seen = [], []
+        leader = asyncio.create_task(
+            group.ado("k", _fn, on_item=lambda *item: leader_seen.append(item))
+        )
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(
+            group.ado("k", _fn, on_item=lambda *item: follower_seen.append(item))
+        )
+        await asyncio.sleep(0)
+        gate.set()
+        results = await asyncio.gather(leader, follower)
+        return results, calls, leader_seen, follower_seen
+
+    results, calls, leader_seen, follower_seen = asyncio.run(_run())
+    assert results == ["ab", "ab"]
+    assert calls == [1]
+    assert leader_seen == follower_seen == [("s", "a"), ("s", "b")]
+
+
+def test_follower_takes_over_when_leader_is_cancelled():
+    group = singleflight.FlightGroup("t")
+
+    async def _run():
+        calls = []
+
+        async def _fn(_publish):
+            calls.append(1)
+            if len(calls) == 1:
+                await asyncio.sleep(10)
+            return "second"
+
+        leader = asyncio.create_task(group.ado("k", _fn))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(group.ado("k", _fn))
+        await asyncio.sleep(0)
+        leader.cancel()
+        # 中文注释：领头者被取消后，跟随者重新发起调用而不是一起失败
+        return await follower, calls
+
+    assert asyncio.run(_run()) == ("second", [1, 1])
+
+
+def test_identical_stage_calls_are_coalesced(monkeypatch):
+    calls = []
+    payload = json.dumps({"custom_resume_markdown": "# md"})
+
+    async def _fake_call(prompt, llm_config, *, include_reasoning, stage, on_delta=None):
+        calls.append(stage)
+        await asyncio.sleep(0.01)
+        if on_delta is not None:
+            on_delta(stage, LLMDelta("content", payload))
+        return payload
+
+    monkeypatch.setattr(pipeline, "_call_with_config_async", _fake_call)
+    config = {"bypass_cache": True}
+
+    async def _run():
+        seen = []
+        results = await asyncio.gather(
+            pipeline.generate_custom_resume_async("r", "j", llm_config=config),
+            pipeline.generate_custom_resume_async(
+                "r", "j", llm_config=config, on_delta=lambda stage, d: seen.append(d.text)
+            ),
+            pipeline.generate_custom_resume_async("r", "j", llm_config={**config, "api_key": "other"}),
+        )
+        return results, seen
+
+    results, seen = asyncio.run(_run())
+    assert [markdown for markdown, _, _ in results] == ["# md"] * 3
+    # 中文注释：不同 API Key 不合并；非流式领头者结束后向流式跟随者一次性回放结果
+    assert calls == ["custom_resume", "custom_resume"]
+    assert seen == [payload]
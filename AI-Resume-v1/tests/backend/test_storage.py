@@ -58,6 +58,32 @@ def test_prompt_template_crud(storage):
     assert storage.get_prompt_template("custom") == "hello"
 
 
+def test_edited_parse_profile_prompt_migrates(storage):
+    # 中文注释：旧版用户改过的 parse_profile 模板在 init_db 时复制到拆分后的两个模板
+    storage.update_prompt_template("parse_profile", "自定义：{resume_text} / {jd_text}")
+    storage.update_prompt_template("parse_job", "已单独修改的 JD 模板 {jd_text}")
+    storage.init_db()
+    assert storage.get_prompt_template("parse_profile") is None
+    assert storage.get_prompt_template("parse_resume") == "自定义：{resume_text} / {jd_text}"
+    assert storage.get_prompt_template("parse_job") == "已单独修改的 JD 模板 {jd_text}"
+
+
+def test_llm_cache_entry_ttl_and_bound(storage):
+    from datetime import datetime, timedelta
+
+    future = datetime.utcnow() + timedelta(hours=1)
+    storage.put_llm_cache_entry("a", "A", None, future)
+    storage.put_llm_cache_entry("b", "B", "why", future)
+    assert storage.get_llm_cache_entry("b").reasoning == "why"
+    storage.put_llm_cache_entry("c", "C", None, future)
+    storage.put_llm_cache_entry("d", "D", None, datetime.utcnow() - timedelta(seconds=1))
+    # 中文注释：过期条目读取时视为未命中；裁剪时删除过期条目并淘汰超出容量的最旧条目
+    assert storage.get_llm_cache_entry("d") is None
+    assert storage.evict_llm_cache_entries(2) == 2
+    assert storage.get_llm_cache_entry("a") is None
+    assert storage.get_llm_cache_entry("c").content == "C"
+
+
 def test_storage_error_on_invalid_db(monkeypatch, fake_result_factory):
     # 中文注释：伪造错误 engine 触发 StorageError
     import backend.storage as storage
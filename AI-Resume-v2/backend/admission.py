@@ -0,0 +1,193 @@
+"""Admission control: cap concurrent analysis pipelines and shed excess load early."""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Deque, Dict
+
+from . import metrics
+
+
+# Interactive requests (/analyze/stream, /resume/customize) are always served before
+# bulk work, and bulk work may only fill part of the slots.
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+# Pipelines running at once across both lanes; 0 disables admission control.
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+# Share of the slots bulk work may hold, so interactive requests always find room.
+ADMISSION_BULK_SHARE = float(os.getenv("ADMISSION_BULK_SHARE", "0.5"))
+# Requests allowed to wait per lane; beyond that they are rejected straight away.
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "16"))
+# Longest a queued request waits for a slot before it is rejected.
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "20"))
+# Assumed pipeline duration until real ones have been observed (for Retry-After).
+ADMISSION_EXPECTED_SECONDS = float(os.getenv("ADMISSION_EXPECTED_SECONDS", "60"))
+
+
+class AdmissionRejected(Exception):
+    """No slot is free and the wait queue is full (or the wait ran out)."""
+
+    def __init__(self, lane: str, reason: str, retry_after: int) -> None:
+        super().__init__(f"Server busy ({lane} {reason}); retry in {retry_after}s")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class Ticket:
+    lane: str
+    admitted_at: float
+    released: bool = False
+
+
+class AdmissionController:
+    """Slots for concurrent pipelines, handed out interactive-first from bounded FIFO queues."""
+
+    def __init__(
+        self,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+        *,
+        bulk_share: float = ADMISSION_BULK_SHARE,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        max_wait: float = ADMISSION_MAX_WAIT_SECONDS,
+        expected_seconds: float = ADMISSION_EXPECTED_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_concurrent = max_concurrent
+        self.limits = {
+            INTERACTIVE: max_concurrent,
+            BULK: max(1, math.floor(max_concurrent * bulk_share)),
+        }
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        # Moving average of how long an admitted pipeline holds its slot.
+        self.avg_seconds = expected_seconds
+        self.clock = clock
+        self.active: Dict[str, int] = {lane: 0 for lane in LANES}
+        self.waiting: Dict[str, Deque["asyncio.Future[Ticket]"]] = {lane: deque() for lane in LANES}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+    def _has_room(self, lane: str) -> bool:
+        return (
+            sum(self.active.values()) < self.max_concurrent
+            and self.active[lane] < self.limits[lane]
+        )
+
+    def retry_after(self, lane: str) -> int:
+        """Seconds until the lane can likely take one more request."""
+
+        ahead = len(self.waiting[lane]) + 1
+        return max(1, math.ceil(self.avg_seconds * ahead / max(self.limits[lane], 1)))
+
+    def _grant(self, lane: str) -> Ticket:
+        self.active[lane] += 1
+        metrics.incr("admission_admitted_total", lane=lane)
+        return Ticket(lane, self.clock())
+
+    def _dispatch(self) -> None:
+        for lane in LANES:
+            queue = self.waiting[lane]
+            while queue and self._has_room(lane):
+                future = queue.popleft()
+                if not future.done():
+                    future.set_result(self._grant(lane))
+        self._report()
+
+    def _reject(self, lane: str, reason: str) -> AdmissionRejected:
+        metrics.incr("admission_rejected_total", lane=lane, reason=reason)
+        return AdmissionRejected(lane, reason, self.retry_after(lane))
+
+    async def acquire(self, lane: str, *, bounded: bool = True) -> Ticket:
+        """Wait for a slot in ``lane``.
+
+        ``bounded`` requests are rejected with :class:`AdmissionRejected` when
+        the lane's queue is full or no slot frees up within ``max_wait``;
+        unbounded ones (work that is already queued elsewhere) wait as long as
+        it takes.
+        """
+
+        if not self.enabled:
+            return Ticket(lane, self.clock())
+        # Bulk work never jumps ahead of interactive requests that are waiting.
+        ahead = self.waiting[lane] or (lane == BULK and self.waiting[INTERACTIVE])
+        if not ahead and self._has_room(lane):
+            ticket = self._grant(lane)
+            self._report()
+            return ticket
+        if bounded and len(self.waiting[lane]) >= self.queue_size:
+            raise self._reject(lane, "queue_full")
+        future: "asyncio.Future[Ticket]" = asyncio.get_running_loop().create_future()
+        self.waiting[lane].append(future)
+        self._report()
+        queued_at = self.clock()
+        try:
+            if bounded:
+                ticket = await asyncio.wait_for(future, self.max_wait)
+            else:
+                ticket = await future
+        except asyncio.TimeoutError:
+            self._forget(lane, future)
+            raise self._reject(lane, "timeout") from None
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(future.result())
+            else:
+                self._forget(lane, future)
+            raise
+        metrics.observe("admission_wait_seconds", self.clock() - queued_at, lane=lane)
+        return ticket
+
+    def _forget(self, lane: str, future: "asyncio.Future[Ticket]") -> None:
+        if future in self.waiting[lane]:
+            self.waiting[lane].remove(future)
+        self._dispatch()
+
+    def release(self, ticket: Ticket) -> None:
+        if ticket.released or not self.enabled:
+            return
+        ticket.released = True
+        self.active[ticket.lane] -= 1
+        held = self.clock() - ticket.admitted_at
+        self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * held
+        self._dispatch()
+
+    def _report(self) -> None:
+        for lane in LANES:
+            metrics.set_gauge("admission_queue_depth", len(self.waiting[lane]), lane=lane)
+            metrics.set_gauge("admission_active", self.active[lane], lane=lane)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent or None,
+            "avg_seconds": round(self.avg_seconds, 1),
+            "lanes": {
+                lane: {
+                    "limit": self.limits[lane],
+                    "active": self.active[lane],
+                    "queued": len(self.waiting[lane]),
+                    "retry_after": self.retry_after(lane),
+                }
+                for lane in LANES
+            },
+        }
+
+
+controller = AdmissionController()
+
+
+@asynccontextmanager
+async def admitted(lane: str, *, bounded: bool = True) -> AsyncIterator[Ticket]:
+    ticket = await controller.acquire(lane, bounded=bounded)
+    try:
+        yield ticket
+    finally:
+        controller.release(ticket)
@@ -0,0 +1,51 @@
+"""Idempotency keys for analysis submissions (``client_run_id`` or the Idempotency-Key header)."""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlmodel import Session
+
+from . import metrics
+from .schemas import AnalyzeRequest
+from .storage import get_idempotency_record, put_idempotency_record
+
+
+# How long a key keeps pointing at its analysis.
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a different request."""
+
+
+def fingerprint(payload: AnalyzeRequest) -> str:
+    # API key 与 client_run_id 不参与，换 key 重试仍视为同一请求
+    material = json.dumps(
+        [payload.resume_text, payload.jd_text, payload.model, payload.base_url],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _expires_at() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+
+
+def begin(session: Session, key: str, request_fingerprint: str) -> Optional[str]:
+    """Claim ``key``; returns the stored analysis id if that request already finished."""
+    record = get_idempotency_record(session, key)
+    if record is not None:
+        if record.fingerprint != request_fingerprint:
+            metrics.incr("idempotency_conflicts_total")
+            raise IdempotencyConflict(f"Idempotency key {key!r} was used for a different request")
+        if record.analysis_id:
+            metrics.incr("idempotency_replays_total")
+        return record.analysis_id
+    put_idempotency_record(session, key, request_fingerprint, _expires_at())
+    return None
+
+
+def complete(session: Session, key: str, request_fingerprint: str, analysis_id: str) -> None:
+    put_idempotency_record(session, key, request_fingerprint, _expires_at(), analysis_id)
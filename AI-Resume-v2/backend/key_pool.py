@@ -0,0 +1,173 @@
+"""Weighted pool of (base_url, api_key) entries so throughput scales with owned keys."""
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from openai import AsyncOpenAI
+
+from . import metrics
+
+
+# JSON list of {"base_url", "key", "weight", "rpm", "tpm"} (or LLM_KEY_POOL_FILE);
+# DEEPSEEK_API_KEYS=k1,k2 adds equal-weight entries on DEEPSEEK_BASE_URL.
+KEY_POOL_SPEC = os.getenv("LLM_KEY_POOL", "")
+KEY_POOL_FILE = os.getenv("LLM_KEY_POOL_FILE", "")
+DEEPSEEK_KEYS = os.getenv("DEEPSEEK_API_KEYS", "")
+DEFAULT_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+# How long a key that returned 429 stays out of rotation when no Retry-After is sent.
+KEY_COOLDOWN_SECONDS = float(os.getenv("LLM_KEY_COOLDOWN", "30"))
+LATENCY_ALPHA = 0.2
+WINDOW_SECONDS = 60.0
+
+
+@dataclass
+class PoolEntry:
+    base_url: str
+    api_key: str
+    weight: float = 1.0
+    rpm: Optional[int] = None
+    tpm: Optional[int] = None
+    cooldown_until: float = 0.0
+    latency: Optional[float] = None
+    in_flight: int = 0
+    requests: Deque[float] = field(default_factory=deque)
+    tokens: Deque[Tuple[float, int]] = field(default_factory=deque)
+    client: Optional[AsyncOpenAI] = None
+
+    @property
+    def name(self) -> str:
+        key = self.api_key
+        return f"{key[:6]}...{key[-4:]}" if len(key) > 10 else key[:2] + "..."
+
+    def capacity(self, now: float) -> float:
+        while self.requests and now - self.requests[0] > WINDOW_SECONDS:
+            self.requests.popleft()
+        while self.tokens and now - self.tokens[0][0] > WINDOW_SECONDS:
+            self.tokens.popleft()
+        remaining = 1.0
+        if self.rpm:
+            remaining = min(remaining, 1 - len(self.requests) / self.rpm)
+        if self.tpm:
+            remaining = min(remaining, 1 - sum(count for _, count in self.tokens) / self.tpm)
+        return max(remaining, 0.0)
+
+    def get_client(self) -> AsyncOpenAI:
+        if self.client is None:
+            # Retries are handled by RetryBudget so another key can take the next attempt.
+            self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self.client
+
+
+class KeyPool:
+    def __init__(self, entries: Optional[List[PoolEntry]] = None) -> None:
+        self.entries = entries or []
+        self._lock = threading.Lock()
+
+    def candidates(self, base_url: Optional[str]) -> List[PoolEntry]:
+        """Entries for ``base_url``; any entry when the default endpoint is requested."""
+
+        if not base_url or base_url.rstrip("/") == DEFAULT_BASE_URL.rstrip("/"):
+            return list(self.entries)
+        return [e for e in self.entries if e.base_url.rstrip("/") == base_url.rstrip("/")]
+
+    def acquire(self, entries: List[PoolEntry], estimated_tokens: int = 0) -> PoolEntry:
+        """Pick an entry weighted by remaining capacity and inverse latency."""
+
+        now = time.monotonic()
+        with self._lock:
+            available = [e for e in entries if e.cooldown_until <= now]
+            if not available:
+                available = [min(entries, key=lambda e: e.cooldown_until)]
+            known = [e.latency for e in available if e.latency is not None]
+            default_latency = sum(known) / len(known) if known else 1.0
+            weights = [
+                e.weight
+                * max(e.capacity(now), 0.01)
+                / max(e.latency if e.latency is not None else default_latency, 0.05)
+                / (1 + e.in_flight)
+                for e in available
+            ]
+            entry = random.choices(available, weights=weights)[0]
+            entry.requests.append(now)
+            if estimated_tokens:
+                entry.tokens.append((now, estimated_tokens))
+            entry.in_flight += 1
+        metrics.incr("llm_key_requests_total", key=entry.name)
+        return entry
+
+    def release(
+        self,
+        entry: PoolEntry,
+        *,
+        latency: Optional[float] = None,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        now = time.monotonic()
+        with self._lock:
+            entry.in_flight = max(entry.in_flight - 1, 0)
+            if latency is not None:
+                entry.latency = (
+                    latency
+                    if entry.latency is None
+                    else (1 - LATENCY_ALPHA) * entry.latency + LATENCY_ALPHA * latency
+                )
+            if status_code == 429:
+                entry.cooldown_until = now + (retry_after or KEY_COOLDOWN_SECONDS)
+        if status_code == 429:
+            metrics.incr("llm_key_cooldowns_total", key=entry.name)
+
+    def available(self, entries: List[PoolEntry]) -> int:
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for e in entries if e.cooldown_until <= now)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "base_url": e.base_url,
+                    "key": e.name,
+                    "weight": e.weight,
+                    "capacity": round(e.capacity(now), 3),
+                    "latency_seconds": e.latency,
+                    "in_flight": e.in_flight,
+                    "cooldown_seconds": max(e.cooldown_until - now, 0.0),
+                }
+                for e in self.entries
+            ]
+
+
+def load_entries(spec: str, deepseek_keys: str) -> List[PoolEntry]:
+    entries = [
+        PoolEntry(
+            base_url=item.get("base_url", DEFAULT_BASE_URL),
+            api_key=item["key"],
+            weight=float(item.get("weight", 1.0)),
+            rpm=item.get("rpm"),
+            tpm=item.get("tpm"),
+        )
+        for item in (json.loads(spec) if spec.strip() else [])
+    ]
+    entries += [
+        PoolEntry(base_url=DEFAULT_BASE_URL, api_key=key.strip())
+        for key in deepseek_keys.split(",")
+        if key.strip()
+    ]
+    return entries
+
+
+def _load_spec() -> str:
+    if KEY_POOL_FILE:
+        with open(KEY_POOL_FILE, "r", encoding="utf-8") as handle:
+            return handle.read()
+    return KEY_POOL_SPEC
+
+
+pool = KeyPool(load_entries(_load_spec(), DEEPSEEK_KEYS))
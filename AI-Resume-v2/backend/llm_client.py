@@ -1,10 +1,15 @@
+import hashlib
 import json
 import os
-from typing import Optional, Type, TypeVar
+import time
+from typing import Callable, Optional, Type, TypeVar
 
-from openai import AsyncOpenAI
+from openai import APIStatusError, AsyncOpenAI
 from pydantic import BaseModel
 
+from . import key_pool, ratelimit, singleflight
+from .retry import RetryBudget, RetryNotice, retry_after
+
 
 T = TypeVar("T", bound=BaseModel)
 
@@ -13,21 +18,83 @@ class LLMClient:
     """
     Thin wrapper for OpenAI-compatible chat completions (e.g., DeepSeek V3).
     Supports structured JSON responses using `response_format={"type": "json_object"}`.
+
+    Transient failures (429 / 5xx / network) are retried with backoff; one client
+    serves one request, so its retry budget is shared by all of its completions.
+    `on_retry` is told about each retry before the backoff wait. Every attempt
+    waits for a slot in the outbound rate limiter; `on_queued` hears its queue
+    position while it waits. A completion identical to one already in flight
+    (same messages, model, endpoint and key) waits for that one instead.
     """
 
-    def __init__(self, api_key: Optional[str], base_url: Optional[str], model: str):
-        key = api_key or os.getenv("DEEPSEEK_API_KEY")
-        if not key:
-            raise ValueError("Missing API key for LLM (set DEEPSEEK_API_KEY or pass api_key)")
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: Optional[str],
+        model: str,
+        on_retry: Optional[Callable[[RetryNotice], None]] = None,
+        on_queued: Optional[Callable[[ratelimit.QueuedNotice], None]] = None,
+    ):
         url = base_url or os.getenv("DEEPSEEK_BASE_URL")
-        self.client = AsyncOpenAI(api_key=key, base_url=url)
+        # Without a caller-supplied key, requests are spread over the configured key pool.
+        self.entries = [] if api_key else key_pool.pool.candidates(url)
+        self.client: Optional[AsyncOpenAI] = None
+        if not self.entries:
+            key = api_key or os.getenv("DEEPSEEK_API_KEY")
+            if not key:
+                raise ValueError("Missing API key for LLM (set DEEPSEEK_API_KEY or pass api_key)")
+            # Retries are handled by RetryBudget so they can be counted and reported.
+            self.client = AsyncOpenAI(api_key=key, base_url=url, max_retries=0)
         self.model = model
+        self.retry = RetryBudget()
+        self.on_retry = on_retry
+        self.on_queued = on_queued
+        self.limiter = ratelimit.get_limiter(url or key_pool.DEFAULT_BASE_URL, model)
+        # Callers with different keys never share a request (or its billing).
+        self.identity = (
+            (url or key_pool.DEFAULT_BASE_URL).rstrip("/"),
+            model,
+            hashlib.sha256(api_key.encode("utf-8")).hexdigest() if api_key else None,
+        )
+
+    async def _create(self, **kwargs):
+        estimated_tokens = sum(len(m["content"]) for m in kwargs["messages"]) // 4
+        async with ratelimit.slot(self.limiter, estimated_tokens, self.on_queued):
+            return await self._send(estimated_tokens, **kwargs)
+
+    async def _send(self, estimated_tokens: int, **kwargs):
+        if self.client is not None:
+            return await self.client.chat.completions.create(model=self.model, **kwargs)
+        # Each attempt takes its own lease, so a retry after 429 lands on another key.
+        entry = key_pool.pool.acquire(self.entries, estimated_tokens)
+        started = time.perf_counter()
+        try:
+            completion = await entry.get_client().chat.completions.create(
+                model=self.model, **kwargs
+            )
+        except APIStatusError as exc:
+            key_pool.pool.release(
+                entry, status_code=exc.status_code, retry_after=retry_after(exc)
+            )
+            if exc.status_code == 429 and key_pool.pool.available(self.entries):
+                exc.rotated = True  # type: ignore[attr-defined]
+            raise
+        except BaseException:
+            key_pool.pool.release(entry)
+            raise
+        key_pool.pool.release(entry, latency=time.perf_counter() - started)
+        return completion
+
+    async def _complete(self, **kwargs):
+        return await singleflight.completions.do(
+            singleflight.flight_key(self.identity, kwargs),
+            lambda: self.retry.run(lambda: self._create(**kwargs), on_retry=self.on_retry),
+        )
 
     async def generate_json(
         self, *, system_prompt: str, user_prompt: str, response_model: Type[T]
     ) -> T:
-        completion = await self.client.chat.completions.create(
-            model=self.model,
+        completion = await self._complete(
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
@@ -39,8 +106,7 @@ class LLMClient:
         return response_model.parse_obj(data)
 
     async def generate_markdown(self, *, system_prompt: str, user_prompt: str) -> str:
-        completion = await self.client.chat.completions.create(
-            model=self.model,
+        completion = await self._complete(
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
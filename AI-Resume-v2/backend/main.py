@@ -4,6 +4,7 @@ from typing import List
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from . import admission, key_pool, metrics, ratelimit
 from .routers import analysis, history, prompts
 from .storage import init_db
 
@@ -37,3 +38,17 @@ async def on_startup() -> None:
 @app.get("/health")
 async def health() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def metrics_snapshot() -> dict:
+    return metrics.snapshot()
+
+
+@app.get("/llm/status")
+async def llm_status() -> dict:
+    return {
+        "key_pool": key_pool.pool.snapshot(),
+        "rate_limits": ratelimit.limiter_status(),
+        "admission": admission.controller.snapshot(),
+    }
@@ -0,0 +1,45 @@
+"""In-process counters, gauges and summaries exported on /metrics."""
+import threading
+from collections import defaultdict
+from typing import Any, Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = defaultdict(float)
+_gauges: Dict[str, float] = {}
+_summaries: Dict[str, Dict[str, float]] = {}
+
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    rendered = ",".join(f'{k}="{labels[k]}"' for k in sorted(labels))
+    return f"{name}{{{rendered}}}"
+
+
+def incr(name: str, value: float = 1.0, **labels: Any) -> None:
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def set_gauge(name: str, value: float, **labels: Any) -> None:
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    with _lock:
+        summary = _summaries.setdefault(
+            _key(name, labels), {"count": 0.0, "sum": 0.0, "max": 0.0}
+        )
+        summary["count"] += 1
+        summary["sum"] += value
+        summary["max"] = max(summary["max"], value)
+
+
+def snapshot() -> dict[str, Any]:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "summaries": {key: dict(value) for key, value in _summaries.items()},
+        }
@@ -1,13 +1,15 @@
 import asyncio
 import json
 from dataclasses import dataclass
-from typing import AsyncGenerator, List
+from typing import AsyncGenerator, List, Union
 from uuid import uuid4
 
 from sqlmodel import Session
 
 from .llm_client import LLMClient
 from .prompts import get_prompt_text
+from .ratelimit import QueuedNotice
+from .retry import RetryNotice
 from .schemas import AnalyzeRequest, FullAnalysisResult, StreamEvent
 from .storage import AnalysisRecord, persist_analysis
 
@@ -173,8 +175,16 @@ async def stream_analysis(
         user_prompt = build_user_prompt(req)
 
         result: FullAnalysisResult
+        fallback = False
         try:
-            llm = LLMClient(req.api_key, req.base_url, req.model)
+            notices: asyncio.Queue[Union[RetryNotice, QueuedNotice]] = asyncio.Queue()
+            llm = LLMClient(
+                req.api_key,
+                req.base_url,
+                req.model,
+                on_retry=notices.put_nowait,
+                on_queued=notices.put_nowait,
+            )
             yield log("llm", f"调用模型 {req.model}")
 
             async def run_llm() -> FullAnalysisResult:
@@ -185,12 +195,36 @@ async def stream_analysis(
                 )
                 return data
 
-            result = await asyncio.wait_for(
-                run_llm(), timeout=ANALYSIS_TIMEOUT_SECONDS
+            task = asyncio.ensure_future(
+                asyncio.wait_for(run_llm(), timeout=ANALYSIS_TIMEOUT_SECONDS)
             )
+            try:
+                # 重试与排队通知在等待模型期间即时推送，而非等调用结束后
+                while not task.done():
+                    notice_task = asyncio.ensure_future(notices.get())
+                    await asyncio.wait(
+                        {task, notice_task}, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if not notice_task.done():
+                        notice_task.cancel()
+                        continue
+                    notice = notice_task.result()
+                    if isinstance(notice, QueuedNotice):
+                        yield log("queued", f"等待 LLM 配额，当前排队第 {notice.position} 位")
+                        continue
+                    yield log(
+                        "retry",
+                        f"模型调用失败（{notice.reason}），{notice.delay:.1f}s 后第 {notice.attempt} 次尝试",
+                    )
+            finally:
+                task.cancel()
+            result = task.result()
+            if llm.retry.attempts > 1:
+                yield log("llm", f"模型调用共尝试 {llm.retry.attempts} 次")
         except Exception as exc:  # noqa: BLE001
             yield log("fallback", f"LLM 不可用，使用本地示例数据: {exc}")
             result = build_mock_result(req)
+            fallback = True
 
         persist_analysis(
             session,
@@ -205,6 +239,7 @@ async def stream_analysis(
             analysis_id=record.id,
             payload=result,
             message="分析完成",
+            fallback=fallback,
         )
         yield StreamEvent(
             type="end", stage="completed", analysis_id=record.id, message="done"
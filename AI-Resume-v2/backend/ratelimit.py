@@ -0,0 +1,212 @@
+"""Process-wide throttle for outbound LLM requests, per provider host and model."""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from . import metrics
+
+
+# Defaults for every provider/model; 0 disables that limit.
+DEFAULT_RPM = int(os.getenv("LLM_RPM", "0"))
+DEFAULT_TPM = int(os.getenv("LLM_TPM", "0"))
+DEFAULT_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "0"))
+# JSON object of {"host" | "host:model": {"rpm", "tpm", "max_in_flight"}}, where host
+# is the API base URL's host (e.g. "api.deepseek.com"); model entries win.
+RATE_LIMITS_SPEC = os.getenv("LLM_RATE_LIMITS", "")
+
+
+@dataclass
+class QueuedNotice:
+    position: int
+
+
+@dataclass(frozen=True)
+class Limits:
+    rpm: int = 0
+    tpm: int = 0
+    max_in_flight: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rpm or self.tpm or self.max_in_flight)
+
+
+class TokenBucket:
+    """``capacity`` tokens that refill evenly over a minute."""
+
+    def __init__(self, per_minute: int, clock: Callable[[], float]) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def wait_time(self, amount: float) -> float:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A single request larger than the whole bucket waits for a full bucket.
+        return max((min(amount, self.capacity) - self.tokens) / self.rate, 0.0)
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+@dataclass
+class _Waiter:
+    tokens: int
+    future: "asyncio.Future[None]"
+    on_position: Optional[Callable[[QueuedNotice], None]]
+    enqueued: float
+    position: int = 0
+
+
+class RateLimiter:
+    """Request and token buckets plus an in-flight cap, served in FIFO order."""
+
+    def __init__(
+        self, name: str, limits: Limits, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.name = name
+        self.limits = limits
+        self.requests = TokenBucket(limits.rpm, clock) if limits.rpm else None
+        self.token_bucket = TokenBucket(limits.tpm, clock) if limits.tpm else None
+        self.in_flight = 0
+        self.queue: Deque[_Waiter] = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _wait_time(self, waiter: _Waiter) -> float:
+        delay = self.requests.wait_time(1) if self.requests else 0.0
+        if self.token_bucket and waiter.tokens:
+            delay = max(delay, self.token_bucket.wait_time(waiter.tokens))
+        return delay
+
+    def _dispatch(self) -> None:
+        self._timer = None
+        while self.queue:
+            if self.limits.max_in_flight and self.in_flight >= self.limits.max_in_flight:
+                break
+            head = self.queue[0]
+            if head.future.cancelled():
+                # Cancelled but not yet unwound by its task.
+                self.queue.popleft()
+                continue
+            delay = self._wait_time(head)
+            if delay > 0:
+                # Re-check once the buckets have refilled enough for the head.
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                break
+            self.queue.popleft()
+            if self.requests:
+                self.requests.take(1)
+            if self.token_bucket and head.tokens:
+                self.token_bucket.take(head.tokens)
+            self.in_flight += 1
+            head.future.set_result(None)
+            metrics.observe(
+                "llm_queue_wait_seconds", time.perf_counter() - head.enqueued, limiter=self.name
+            )
+        for index, waiter in enumerate(self.queue, start=1):
+            if waiter.position != index:
+                waiter.position = index
+                if waiter.on_position:
+                    waiter.on_position(QueuedNotice(index))
+        metrics.set_gauge("llm_queue_depth", len(self.queue), limiter=self.name)
+        metrics.set_gauge("llm_in_flight", self.in_flight, limiter=self.name)
+
+    async def acquire(
+        self, tokens: int = 0, on_position: Optional[Callable[[QueuedNotice], None]] = None
+    ) -> None:
+        """Wait for a slot; ``on_position`` hears the queue position whenever it changes."""
+
+        waiter = _Waiter(
+            tokens, asyncio.get_running_loop().create_future(), on_position, time.perf_counter()
+        )
+        self.queue.append(waiter)
+        self._dispatch_after_change()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release()
+            else:
+                if waiter in self.queue:
+                    self.queue.remove(waiter)
+                self._dispatch_after_change()
+            raise
+
+    def _dispatch_after_change(self) -> None:
+        # Any pending bucket timer is recomputed from the current queue.
+        if self._timer is not None:
+            self._timer.cancel()
+        self._dispatch()
+
+    def release(self) -> None:
+        self.in_flight = max(self.in_flight - 1, 0)
+        self._dispatch_after_change()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limiter": self.name,
+            "rpm": self.limits.rpm or None,
+            "tpm": self.limits.tpm or None,
+            "max_in_flight": self.limits.max_in_flight or None,
+            "in_flight": self.in_flight,
+            "queued": len(self.queue),
+        }
+
+
+def parse_limits(spec: str) -> Dict[str, Limits]:
+    return {
+        name: Limits(
+            rpm=int(values.get("rpm") or 0),
+            tpm=int(values.get("tpm") or 0),
+            max_in_flight=int(values.get("max_in_flight") or 0),
+        )
+        for name, values in (json.loads(spec) if spec.strip() else {}).items()
+    }
+
+
+_configured = parse_limits(RATE_LIMITS_SPEC)
+_limiters: Dict[Tuple[str, str], Optional[RateLimiter]] = {}
+
+
+def get_limiter(base_url: Optional[str], model: str) -> Optional[RateLimiter]:
+    """The shared limiter for the host of ``base_url`` and ``model``, or None if unlimited."""
+
+    host = urlparse(base_url or "").hostname or "default"
+    key = (host, model)
+    if key not in _limiters:
+        limits = (
+            _configured.get(f"{host}:{model}")
+            or _configured.get(host)
+            or Limits(DEFAULT_RPM, DEFAULT_TPM, DEFAULT_MAX_IN_FLIGHT)
+        )
+        _limiters[key] = RateLimiter(f"{host}:{model}", limits) if limits.enabled else None
+    return _limiters[key]
+
+
+def limiter_status() -> List[Dict[str, Any]]:
+    return [limiter.snapshot() for limiter in _limiters.values() if limiter is not None]
+
+
+@asynccontextmanager
+async def slot(
+    limiter: Optional[RateLimiter],
+    tokens: int = 0,
+    on_position: Optional[Callable[[QueuedNotice], None]] = None,
+) -> AsyncIterator[None]:
+    if limiter is None:
+        yield
+        return
+    await limiter.acquire(tokens, on_position)
+    try:
+        yield
+    finally:
+        limiter.release()
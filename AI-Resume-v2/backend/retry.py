@@ -0,0 +1,106 @@
+"""Retry policy for transient LLM provider failures (429 / 5xx / network)."""
+import asyncio
+import os
+import random
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from openai import APIConnectionError, APIStatusError
+
+from . import metrics
+
+
+T = TypeVar("T")
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+# Retries shared by every completion one LLMClient makes for a request.
+RETRY_BUDGET = int(os.getenv("LLM_RETRY_BUDGET", "4"))
+# A Retry-After longer than this is not waited out; the error is raised instead.
+RETRY_MAX_AFTER = float(os.getenv("LLM_RETRY_MAX_AFTER", "30"))
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+
+@dataclass
+class RetryNotice:
+    attempt: int
+    delay: float
+    reason: str
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS or exc.status_code >= 500
+    # APITimeoutError is a subclass of APIConnectionError.
+    return isinstance(exc, APIConnectionError)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds requested by the provider's ``retry-after(-ms)`` header, if any."""
+
+    # A rate-limited pooled key is already out of rotation; the retry uses another key.
+    if not isinstance(exc, APIStatusError) or getattr(exc, "rotated", False):
+        return None
+    headers = exc.response.headers
+    for header, scale in (("retry-after-ms", 1000.0), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value:
+            try:
+                return max(float(value) / scale, 0.0)
+            except ValueError:
+                continue
+    return None
+
+
+def retry_reason(exc: BaseException) -> str:
+    return str(exc.status_code) if isinstance(exc, APIStatusError) else "network"
+
+
+@dataclass
+class RetryBudget:
+    """Per-request retry state: attempts made and retries still allowed."""
+
+    max_attempts: int = field(default_factory=lambda: RETRY_MAX_ATTEMPTS)
+    retries_left: int = field(default_factory=lambda: RETRY_BUDGET)
+    attempts: int = 0
+
+    def next_delay(self, exc: BaseException, attempt: int) -> Optional[float]:
+        if not is_retryable(exc) or attempt >= self.max_attempts or self.retries_left <= 0:
+            return None
+        wait_at_least = retry_after(exc)
+        if wait_at_least is not None and wait_at_least > RETRY_MAX_AFTER:
+            return None
+        self.retries_left -= 1
+        # Capped exponential backoff with full jitter, never shorter than Retry-After.
+        ceiling = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** (attempt - 1)))
+        return max(random.uniform(0, ceiling), wait_at_least or 0.0)
+
+    async def run(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        on_retry: Optional[Callable[[RetryNotice], None]] = None,
+    ) -> T:
+        """Await ``fn`` until it succeeds, fails permanently or the budget runs out."""
+
+        attempt = 0
+        while True:
+            attempt += 1
+            self.attempts += 1
+            try:
+                result = await fn()
+            except Exception as exc:
+                delay = self.next_delay(exc, attempt)
+                if delay is None:
+                    metrics.observe("llm_request_attempts", attempt)
+                    raise
+                reason = retry_reason(exc)
+                metrics.incr("llm_retries_total", reason=reason)
+                if on_retry is not None:
+                    on_retry(RetryNotice(attempt=attempt + 1, delay=delay, reason=reason))
+                await asyncio.sleep(delay)
+                continue
+            metrics.observe("llm_request_attempts", attempt)
+            return result
@@ -1,11 +1,16 @@
+import asyncio
 import json
-from typing import Any, AsyncGenerator
+import os
+from typing import Any, AsyncGenerator, Awaitable, Callable, Optional
+from uuid import uuid4
 
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sse_starlette.sse import EventSourceResponse
 from sqlmodel import Session
 
-from .. import prompts
+from .. import admission, idempotency, metrics, prompts, runs
+from ..admission import AdmissionRejected, Ticket
+from ..idempotency import IdempotencyConflict
 from ..llm_client import LLMClient
 from ..pipeline import stream_analysis
 from ..schemas import (
@@ -13,29 +18,165 @@ from ..schemas import (
     DraftUpdateRequest,
     FullAnalysisResult,
     ResumeCustomizeRequest,
+    StreamEvent,
 )
-from ..storage import AnalysisRecord, get_session, load_analysis
+from ..runs import Run
+from ..storage import AnalysisRecord, engine, get_session, load_analysis
 
 
 router = APIRouter(tags=["analysis"])
 
+# How often /analyze/stream checks whether the client is still connected.
+DISCONNECT_POLL_SECONDS = float(os.getenv("ANALYZE_DISCONNECT_POLL_SECONDS", "1"))
 
-@router.post("/analyze/stream")
-async def analyze_stream_endpoint(
-    request: Request, payload: AnalyzeRequest, session: Session = Depends(get_session)
-) -> EventSourceResponse:
-    async def event_generator() -> AsyncGenerator[dict[str, Any], None]:
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+async def _admit(lane: str) -> Ticket:
+    # 满载时快速返回 429，并按平均耗时与排队人数给出 Retry-After
+    try:
+        return await admission.controller.acquire(lane)
+    except AdmissionRejected as exc:
+        raise HTTPException(
+            status_code=429, detail=str(exc), headers={"Retry-After": str(exc.retry_after)}
+        ) from exc
+
+
+def _live_run(run_id: str) -> Optional[Run]:
+    # 可接上的运行：进行中或已成功；失败、取消或降级为示例数据的运行不复用，同键重试会重新分析
+    run = runs.registry.get(run_id)
+    return None if run is None or run.failed else run
+
+
+async def _start_admitted(run_id: str, work: Callable[[Run], Awaitable[None]]) -> Run:
+    # 排队等槽位期间同一键可能已被另一请求启动：此时接上该运行并归还槽位，不重复分析
+    ticket = await _admit(admission.INTERACTIVE)
+    run = _live_run(run_id)
+    if run is not None:
+        admission.controller.release(ticket)
+        return run
+    run = runs.registry.start(run_id, work)
+    run.task.add_done_callback(lambda _task: admission.controller.release(ticket))
+    return run
+
+
+def _publish(run: Run, event: StreamEvent) -> None:
+    run.publish(event.type, json.dumps(event.dict(), ensure_ascii=False))
+
+
+async def _run_analysis(
+    run: Run, payload: AnalyzeRequest, idempotency_key: Optional[str] = None
+) -> None:
+    # 后台运行，不依赖单个连接的数据库会话
+    with Session(engine) as session:
         async for event in stream_analysis(payload, session):
-            if await request.is_disconnected():
-                break
-            yield {
-                "event": event.type,
-                "data": json.dumps(event.dict(), ensure_ascii=False),
-            }
+            if event.type == "error":
+                run.error = event.message or "analysis failed"
+            elif event.type == "result" and event.fallback:
+                # 示例数据不算该键的结果：键保持未完成，重试时重新调用模型
+                run.error = event.message or "fallback result"
+            elif event.type == "result" and idempotency_key and event.analysis_id:
+                idempotency.complete(
+                    session, idempotency_key, idempotency.fingerprint(payload), event.analysis_id
+                )
+            _publish(run, event)
+
+
+async def _replay_stored(run: Run, analysis_id: str, result: FullAnalysisResult) -> None:
+    # 同一幂等键已有结果：以已结束运行的形式回放，不再调用模型
+    for event in (
+        StreamEvent(type="log", stage="stored", analysis_id=analysis_id, message="复用已保存的分析结果"),
+        StreamEvent(
+            type="result",
+            stage="completed",
+            analysis_id=analysis_id,
+            payload=result,
+            message="分析完成",
+        ),
+        StreamEvent(type="end", stage="completed", analysis_id=analysis_id, message="done"),
+    ):
+        _publish(run, event)
+
+
+def _stored_result(key: str, payload: AnalyzeRequest) -> Optional[tuple[str, FullAnalysisResult]]:
+    with Session(engine) as session:
+        try:
+            analysis_id = idempotency.begin(session, key, idempotency.fingerprint(payload))
+        except IdempotencyConflict as exc:
+            raise HTTPException(status_code=409, detail=str(exc)) from exc
+        record = load_analysis(session, analysis_id) if analysis_id else None
+        if record is None or not record.result_json:
+            return None
+        return record.id, FullAnalysisResult.parse_obj(json.loads(record.result_json))
+
+
+def _follow_run(request: Request, run: Run, after: int) -> EventSourceResponse:
+    async def event_generator() -> AsyncGenerator[dict[str, Any], None]:
+        events = run.follow(after)
+        disconnect = asyncio.ensure_future(_wait_for_disconnect(request))
+        next_event: Optional[asyncio.Future] = None
+        try:
+            while True:
+                next_event = asyncio.ensure_future(events.__anext__())
+                await asyncio.wait(
+                    {next_event, disconnect}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not next_event.done():
+                    metrics.incr("analysis_stream_disconnects_total")
+                    break
+                try:
+                    event = next_event.result()
+                except StopAsyncIteration:
+                    break
+                yield event
+        finally:
+            disconnect.cancel()
+            if next_event is not None and not next_event.done():
+                # 断线只解除跟随；无人跟随超过宽限期后运行才会被取消
+                next_event.cancel()
+            else:
+                await events.aclose()
 
     return EventSourceResponse(event_generator())
 
 
+@router.post("/analyze/stream")
+async def analyze_stream_endpoint(request: Request, payload: AnalyzeRequest) -> EventSourceResponse:
+    # 同一 client_run_id 重连时按 Last-Event-ID 补发漏掉的事件并接上原运行，而不是重新分析；
+    # 该键（或 Idempotency-Key 头）已产出结果时直接回放已保存的分析
+    key = request.headers.get("idempotency-key") or payload.client_run_id
+    run_id = key or str(uuid4())
+    # 先核对请求指纹：同一键换了请求内容时返回 409，而不是接到该键的运行上
+    stored = _stored_result(key, payload) if key else None
+    last_event_id = request.headers.get("last-event-id")
+    # 重连（带 Last-Event-ID）回放原运行，即便它已失败；新提交遇到失败的运行则重新开始
+    run = runs.registry.get(run_id) if last_event_id else _live_run(run_id)
+    if run is None and stored is not None:
+        run = runs.registry.start(run_id, lambda started: _replay_stored(started, *stored))
+        return _follow_run(request, run, 0)
+    if run is None:
+        # 只有新运行需要占用并发槽位；重连接上的是已放行的运行
+        run = await _start_admitted(run_id, lambda started: _run_analysis(started, payload, key))
+        return _follow_run(request, run, 0)
+    metrics.incr("analysis_stream_resumed_total")
+    return _follow_run(request, run, runs.parse_last_event_id(last_event_id))
+
+
+@router.get("/analyze/stream/{run_id}")
+async def analyze_stream_resume_endpoint(
+    request: Request, run_id: str, last_event_id: Optional[str] = None
+) -> EventSourceResponse:
+    run = runs.registry.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found or expired")
+    metrics.incr("analysis_stream_resumed_total")
+    after = request.headers.get("last-event-id") or last_event_id
+    return _follow_run(request, run, runs.parse_last_event_id(after))
+
+
 @router.get("/analysis/{analysis_id}")
 def get_analysis_detail(
     analysis_id: str, session: Session = Depends(get_session)
@@ -82,6 +223,7 @@ async def regenerate_resume(
         f"【简历】\n{payload.resume_text}\n\n【JD】\n{payload.jd_text}\n\n"
         "输出 Markdown，突出匹配 JD 的经历。"
     )
+    ticket = await _admit(admission.INTERACTIVE)
     try:
         client = LLMClient(payload.api_key, payload.base_url, payload.model)
         markdown = await client.generate_markdown(
@@ -95,6 +237,8 @@ async def regenerate_resume(
                 f"- {exc}",
             ]
         )
+    finally:
+        admission.controller.release(ticket)
     return {
         "markdown": markdown,
         "analysis_id": payload.analysis_id,
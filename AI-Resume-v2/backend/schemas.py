@@ -111,6 +111,9 @@ class AnalyzeRequest(BaseModel):
         default=None, description="LLM API key; falls back to environment if omitted"
     )
     model: Optional[str] = Field(default="deepseek-chat")
+    client_run_id: Optional[str] = Field(
+        default=None, description="Reconnects with the same id resume the run instead of restarting it"
+    )
 
 
 class ResumeCustomizeRequest(BaseModel):
@@ -150,3 +153,5 @@ class StreamEvent(BaseModel):
     message: Optional[str] = None
     analysis_id: Optional[str] = None
     payload: Optional[FullAnalysisResult] = None
+    # result 事件：LLM 不可用时返回的本地示例数据
+    fallback: bool = False
@@ -0,0 +1,63 @@
+"""Coalesce identical in-flight LLM calls so duplicates share one upstream request."""
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from . import metrics
+
+
+T = TypeVar("T")
+
+SINGLEFLIGHT_ENABLED = os.getenv("LLM_SINGLEFLIGHT", "true").lower() in {"1", "true", "yes"}
+
+
+class FlightAbandoned(Exception):
+    """The leading caller was cancelled before its call finished."""
+
+
+def flight_key(*parts: Any) -> str:
+    material = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class FlightGroup:
+    """In-flight calls by key; the first caller leads and later identical callers wait for it."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._flights: Dict[str, "asyncio.Future[Any]"] = {}
+
+    async def do(self, key: Optional[str], fn: Callable[[], Awaitable[T]]) -> T:
+        if key is None or not SINGLEFLIGHT_ENABLED:
+            return await fn()
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                break
+            metrics.incr("llm_coalesced_total", group=self.name)
+            try:
+                # Shielded so a follower that goes away does not cancel the leader's call.
+                return await asyncio.shield(flight)
+            except FlightAbandoned:
+                continue
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+        except Exception as exc:
+            flight.set_exception(exc)
+            raise
+        except BaseException:
+            flight.set_exception(FlightAbandoned())
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
+            # Nobody may be waiting; retrieve the exception so asyncio does not log it.
+            flight.exception()
+
+
+completions = FlightGroup("completion")
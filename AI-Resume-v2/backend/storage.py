@@ -35,6 +35,19 @@ class PromptRecord(SQLModel, table=True):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class IdempotencyRecord(SQLModel, table=True):
+    key: str = Field(primary_key=True)
+    fingerprint: str
+    analysis_id: Optional[str] = None
+    expires_at: datetime = Field(index=True)
+
+
+class RunEvent(SQLModel, table=True):
+    run_id: str = Field(primary_key=True)
+    seq: int = Field(primary_key=True)
+    event_json: str = Field(sa_column=Column("event_json", Text))
+
+
 engine = create_engine(
     DATABASE_URL, echo=False, connect_args={"check_same_thread": False}
 )
@@ -102,3 +115,58 @@ def fetch_prompt(session: Session, key: str) -> Optional[PromptRecord]:
 def fetch_all_prompts(session: Session) -> list[PromptRecord]:
     statement = select(PromptRecord)
     return list(session.exec(statement).all())
+
+
+def append_run_events(session: Session, run_id: str, events: list[dict]) -> None:
+    for event in events:
+        session.merge(
+            RunEvent(
+                run_id=run_id,
+                seq=int(event["id"]),
+                event_json=json.dumps(event, ensure_ascii=False),
+            )
+        )
+    session.commit()
+
+
+def load_run_events(
+    session: Session, run_id: str, after: int, before: int
+) -> list[dict]:
+    statement = (
+        select(RunEvent)
+        .where(RunEvent.run_id == run_id, RunEvent.seq > after, RunEvent.seq < before)
+        .order_by(RunEvent.seq)
+    )
+    return [json.loads(event.event_json) for event in session.exec(statement).all()]
+
+
+def delete_run_events(session: Session, run_id: str) -> None:
+    for event in session.exec(select(RunEvent).where(RunEvent.run_id == run_id)).all():
+        session.delete(event)
+    session.commit()
+
+
+def get_idempotency_record(session: Session, key: str) -> Optional[IdempotencyRecord]:
+    record = session.get(IdempotencyRecord, key)
+    if record is None or record.expires_at <= datetime.utcnow():
+        return None
+    return record
+
+
+def put_idempotency_record(
+    session: Session,
+    key: str,
+    fingerprint: str,
+    expires_at: datetime,
+    analysis_id: Optional[str] = None,
+) -> None:
+    statement = select(IdempotencyRecord).where(IdempotencyRecord.expires_at <= datetime.utcnow())
+    for expired in session.exec(statement).all():
+        if expired.key != key:
+            session.delete(expired)
+    session.merge(
+        IdempotencyRecord(
+            key=key, fingerprint=fingerprint, analysis_id=analysis_id, expires_at=expires_at
+        )
+    )
+    session.commit()
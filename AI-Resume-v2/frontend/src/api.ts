@@ -6,6 +6,7 @@ import type {
 } from "./types";
 
 const API_BASE = import.meta.env.VITE_API_BASE ?? "http://localhost:8000";
+const MAX_STREAM_RECONNECTS = 3;
 
 export function startAnalysisStream(
   payload: AnalyzePayload,
@@ -14,53 +15,77 @@ export function startAnalysisStream(
   onError: (err: Error) => void
 ) {
   const controller = new AbortController();
+  // 同一 client_run_id 断线重连时，服务端按 Last-Event-ID 补发漏掉的事件并接上原运行
+  const runId = crypto.randomUUID ? crypto.randomUUID() : `run-${Date.now()}`;
+  let lastEventId = 0;
+  let finished = false;
+
+  const readStream = async (response: Response) => {
+    if (!response.ok || !response.body) {
+      throw new Error((await response.text()) || "无法读取 SSE 响应流");
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const segments = buffer.split("\n\n");
+      buffer = segments.pop() ?? "";
+      for (const segment of segments) {
+        const lines = segment.split("\n");
+        let eventName = "message";
+        let dataStr = "";
+        for (const line of lines) {
+          if (line.startsWith("id:")) {
+            lastEventId = Number(line.replace("id:", "").trim()) || lastEventId;
+          }
+          if (line.startsWith("event:")) {
+            eventName = line.replace("event:", "").trim();
+          }
+          if (line.startsWith("data:")) {
+            dataStr += line.replace("data:", "").trim();
+          }
+        }
+        if (eventName === "end" || eventName === "error") finished = true;
+        if (dataStr) {
+          try {
+            const evt = JSON.parse(dataStr) as StreamEvent;
+            onEvent(eventName, evt);
+          } catch (err) {
+            console.error("解析 SSE 失败", err, dataStr);
+          }
+        }
+      }
+    }
+  };
+
   (async () => {
     try {
-      const response = await fetch(`${API_BASE}/analyze/stream`, {
+      let request = fetch(`${API_BASE}/analyze/stream`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
           Accept: "text/event-stream",
         },
-        body: JSON.stringify(payload),
+        body: JSON.stringify({ ...payload, client_run_id: runId }),
         signal: controller.signal,
       });
-
-      if (!response.body) {
-        throw new Error("无法读取 SSE 响应流");
-      }
-
-      const reader = response.body.getReader();
-      const decoder = new TextDecoder();
-      let buffer = "";
-
-      while (true) {
-        const { value, done } = await reader.read();
-        if (done) break;
-        buffer += decoder.decode(value, { stream: true });
-        const segments = buffer.split("\n\n");
-        buffer = segments.pop() ?? "";
-        for (const segment of segments) {
-          const lines = segment.split("\n");
-          let eventName = "message";
-          let dataStr = "";
-          for (const line of lines) {
-            if (line.startsWith("event:")) {
-              eventName = line.replace("event:", "").trim();
-            }
-            if (line.startsWith("data:")) {
-              dataStr += line.replace("data:", "").trim();
-            }
-          }
-          if (dataStr) {
-            try {
-              const evt = JSON.parse(dataStr) as StreamEvent;
-              onEvent(eventName, evt);
-            } catch (err) {
-              console.error("解析 SSE 失败", err, dataStr);
-            }
-          }
+      for (let attempt = 1; ; attempt += 1) {
+        try {
+          await readStream(await request);
+        } catch (err) {
+          if ((err as Error).name === "AbortError" || attempt > MAX_STREAM_RECONNECTS) throw err;
         }
+        if (finished || attempt > MAX_STREAM_RECONNECTS) break;
+        await new Promise((resolve) => setTimeout(resolve, 1000 * attempt));
+        request = fetch(`${API_BASE}/analyze/stream/${encodeURIComponent(runId)}`, {
+          headers: { Accept: "text/event-stream", "Last-Event-ID": String(lastEventId) },
+          signal: controller.signal,
+        });
       }
       onDone();
     } catch (err) {
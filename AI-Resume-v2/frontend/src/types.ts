@@ -102,6 +102,7 @@ export interface StreamEvent {
   message?: string;
   analysis_id?: string;
   payload?: FullAnalysisResult;
+  fallback?: boolean;
 }
 
 export interface HistoryItem {